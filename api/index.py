@@ -1,30 +1,110 @@
 """
 Vercel Serverless Function for Weather API Application
 Handles all API routes for the weather application
+
+Cold starts matter here, so this module avoids Flask entirely and only
+imports the framework-free core at load time. The weather service (HTTP
+client, cache backend, quota governor) is created on the first request
+that needs it.
 """
 
-import json
+import logging
 import os
 import sys
-from urllib.parse import parse_qs
 
 # Add parent directory to path to import backend modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.weather_service import WeatherService
-from backend.utils import validate_city, handle_error
+from backend.api_core import ApiRequest, WeatherApi
+from backend.profiling import Profiler
 
 # Configuration
 API_KEY = os.getenv('OPENWEATHER_API_KEY', '6c693f3402e404265cfde9786cde3894')
 if not API_KEY:
     raise ValueError("OPENWEATHER_API_KEY not found in environment variables")
 
-# Initialize weather service
-weather_service = WeatherService(API_KEY)
+# Upstream API root (optional); benchmarks point it at a local stand-in server
+BASE_URL = os.getenv('OPENWEATHER_BASE_URL')
+
+# Shared cache backend: memory:// (default), sqlite:///path.db or redis://host:port/db
+CACHE_URL = os.getenv('WEATHER_CACHE_URL', 'memory://')
+
+# Upstream call budget (0, the default, disables a limit; upstream 429 pauses still
+# apply); sqlite:///path.db shares it between workers
+QUOTA_URL = os.getenv('WEATHER_QUOTA_URL', 'memory://')
+QUOTA_PER_MINUTE = int(os.getenv('WEATHER_QUOTA_PER_MINUTE', '0'))
+QUOTA_PER_DAY = int(os.getenv('WEATHER_QUOTA_PER_DAY', '0'))
+
+# Lat/lon requests within this many km of a fresh cached observation reuse it (0 disables)
+GEO_RADIUS_KM = float(os.getenv('WEATHER_GEO_RADIUS_KM', '5'))
+
+# Micro-batching (0 disables): current-weather misses for known city IDs wait
+# up to this many ms to share one /group call; an instance serves one request
+# at a time, so this mainly merges the lookups of /api/weather/batch
+GROUP_WINDOW_MS = float(os.getenv('WEATHER_GROUP_WINDOW_MS', '0'))
+GROUP_MAX_SIZE = int(os.getenv('WEATHER_GROUP_MAX_SIZE', '20'))
+
+# Secondary upstream (optional): openmeteo or openweathermap (any endpoint
+# speaking its API, e.g. a regional mirror; set its URL). Lookups slower than
+# the primary's recent WEATHER_HEDGE_PERCENTILE latency are also sent there and
+# the first answer wins (0 keeps failover only); failed ones are retried there
+SECONDARY_PROVIDER = os.getenv('WEATHER_SECONDARY_PROVIDER')
+SECONDARY_URL = os.getenv('WEATHER_SECONDARY_URL')
+SECONDARY_API_KEY = os.getenv('WEATHER_SECONDARY_API_KEY') or (API_KEY if SECONDARY_PROVIDER == 'openweathermap' else None)
+HEDGE_PERCENTILE = float(os.getenv('WEATHER_HEDGE_PERCENTILE', '95'))
+
+# Directory of the weather history store (unset disables history). Only
+# /tmp is writable on Vercel and it does not outlive the instance
+HISTORY_DIR = os.getenv('WEATHER_HISTORY_DIR')
+
+# Request profiling: sampled fraction, X-Debug-Profile token, slow-request
+# log threshold (0 disables) and cProfile dump directory (e.g. /tmp/profiles)
+PROFILE_SAMPLE_RATE = float(os.getenv('WEATHER_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.getenv('WEATHER_PROFILE_TOKEN')
+SLOW_REQUEST_MS = float(os.getenv('WEATHER_SLOW_REQUEST_MS', '1000'))
+PROFILE_DIR = os.getenv('WEATHER_PROFILE_DIR')
+logging.basicConfig(level=os.getenv('WEATHER_LOG_LEVEL', 'WARNING'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+
+def create_weather_service():
+    """Create the weather service (deferred until a route needs it)"""
+    from backend.cache import create_cache
+    from backend.history import HistoryStore
+    from backend.quota import create_quota
+    from backend.metrics import REGISTRY, service_collector
+    from backend.providers import HedgePolicy, create_provider
+    from backend.weather_service import WeatherService
+    
+    service = WeatherService(
+        API_KEY,
+        cache=create_cache(CACHE_URL),
+        quota=create_quota(QUOTA_URL, QUOTA_PER_MINUTE, QUOTA_PER_DAY),
+        base_url=BASE_URL,
+        geo_radius_km=GEO_RADIUS_KM,
+        history=HistoryStore(HISTORY_DIR) if HISTORY_DIR else None,
+        group_window=GROUP_WINDOW_MS / 1000,
+        group_max_size=GROUP_MAX_SIZE,
+        secondary=create_provider(SECONDARY_PROVIDER, SECONDARY_URL, SECONDARY_API_KEY) if SECONDARY_PROVIDER else None,
+        hedge=HedgePolicy(HEDGE_PERCENTILE / 100),
+    )
+    REGISTRY.register_collector(service_collector(service))
+    return service
+
+
+api = WeatherApi(create_weather_service, Profiler(PROFILE_SAMPLE_RATE, PROFILE_TOKEN, SLOW_REQUEST_MS, PROFILE_DIR))
 
 
 def get_query_params(query_string):
     """Parse query string into dictionary"""
+    from urllib.parse import parse_qs
+    
     if not query_string:
         return {}
     return {k: v[0] if len(v) == 1 else v for k, v in parse_qs(query_string).items()}
@@ -32,19 +112,21 @@ def get_query_params(query_string):
 
 def create_response(body, status_code=200, headers=None):
     """Create Vercel response"""
-    default_headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type',
-    }
+    default_headers = {'Content-Type': 'application/json'}
+    default_headers.update(CORS_HEADERS)
     if headers:
         default_headers.update(headers)
     
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    elif not isinstance(body, str):
+        from backend.json_codec import dumps
+        
+        body = dumps(body).decode('utf-8')
     return {
         'statusCode': status_code,
         'headers': default_headers,
-        'body': json.dumps(body) if isinstance(body, dict) else body
+        'body': body
     }
 
 
@@ -52,116 +134,18 @@ def handler(request):
     """Vercel serverless function handler"""
     # Vercel passes request as dict
     # Handle both 'path' and 'url' formats
-    path = request.get('path', '') or (request.get('url', '').split('?')[0] if request.get('url') else '')
+    url = request.get('url') or ''
+    path = request.get('path', '') or url.split('?')[0]
     method = request.get('method', 'GET') or request.get('httpMethod', 'GET')
-    query_string = request.get('queryStringParameters', {}) or {}
+    query = request.get('queryStringParameters', {}) or {}
     
     # Parse query string from URL if needed
-    if not query_string and '?' in request.get('url', ''):
-        from urllib.parse import urlparse, parse_qs
-        parsed = urlparse(request.get('url', ''))
-        query_string = {k: v[0] if len(v) == 1 else v for k, v in parse_qs(parsed.query).items()}
-    
-    # Handle OPTIONS for CORS
-    if method == 'OPTIONS':
-        return create_response({}, 200)
-    
-    # Route handling - Vercel routes /api/* to this function
-    # So path might be '/api/weather/current' or just '/weather/current'
-    route_path = path.replace('/api', '') if path.startswith('/api') else path
+    if not query and '?' in url:
+        query = get_query_params(url.split('?', 1)[1])
     
-    if route_path == '/weather/current' or route_path.endswith('/weather/current') or path.endswith('/api/weather/current'):
-        city = query_string.get('city', '').strip()
-        unit = query_string.get('unit', 'metric').strip().lower()
-        
-        if not city:
-            return create_response({
-                'success': False,
-                'error': 'City parameter is required'
-            }, 400)
-        
-        if not validate_city(city):
-            return create_response({
-                'success': False,
-                'error': 'Invalid city name'
-            }, 400)
-        
-        if unit not in ['metric', 'imperial']:
-            unit = 'metric'
-        
-        try:
-            weather_data = weather_service.get_current_weather(city, unit)
-            return create_response({
-                'success': True,
-                'data': weather_data
-            })
-        except Exception as e:
-            # handle_error returns (Flask response, status_code)
-            try:
-                flask_response, status_code = handle_error(e)
-                # Extract JSON from Flask response
-                if hasattr(flask_response, 'get_json'):
-                    error_data = flask_response.get_json()
-                else:
-                    error_data = {'success': False, 'error': str(e)}
-                return create_response(error_data, status_code)
-            except Exception as err:
-                return create_response({
-                    'success': False,
-                    'error': str(e)
-                }, 500)
+    headers = {name.lower(): value for name, value in (request.get('headers') or {}).items()}
     
-    elif route_path == '/weather/forecast' or route_path.endswith('/weather/forecast'):
-        city = query_string.get('city', '').strip()
-        unit = query_string.get('unit', 'metric').strip().lower()
-        
-        if not city:
-            return create_response({
-                'success': False,
-                'error': 'City parameter is required'
-            }, 400)
-        
-        if not validate_city(city):
-            return create_response({
-                'success': False,
-                'error': 'Invalid city name'
-            }, 400)
-        
-        if unit not in ['metric', 'imperial']:
-            unit = 'metric'
-        
-        try:
-            forecast_data = weather_service.get_forecast(city, unit)
-            return create_response({
-                'success': True,
-                'data': forecast_data
-            })
-        except Exception as e:
-            # handle_error returns (Flask response, status_code)
-            try:
-                flask_response, status_code = handle_error(e)
-                # Extract JSON from Flask response
-                if hasattr(flask_response, 'get_json'):
-                    error_data = flask_response.get_json()
-                else:
-                    error_data = {'success': False, 'error': str(e)}
-                return create_response(error_data, status_code)
-            except Exception as err:
-                return create_response({
-                    'success': False,
-                    'error': str(e)
-                }, 500)
-    
-    elif route_path == '/health' or route_path.endswith('/health'):
-        return create_response({
-            'status': 'healthy',
-            'service': 'Weather API Application',
-            'version': '1.0.0'
-        })
-    
-    else:
-        return create_response({
-            'success': False,
-            'error': 'Endpoint not found'
-        }, 404)
-
+    # Route handling - Vercel routes /api/* to this function, so the path
+    # may be '/api/weather/current' or just '/weather/current'
+    response = api.dispatch(ApiRequest(method, path, query, headers, request.get('body')))
+    return create_response(response.body, response.status, response.headers)
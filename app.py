@@ -3,47 +3,196 @@ Weather API Application - Flask Backend
 Main application entry point
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import logging
 import os
 from dotenv import load_dotenv
+from backend.api_core import parse_city_query, parse_history_query
+from backend.cache import create_cache
+from backend.history import HistoryStore
+from backend.json_codec import dumps, negotiate_encoding
+from backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, begin_request, end_request, service_collector
+from backend.prewarm import PopularityCounter, Prewarmer
+from backend.profiling import PROFILE_HEADER, Profiler
+from backend.providers import HedgePolicy, create_provider
+from backend.quota import create_quota
+from backend.static_files import SERVED_DIRS, StaticFiles, default_static_root
 from backend.weather_service import WeatherService
-from backend.utils import validate_city, handle_error
+from backend.utils import handle_error, error_headers, normalize_unit, parse_batch_items, parse_limit, bundle_response
 
 # Load environment variables
 load_dotenv()
 
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Route jsonify and app.json through the pluggable encoder in backend.json_codec"""
+    
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        return self._app.response_class(dumps(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype)
+
+
 # Initialize Flask app
-# Serve static files from root directory (for deployment)
-app = Flask(__name__, static_folder='.', static_url_path='')
-CORS(app)  # Enable CORS for frontend
+# Static files are served by serve_static from a lookup table (see below)
+app = Flask(__name__, static_folder=None)
+app.json = FastJSONProvider(app)
+# Always answer '*' instead of echoing Origin, so shared caches can store one copy
+CORS(app, send_wildcard=True)  # Enable CORS for frontend
 
 # Configuration
 API_KEY = os.getenv('OPENWEATHER_API_KEY', '6c693f3402e404265cfde9786cde3894')
 if not API_KEY:
     raise ValueError("OPENWEATHER_API_KEY not found in environment variables")
 
+# Upstream API root (optional); benchmarks point it at a local stand-in server
+BASE_URL = os.getenv('OPENWEATHER_BASE_URL')
+
+# Shared cache backend: memory:// (default), sqlite:///path.db or redis://host:port/db
+CACHE_URL = os.getenv('WEATHER_CACHE_URL', 'memory://')
+
+# Upstream call budget (0, the default, disables a limit; upstream 429 pauses still
+# apply); sqlite:///path.db shares it between workers
+QUOTA_URL = os.getenv('WEATHER_QUOTA_URL', 'memory://')
+QUOTA_PER_MINUTE = int(os.getenv('WEATHER_QUOTA_PER_MINUTE', '0'))
+QUOTA_PER_DAY = int(os.getenv('WEATHER_QUOTA_PER_DAY', '0'))
+
+# Lat/lon requests within this many km of a fresh cached observation reuse it (0 disables)
+GEO_RADIUS_KM = float(os.getenv('WEATHER_GEO_RADIUS_KM', '5'))
+
+# Micro-batching (0 disables): current-weather misses for known city IDs wait
+# up to this many ms to share one OpenWeatherMap /group call of at most
+# WEATHER_GROUP_MAX_SIZE IDs, trading that wait for fewer upstream calls
+GROUP_WINDOW_MS = float(os.getenv('WEATHER_GROUP_WINDOW_MS', '0'))
+GROUP_MAX_SIZE = int(os.getenv('WEATHER_GROUP_MAX_SIZE', '20'))
+
+# Secondary upstream (optional): openmeteo or openweathermap (any endpoint
+# speaking its API, e.g. a regional mirror; set its URL). Lookups slower than
+# the primary's recent WEATHER_HEDGE_PERCENTILE latency are also sent there and
+# the first answer wins (0 keeps failover only); failed ones are retried there
+SECONDARY_PROVIDER = os.getenv('WEATHER_SECONDARY_PROVIDER')
+SECONDARY_URL = os.getenv('WEATHER_SECONDARY_URL')
+SECONDARY_API_KEY = os.getenv('WEATHER_SECONDARY_API_KEY') or (API_KEY if SECONDARY_PROVIDER == 'openweathermap' else None)
+HEDGE_PERCENTILE = float(os.getenv('WEATHER_HEDGE_PERCENTILE', '95'))
+
+# Directory of the weather history store (unset disables history); every
+# fetched observation and forecast is appended there
+HISTORY_DIR = os.getenv('WEATHER_HISTORY_DIR')
+
+# Request profiling (see README_PYTHON.md): sampled fraction, X-Debug-Profile
+# token, slow-request log threshold (0 disables) and cProfile dump directory
+PROFILE_SAMPLE_RATE = float(os.getenv('WEATHER_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.getenv('WEATHER_PROFILE_TOKEN')
+SLOW_REQUEST_MS = float(os.getenv('WEATHER_SLOW_REQUEST_MS', '1000'))
+PROFILE_DIR = os.getenv('WEATHER_PROFILE_DIR')
+
+# Cache prewarming (0 disables): keep the N most requested cities fresh by
+# refreshing entries up to WEATHER_PREWARM_LEAD seconds before they expire,
+# leaving WEATHER_PREWARM_RESERVE of the quota for cache misses
+PREWARM_TOP_N = int(os.getenv('WEATHER_PREWARM_TOP_N', '0'))
+PREWARM_LEAD = float(os.getenv('WEATHER_PREWARM_LEAD', '60'))
+PREWARM_INTERVAL = float(os.getenv('WEATHER_PREWARM_INTERVAL', '10'))
+PREWARM_RESERVE = float(os.getenv('WEATHER_PREWARM_RESERVE', '0.5'))
+
+logging.basicConfig(level=os.getenv('WEATHER_LOG_LEVEL', 'WARNING'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+# Frontend: build.py output (public/) when built, otherwise the repository root
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.getenv('WEATHER_STATIC_DIR') or default_static_root((os.path.join(BASE_DIR, 'public'), BASE_DIR))
+static_files = StaticFiles(STATIC_DIR)
+
 # Initialize weather service
-weather_service = WeatherService(API_KEY)
+weather_service = WeatherService(
+    API_KEY,
+    cache=create_cache(CACHE_URL),
+    quota=create_quota(QUOTA_URL, QUOTA_PER_MINUTE, QUOTA_PER_DAY),
+    base_url=BASE_URL,
+    geo_radius_km=GEO_RADIUS_KM,
+    history=HistoryStore(HISTORY_DIR) if HISTORY_DIR else None,
+    group_window=GROUP_WINDOW_MS / 1000,
+    group_max_size=GROUP_MAX_SIZE,
+    secondary=create_provider(SECONDARY_PROVIDER, SECONDARY_URL, SECONDARY_API_KEY) if SECONDARY_PROVIDER else None,
+    hedge=HedgePolicy(HEDGE_PERCENTILE / 100),
+    popularity=PopularityCounter() if PREWARM_TOP_N > 0 else None,
+)
+service_metrics = service_collector(weather_service)
+REGISTRY.register_collector(service_metrics)
+prewarmer = None
+if PREWARM_TOP_N > 0:
+    # Started here for plain imports; gunicorn.conf.py restarts it in forked
+    # workers and stops it when a worker exits
+    prewarmer = Prewarmer(weather_service, PREWARM_TOP_N, PREWARM_LEAD, PREWARM_INTERVAL, PREWARM_RESERVE)
+    prewarmer.start()
+profiler = Profiler(PROFILE_SAMPLE_RATE, PROFILE_TOKEN, SLOW_REQUEST_MS, PROFILE_DIR)
+
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight, labelled by its route template"""
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_started = begin_request(g.metrics_route)
+    g.profile = profiler.start(request.method, g.metrics_route, request.headers.get(PROFILE_HEADER))
+
+
+@app.after_request
+def record_response_status(response):
+    """Remember the status for finish_request_metrics and report the request's profile"""
+    g.metrics_status = response.status_code
+    response.headers.update(profiler.finish(g.pop('profile', None), response.status_code))
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Record latency and status; runs even when a view raised"""
+    profiler.finish(g.pop('profile', None), 500)  # only still set if after_request did not run
+    if 'metrics_started' in g:
+        end_request(g.metrics_route, request.method, g.get('metrics_status', 500), g.metrics_started)
+
+
+def body_response(body):
+    """Send a pre-encoded weather body, or a 304 if the client's copy is current"""
+    if body.not_modified(request.headers.get('If-None-Match')):
+        return Response(status=304, headers=body.validator_headers())
+    return Response(body.body, headers=body.headers())
+
+
+def send_asset(asset):
+    """Send a static asset, precompressed when the client accepts it"""
+    path, encoding = asset.select(request.headers.get('Accept-Encoding'))
+    response = send_file(path, mimetype=asset.mimetype, conditional=True, etag=True, max_age=None)
+    response.headers['Cache-Control'] = asset.cache_control
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+    return response
 
 
 @app.route('/')
 def index():
     """Serve the main frontend page"""
-    return app.send_static_file('index.html')
+    return send_asset(static_files.get('index.html'))
 
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve static files from root directory"""
+    """Serve static files from the startup lookup table"""
     # Exclude API routes
     if path.startswith('api/'):
         return jsonify({'error': 'Not found'}), 404
-    try:
-        return app.send_static_file(path)
-    except:
-        # Fallback to index.html for SPA routing
-        return app.send_static_file('index.html')
+    asset = static_files.get(path)
+    if asset is None:
+        # Missing scripts, styles and images are real 404s; other paths
+        # fall back to index.html for SPA routing
+        if path.split('/', 1)[0] in SERVED_DIRS:
+            return jsonify({'error': 'Not found'}), 404
+        asset = static_files.get('index.html')
+    return send_asset(asset)
 
 
 @app.route('/api/weather/current', methods=['GET'])
@@ -51,36 +200,21 @@ def get_current_weather():
     """
     Get current weather for a city
     Query parameters:
-        - city: City name (required)
+        - city: City name (required unless lat/lon are given)
+        - lat, lon: Coordinates in degrees (optional, instead of city)
         - unit: 'metric' or 'imperial' (optional, default: 'metric')
     """
     try:
-        city = request.args.get('city', '').strip()
-        unit = request.args.get('unit', 'metric').strip().lower()
-        
         # Validate input
-        if not city:
-            return jsonify({
-                'success': False,
-                'error': 'City parameter is required'
-            }), 400
-        
-        if not validate_city(city):
-            return jsonify({
-                'success': False,
-                'error': 'Invalid city name'
-            }), 400
-        
-        if unit not in ['metric', 'imperial']:
-            unit = 'metric'
+        city, unit, error = parse_city_query(request.args)
+        if error:
+            return jsonify(error), 400
         
-        # Get weather data
-        weather_data = weather_service.get_current_weather(city, unit)
+        # Encoded once per city/unit/encoding while fresh (marked stale if
+        # served from cache while rate limited); 304 on a matching ETag
+        body = weather_service.get_current_weather_body(city, unit, negotiate_encoding(request.headers.get('Accept-Encoding')))
         
-        return jsonify({
-            'success': True,
-            'data': weather_data
-        })
+        return body_response(body)
         
     except Exception as e:
         return handle_error(e)
@@ -91,51 +225,163 @@ def get_forecast():
     """
     Get 5-day forecast for a city
     Query parameters:
-        - city: City name (required)
+        - city: City name (required unless lat/lon are given)
+        - lat, lon: Coordinates in degrees (optional, instead of city)
         - unit: 'metric' or 'imperial' (optional, default: 'metric')
     """
     try:
-        city = request.args.get('city', '').strip()
-        unit = request.args.get('unit', 'metric').strip().lower()
-        
         # Validate input
-        if not city:
-            return jsonify({
-                'success': False,
-                'error': 'City parameter is required'
-            }), 400
+        city, unit, error = parse_city_query(request.args)
+        if error:
+            return jsonify(error), 400
         
-        if not validate_city(city):
-            return jsonify({
-                'success': False,
-                'error': 'Invalid city name'
-            }), 400
+        # Encoded once per city/unit/encoding while fresh (marked stale if
+        # served from cache while rate limited); 304 on a matching ETag
+        body = weather_service.get_forecast_body(city, unit, negotiate_encoding(request.headers.get('Accept-Encoding')))
         
-        if unit not in ['metric', 'imperial']:
-            unit = 'metric'
+        return body_response(body)
         
-        # Get forecast data
-        forecast_data = weather_service.get_forecast(city, unit)
+    except Exception as e:
+        return handle_error(e)
+
+
+@app.route('/api/weather/bundle', methods=['GET'])
+def get_weather_bundle():
+    """
+    Get current weather and 5-day forecast for a city in one response
+    Query parameters:
+        - city: City name (required unless lat/lon are given)
+        - lat, lon: Coordinates in degrees (optional, instead of city)
+        - unit: 'metric' or 'imperial' (optional, default: 'metric')
+    """
+    try:
+        # Validate input
+        city, unit, error = parse_city_query(request.args)
+        if error:
+            return jsonify(error), 400
+        
+        payload, status_code = bundle_response(weather_service.get_bundle(city, unit))
+        return jsonify(payload), status_code, error_headers(payload)
+    
+    except Exception as e:
+        return handle_error(e)
+
+
+@app.route('/api/weather/history', methods=['GET'])
+def get_weather_history():
+    """
+    Get recorded weather for a city over a time range
+    Query parameters:
+        - city: City name (required unless lat/lon are given)
+        - lat, lon: Coordinates in degrees (optional, instead of city)
+        - from, to: Unix seconds or ISO 8601 (optional, default: the last 24 hours)
+        - step: Seconds per averaged point, or e.g. '15m', '1h', '1d' (optional, default: raw samples)
+        - series: 'observed' or 'forecast' (optional, default: 'observed')
+        - unit: 'metric' or 'imperial' (optional, default: 'metric')
+    """
+    try:
+        params, error = parse_history_query(request.args)
+        if error:
+            return jsonify(error), 400
         
+        data = weather_service.get_history(params.city, params.start, params.end, params.step,
+                                           params.unit, params.series)
         return jsonify({
             'success': True,
-            'data': forecast_data
+            'data': data
         })
-        
+    
     except Exception as e:
         return handle_error(e)
 
 
+@app.route('/api/weather/batch', methods=['GET', 'POST'])
+def get_weather_batch():
+    """
+    Get current weather for many cities at once
+    Query parameters (GET):
+        - cities: Comma-separated city names (required)
+        - unit: 'metric' or 'imperial' (optional, default: 'metric')
+    JSON body (POST):
+        - cities: List of city names or {"city": ..., "unit": ...} objects
+        - unit: Default unit for items without one
+    Streams one JSON object per line (NDJSON) in completion order.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        unit = normalize_unit(body.get('unit', 'metric'))
+        items = parse_batch_items(body.get('cities'), unit)
+    else:
+        unit = normalize_unit(request.args.get('unit', 'metric'))
+        items = parse_batch_items(request.args.get('cities', ''), unit)
+    
+    if not items:
+        return jsonify({
+            'success': False,
+            'error': 'Cities parameter is required'
+        }), 400
+    
+    if len(items) > weather_service.MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'At most {weather_service.MAX_BATCH_SIZE} cities per batch'
+        }), 400
+    
+    def generate():
+        for result in weather_service.iter_current_weather(items):
+            yield dumps(result) + b'\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/api/cities/suggest', methods=['GET'])
+def suggest_cities():
+    """
+    Autocomplete city names from the local city index
+    Query parameters:
+        - prefix: Beginning of a city name (required)
+        - limit: Maximum number of suggestions (optional, default: 10)
+    """
+    prefix = request.args.get('prefix', '').strip()
+    if not prefix:
+        return jsonify({
+            'success': False,
+            'error': 'Prefix parameter is required'
+        }), 400
+    
+    limit = parse_limit(request.args.get('limit'), weather_service.SUGGEST_LIMIT, weather_service.MAX_SUGGEST_LIMIT)
+    return jsonify({
+        'success': True,
+        'data': weather_service.suggest_cities(prefix, limit)
+    })
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy',
+        'status': 'degraded' if weather_service.is_degraded() else 'healthy',
         'service': 'Weather API Application',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'circuit': weather_service.get_circuit_stats(),
+        'cache': weather_service.get_cache_stats(),
+        'bodyCache': weather_service.get_body_cache_stats(),
+        'coalescing': weather_service.get_coalescing_stats(),
+        'grouping': weather_service.get_grouping_stats(),
+        'providers': weather_service.get_provider_stats(),
+        'geo': weather_service.get_geo_stats(),
+        'history': weather_service.get_history_stats(),
+        'quota': weather_service.get_quota_stats(),
+        'prewarm': prewarmer.get_stats() if prewarmer is not None else None
     })
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == '__main__':
     # Run the Flask app
     port = int(os.getenv('PORT', 5000))
@@ -0,0 +1,405 @@
+"""
+Weather API Application - ASGI Entry Point
+Serves the /api/weather/* routes with AsyncWeatherService so one process can
+hold many in-flight upstream requests; all other paths go to the Flask app.
+
+Run with:
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+    uvicorn asgi:app
+"""
+
+import asyncio
+import json
+import signal
+import threading
+from typing import Optional
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from app import app as flask_app, weather_service, service_metrics, prewarmer, profiler, API_KEY
+from backend.api_core import parse_city_query, parse_history_query
+from backend.async_weather_service import AsyncWeatherService
+from backend.json_codec import EncodedBody, dumps, negotiate_encoding
+from backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, begin_request, end_request, service_collector
+from backend.profiling import PROFILE_HEADER
+from backend.streaming import WeatherStreamHub
+from backend.utils import map_error, error_headers, normalize_unit, parse_batch_items, parse_limit, bundle_response, validate_city
+
+# Share the response and body caches, call budget, circuit breaker and
+# providers with the sync service used by the Flask routes
+async_weather_service = AsyncWeatherService(
+    API_KEY,
+    cache=weather_service.cache,
+    quota=weather_service.quota,
+    breaker=weather_service.breaker,
+    bodies=weather_service.bodies,
+    base_url=weather_service.base_url,
+    geo_radius_km=weather_service.geo_radius_km,
+    places=weather_service.places,
+    popularity=weather_service.popularity,
+    history=weather_service.history,
+    group_window=weather_service.group_window,
+    group_max_size=weather_service.group_max_size,
+    secondary=weather_service.secondary,
+    hedge=weather_service.hedge,
+)
+# /api/weather/* is served by the async service here, so its single-flight
+# and micro-batching counters are reported together with the sync service's
+REGISTRY.unregister_collector(service_metrics)
+REGISTRY.register_collector(service_collector(weather_service, async_weather_service))
+stream_hub = WeatherStreamHub(async_weather_service)
+wsgi_app = WsgiToAsgi(flask_app)
+
+MAX_BODY_SIZE = 1024 * 1024  # bytes accepted for batch POST bodies
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+    (b'access-control-allow-headers', b'Content-Type'),
+]
+
+
+def encode_json(body) -> bytes:
+    """Serialize a response body"""
+    return dumps(body)
+
+
+def encode_headers(headers: dict) -> list:
+    """Convert a header dictionary to ASGI header pairs"""
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+
+async def send_bytes(send, payload: bytes, status_code: int = 200, headers: dict = None) -> None:
+    """
+    Send a complete response whose body is already encoded
+    
+    Args:
+        send: ASGI send callable
+        payload: Response body
+        status_code: HTTP status code
+        headers: Response headers, including Content-Type
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-length', str(len(payload)).encode('ascii'))] + CORS_HEADERS + encode_headers(headers or {}),
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def send_json(send, body, status_code: int = 200, headers: dict = None) -> None:
+    """
+    Send a complete JSON response
+    
+    Args:
+        send: ASGI send callable
+        body: JSON-serializable response body
+        status_code: HTTP status code
+        headers: Extra response headers
+    """
+    await send_bytes(send, encode_json(body), status_code, dict({'Content-Type': 'application/json'}, **(headers or {})))
+
+
+def request_header(scope, name: bytes) -> Optional[str]:
+    """Return a request header (lower-case name) or None"""
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def send_body(scope, send, body: EncodedBody) -> None:
+    """Send a pre-encoded weather body, or a 304 if the client's copy is current"""
+    if body.not_modified(request_header(scope, b'if-none-match')):
+        await send({
+            'type': 'http.response.start',
+            'status': 304,
+            'headers': CORS_HEADERS + encode_headers(body.validator_headers()),
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    await send_bytes(send, body.body, 200, body.headers())
+
+
+def accept_encoding(scope) -> Optional[str]:
+    """Negotiate the response content coding from the request headers"""
+    return negotiate_encoding(request_header(scope, b'accept-encoding'))
+
+
+async def send_error(send, error: Exception) -> None:
+    """Send the mapped error response for an exception"""
+    payload, status_code = map_error(error)
+    await send_json(send, payload, status_code, error_headers(payload))
+
+
+async def read_body(receive) -> bytes:
+    """Read the request body, up to MAX_BODY_SIZE bytes"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if len(body) > MAX_BODY_SIZE:
+            raise ValueError('Request body too large')
+    return body
+
+
+async def current_weather(scope, receive, send, query: dict) -> None:
+    """GET /api/weather/current?city=&unit= (or lat=&lon= instead of city)"""
+    city, unit, error = parse_city_query(query)
+    if error:
+        return await send_json(send, error, 400)
+    try:
+        body = await async_weather_service.get_current_weather_body(city, unit, accept_encoding(scope))
+    except Exception as e:
+        return await send_error(send, e)
+    await send_body(scope, send, body)
+
+
+async def forecast(scope, receive, send, query: dict) -> None:
+    """GET /api/weather/forecast?city=&unit= (or lat=&lon= instead of city)"""
+    city, unit, error = parse_city_query(query)
+    if error:
+        return await send_json(send, error, 400)
+    try:
+        body = await async_weather_service.get_forecast_body(city, unit, accept_encoding(scope))
+    except Exception as e:
+        return await send_error(send, e)
+    await send_body(scope, send, body)
+
+
+async def bundle(scope, receive, send, query: dict) -> None:
+    """GET /api/weather/bundle?city=&unit=, current + forecast fetched concurrently"""
+    city, unit, error = parse_city_query(query)
+    if error:
+        return await send_json(send, error, 400)
+    payload, status_code = bundle_response(await async_weather_service.get_bundle(city, unit))
+    await send_json(send, payload, status_code, error_headers(payload))
+
+
+async def history(scope, receive, send, query: dict) -> None:
+    """GET /api/weather/history?city=&from=&to=&step=&series=&unit="""
+    params, error = parse_history_query(query)
+    if error:
+        return await send_json(send, error, 400)
+    try:
+        data = await async_weather_service.get_history(params.city, params.start, params.end, params.step,
+                                                       params.unit, params.series)
+    except Exception as e:
+        return await send_error(send, e)
+    await send_json(send, {'success': True, 'data': data})
+
+
+async def batch(scope, receive, send, query: dict) -> None:
+    """GET/POST /api/weather/batch, streamed as NDJSON in completion order"""
+    if scope['method'] == 'POST':
+        try:
+            body = json.loads(await read_body(receive) or b'{}')
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        unit = normalize_unit(body.get('unit', 'metric'))
+        items = parse_batch_items(body.get('cities'), unit)
+    else:
+        unit = normalize_unit(query.get('unit', 'metric'))
+        items = parse_batch_items(query.get('cities', ''), unit)
+    
+    if not items:
+        return await send_json(send, {
+            'success': False,
+            'error': 'Cities parameter is required'
+        }, 400)
+    if len(items) > async_weather_service.MAX_BATCH_SIZE:
+        return await send_json(send, {
+            'success': False,
+            'error': f'At most {async_weather_service.MAX_BATCH_SIZE} cities per batch'
+        }, 400)
+    
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')] + CORS_HEADERS,
+    })
+    async for result in async_weather_service.iter_current_weather(items):
+        await send({'type': 'http.response.body', 'body': encode_json(result) + b'\n', 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def end_on_disconnect(receive, subscriber) -> None:
+    """End a stream when its client goes away"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscriber.push(None)
+
+
+async def stream(scope, receive, send, query: dict) -> None:
+    """GET /api/weather/stream?cities=&unit=, Server-Sent Events with live current weather"""
+    items = parse_batch_items(query.get('cities', ''), normalize_unit(query.get('unit', 'metric')))
+    if not items:
+        return await send_json(send, {
+            'success': False,
+            'error': 'Cities parameter is required'
+        }, 400)
+    if len(items) > stream_hub.MAX_CITIES:
+        return await send_json(send, {
+            'success': False,
+            'error': f'At most {stream_hub.MAX_CITIES} cities per stream'
+        }, 400)
+    if not all(validate_city(city) for city, _ in items):
+        return await send_json(send, {
+            'success': False,
+            'error': 'Invalid city name'
+        }, 400)
+    
+    subscriber = stream_hub.subscribe(items)
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # no proxy buffering (nginx)
+        ] + CORS_HEADERS,
+    })
+    watcher = asyncio.ensure_future(end_on_disconnect(receive, subscriber))
+    try:
+        while True:
+            chunk = await subscriber.next()
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        watcher.cancel()
+        stream_hub.unsubscribe(subscriber)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def suggest_cities(scope, receive, send, query: dict) -> None:
+    """GET /api/cities/suggest?prefix=&limit="""
+    prefix = query.get('prefix', '').strip()
+    if not prefix:
+        return await send_json(send, {
+            'success': False,
+            'error': 'Prefix parameter is required'
+        }, 400)
+    limit = parse_limit(query.get('limit'), async_weather_service.SUGGEST_LIMIT, async_weather_service.MAX_SUGGEST_LIMIT)
+    await send_json(send, {'success': True, 'data': async_weather_service.suggest_cities(prefix, limit)})
+
+
+async def health(scope, receive, send, query: dict) -> None:
+    """GET /api/health"""
+    await send_json(send, {
+        'status': 'degraded' if async_weather_service.is_degraded() else 'healthy',
+        'service': 'Weather API Application',
+        'version': '1.0.0',
+        'circuit': async_weather_service.get_circuit_stats(),
+        'cache': async_weather_service.get_cache_stats(),
+        'bodyCache': async_weather_service.get_body_cache_stats(),
+        'coalescing': async_weather_service.get_coalescing_stats(),
+        'grouping': async_weather_service.get_grouping_stats(),
+        'providers': async_weather_service.get_provider_stats(),
+        'geo': async_weather_service.get_geo_stats(),
+        'history': async_weather_service.get_history_stats(),
+        'quota': async_weather_service.get_quota_stats(),
+        'streams': stream_hub.get_stats(),
+        'prewarm': prewarmer.get_stats() if prewarmer is not None else None
+    })
+
+
+async def metrics(scope, receive, send, query: dict) -> None:
+    """GET /api/metrics (Prometheus text format, this process)"""
+    await send_bytes(send, REGISTRY.render().encode('utf-8'), 200, {'Content-Type': METRICS_CONTENT_TYPE})
+
+
+ROUTES = {
+    '/api/weather/current': current_weather,
+    '/api/weather/forecast': forecast,
+    '/api/weather/bundle': bundle,
+    '/api/weather/batch': batch,
+    '/api/weather/history': history,
+    '/api/weather/stream': stream,
+    '/api/cities/suggest': suggest_cities,
+    '/api/health': health,
+    '/api/metrics': metrics,
+}
+
+
+def on_exit_signal(callback) -> None:
+    """
+    Run callback on the event loop when the server is told to stop
+    
+    uvicorn waits for open responses to finish before it sends
+    lifespan.shutdown, so event streams must be ended as soon as SIGINT or
+    SIGTERM arrives. The server's own handler, installed before lifespan
+    startup, is still called.
+    
+    Args:
+        callback: Function to call (no arguments)
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue  # default or ignored: not managed by the server, leave it alone
+        
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(callback)
+            previous(signum, frame)
+        
+        signal.signal(sig, handler)
+
+
+async def lifespan(receive, send) -> None:
+    """Handle ASGI startup/shutdown, ending streams, stopping prewarming and closing pooled connections on exit"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            on_exit_signal(stream_hub.close)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            stream_hub.close()
+            if prewarmer is not None:
+                await asyncio.to_thread(prewarmer.stop)
+            await async_weather_service.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    
+    route = ROUTES.get(scope.get('path', '').rstrip('/')) if scope['type'] == 'http' else None
+    if route is None:
+        return await wsgi_app(scope, receive, send)
+    
+    path = scope['path'].rstrip('/')
+    started = begin_request(path)
+    status = [500]
+    # Started in this task, so the profile's context variable is seen by
+    # every phase() the route awaits; finished as the response starts, like
+    # Flask's after_request, so Server-Timing can still be added
+    profile = [profiler.start(scope['method'], path, request_header(scope, PROFILE_HEADER.lower().encode('latin-1')))]
+    
+    async def send_tracked(message):
+        if message['type'] == 'http.response.start':
+            status[0] = message['status']
+            extra = profiler.finish(profile.pop(), status[0]) if profile else {}
+            if extra:
+                message = dict(message, headers=list(message.get('headers', ())) + encode_headers(extra))
+        await send(message)
+    
+    try:
+        if scope['method'] == 'OPTIONS':
+            return await send_json(send_tracked, {}, 200)
+        
+        query = {k: v[0] for k, v in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        await route(scope, receive, send_tracked, query)
+    finally:
+        if profile:
+            profiler.finish(profile.pop(), 500)  # the route raised before responding
+        end_request(path, scope['method'], status[0], started)
@@ -0,0 +1,357 @@
+"""
+Weather API Application - Framework-free API Core
+Request validation, error mapping and the route table for entry points that
+should not load Flask (the Vercel serverless handler)
+"""
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Union
+from backend.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, begin_request, end_request
+from backend.profiling import PROFILE_HEADER, Profiler
+from backend.spatial import Coordinates
+from backend.utils import validate_city, map_error, error_headers, normalize_unit, parse_batch_items, parse_limit, bundle_response, parse_coordinates, parse_duration, parse_timestamp
+
+HISTORY_SPAN = 86400  # seconds of history returned when 'from' is omitted
+FORECAST_HORIZON = 5 * 86400  # default end of a forecast history range, from now
+
+
+class ApiRequest(NamedTuple):
+    """A parsed HTTP request"""
+    method: str
+    path: str  # e.g. '/api/weather/current' or '/weather/current'
+    query: Dict[str, Any]
+    headers: Dict[str, str]  # lower-case names
+    body: Any  # raw body (str/bytes) or already decoded JSON
+
+
+class ApiResponse(NamedTuple):
+    """A response for the entry point to serialize"""
+    status: int
+    body: Any  # JSON-compatible payload, or an already encoded str/bytes body
+    headers: Dict[str, str]
+
+
+def json_response(payload: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> ApiResponse:
+    """Build a JSON response"""
+    return ApiResponse(status_code, payload, headers or {})
+
+
+def error_response(error: Exception) -> ApiResponse:
+    """Build the mapped error response for an exception"""
+    payload, status_code = map_error(error)
+    return ApiResponse(status_code, payload, error_headers(payload))
+
+
+def route_key(path: str) -> str:
+    """
+    Normalize a request path to a route table key
+    
+    Vercel routes /api/* to the handler with or without the /api prefix.
+    
+    Args:
+        path: Request path
+    
+    Returns:
+        Path without the /api prefix, query string or trailing slash
+    """
+    path = path.split('?', 1)[0].rstrip('/')
+    return path[4:] if path.startswith('/api/') else path
+
+
+def parse_city_query(query: Dict[str, Any]) -> Tuple[Union[str, Coordinates], str, Optional[Dict[str, Any]]]:
+    """
+    Validate the city (or lat/lon) and unit query parameters shared by the weather routes
+    
+    Args:
+        query: Parsed query parameters
+    
+    Returns:
+        Tuple of (city name or Coordinates, unit, error body or None)
+    """
+    city = query.get('city', '')
+    city = city.strip() if isinstance(city, str) else ''
+    unit = normalize_unit(query.get('unit', 'metric'))
+    
+    if not city and (query.get('lat') is not None or query.get('lon') is not None):
+        point = parse_coordinates(query.get('lat'), query.get('lon'))
+        if point is None:
+            return city, unit, {
+                'success': False,
+                'error': 'Invalid coordinates'
+            }
+        return point, unit, None
+    if not city:
+        return city, unit, {
+            'success': False,
+            'error': 'City parameter is required'
+        }
+    if not validate_city(city):
+        return city, unit, {
+            'success': False,
+            'error': 'Invalid city name'
+        }
+    return city, unit, None
+
+
+class HistoryQuery(NamedTuple):
+    """Validated parameters of a history request"""
+    city: Union[str, Coordinates]
+    unit: str
+    series: str
+    start: int
+    end: int
+    step: int
+
+
+def parse_history_query(query: Dict[str, Any]) -> Tuple[Optional[HistoryQuery], Optional[Dict[str, Any]]]:
+    """
+    Validate the parameters of the history route
+    
+    'from' and 'to' are Unix seconds or ISO 8601. 'to' defaults to now
+    (observed) or FORECAST_HORIZON ahead (forecast), 'from' to HISTORY_SPAN
+    before now. 'step' is seconds per averaged point, optionally with an
+    s/m/h/d suffix (0, the default, returns samples as recorded).
+    
+    Args:
+        query: Parsed query parameters
+    
+    Returns:
+        Tuple of (HistoryQuery or None, error body or None)
+    """
+    city, unit, error = parse_city_query(query)
+    if error:
+        return None, error
+    series = query.get('series') or 'observed'
+    if series not in ('observed', 'forecast'):
+        return None, {
+            'success': False,
+            'error': "Series must be 'observed' or 'forecast'"
+        }
+    
+    now = int(time.time())
+    values = {}
+    for name, default in (('from', now - HISTORY_SPAN), ('to', now + (FORECAST_HORIZON if series == 'forecast' else 0))):
+        raw = query.get(name)
+        values[name] = default if raw in (None, '') else parse_timestamp(raw)
+        if values[name] is None:
+            return None, {
+                'success': False,
+                'error': f"Invalid '{name}' time"
+            }
+    if values['from'] > values['to']:
+        return None, {
+            'success': False,
+            'error': "'from' must not be after 'to'"
+        }
+    step = parse_duration(query.get('step') or '0')
+    if step is None:
+        return None, {
+            'success': False,
+            'error': 'Invalid step'
+        }
+    return HistoryQuery(city, unit, series, values['from'], values['to'], step), None
+
+
+class WeatherApi:
+    """
+    Route table and handlers for the JSON API
+    
+    The weather service is created by `service_factory` on the first request
+    that needs it, so validation errors, CORS preflights and unknown paths
+    are answered without importing the HTTP client or opening the cache.
+    """
+    
+    def __init__(self, service_factory: Callable[[], Any], profiler: Optional[Profiler] = None):
+        """
+        Initialize WeatherApi
+        
+        Args:
+            service_factory: Zero-argument callable returning a WeatherService
+            profiler: Request profiler (defaults to slow-request logging only)
+        """
+        self._service_factory = service_factory
+        self.profiler = profiler if profiler is not None else Profiler()
+        self._service = None
+        self._lock = threading.Lock()
+        self.routes: Dict[str, Callable[[ApiRequest], ApiResponse]] = {
+            '/weather/current': self.current_weather,
+            '/weather/forecast': self.forecast,
+            '/weather/bundle': self.bundle,
+            '/weather/batch': self.batch,
+            '/weather/history': self.history,
+            '/cities/suggest': self.suggest_cities,
+            '/health': self.health,
+            '/metrics': self.metrics,
+        }
+    
+    @property
+    def service(self) -> Any:
+        """The weather service, created on first use"""
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = self._service_factory()
+        return self._service
+    
+    def dispatch(self, request: ApiRequest) -> ApiResponse:
+        """
+        Route a request
+        
+        Args:
+            request: Parsed request
+        
+        Returns:
+            Response for the entry point to send
+        """
+        key = route_key(request.path)
+        route = self.routes.get(key)
+        label = '/api' + key if route is not None else 'unmatched'
+        started = begin_request(label)
+        profile = self.profiler.start(request.method, label, request.headers.get(PROFILE_HEADER.lower()))
+        status_code = 500
+        try:
+            if request.method == 'OPTIONS':
+                response = json_response({})
+            elif route is None:
+                response = json_response({
+                    'success': False,
+                    'error': 'Endpoint not found'
+                }, 404)
+            else:
+                response = route(request)
+            status_code = response.status
+        finally:
+            end_request(label, request.method, status_code, started)
+            timing_headers = self.profiler.finish(profile, status_code)
+        if timing_headers:
+            response = response._replace(headers=dict(response.headers, **timing_headers))
+        return response
+    
+    def _body_response(self, body: Any, request: ApiRequest) -> ApiResponse:
+        """Send a pre-encoded weather body, or a 304 if the client's copy is current"""
+        if body.not_modified(request.headers.get('if-none-match')):
+            return ApiResponse(304, '', body.validator_headers())
+        return ApiResponse(200, body.body, body.headers())
+    
+    def current_weather(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/weather/current?city=&unit="""
+        city, unit, error = parse_city_query(request.query)
+        if error:
+            return json_response(error, 400)
+        try:
+            # Identity-encoded; the platform compresses responses at the edge
+            return self._body_response(self.service.get_current_weather_body(city, unit), request)
+        except Exception as e:
+            return error_response(e)
+    
+    def forecast(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/weather/forecast?city=&unit="""
+        city, unit, error = parse_city_query(request.query)
+        if error:
+            return json_response(error, 400)
+        try:
+            return self._body_response(self.service.get_forecast_body(city, unit), request)
+        except Exception as e:
+            return error_response(e)
+    
+    def bundle(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/weather/bundle?city=&unit=, current + forecast fetched concurrently"""
+        city, unit, error = parse_city_query(request.query)
+        if error:
+            return json_response(error, 400)
+        try:
+            payload, status_code = bundle_response(self.service.get_bundle(city, unit))
+        except Exception as e:
+            return error_response(e)
+        return json_response(payload, status_code, error_headers(payload))
+    
+    def history(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/weather/history?city=&from=&to=&step=&series=&unit="""
+        params, error = parse_history_query(request.query)
+        if error:
+            return json_response(error, 400)
+        try:
+            data = self.service.get_history(params.city, params.start, params.end, params.step,
+                                            params.unit, params.series)
+        except Exception as e:
+            return error_response(e)
+        return json_response({
+            'success': True,
+            'data': data
+        })
+    
+    def batch(self, request: ApiRequest) -> ApiResponse:
+        """GET/POST /api/weather/batch, one JSON object per line (NDJSON)"""
+        body = request.body or {}
+        if isinstance(body, (str, bytes)):
+            try:
+                body = json.loads(body)
+            except ValueError:
+                body = {}
+        if request.method == 'POST' and isinstance(body, dict):
+            unit = normalize_unit(body.get('unit', 'metric'))
+            items = parse_batch_items(body.get('cities'), unit)
+        else:
+            unit = normalize_unit(request.query.get('unit', 'metric'))
+            items = parse_batch_items(request.query.get('cities', ''), unit)
+        
+        if not items:
+            return json_response({
+                'success': False,
+                'error': 'Cities parameter is required'
+            }, 400)
+        
+        service = self.service
+        if len(items) > service.MAX_BATCH_SIZE:
+            return json_response({
+                'success': False,
+                'error': f'At most {service.MAX_BATCH_SIZE} cities per batch'
+            }, 400)
+        
+        from backend.json_codec import dumps
+        
+        # The serverless runtime returns one body, so rows are joined in
+        # completion order rather than flushed individually
+        lines = [dumps(result) for result in service.iter_current_weather(items)]
+        return ApiResponse(200, b'\n'.join(lines) + b'\n', {'Content-Type': 'application/x-ndjson'})
+    
+    def suggest_cities(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/cities/suggest?prefix=&limit="""
+        prefix = request.query.get('prefix', '')
+        prefix = prefix.strip() if isinstance(prefix, str) else ''
+        if not prefix:
+            return json_response({
+                'success': False,
+                'error': 'Prefix parameter is required'
+            }, 400)
+        
+        service = self.service
+        limit = parse_limit(request.query.get('limit'), service.SUGGEST_LIMIT, service.MAX_SUGGEST_LIMIT)
+        return json_response({
+            'success': True,
+            'data': service.suggest_cities(prefix, limit)
+        })
+    
+    def health(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/health"""
+        service = self.service
+        return json_response({
+            'status': 'degraded' if service.is_degraded() else 'healthy',
+            'service': 'Weather API Application',
+            'version': '1.0.0',
+            'circuit': service.get_circuit_stats(),
+            'cache': service.get_cache_stats(),
+            'bodyCache': service.get_body_cache_stats(),
+            'coalescing': service.get_coalescing_stats(),
+            'grouping': service.get_grouping_stats(),
+            'providers': service.get_provider_stats(),
+            'geo': service.get_geo_stats(),
+            'history': service.get_history_stats(),
+            'quota': service.get_quota_stats()
+        })
+    
+    def metrics(self, request: ApiRequest) -> ApiResponse:
+        """GET /api/metrics (Prometheus text format, this instance)"""
+        return ApiResponse(200, REGISTRY.render(), {'Content-Type': METRICS_CONTENT_TYPE})
@@ -0,0 +1,529 @@
+"""
+Weather API Application - Async Weather Service
+Non-blocking OpenWeatherMap client for ASGI servers
+"""
+
+import asyncio
+import httpx
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
+from backend.batching import MISSING, AsyncMicroBatcher
+from backend.cache import CacheBackend, CacheEntry
+from backend.circuit_breaker import CircuitOpenError
+from backend.gazetteer import City
+from backend.json_codec import EncodedBody
+from backend.providers import Provider
+from backend.quota import QuotaExceededError
+from backend.singleflight import AsyncSingleFlight
+from backend.spatial import Coordinates
+from backend.utils import validate_city
+from backend.weather_service import CityNotFoundError, WeatherResult, WeatherServiceBase
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWeatherService(WeatherServiceBase):
+    """
+    asyncio counterpart of WeatherService with identical parsed output
+    
+    Calls into shared backends that block (a SQLite or Redis cache, a
+    SQLite quota governor) run in worker threads, so a slow backend delays
+    only the requests waiting on it instead of the whole event loop.
+    History appends go to a single writer thread in fetch order and are
+    not awaited by the request; aclose() waits for the queued ones.
+    """
+    
+    BATCH_WORKERS = 64  # concurrent upstream fetches for batch requests
+    
+    def __init__(self, api_key: str, cache: Optional[CacheBackend] = None,
+                 client: Optional[httpx.AsyncClient] = None, **options: Any):
+        """
+        Initialize AsyncWeatherService
+        
+        Args:
+            api_key: OpenWeatherMap API key
+            cache: Cache backend (may be shared with a sync WeatherService)
+            client: Pre-configured httpx client (defaults to a pooled client
+                created on first use inside the running event loop)
+            **options: TTL, pool, retry and timeout settings (see WeatherServiceBase)
+        """
+        super().__init__(api_key, cache, **options)
+        self._flight = AsyncSingleFlight()
+        self._grouper = AsyncMicroBatcher(self._fetch_group, self.group_window, self.group_max_size) if self.group_window > 0 else None
+        self._client = client
+        self._background: Set[asyncio.Task] = set()
+        self._history_writer: Optional[ThreadPoolExecutor] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client, created lazily inside the event loop"""
+        if self._client is None:
+            connect_timeout, read_timeout = self.timeout
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Cancel background refreshes, flush queued history appends and close pooled upstream connections"""
+        for task in list(self._background):
+            task.cancel()
+        if self._history_writer is not None:
+            writer, self._history_writer = self._history_writer, None
+            await asyncio.to_thread(writer.shutdown, True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @staticmethod
+    async def _offload(blocking: bool, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn, in a worker thread when it may block on I/O"""
+        if blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+    
+    async def _admit_attempt(self, provider: Provider) -> None:
+        """
+        Admit one upstream attempt without blocking the event loop
+        
+        Same checks as WeatherServiceBase._admit. The breaker is in-process and checked inline. A blocking quota
+        governor is called in a worker thread, as it may wait up to its busy
+        timeout for another worker's transaction.
+        """
+        if not self.quota.blocking:
+            self._admit(provider)
+            return
+        provider.breaker.before_call()
+        if not provider.metered:
+            return
+        try:
+            await asyncio.to_thread(self.quota.acquire)
+        except BaseException:
+            # Budget exhausted, or cancelled while waiting: no call is made
+            provider.breaker.release()
+            raise
+    
+    def _lookup_blocks(self, city: Union[str, Coordinates]) -> bool:
+        """Return True when resolving city reads a blocking cache (nearby reuse of coordinates)"""
+        return self.cache.blocking and isinstance(city, Coordinates)
+    
+    async def _make_request(self, endpoint: str, params: Dict[str, Any],
+                            provider: Optional[Provider] = None) -> Dict[str, Any]:
+        """
+        Make HTTP request to OpenWeatherMap API (or another provider) without blocking the event loop
+        
+        Retries connection errors, 5xx and 429 responses with the same
+        jittered backoff as the sync service. Every attempt passes the
+        provider's circuit breaker and the quota governor shared with it.
+        
+        Args:
+            endpoint: API endpoint (e.g., '/weather', '/forecast')
+            params: Query parameters
+            provider: Provider to call (defaults to the primary)
+        
+        Returns:
+            JSON response as dictionary
+        
+        Raises:
+            QuotaExceededError: If the call budget is exhausted or upstream
+                kept answering 429
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            Exception: If request fails
+        """
+        provider = provider or self.primary
+        url = provider.url(endpoint)
+        provider.authorize(params)
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                retries_left = attempt < self.max_retries
+                await self._admit_attempt(provider)
+                started = time.monotonic()
+                try:
+                    response = await self.client.get(url, params=params)
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.ReadError):
+                    self._record_attempt(endpoint, started, provider=provider)
+                    # GETs are idempotent, so connection resets and connect
+                    # timeouts are always safe to retry.
+                    if not retries_left:
+                        raise
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    continue
+                except httpx.TransportError:
+                    self._record_attempt(endpoint, started, provider=provider)
+                    raise
+                except asyncio.CancelledError:
+                    provider.breaker.release()
+                    # Cancelled as the loser of a hedge: its latency so far is
+                    # a lower bound, which keeps it in the tail of the window
+                    provider.observe(endpoint, time.monotonic() - started)
+                    raise
+                self._record_attempt(endpoint, started, response.status_code, provider)
+                
+                if response.status_code in self.RETRY_STATUSES and retries_left:
+                    delay = self._backoff_delay(attempt, response.headers.get('Retry-After'))
+                    if delay is not None:
+                        await asyncio.sleep(delay)
+                        continue
+                
+                if response.status_code == 429:
+                    raise await self._offload(self.quota.blocking, self._rate_limited,
+                                              response.headers.get('Retry-After'), provider)
+                response.raise_for_status()
+                return response.json()
+        except httpx.TimeoutException:
+            raise Exception("Request timed out. Please try again.")
+        except httpx.TransportError:
+            raise Exception("Network error. Please check your internet connection.")
+        except httpx.HTTPStatusError as e:
+            error_data = e.response.json() if e.response.content else {}
+            raise self._http_error(e.response.status_code, error_data)
+        except (QuotaExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            raise Exception(f"An unexpected error occurred: {str(e)}")
+    
+    async def get_current_weather(self, city: Union[str, Coordinates], unit: str = 'metric') -> Dict[str, Any]:
+        """
+        Get current weather for a city
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            Parsed weather data dictionary
+        """
+        return (await self.get_current_weather_result(city, unit)).data
+    
+    async def get_current_weather_result(self, city: Union[str, Coordinates], unit: str = 'metric') -> WeatherResult:
+        """
+        Get current weather for a city with its cache metadata
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            WeatherResult whose data is the parsed weather dictionary
+        """
+        self._record_demand('/weather', city, unit)
+        return self._convert_result('/weather', await self._get_result('/weather', city), unit)
+    
+    async def get_current_weather_body(self, city: Union[str, Coordinates], unit: str = 'metric',
+                                       encoding: Optional[str] = None) -> EncodedBody:
+        """
+        Get the encoded success response for current weather
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+            encoding: Content coding from negotiate_encoding (None for identity)
+        
+        Returns:
+            EncodedBody, reused without re-serializing while the data is fresh
+        """
+        key, body = await self._offload(self._lookup_blocks(city), self._cached_body, '/weather', city, unit, encoding)
+        if body is not None:
+            self._record_demand('/weather', city, unit)
+            return body
+        return self._encode_result(key, await self.get_current_weather_result(city, unit), encoding)
+    
+    async def get_forecast(self, city: Union[str, Coordinates], unit: str = 'metric') -> List[Dict[str, Any]]:
+        """
+        Get 5-day forecast for a city
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            List of forecast data dictionaries
+        """
+        return (await self.get_forecast_result(city, unit)).data
+    
+    async def get_forecast_result(self, city: Union[str, Coordinates], unit: str = 'metric') -> WeatherResult:
+        """
+        Get 5-day forecast for a city with its cache metadata
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            WeatherResult whose data is the list of forecast days
+        """
+        self._record_demand('/forecast', city, unit)
+        return self._convert_result('/forecast', await self._get_result('/forecast', city), unit)
+    
+    async def get_forecast_body(self, city: Union[str, Coordinates], unit: str = 'metric', encoding: Optional[str] = None) -> EncodedBody:
+        """
+        Get the encoded success response for a 5-day forecast
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+            encoding: Content coding from negotiate_encoding (None for identity)
+        
+        Returns:
+            EncodedBody, reused without re-serializing while the data is fresh
+        """
+        key, body = await self._offload(self._lookup_blocks(city), self._cached_body, '/forecast', city, unit, encoding)
+        if body is not None:
+            self._record_demand('/forecast', city, unit)
+            return body
+        return self._encode_result(key, await self.get_forecast_result(city, unit), encoding)
+    
+    async def get_bundle(self, city: Union[str, Coordinates], unit: str = 'metric') -> Dict[str, Dict[str, Any]]:
+        """
+        Get current weather and forecast for a city concurrently
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            Dictionary with 'current' and 'forecast' sections
+        """
+        results = await asyncio.gather(
+            self.get_current_weather_result(city, unit),
+            self.get_forecast_result(city, unit),
+            return_exceptions=True,
+        )
+        current, forecast = (
+            self._section_result(error=result) if isinstance(result, Exception) else self._section_result(result=result)
+            for result in results
+        )
+        return {'current': current, 'forecast': forecast}
+    
+    async def get_history(self, city: Union[str, Coordinates], start: int, end: int, step: int = 0,
+                          unit: str = 'metric', series: str = 'observed') -> Dict[str, Any]:
+        """
+        Read a city's recorded observations or forecasts in a worker thread
+        
+        Range scans read memory-mapped files, so they are kept off the event
+        loop. See WeatherServiceBase.get_history for arguments and result.
+        """
+        return await asyncio.to_thread(WeatherServiceBase.get_history, self, city, start, end, step, unit, series)
+    
+    async def iter_current_weather(self, items: List[Tuple[str, str]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Fetch current weather for many cities concurrently
+        
+        At most BATCH_WORKERS upstream fetches run at once; results are
+        yielded in completion order.
+        
+        Args:
+            items: List of (city, unit) tuples
+        
+        Yields:
+            Result dictionaries as built by _batch_result
+        """
+        semaphore = asyncio.Semaphore(self.BATCH_WORKERS)
+        
+        async def fetch_one(index: int, city: str, unit: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return self._batch_result(index, city, unit, result=await self.get_current_weather_result(city, unit))
+                except Exception as e:
+                    return self._batch_result(index, city, unit, error=e)
+        
+        tasks = []
+        for index, (city, unit) in enumerate(items):
+            if not validate_city(city):
+                yield self._batch_result(index, city, unit, error=ValueError('Invalid city name'))
+                continue
+            tasks.append(asyncio.ensure_future(fetch_one(index, city, unit)))
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Stop outstanding work if the consumer went away early
+            for task in tasks:
+                task.cancel()
+    
+    async def _get_result(self, endpoint: str, city: Union[str, Coordinates]) -> WeatherResult:
+        """
+        Return parsed data for an endpoint, serving from cache when possible
+        
+        Mirrors WeatherService._get_result: stale entries are served while one
+        background task refreshes them, concurrent misses share one fetch,
+        recent 404s are answered locally and an exhausted call budget falls
+        back to the last cached value.
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            city: City name, or Coordinates
+        
+        Returns:
+            WeatherResult with data in the canonical unit system
+        """
+        key, query, entry = await self._offload(self.cache.blocking, self._lookup, endpoint, city)
+        if entry is not None:
+            if not entry.is_fresh():
+                self._schedule_refresh(key, endpoint, query)
+            return WeatherResult(entry.value, entry.stored_at, entry.fresh_until, False)
+        
+        try:
+            entry = await self._flight.do(key, lambda: self._fetch_and_store(key, endpoint, query))
+        except self.FALLBACK_ERRORS as e:
+            return await self._offload(self.cache.blocking, self._fallback, key, e)
+        return WeatherResult(entry.value, entry.stored_at, entry.fresh_until, False)
+    
+    def _lookup(self, endpoint: str, city: Union[str, Coordinates]) -> Tuple[Tuple[str, str], Dict[str, Any], Optional[CacheEntry]]:
+        """
+        Resolve a city and read its cache entry
+        
+        Done in one call so a blocking cache costs a single thread hop.
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            city: City name, or Coordinates
+        
+        Returns:
+            Tuple of (cache key, query parameters, usable entry or None)
+        
+        Raises:
+            CityNotFoundError: If the city is unknown or recently returned 404
+        """
+        location, query = self._resolve_city(city, endpoint)
+        key = (endpoint, location)
+        entry = self.cache.get(key)
+        if entry is None:
+            self._check_not_found(location)
+        return key, query, entry
+    
+    async def _fetch_and_store(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any]) -> CacheEntry:
+        """Fetch from upstream and store the parsed result (or a 404) in the cache"""
+        try:
+            value = await self._fetch(endpoint, query)
+        except CityNotFoundError:
+            await self._offload(self.cache.blocking, self._remember_not_found, key[1])
+            raise
+        self._index_location(key[1], endpoint, value, query)
+        entry = await self._offload(self.cache.blocking, self.cache.set, key, value, self.ttls[endpoint], self.stale_ttl)
+        self._queue_history(key[1], endpoint, value, entry.stored_at)
+        return entry
+    
+    def _queue_history(self, location: str, endpoint: str, value: Any, stored_at: float) -> None:
+        """Hand a fetched result to the history writer thread (file I/O, sealing, compaction)"""
+        if self.history is None:
+            return
+        if self._history_writer is None:
+            # One worker keeps appends in fetch order and off the event loop
+            self._history_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-history')
+        future = self._history_writer.submit(self._record_history, location, endpoint, value, stored_at)
+        future.add_done_callback(self._history_done)
+    
+    @staticmethod
+    def _history_done(future: Future) -> None:
+        """Log an append that failed; nothing waits for the result"""
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Could not record weather history", exc_info=future.exception())
+    
+    async def _fetch(self, endpoint: str, query: Dict[str, Any]) -> Any:
+        """Fetch and parse data from the upstream API, bypassing the cache (see WeatherService._fetch)"""
+        if self._groupable(endpoint, query):
+            value = await self._grouper.submit(query['id'])
+            if value is not MISSING:
+                return value
+        alternate = self._alternate(endpoint, query)
+        if alternate is not None:
+            return await self._fetch_hedged(endpoint, query, *alternate)
+        return await self._fetch_from(self.primary, endpoint, self._request_params(query))
+    
+    async def _fetch_from(self, provider: Provider, endpoint: str, params: Dict[str, Any],
+                          place: Optional[City] = None) -> Any:
+        """Fetch from one provider and parse its normalized response (see WeatherService._fetch_from)"""
+        data = await self._make_request(endpoint, params, provider)
+        return self._parsers[endpoint](provider.normalize(endpoint, data, place))
+    
+    async def _fetch_hedged(self, endpoint: str, query: Dict[str, Any], params: Dict[str, Any],
+                            place: Optional[City]) -> Any:
+        """
+        Fetch from the primary, racing the secondary if the primary is slow or fails
+        
+        Same policy as WeatherService._fetch_hedged, except that each call
+        runs in its own task and the loser is cancelled outright, closing
+        its connection.
+        """
+        legs: Dict[asyncio.Task, Provider] = {}
+        errors: Dict[Provider, Exception] = {}
+        hedged = failover = False
+        
+        def start(provider: Provider, provider_params: Dict[str, Any], provider_place: Optional[City]) -> None:
+            legs[asyncio.ensure_future(self._fetch_from(provider, endpoint, provider_params, provider_place))] = provider
+        
+        start(self.primary, self._request_params(query), None)
+        try:
+            done, _ = await asyncio.wait(legs, timeout=self.hedge.delay(self.primary, endpoint))
+            if not done and self.hedge.allow():
+                hedged = True
+                start(self.secondary, params, place)
+            while legs:
+                done, _ = await asyncio.wait(legs, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = legs.pop(task)
+                    try:
+                        value = task.result()
+                    except Exception as e:
+                        errors[provider] = e
+                        if provider is self.primary:
+                            if isinstance(e, CityNotFoundError):
+                                raise
+                            if not hedged:
+                                hedged = failover = True
+                                self.hedge.record_failover()
+                                start(self.secondary, params, place)
+                        continue
+                    if provider is self.secondary:
+                        self.hedge.record_win(failover)
+                    return value
+            raise errors.get(self.primary) or errors[self.secondary]
+        finally:
+            for task in legs:
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    task.exception()  # finished alongside the winner; mark its error retrieved
+    
+    async def _fetch_group(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Fetch current weather for a batch of city IDs (see WeatherService._fetch_group)"""
+        if len(ids) == 1:
+            return {}
+        try:
+            data = await self._make_request(self.GROUP_ENDPOINT, self._group_params(ids))
+        except CityNotFoundError:
+            return {}
+        return self._split_group(data)
+    
+    def _schedule_refresh(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any]) -> None:
+        """
+        Start a background refresh task for a stale key unless one is already running
+        
+        A blocking cache is asked for the claim inside the task, off the event loop.
+        """
+        claimed = not self.cache.blocking
+        if claimed and not self.cache.begin_refresh(key):
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(key, endpoint, query, claimed))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _refresh(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any], claimed: bool = True) -> None:
+        """Re-fetch a stale key and store the result, first claiming the refresh if not claimed yet"""
+        if not claimed and not await asyncio.to_thread(self.cache.begin_refresh, key):
+            return
+        try:
+            await self._flight.do(key, lambda: self._fetch_and_store(key, endpoint, query))
+        except Exception:
+            # Keep serving the stale entry until the window closes
+            pass
+        finally:
+            await self._offload(self.cache.blocking, self.cache.end_refresh, key)
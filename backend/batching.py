@@ -0,0 +1,212 @@
+"""
+Weather API Application - Request Micro-batching
+Collectors that hold concurrent lookups for a few milliseconds and serve
+them with one upstream call
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+MISSING = object()  # submit() result for an item the batch call did not answer
+
+
+class _Batch:
+    """Items collected by a leader thread and the result shared with its waiters"""
+    
+    __slots__ = ('items', 'full', 'done', 'results', 'error')
+    
+    def __init__(self):
+        self.items: Dict[Hashable, None] = {}  # insertion-ordered set
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results: Dict[Hashable, Any] = {}
+        self.error: Optional[BaseException] = None
+
+
+class _BatchStats:
+    """Counters shared by both collectors"""
+    
+    def __init__(self, window: float, max_size: int):
+        if window <= 0 or max_size < 1:
+            raise ValueError("Batch window and size must be positive")
+        self.window = window
+        self.max_size = max_size
+        self._batches = 0
+        self._items = 0
+        self._full = 0
+    
+    def _record(self, size: int) -> None:
+        self._batches += 1
+        self._items += size
+        if size >= self.max_size:
+            self._full += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get batching statistics
+        
+        Returns:
+            Dictionary with the window, size limit, batches sent, items
+            batched, mean batch size and batches that filled up
+        """
+        return {
+            'windowMs': round(self.window * 1000, 3),
+            'maxSize': self.max_size,
+            'batches': self._batches,
+            'items': self._items,
+            'meanSize': round(self._items / self._batches, 2) if self._batches else None,
+            'full': self._full,
+        }
+
+
+class MicroBatcher(_BatchStats):
+    """
+    Thread-based micro-batcher
+    
+    The first caller opens a batch and waits up to `window` seconds (less
+    once `max_size` items have joined) for other threads to add theirs,
+    then calls `fetch_many` once with every item. The other callers block
+    until it returns and pick their own result out of the mapping, or
+    share the exception it raised.
+    """
+    
+    def __init__(self, fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]], window: float, max_size: int):
+        """
+        Initialize MicroBatcher
+        
+        Args:
+            fetch_many: Function taking a list of items and returning a
+                mapping of item to result (items may be left out)
+            window: Seconds the first item of a batch waits for others
+            max_size: Items per batch; a full batch is sent immediately
+        """
+        super().__init__(window, max_size)
+        self._fetch_many = fetch_many
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+    
+    def submit(self, item: Hashable) -> Any:
+        """
+        Add an item to the open batch and wait for its result
+        
+        Args:
+            item: Hashable item (duplicates in one batch are sent once)
+        
+        Returns:
+            The item's result, or MISSING if fetch_many left it out
+        
+        Raises:
+            Exception: Whatever fetch_many raised, in every caller of the batch
+        """
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.items[item] = None
+            if len(batch.items) >= self.max_size:
+                self._open = None
+                batch.full.set()
+        
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+                self._record(len(batch.items))
+            try:
+                batch.results = self._fetch_many(list(batch.items))
+            except BaseException as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+        
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(item, MISSING)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return super().get_stats()
+
+
+class _AsyncBatch:
+    """Items collected on the event loop and the future of their shared call"""
+    
+    __slots__ = ('items', 'future', 'timer')
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.items: Dict[Hashable, None] = {}
+        self.future: asyncio.Future = loop.create_future()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class AsyncMicroBatcher(_BatchStats):
+    """
+    asyncio micro-batcher
+    
+    A timer sends each batch `window` seconds after its first item (or as
+    soon as it is full). The call runs in its own task, so cancelling one
+    caller never cancels the call the others are waiting on.
+    """
+    
+    def __init__(self, fetch_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 window: float, max_size: int):
+        """
+        Initialize AsyncMicroBatcher
+        
+        Args:
+            fetch_many: Coroutine function taking a list of items and
+                returning a mapping of item to result (items may be left out)
+            window: Seconds the first item of a batch waits for others
+            max_size: Items per batch; a full batch is sent immediately
+        """
+        super().__init__(window, max_size)
+        self._fetch_many = fetch_many
+        self._open: Optional[_AsyncBatch] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, item: Hashable) -> Any:
+        """
+        Add an item to the open batch and wait for its result
+        
+        Args:
+            item: Hashable item (duplicates in one batch are sent once)
+        
+        Returns:
+            The item's result, or MISSING if fetch_many left it out
+        """
+        batch = self._open
+        if batch is None:
+            loop = asyncio.get_running_loop()
+            batch = self._open = _AsyncBatch(loop)
+            batch.timer = loop.call_later(self.window, self._flush, batch)
+        batch.items[item] = None
+        if len(batch.items) >= self.max_size:
+            batch.timer.cancel()
+            self._flush(batch)
+        results = await asyncio.shield(batch.future)
+        return results.get(item, MISSING)
+    
+    def _flush(self, batch: _AsyncBatch) -> None:
+        """Close a batch and start its call"""
+        if self._open is batch:
+            self._open = None
+        self._record(len(batch.items))
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: _AsyncBatch) -> None:
+        try:
+            batch.future.set_result(await self._fetch_many(list(batch.items)))
+        except asyncio.CancelledError:
+            batch.future.cancel()
+            raise
+        except BaseException as e:
+            batch.future.set_exception(e)
+            # Mark the exception as retrieved in case every caller went away
+            batch.future.exception()
@@ -0,0 +1,357 @@
+"""
+Weather API Application - Response Cache
+Cache backend interface and the bounded in-process TTL + LRU implementation
+"""
+
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+from urllib.parse import urlparse
+
+COMPRESS_THRESHOLD = 1024  # bytes; larger serialized payloads are zlib-compressed
+
+
+class CacheEntry:
+    """Cached value together with its freshness metadata"""
+    
+    __slots__ = ('value', 'stored_at', 'fresh_until', 'stale_until')
+    
+    def __init__(self, value: Any, stored_at: float, fresh_until: float, stale_until: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+    
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Return True while the entry is within its TTL"""
+        return (time.time() if now is None else now) < self.fresh_until
+    
+    def is_usable(self, now: Optional[float] = None) -> bool:
+        """Return True while the entry is fresh or inside the stale-while-revalidate window"""
+        return (time.time() if now is None else now) < self.stale_until
+
+
+def _encode_default(value: Any) -> Any:
+    """Tag datetimes so they round-trip through JSON"""
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_hook(obj: Dict[str, Any]) -> Any:
+    """Restore datetimes tagged by _encode_default"""
+    if len(obj) == 1 and '$dt' in obj:
+        return datetime.fromisoformat(obj['$dt'])
+    return obj
+
+
+def serialize_value(value: Any) -> bytes:
+    """
+    Serialize a parsed payload for a shared cache backend
+    
+    Payloads are compact JSON; anything over COMPRESS_THRESHOLD bytes (such as
+    a forecast with its 3-hour items) is zlib-compressed. The first byte
+    records which encoding was used.
+    
+    Args:
+        value: Parsed weather data
+    
+    Returns:
+        Encoded bytes
+    """
+    raw = json.dumps(value, separators=(',', ':'), default=_encode_default).encode('utf-8')
+    if len(raw) > COMPRESS_THRESHOLD:
+        return b'z' + zlib.compress(raw, 6)
+    return b'j' + raw
+
+
+def deserialize_value(data: bytes) -> Any:
+    """
+    Decode bytes produced by serialize_value
+    
+    Args:
+        data: Encoded bytes
+    
+    Returns:
+        Parsed weather data
+    """
+    raw = zlib.decompress(data[1:]) if data[:1] == b'z' else data[1:]
+    return json.loads(raw, object_hook=_decode_hook)
+
+
+class CacheBackend:
+    """
+    Interface shared by all cache backends used by WeatherService
+    
+    Subclasses implement _load, _store, delete, clear and size; hit/miss
+    accounting, freshness checks and refresh claims live here. Backends
+    whose calls do network or disk I/O set `blocking`, so async callers
+    run them in a worker thread.
+    """
+    
+    name = 'base'
+    blocking = False  # True when calls may wait on a socket or file lock
+    RETAIN = 86400  # seconds past the stale window an entry is kept as a last-resort fallback
+    
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._refreshing = set()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._errors = 0
+    
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the stored entry for a key, or None"""
+        raise NotImplementedError
+    
+    def _store(self, key: Hashable, entry: CacheEntry) -> None:
+        """Persist an entry"""
+        raise NotImplementedError
+    
+    def delete(self, key: Hashable) -> None:
+        """Remove a single entry if present"""
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        """Remove all entries (counters are kept)"""
+        raise NotImplementedError
+    
+    def size(self) -> Optional[int]:
+        """Number of stored entries, if cheaply known"""
+        raise NotImplementedError
+    
+    @staticmethod
+    def key_to_str(key: Hashable) -> str:
+        """Flatten a tuple cache key into the string used by shared backends"""
+        if isinstance(key, tuple):
+            return '|'.join(str(part) for part in key)
+        return str(key)
+    
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Look up a cache entry
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The entry if it is fresh or stale-but-servable, otherwise None
+        """
+        try:
+            entry = self._load(key)
+        except Exception:
+            # A broken shared cache must never fail the request
+            self._count('_errors')
+            entry = None
+        
+        now = time.time()
+        if entry is None:
+            self._count('_misses')
+            return None
+        if not entry.is_usable(now):
+            self._count('_expirations')
+            self._count('_misses')
+            return None
+        self._count('_hits' if entry.is_fresh(now) else '_stale_hits')
+        return entry
+    
+    def peek(self, key: Hashable) -> Optional[CacheEntry]:
+        """
+        Return a stored entry regardless of freshness, without counting a lookup
+        
+        Used to answer with the last known value when the upstream cannot be
+        called. Entries are retained for RETAIN seconds after their stale
+        window closes.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            The stored entry, or None
+        """
+        try:
+            entry = self._load(key)
+        except Exception:
+            self._count('_errors')
+            return None
+        if entry is None or entry.stale_until + self.RETAIN <= time.time():
+            return None
+        return entry
+    
+    def set(self, key: Hashable, value: Any, ttl: float, stale_ttl: float = 0) -> CacheEntry:
+        """
+        Store a value in the cache
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Seconds the value is considered fresh
+            stale_ttl: Extra seconds the value may be served while refreshing
+        
+        Returns:
+            The stored cache entry
+        """
+        now = time.time()
+        entry = CacheEntry(value, now, now + ttl, now + ttl + stale_ttl)
+        try:
+            self._store(key, entry)
+        except Exception:
+            self._count('_errors')
+        return entry
+    
+    def begin_refresh(self, key: Hashable) -> bool:
+        """
+        Claim the background refresh for a key
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            True if the caller owns the refresh, False if one is already running
+        """
+        with self._stats_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+    
+    def end_refresh(self, key: Hashable) -> None:
+        """Release a refresh claimed with begin_refresh"""
+        with self._stats_lock:
+            self._refreshing.discard(key)
+    
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """Increment a statistics counter"""
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+        
+        Returns:
+            Dictionary with backend name, size, hit/miss/eviction counters and hit ratio
+        """
+        try:
+            size = self.size()
+        except Exception:
+            size = None
+        with self._stats_lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                'backend': self.name,
+                'size': size,
+                'hits': self._hits,
+                'staleHits': self._stale_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'errors': self._errors,
+                'refreshing': len(self._refreshing),
+                'hitRatio': round((self._hits + self._stale_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class ResponseCache(CacheBackend):
+    """
+    Thread-safe in-process cache with per-entry TTL and LRU eviction
+    
+    Entries stay servable for `stale_ttl` seconds after they expire so callers
+    can answer immediately while a single background refresh runs, and are
+    kept (until evicted) for RETAIN seconds more as a fallback. Values are
+    kept as live objects, so hits cost no deserialization.
+    """
+    
+    name = 'memory'
+    DEFAULT_MAX_ENTRIES = 1024
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize ResponseCache
+        
+        Args:
+            max_entries: Maximum number of entries kept before LRU eviction
+        """
+        super().__init__()
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.stale_until + self.RETAIN <= time.time():
+                del self._entries[key]
+            elif entry.is_usable():
+                self._entries.move_to_end(key)
+            return entry
+    
+    def _store(self, key: Hashable, entry: CacheEntry) -> None:
+        evicted = 0
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._count('_evictions', evicted)
+    
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def size(self) -> int:
+        return len(self._entries)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['maxEntries'] = self.max_entries
+        return stats
+
+
+def create_cache(url: Optional[str] = None, max_entries: int = ResponseCache.DEFAULT_MAX_ENTRIES) -> CacheBackend:
+    """
+    Create a cache backend from a URL
+    
+    Supported URLs:
+        - memory:// (default): per-process ResponseCache
+        - sqlite:///relative/cache.db or sqlite:////abs/cache.db: WAL-mode
+          file shared by every worker on the host
+        - redis://host:port/db: any Redis-protocol server shared across hosts
+    
+    Args:
+        url: Cache URL (None or empty for memory)
+        max_entries: Entry limit for the memory and SQLite backends
+    
+    Returns:
+        Cache backend instance
+    """
+    parsed = urlparse(url or 'memory://')
+    if parsed.scheme == 'memory':
+        return ResponseCache(max_entries)
+    if parsed.scheme == 'sqlite':
+        from backend.sqlite_cache import SQLiteCache
+        return SQLiteCache(parsed.path[1:] or 'weather_cache.db', max_entries)
+    if parsed.scheme in ('redis', 'rediss'):
+        from backend.redis_cache import RedisCache
+        return RedisCache.from_url(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
@@ -0,0 +1,188 @@
+"""
+Weather API Application - Circuit Breaker
+Fails upstream calls fast while OpenWeatherMap is erroring or slow
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit is open"""
+    
+    def __init__(self, retry_after: float, message: str = "Weather service temporarily unavailable. Please try again later."):
+        super().__init__(message)
+        self.retry_after = max(retry_after, 0.0)
+
+
+class CircuitBreaker:
+    """
+    Count-based circuit breaker with failure-rate and slow-call triggers
+    
+    The outcome and latency of the last `window` upstream attempts are kept.
+    Once at least `min_calls` are recorded, the circuit opens when the share
+    of failures or of calls slower than `slow_call_seconds` reaches its
+    threshold. While open every call is rejected at once; after
+    `open_seconds` up to `half_open_probes` trial calls are let through and
+    the first result decides between closing and re-opening.
+    """
+    
+    WINDOW = 20  # most recent attempts considered
+    MIN_CALLS = 5  # attempts needed before the rates are trusted
+    FAILURE_RATE = 0.5  # share of failed attempts that opens the circuit
+    SLOW_CALL_SECONDS = 3.0  # attempts slower than this count as slow
+    SLOW_CALL_RATE = 0.8  # share of slow attempts that opens the circuit
+    OPEN_SECONDS = 30.0  # time rejected before probing again
+    HALF_OPEN_PROBES = 1  # concurrent trial calls while half-open
+    
+    def __init__(self, window: int = WINDOW, min_calls: int = MIN_CALLS, failure_rate: float = FAILURE_RATE,
+                 slow_call_seconds: float = SLOW_CALL_SECONDS, slow_call_rate: float = SLOW_CALL_RATE,
+                 open_seconds: float = OPEN_SECONDS, half_open_probes: int = HALF_OPEN_PROBES):
+        """
+        Initialize CircuitBreaker
+        
+        Args:
+            window: Number of recent attempts considered
+            min_calls: Attempts needed before the circuit may open
+            failure_rate: Failure share (0-1) that opens the circuit
+            slow_call_seconds: Latency above which an attempt counts as slow
+            slow_call_rate: Slow share (0-1) that opens the circuit
+            open_seconds: Seconds to reject calls before probing
+            half_open_probes: Concurrent trial calls allowed while half-open
+        """
+        self.window = window
+        self.min_calls = min(min_calls, window)
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._failures = 0
+        self._slow = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._opens = 0
+        self._rejected = 0
+        self._fallbacks = 0
+    
+    @property
+    def state(self) -> str:
+        """Current state: 'closed', 'open' or 'half_open'"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+    
+    def before_call(self) -> None:
+        """
+        Admit an upstream attempt
+        
+        Every admitted attempt must be followed by record() or release().
+        
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with all
+                probe slots taken)
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = time.monotonic()
+            if self._state == OPEN:
+                remaining = self.open_seconds - (now - self._opened_at)
+                if remaining > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(remaining)
+                self._state = HALF_OPEN
+                self._probes = 0
+            if self._probes >= self.half_open_probes:
+                self._rejected += 1
+                raise CircuitOpenError(1.0)
+            self._probes += 1
+    
+    def release(self) -> None:
+        """Give back an admitted attempt that never reached upstream"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+    
+    def record(self, latency: float, failed: bool) -> None:
+        """
+        Record the outcome of an admitted attempt
+        
+        Args:
+            latency: Seconds the attempt took
+            failed: True for connection errors, timeouts and 5xx responses
+        """
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(self._probes - 1, 0)
+                if failed or slow:
+                    self._trip()
+                else:
+                    self._reset()
+                return
+            if self._state == OPEN:
+                # A call admitted before the circuit opened finished late
+                return
+            if len(self._outcomes) == self.window:
+                old_failed, old_slow = self._outcomes[0]
+                self._failures -= old_failed
+                self._slow -= old_slow
+            self._outcomes.append((failed, slow))
+            self._failures += failed
+            self._slow += slow
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and (self._failures / calls >= self.failure_rate
+                                            or self._slow / calls >= self.slow_call_rate):
+                self._trip()
+    
+    def record_fallback(self) -> None:
+        """Count a request answered from stale cache because the circuit was open"""
+        with self._lock:
+            self._fallbacks += 1
+    
+    def _trip(self) -> None:
+        """Open the circuit (lock held)"""
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self._opens += 1
+    
+    def _reset(self) -> None:
+        """Close the circuit and forget the old window (lock held)"""
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get breaker state and counters
+        
+        Returns:
+            Dictionary with state, recent failure/slow rates and counters
+        """
+        state = self.state
+        with self._lock:
+            calls = len(self._outcomes)
+            open_for = self.open_seconds - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            return {
+                'state': state,
+                'calls': calls,
+                'failureRate': round(self._failures / calls, 4) if calls else 0.0,
+                'slowCallRate': round(self._slow / calls, 4) if calls else 0.0,
+                'openFor': round(max(open_for, 0.0), 1),
+                'opens': self._opens,
+                'rejected': self._rejected,
+                'staleServed': self._fallbacks,
+            }
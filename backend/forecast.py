@@ -0,0 +1,243 @@
+"""
+Weather API Application - Forecast Parsing
+Single-pass parsing of OpenWeatherMap 5-day/3-hour forecasts into daily rollups
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from backend.utils import convert_pressure_to_inhg
+
+MAX_DAYS = 5
+MEMO_SIZE = 4096  # timestamps / pressures remembered before the memo is reset
+_NO_WEATHER = ({},)
+
+_numpy: Any = None  # imported on first use (it dominates cold starts); False when missing
+
+# Forecast timestamps sit on a shared 3-hour UTC grid and pressures are
+# whole hPa values, so every city's forecast repeats the same few hundred
+# conversions. Both are memoized per process.
+_local_times: Dict[int, Tuple[str, date]] = {}
+_pressures: Dict[Any, Optional[float]] = {}
+
+
+def load_numpy() -> Any:
+    """Return the numpy module, importing it on first call, or None if it is not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:  # optional; parse_forecasts falls back to the pure-Python path
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def _local_time(timestamp: int) -> Tuple[str, date]:
+    """Return (ISO local time, local date) for a Unix timestamp"""
+    cached = _local_times.get(timestamp)
+    if cached is None:
+        if len(_local_times) >= MEMO_SIZE:
+            _local_times.clear()
+        moment = datetime.fromtimestamp(timestamp)
+        cached = _local_times[timestamp] = (moment.isoformat(), moment.date())
+    return cached
+
+
+def _pressure(pressure_hpa: Any) -> Optional[float]:
+    """Memoized convert_pressure_to_inhg"""
+    try:
+        return _pressures[pressure_hpa]
+    except KeyError:
+        if len(_pressures) >= MEMO_SIZE:
+            _pressures.clear()
+        converted = _pressures[pressure_hpa] = convert_pressure_to_inhg(pressure_hpa)
+        return converted
+
+
+class DayRollup:
+    """Running aggregates for one local calendar day of forecast items"""
+    
+    __slots__ = ('date', 'items', 'temp_total', 'temp_count', 'temp_min', 'temp_max',
+                 'precipitation', 'condition_counts', 'condition_items')
+    
+    def __init__(self, date: str):
+        self.date = date
+        self.items: List[Dict[str, Any]] = []
+        self.temp_total = 0.0
+        self.temp_count = 0
+        self.temp_min: Optional[float] = None
+        self.temp_max: Optional[float] = None
+        self.precipitation = 0.0
+        self.condition_counts: Dict[str, int] = {}
+        self.condition_items: Dict[str, Dict[str, Any]] = {}
+    
+    def add(self, item: Dict[str, Any]) -> None:
+        """Fold one parsed 3-hour item into the day"""
+        self.append(item)
+        temp = item['temperature']
+        if temp is not None:
+            self.temp_total += temp
+            self.temp_count += 1
+            if self.temp_min is None or temp < self.temp_min:
+                self.temp_min = temp
+            if self.temp_max is None or temp > self.temp_max:
+                self.temp_max = temp
+        self.precipitation += item['precipitation']
+    
+    def append(self, item: Dict[str, Any]) -> None:
+        """Record an item and its condition without updating the numeric rollups"""
+        self.items.append(item)
+        condition = item['main']
+        count = self.condition_counts.get(condition)
+        if count is None:
+            self.condition_counts[condition] = 1
+            self.condition_items[condition] = item
+        else:
+            self.condition_counts[condition] = count + 1
+    
+    def dominant_item(self) -> Dict[str, Any]:
+        """First item of the most frequent condition (ties go to the earliest condition)"""
+        counts = self.condition_counts
+        return self.condition_items[max(counts, key=counts.__getitem__)]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Build the API representation of the day"""
+        dominant = self.dominant_item()
+        return {
+            'date': self.date,
+            'temperature': self.temp_total / self.temp_count if self.temp_count else None,
+            'tempMin': self.temp_min,
+            'tempMax': self.temp_max,
+            'precipitation': round(self.precipitation, 2),
+            'description': dominant['description'],
+            'icon': dominant['icon'],
+            'main': dominant['main'],
+            'items': self.items,
+        }
+
+
+def _parse_item(entry: Dict[str, Any], time: str) -> Dict[str, Any]:
+    """Parse one 3-hour forecast entry"""
+    main = entry.get('main') or {}
+    weather = (entry.get('weather') or _NO_WEATHER)[0]
+    rain = entry.get('rain')
+    snow = entry.get('snow')
+    return {
+        'time': time,
+        'temperature': main.get('temp'),
+        'feelsLike': main.get('feels_like'),
+        'humidity': main.get('humidity'),
+        'pressure': _pressure(main.get('pressure')),
+        'windSpeed': (entry.get('wind') or {}).get('speed'),
+        'description': weather.get('description', ''),
+        'icon': weather.get('icon', '01d'),
+        'main': weather.get('main', ''),
+        'precipitation': (rain.get('3h', 0.0) if rain else 0.0) + (snow.get('3h', 0.0) if snow else 0.0),
+    }
+
+
+def _group_days(entries: List[Dict[str, Any]], max_days: int, aggregate: bool = True) -> List[DayRollup]:
+    """Parse entries and fold them into per-day rollups in one pass"""
+    days: List[DayRollup] = []
+    by_date: Dict[date, DayRollup] = {}
+    current_date = None
+    current: Optional[DayRollup] = None
+    for entry in entries:
+        time, day = _local_time(entry.get('dt', 0))
+        if day != current_date:
+            current = by_date.get(day)
+            if current is None:
+                if len(days) >= max_days:
+                    continue
+                current = by_date[day] = DayRollup(time)
+                days.append(current)
+            current_date = day
+        if aggregate:
+            current.add(_parse_item(entry, time))
+        else:
+            current.append(_parse_item(entry, time))
+    return days
+
+
+def parse_forecast(data: Dict[str, Any], max_days: int = MAX_DAYS) -> List[Dict[str, Any]]:
+    """
+    Parse a forecast response into daily summaries
+    
+    Items are grouped by local calendar day in a single pass while the
+    daily mean/min/max temperature, total precipitation (rain + snow, mm)
+    and the most frequent condition are accumulated.
+    
+    Args:
+        data: Raw /forecast API response
+        max_days: Number of days to keep
+    
+    Returns:
+        List of day dictionaries, each with its 3-hour 'items'
+    """
+    entries = data.get('list')
+    if not entries or not isinstance(entries, list):
+        return []
+    return [day.to_dict() for day in _group_days(entries, max_days)]
+
+
+def parse_forecasts(payloads: Iterable[Dict[str, Any]], max_days: int = MAX_DAYS,
+                    use_numpy: Optional[bool] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Parse many forecast responses at once
+    
+    With NumPy the temperature and precipitation rollups of every day of
+    every payload are computed in a handful of vectorized reductions; the
+    per-item dictionaries are still built in Python. Output equals calling
+    parse_forecast on each payload (rollup temperatures come back as floats).
+    
+    Args:
+        payloads: Raw /forecast API responses
+        max_days: Number of days to keep per payload
+        use_numpy: Force the NumPy path on or off (default: use it when installed)
+    
+    Returns:
+        One parsed forecast per payload, in input order
+    """
+    np = load_numpy() if use_numpy is not False else None
+    if use_numpy is None:
+        use_numpy = np is not None
+    if not use_numpy:
+        return [parse_forecast(data, max_days) for data in payloads]
+    if np is None:
+        raise RuntimeError("NumPy is not installed")
+    
+    grouped = []
+    for data in payloads:
+        entries = data.get('list')
+        grouped.append(_group_days(entries, max_days, aggregate=False) if entries and isinstance(entries, list) else [])
+    
+    days = [day for payload_days in grouped for day in payload_days]
+    if not days:
+        return [[] for _ in grouped]
+    
+    sizes = np.fromiter((len(day.items) for day in days), dtype=np.intp, count=len(days))
+    day_index = np.repeat(np.arange(len(days)), sizes)
+    items = [item for day in days for item in day.items]
+    temps = np.fromiter(
+        (np.nan if item['temperature'] is None else item['temperature'] for item in items),
+        dtype=np.float64, count=len(items),
+    )
+    precipitation = np.fromiter((item['precipitation'] for item in items), dtype=np.float64, count=len(items))
+    
+    valid = ~np.isnan(temps)
+    counts = np.bincount(day_index[valid], minlength=len(days))
+    totals = np.bincount(day_index[valid], weights=temps[valid], minlength=len(days))
+    minimums = np.full(len(days), np.inf)
+    maximums = np.full(len(days), -np.inf)
+    np.minimum.at(minimums, day_index[valid], temps[valid])
+    np.maximum.at(maximums, day_index[valid], temps[valid])
+    precipitation_totals = np.bincount(day_index, weights=precipitation, minlength=len(days))
+    
+    for position, day in enumerate(days):
+        has_temps = counts[position] > 0
+        day.temp_total = float(totals[position])
+        day.temp_count = int(counts[position])
+        day.temp_min = float(minimums[position]) if has_temps else None
+        day.temp_max = float(maximums[position]) if has_temps else None
+        day.precipitation = float(precipitation_totals[position])
+    return [[day.to_dict() for day in payload_days] for payload_days in grouped]
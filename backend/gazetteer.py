@@ -0,0 +1,220 @@
+"""
+Weather API Application - City Gazetteer
+Lazily loaded sorted-array index mapping city names to OpenWeatherMap city IDs
+"""
+
+import gzip
+import json
+import os
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SEED_PATH = os.path.join(os.path.dirname(__file__), 'data', 'cities.tsv')
+INDEX_ENV = 'WEATHER_CITY_INDEX'  # optional path to OpenWeatherMap's city.list.json(.gz)
+
+
+class City(NamedTuple):
+    """One gazetteer entry"""
+    id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for API responses"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'country': self.country,
+            'coord': {'lat': self.lat, 'lon': self.lon},
+        }
+
+
+def normalize_city_name(name: str) -> str:
+    """
+    Normalize a city name for index lookups
+    
+    Case, accents and repeated whitespace are ignored, so "LONDON ",
+    "london" and "London" map to one key, as do "São Paulo" and "Sao Paulo".
+    
+    Args:
+        name: City name as typed
+    
+    Returns:
+        Normalized lookup key
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+class CityIndex:
+    """
+    Read-only city index stored as parallel sorted arrays
+    
+    Keys are kept in one sorted list of normalized names with IDs and
+    coordinates in typed arrays, which is far smaller than a dict of dicts or
+    a trie for the ~200k entries of the full OpenWeatherMap list. Exact
+    lookups and prefix scans are both a binary search.
+    """
+    
+    def __init__(self, rows: Iterable[Tuple[int, str, str, float, float]], authoritative: bool = False):
+        """
+        Build the index
+        
+        Args:
+            rows: (id, name, country, lat, lon) tuples; when several rows share
+                a normalized name the first one wins
+            authoritative: True when rows cover every city OpenWeatherMap
+                knows, so names missing from the index can be rejected locally
+        """
+        best: Dict[str, Tuple[int, str, str, float, float]] = {}
+        for row in rows:
+            key = normalize_city_name(row[1])
+            if key and key not in best:
+                best[key] = row
+        
+        self._keys: List[str] = sorted(best)
+        self._ids = array('l')
+        self._lats = array('f')
+        self._lons = array('f')
+        self._names: List[str] = []
+        self._countries: List[str] = []
+        for key in self._keys:
+            city_id, name, country, lat, lon = best[key]
+            self._ids.append(city_id)
+            self._names.append(name)
+            self._countries.append(country)
+            self._lats.append(lat)
+            self._lons.append(lon)
+        self.authoritative = authoritative
+        self._by_id: Optional[Tuple[array, array]] = None  # (sorted IDs, their positions), built on first get()
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def _city(self, position: int) -> City:
+        """Materialize the entry at a sorted position"""
+        return City(
+            self._ids[position],
+            self._names[position],
+            self._countries[position],
+            round(self._lats[position], 4),
+            round(self._lons[position], 4),
+        )
+    
+    def lookup(self, name: str) -> Optional[City]:
+        """
+        Find a city by exact (normalized) name
+        
+        Args:
+            name: City name
+        
+        Returns:
+            Matching city, or None
+        """
+        key = normalize_city_name(name)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return self._city(position)
+        return None
+    
+    def get(self, city_id: int) -> Optional[City]:
+        """
+        Find a city by OpenWeatherMap ID
+        
+        Args:
+            city_id: City ID
+        
+        Returns:
+            Matching city, or None
+        """
+        if self._by_id is None:
+            order = sorted(range(len(self._ids)), key=self._ids.__getitem__)
+            self._by_id = (array('l', (self._ids[position] for position in order)), array('l', order))
+        ids, positions = self._by_id
+        index = bisect_left(ids, city_id)
+        if index < len(ids) and ids[index] == city_id:
+            return self._city(positions[index])
+        return None
+    
+    def suggest(self, prefix: str, limit: int = 10) -> List[City]:
+        """
+        List cities whose normalized name starts with a prefix
+        
+        Args:
+            prefix: Name prefix as typed
+            limit: Maximum number of suggestions
+        
+        Returns:
+            Matching cities in alphabetical order
+        """
+        key = normalize_city_name(prefix)
+        if not key:
+            return []
+        results = []
+        position = bisect_left(self._keys, key)
+        while position < len(self._keys) and len(results) < limit and self._keys[position].startswith(key):
+            results.append(self._city(position))
+            position += 1
+        return results
+
+
+def _read_seed(path: str) -> Iterable[Tuple[int, str, str, float, float]]:
+    """Read the bundled tab-separated seed list"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            city_id, name, country, lat, lon = line.rstrip('\n').split('\t')
+            yield int(city_id), name, country, float(lat), float(lon)
+
+
+def _read_city_list(path: str) -> Iterable[Tuple[int, str, str, float, float]]:
+    """Read OpenWeatherMap's bulk city.list.json, optionally gzip-compressed"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        entries = json.load(f)
+    for entry in entries:
+        coord = entry.get('coord', {})
+        yield int(entry['id']), entry.get('name', ''), entry.get('country', ''), coord.get('lat', 0.0), coord.get('lon', 0.0)
+
+
+def load_city_index(seed_path: str = SEED_PATH, full_path: Optional[str] = None) -> CityIndex:
+    """
+    Load the city index from the bundled seed and an optional full list
+    
+    Seed entries win over duplicates in the full list, so common names keep
+    resolving to the city people usually mean (London, GB rather than
+    London, CA). Without the full list the index is not authoritative and
+    unknown names are still sent upstream by name.
+    
+    Args:
+        seed_path: Path of the bundled TSV seed
+        full_path: Path of city.list.json(.gz), if available
+    
+    Returns:
+        Loaded index
+    """
+    rows = list(_read_seed(seed_path))
+    if full_path:
+        rows.extend(_read_city_list(full_path))
+    return CityIndex(rows, authoritative=bool(full_path))
+
+
+_index: Optional[CityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_city_index() -> CityIndex:
+    """Return the process-wide city index, loading it on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_city_index(full_path=os.getenv(INDEX_ENV) or None)
+    return _index
@@ -0,0 +1,549 @@
+"""
+Weather API Application - Weather History
+Append-only columnar store of the observed and forecast samples of every
+location, read through memory maps with range scans and server-side
+downsampling
+"""
+
+import logging
+import math
+import mmap
+import os
+import shutil
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: sealing and compaction are then only safe with one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SERIES = ('observed', 'forecast')
+# Column files of a segment: time is Unix seconds, readings are NaN when missing
+COLUMNS = (('time', 'q'), ('temperature', 'f'), ('humidity', 'f'), ('pressure', 'f'), ('windSpeed', 'f'))
+FIELDS = tuple(name for name, _ in COLUMNS[1:])
+NAN = float('nan')
+# Bucket widths a query's step is rounded up to when it has to be widened
+NICE_STEPS = (60, 300, 600, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400)
+
+Row = Tuple[Any, ...]  # (time, temperature, humidity, pressure, windSpeed)
+
+
+def _writer_id() -> str:
+    """Name of this process's open segments, unique across hosts sharing the directory"""
+    return f"{quote(socket.gethostname(), safe='')}.{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    """Return True unless no process with this ID exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by another user
+    return True
+
+
+class _Segment:
+    """Memory-mapped columns of one segment directory"""
+    
+    __slots__ = ('columns', 'rows', '_views', '_maps')
+    
+    def __init__(self, path: str):
+        self.columns: List[memoryview] = []
+        self._views: List[memoryview] = []
+        self._maps: List[mmap.mmap] = []
+        try:
+            for name, code in COLUMNS:
+                self.columns.append(self._map(os.path.join(path, name), code))
+        except BaseException:
+            self.close()
+            raise
+        # Columns are written one after the other; rows beyond the shortest are incomplete
+        self.rows = min(len(column) for column in self.columns)
+    
+    def _map(self, path: str, code: str) -> memoryview:
+        """Map one column file as a typed view"""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            if not os.path.isdir(os.path.dirname(path)):
+                raise  # segment removed by a compaction
+            return memoryview(b'').cast(code)  # open segment whose first append is being written
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            size -= size % array(code).itemsize  # a torn write leaves a partial value
+            if not size:
+                return memoryview(b'').cast(code)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        raw = memoryview(mapped)
+        self._views.append(raw)
+        view = raw[:size].cast(code)
+        self._views.append(view)
+        return view
+    
+    @property
+    def times(self) -> memoryview:
+        return self.columns[0]
+    
+    def row(self, index: int) -> Row:
+        return tuple(column[index] for column in self.columns)
+    
+    def slice(self, start: int, stop: int) -> Iterator[Row]:
+        """Iterate rows [start, stop) without copying the columns"""
+        return zip(*(column[start:stop] for column in self.columns))
+    
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views = []
+        self._maps = []
+        self.columns = []
+
+
+def merge_rows(base: Optional[_Segment], newer: Sequence[_Segment], start: int, end: int) -> Iterator[Row]:
+    """
+    Merge the rows of a sorted base segment and the segments written after it
+    
+    The base range is found by bisecting its time column and streamed;
+    the newer segments are small, so they are scanned linearly and merged
+    over it. For a timestamp present more than once the newest row wins.
+    
+    Args:
+        base: Compacted segment, sorted by time with unique timestamps
+        newer: Later segments, oldest first, in any time order
+        start: First time included (Unix seconds)
+        end: Last time included (Unix seconds)
+    
+    Returns:
+        Iterator of rows in time order
+    """
+    overlay: Dict[int, Row] = {}
+    for segment in newer:
+        times = segment.times
+        for index in range(segment.rows):
+            if start <= times[index] <= end:
+                overlay[times[index]] = segment.row(index)
+    pending = [overlay[t] for t in sorted(overlay)]
+    
+    position = 0
+    if base is not None:
+        low = bisect_left(base.times, start, 0, base.rows)
+        high = bisect_right(base.times, end, low, base.rows)
+        for row in base.slice(low, high):
+            t = row[0]
+            while position < len(pending) and pending[position][0] < t:
+                yield pending[position]
+                position += 1
+            if position < len(pending) and pending[position][0] == t:
+                yield pending[position]
+                position += 1
+            else:
+                yield row
+    yield from pending[position:]
+
+
+def widen_step(step: int, span: int, max_points: int) -> int:
+    """
+    Return the step to use so a range yields at most max_points buckets
+    
+    Args:
+        step: Requested bucket width in seconds
+        span: Seconds covered by the range
+        max_points: Bucket limit
+    
+    Returns:
+        step if it is wide enough, otherwise the smallest NICE_STEPS value
+        (or whole number of weeks) that is
+    """
+    needed = math.ceil((span + 1) / max_points)
+    if step >= needed:
+        return step
+    for nice in NICE_STEPS:
+        if nice >= needed:
+            return nice
+    return math.ceil(needed / NICE_STEPS[-1]) * NICE_STEPS[-1]
+
+
+def downsample(rows: Iterable[Row], step: int) -> Iterator[Row]:
+    """
+    Average rows into buckets of `step` seconds aligned to the Unix epoch
+    
+    Args:
+        rows: Rows in time order
+        step: Bucket width in seconds (0 or 1 passes rows through)
+    
+    Returns:
+        Iterator of (bucket start, mean of each reading) rows; a mean is NaN
+        when the bucket has no value for that reading
+    """
+    if step <= 1:
+        yield from rows
+        return
+    bucket = None
+    sums = [0.0] * len(FIELDS)
+    counts = [0] * len(FIELDS)
+    for row in rows:
+        start = row[0] - row[0] % step
+        if start != bucket:
+            if bucket is not None:
+                yield (bucket,) + tuple(total / count if count else NAN for total, count in zip(sums, counts))
+            bucket = start
+            sums = [0.0] * len(FIELDS)
+            counts = [0] * len(FIELDS)
+        for index, value in enumerate(row[1:]):
+            if value == value:  # not NaN
+                sums[index] += value
+                counts[index] += 1
+    if bucket is not None:
+        yield (bucket,) + tuple(total / count if count else NAN for total, count in zip(sums, counts))
+
+
+class HistoryStore:
+    """
+    Append-only columnar store of weather samples per series and location
+    
+    Every location directory holds segments; a segment is a directory with
+    one file per column (time as int64 Unix seconds, readings as float32 in
+    native byte order). Each process appends to its own open segment, so
+    writers never share a file. After `segment_rows` rows it is sealed
+    (renamed to seg-<ns>-<writer>), and once `compact_segments` sealed
+    segments have piled up they are merged with the previous compacted
+    segment into a new one (seg-<ns>c) sorted by time with one row per
+    timestamp, the newest sample winning (a later forecast for the same
+    hour replaces the earlier one). Sealing and compaction hold a file lock
+    on the location directory; the merged segment is written under a
+    temporary name and renamed into place before its inputs are removed,
+    so readers never see half of it. Open segments of writers that died
+    are folded in by the next compaction.
+    
+    Reads memory-map the columns: the compacted segment's range is found
+    by bisection and streamed without copying, and the few small segments
+    written since are merged over it, so a query touches only the pages of
+    the requested range.
+    """
+    
+    SEGMENT_ROWS = 4096  # rows in an open segment before it is sealed
+    COMPACT_SEGMENTS = 8  # sealed segments that trigger a compaction
+    MAX_POINTS = 1000  # points per query; the step is widened to fit
+    ABANDONED_AFTER = 86400  # seconds after which a silent open segment of another host is folded in
+    OPEN_RETRIES = 3  # attempts to open a consistent set of segments while compaction runs
+    
+    def __init__(self, root: str, segment_rows: Optional[int] = None, compact_segments: Optional[int] = None):
+        """
+        Initialize HistoryStore
+        
+        Args:
+            root: Directory holding the store (created if missing)
+            segment_rows: Rows in an open segment before it is sealed
+            compact_segments: Sealed segments that trigger a compaction
+        """
+        self.root = os.path.abspath(root)
+        self.segment_rows = self.SEGMENT_ROWS if segment_rows is None else segment_rows
+        self.compact_segments = self.COMPACT_SEGMENTS if compact_segments is None else compact_segments
+        if self.segment_rows < 1 or self.compact_segments < 1:
+            raise ValueError("Segment rows and compaction threshold must be positive")
+        os.makedirs(self.root, exist_ok=True)
+        self._open_rows: Dict[str, int] = {}  # open segment path -> rows written
+        self._lock = threading.Lock()
+        self._appended = 0
+        self._sealed = 0
+        self._compactions = 0
+        self._queries = 0
+        self._errors = 0
+    
+    def _location_dir(self, series: str, location: str) -> str:
+        if series not in SERIES:
+            raise ValueError(f"Unknown history series: {series}")
+        return os.path.join(self.root, series, quote(location, safe=''))
+    
+    @contextmanager
+    def _locked(self, directory: str) -> Iterator[None]:
+        """Hold the location's file lock, shared with other processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, '.lock'), 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def append(self, series: str, location: str, samples: Iterable[Sequence[Optional[float]]]) -> int:
+        """
+        Append samples to a location's history
+        
+        Disk errors are logged and counted, not raised: history must never
+        fail the weather request that produced the samples.
+        
+        Args:
+            series: 'observed' or 'forecast'
+            location: Location key (e.g. 'id:2643743')
+            samples: (time, temperature, humidity, pressure, windSpeed)
+                tuples; time in Unix seconds, None for a missing reading
+        
+        Returns:
+            Number of rows written
+        """
+        columns = [array(code) for _, code in COLUMNS]
+        for sample in samples:
+            columns[0].append(int(sample[0]))
+            for column, value in zip(columns[1:], sample[1:]):
+                column.append(NAN if value is None else value)
+        rows = len(columns[0])
+        if not rows:
+            return 0
+        
+        directory = self._location_dir(series, location)
+        segment = os.path.join(directory, f'open-{_writer_id()}')
+        with self._lock:
+            try:
+                count = self._open_rows.get(segment)
+                if count is None or not os.path.isdir(segment):
+                    os.makedirs(segment, exist_ok=True)
+                    count = self._repair(segment)
+                # Time last, so a reader never sees a timestamp before its readings
+                for (name, _), column in reversed(list(zip(COLUMNS, columns))):
+                    with open(os.path.join(segment, name), 'ab') as f:
+                        column.tofile(f)
+                count += rows
+                self._appended += rows
+                if count >= self.segment_rows:
+                    self._open_rows.pop(segment, None)
+                    self._seal(directory, segment)
+                else:
+                    self._open_rows[segment] = count
+            except OSError as e:
+                self._open_rows.pop(segment, None)  # re-checked on the next append
+                self._errors += 1
+                logger.warning("Could not append to weather history %s: %s", directory, e)
+                return 0
+        return rows
+    
+    @staticmethod
+    def _repair(segment: str) -> int:
+        """Cut every column of a reused open segment to its complete rows and return their count"""
+        sizes = {}
+        for name, code in COLUMNS:
+            path = os.path.join(segment, name)
+            sizes[path] = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = min(size // array(code).itemsize for (_, code), size in zip(COLUMNS, sizes.values()))
+        for (_, code), (path, size) in zip(COLUMNS, sizes.items()):
+            if size > rows * array(code).itemsize:
+                os.truncate(path, rows * array(code).itemsize)
+        return rows
+    
+    def _seal(self, directory: str, segment: str) -> None:
+        """Rename a full open segment to a sealed one and compact if enough have piled up"""
+        with self._locked(directory):
+            os.rename(segment, os.path.join(directory, f'seg-{time.time_ns():020d}-{os.path.basename(segment)[5:]}'))
+            self._sealed += 1
+            _, sealed, _ = self._segment_names(directory)
+            if len(sealed) >= self.compact_segments:
+                self._compact(directory)
+    
+    @staticmethod
+    def _segment_names(directory: str) -> Tuple[Optional[str], List[str], List[str]]:
+        """
+        List a location's segments
+        
+        Returns:
+            Tuple of (newest compacted segment or None, sealed segments
+            written after it, open segments); segments older than the
+            compacted one were its inputs and are ignored
+        """
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return None, [], []
+        sealed = sorted(name for name in names if name.startswith('seg-'))
+        opened = sorted(name for name in names if name.startswith('open-'))
+        for index in range(len(sealed) - 1, -1, -1):
+            if sealed[index][24:] == 'c':
+                return sealed[index], sealed[index + 1:], opened
+        return None, sealed, opened
+    
+    def _open_segments(self, directory: str, names: List[Optional[str]]) -> List[Optional[_Segment]]:
+        """Map segments, or raise FileNotFoundError if one was removed meanwhile"""
+        segments: List[Optional[_Segment]] = []
+        try:
+            for name in names:
+                segments.append(None if name is None else _Segment(os.path.join(directory, name)))
+        except BaseException:
+            for segment in segments:
+                if segment is not None:
+                    segment.close()
+            raise
+        return segments
+    
+    def compact(self, series: str, location: str) -> bool:
+        """
+        Merge a location's sealed segments now
+        
+        Args:
+            series: 'observed' or 'forecast'
+            location: Location key
+        
+        Returns:
+            True if a compacted segment was written
+        """
+        directory = self._location_dir(series, location)
+        if not os.path.isdir(directory):
+            return False
+        with self._lock, self._locked(directory):
+            return self._compact(directory)
+    
+    def _compact(self, directory: str) -> bool:
+        """Merge sealed segments into a new compacted one (the caller holds the file lock)"""
+        self._adopt_abandoned(directory)
+        base, sealed, _ = self._segment_names(directory)
+        if not sealed:
+            return False
+        # Sorts after all inputs: the newest input's nanoseconds, then 'c' > '-'
+        name = f'seg-{sealed[-1][4:24]}c'
+        temporary = os.path.join(directory, f'tmp-{_writer_id()}')
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        
+        segments = self._open_segments(directory, [base] + sealed)
+        try:
+            files = [open(os.path.join(temporary, column), 'wb') for column, _ in COLUMNS]
+            try:
+                chunk = [array(code) for _, code in COLUMNS]
+                for row in merge_rows(segments[0], segments[1:], -2 ** 63, 2 ** 63 - 1):
+                    for column, value in zip(chunk, row):
+                        column.append(value)
+                    if len(chunk[0]) >= self.segment_rows:
+                        for f, column in zip(files, chunk):
+                            column.tofile(f)
+                        chunk = [array(code) for _, code in COLUMNS]
+                for f, column in zip(files, chunk):
+                    column.tofile(f)
+            finally:
+                for f in files:
+                    f.close()
+        finally:
+            for segment in segments:
+                if segment is not None:
+                    segment.close()
+        
+        os.rename(temporary, os.path.join(directory, name))
+        for old in os.listdir(directory):
+            # Inputs, plus leftovers of earlier compactions whose removal failed
+            if old.startswith('seg-') and old < name:
+                shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+        self._compactions += 1
+        return True
+    
+    def _adopt_abandoned(self, directory: str) -> None:
+        """Seal open segments whose writer has exited, so compaction can fold them in"""
+        own = f'open-{_writer_id()}'
+        host = quote(socket.gethostname(), safe='')
+        now = time.time()
+        for name in os.listdir(directory):
+            if not name.startswith('open-') or name == own:
+                continue
+            writer_host, _, pid = name[5:].rpartition('.')
+            path = os.path.join(directory, name)
+            if writer_host == host and fcntl is not None and pid.isdigit():
+                abandoned = not _pid_alive(int(pid))
+            else:
+                try:
+                    abandoned = now - os.path.getmtime(os.path.join(path, 'time')) > self.ABANDONED_AFTER
+                except OSError:
+                    abandoned = False
+            if abandoned:
+                self._repair(path)
+                os.rename(path, os.path.join(directory, f'seg-{time.time_ns():020d}-{name[5:]}'))
+    
+    def query(self, series: str, location: str, start: int, end: int, step: int = 0,
+              max_points: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Read a time range of a location's history
+        
+        Args:
+            series: 'observed' or 'forecast'
+            location: Location key
+            start: First time included (Unix seconds)
+            end: Last time included (Unix seconds)
+            step: Bucket width in seconds for averaging (0 returns raw samples)
+            max_points: Points returned at most (defaults to MAX_POINTS); raw
+                samples that do not fit, and steps too narrow for the range,
+                are averaged over a wider step (see widen_step)
+        
+        Returns:
+            Tuple of (step used, points in time order); each point has an ISO
+            local 'time' and the readings, None where no value was recorded
+        """
+        max_points = self.MAX_POINTS if max_points is None else max_points
+        directory = self._location_dir(series, location)
+        
+        for attempt in range(self.OPEN_RETRIES):
+            base, sealed, opened = self._segment_names(directory)
+            try:
+                segments = self._open_segments(directory, [base] + sealed + opened)
+                break
+            except FileNotFoundError:
+                # A compaction replaced the segments between listing and mapping
+                if attempt == self.OPEN_RETRIES - 1:
+                    raise
+        try:
+            if step > 1 or self._count(segments, start, end) > max_points:
+                step = widen_step(step, end - start, max_points)
+            points = [
+                dict(zip(('time',) + FIELDS, (datetime.fromtimestamp(row[0]).isoformat(),) + tuple(
+                    None if value != value else round(value, 2) for value in row[1:]
+                )))
+                for row in downsample(merge_rows(segments[0], segments[1:], start, end), step)
+            ]
+        finally:
+            for segment in segments:
+                if segment is not None:
+                    segment.close()
+        with self._lock:
+            self._queries += 1
+        return step, points
+    
+    @staticmethod
+    def _count(segments: List[Optional[_Segment]], start: int, end: int) -> int:
+        """Upper bound of the rows in a range (timestamps written twice count twice)"""
+        base, newer = segments[0], segments[1:]
+        count = 0
+        if base is not None:
+            low = bisect_left(base.times, start, 0, base.rows)
+            count = bisect_right(base.times, end, low, base.rows) - low
+        for segment in newer:
+            times = segment.times
+            count += sum(1 for index in range(segment.rows) if start <= times[index] <= end)
+        return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get store statistics
+        
+        Returns:
+            Dictionary with the rows appended, segments sealed, compactions,
+            queries and append errors of this process
+        """
+        with self._lock:
+            return {
+                'appended': self._appended,
+                'sealed': self._sealed,
+                'compactions': self._compactions,
+                'queries': self._queries,
+                'errors': self._errors,
+            }
@@ -0,0 +1,353 @@
+"""
+Weather API Application - JSON Encoding
+Pluggable fast JSON encoder and pre-encoded (optionally compressed) response bodies
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Any, Callable, Dict, FrozenSet, Hashable, NamedTuple, Optional
+from backend.profiling import phase
+from backend.utils import json_default
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is offered instead
+    brotli = None
+
+ENCODER_ENV = 'WEATHER_JSON_ENCODER'  # force a registered encoder by name
+MIN_COMPRESS_SIZE = 1024  # bytes; smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=json_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    # orjson writes naive datetimes in the same ISO format as json_default
+    return orjson.dumps(value, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {'json': _stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+_dumps: Optional[Callable[[Any], bytes]] = None
+
+
+def register_encoder(name: str, encoder: Callable[[Any], bytes]) -> None:
+    """
+    Register a JSON encoder
+    
+    Args:
+        name: Name used with use_encoder() or WEATHER_JSON_ENCODER
+        encoder: Function turning a JSON-compatible value (plus datetimes)
+            into UTF-8 bytes
+    """
+    ENCODERS[name] = encoder
+
+
+def use_encoder(name: str) -> None:
+    """
+    Select the encoder used by dumps()
+    
+    Args:
+        name: Registered encoder name
+    
+    Raises:
+        ValueError: If no encoder with that name is registered
+    """
+    global _dumps
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown JSON encoder: {name}")
+    _dumps = ENCODERS[name]
+
+
+def encoder_name() -> str:
+    """Name of the encoder dumps() uses"""
+    encoder = _dumps or _default_encoder()
+    return next(name for name, fn in ENCODERS.items() if fn is encoder)
+
+
+def _default_encoder() -> Callable[[Any], bytes]:
+    """WEATHER_JSON_ENCODER if set, otherwise the fastest available encoder"""
+    name = os.getenv(ENCODER_ENV) or ('orjson' if 'orjson' in ENCODERS else 'json')
+    use_encoder(name)
+    return _dumps
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a value as compact UTF-8 JSON
+    
+    Datetimes are written in ISO 8601 format.
+    
+    Args:
+        value: JSON-compatible value
+    
+    Returns:
+        Encoded bytes
+    """
+    with phase('serialize'):
+        return (_dumps or _default_encoder())(value)
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> FrozenSet[str]:
+    """
+    Parse the content codings an Accept-Encoding header allows
+    
+    Args:
+        accept_encoding: Header value (may be None or empty)
+    
+    Returns:
+        Lower-case codings with a non-zero q-value ('*' included if present)
+    """
+    if not accept_encoding:
+        return frozenset()
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip()
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding)
+    return frozenset(accepted)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header
+    
+    Args:
+        accept_encoding: Header value (may be None or empty)
+    
+    Returns:
+        'br', 'gzip' or None for identity
+    """
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Compress a body with a content coding from negotiate_encoding
+    
+    Args:
+        body: Identity-encoded body
+        encoding: 'br', 'gzip' or None
+    
+    Returns:
+        The encoded body
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, GZIP_LEVEL, mtime=0)
+    return body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an entity tag
+    
+    Our tags are strong and name the exact bytes of one content coding. A
+    weak tag (W/"...") means an intermediary changed the representation
+    the client holds, so it never matches and the body is sent in full.
+    
+    Args:
+        if_none_match: Header value (may be None or empty)
+        etag: Current entity tag, quoted
+    
+    Returns:
+        True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip() == etag for tag in if_none_match.split(','))
+
+
+class EncodedBody(NamedTuple):
+    """A response body ready to be written to the socket"""
+    body: bytes
+    encoding: Optional[str]  # Content-Encoding, or None for identity
+    etag: str  # quoted hash of the identity body, suffixed with the coding
+    stored_at: float  # when the underlying data was fetched
+    fresh_until: float  # the body may be reused until then
+    stale: bool
+    revalidate: float  # seconds shared caches may serve it stale while revalidating
+    
+    def validator_headers(self) -> Dict[str, str]:
+        """
+        Caching headers, sent with both 200 and 304 responses
+        
+        max-age counts down to the end of the server-side freshness, so
+        browsers and CDNs stop reusing the body when the server would
+        refresh it. Stale fallback bodies must always be revalidated.
+        
+        Returns:
+            ETag, Last-Modified, Cache-Control and Vary headers
+        """
+        if self.stale:
+            cache_control = 'no-cache'
+        else:
+            max_age = max(int(self.fresh_until - time.time()), 0)
+            cache_control = f'public, max-age={max_age}, s-maxage={max_age}'
+            if self.revalidate > 0:
+                cache_control += f', stale-while-revalidate={int(self.revalidate)}'
+        # unit and city are query parameters and already part of the cache key
+        return {
+            'ETag': self.etag,
+            'Last-Modified': formatdate(self.stored_at, usegmt=True),
+            'Cache-Control': cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+    
+    def headers(self) -> Dict[str, str]:
+        """Content and caching headers for a 200 response"""
+        headers = self.validator_headers()
+        headers['Content-Type'] = 'application/json'
+        if self.encoding:
+            headers['Content-Encoding'] = self.encoding
+        return headers
+    
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        """Return True if a request's If-None-Match allows a 304"""
+        return etag_matches(if_none_match, self.etag)
+
+
+class EncodedBodyCache:
+    """
+    Bounded in-process LRU of encoded response bodies
+    
+    Keys include the unit and content coding, so every representation of a
+    cached payload is encoded (and compressed) once. get() reuses bodies
+    until the data they were built from stops being fresh; after that,
+    reuse() still returns a body for as long as the stale data it was built
+    from is served, so stale-while-revalidate and fallback responses are
+    not re-encoded per request either.
+    """
+    
+    DEFAULT_MAX_ENTRIES = 2048
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, EncodedBody]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._reused = 0
+    
+    def get(self, key: Hashable, now: float) -> Optional[EncodedBody]:
+        """Return a still-fresh body for a key, or None"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None and now < body.fresh_until:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return body
+            # An expired body stays until it is replaced or evicted: reuse() may still serve it
+            self._misses += 1
+            return None
+    
+    def reuse(self, key: Hashable, stored_at: float, stale: bool) -> Optional[EncodedBody]:
+        """
+        Return the body for a key if it was encoded from the same data
+        
+        Args:
+            key: Body cache key
+            stored_at: When the data being served was fetched
+            stale: Whether it is served as a stale fallback
+        
+        Returns:
+            The body, fresh or not, or None if it was built from other data
+        """
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None or body.stored_at != stored_at or body.stale != stale:
+                return None
+            self._entries.move_to_end(key)
+            self._reused += 1
+            return body
+    
+    def put(self, key: Hashable, body: EncodedBody) -> None:
+        """Store a body, evicting the least recently used beyond max_entries"""
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get body cache counters
+        
+        Returns:
+            Dictionary with size, hits, misses, stale bodies reused and the
+            active encoder
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'reused': self._reused,
+                'encoder': encoder_name(),
+                'brotli': brotli is not None,
+            }
+
+
+def entity_tag(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Build a strong, content-derived entity tag
+    
+    Args:
+        body: Identity-encoded body
+        encoding: Content coding of the representation (gets its own tag)
+    
+    Returns:
+        Quoted entity tag
+    """
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def encode_body(payload: Any, encoding: Optional[str], stored_at: float, fresh_until: float,
+                stale: bool = False, revalidate: float = 0) -> EncodedBody:
+    """
+    Encode (and compress, when worthwhile) a response payload
+    
+    Args:
+        payload: JSON-compatible response envelope
+        encoding: Negotiated content coding ('br', 'gzip' or None)
+        stored_at: When the underlying data was fetched
+        fresh_until: Until when the body may be reused
+        stale: Whether the payload is a stale fallback
+        revalidate: stale-while-revalidate window advertised to caches
+    
+    Returns:
+        EncodedBody
+    """
+    with phase('serialize'):
+        body = dumps(payload)
+        if encoding is not None and len(body) < MIN_COMPRESS_SIZE:
+            encoding = None
+        return EncodedBody(compress(body, encoding), encoding, entity_tag(body, encoding),
+                           stored_at, fresh_until, stale, revalidate)
@@ -0,0 +1,398 @@
+"""
+Weather API Application - Metrics
+Counters, gauges and histograms rendered in the Prometheus text format
+
+Updates are lock-free on the hot path: every metric keeps one slot per
+thread (keyed by thread ident), and slots are only summed when /api/metrics
+is scraped. Values are per process; with several workers each one reports
+its own series.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+CIRCUIT_STATES = ('closed', 'open', 'half_open')
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+Sample = Tuple[str, Dict[str, str], float]  # (name suffix, labels, value)
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]  # (name, type, help, samples)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Sharded:
+    """
+    Per-thread value slots
+    
+    Each thread only writes its own slot, so updates need no lock; the lock
+    is taken when a thread touches the metric for the first time. Thread
+    idents are reused after a thread exits, so short-lived request threads
+    keep adding to the slot of an earlier thread instead of growing the table.
+    """
+    
+    __slots__ = ('_size', '_slots', '_lock')
+    
+    def __init__(self, size: int):
+        self._size = size
+        self._slots: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+    
+    def _slot(self) -> List[float]:
+        ident = threading.get_ident()
+        slot = self._slots.get(ident)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.setdefault(ident, [0] * self._size)
+        return slot
+    
+    def _totals(self) -> List[float]:
+        totals = [0] * self._size
+        with self._lock:
+            slots = list(self._slots.values())
+        for slot in slots:
+            for i, value in enumerate(slot):
+                totals[i] += value
+        return totals
+
+
+class Counter(_Sharded):
+    """Monotonically increasing value"""
+    
+    __slots__ = ()
+    
+    def __init__(self):
+        super().__init__(1)
+    
+    def inc(self, amount: float = 1) -> None:
+        self._slot()[0] += amount
+    
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+    
+    def samples(self, labels: Dict[str, str]) -> List[Sample]:
+        return [('_total', labels, self.value)]
+
+
+class Gauge(_Sharded):
+    """Value that goes up and down (e.g. requests in flight)"""
+    
+    __slots__ = ()
+    
+    def __init__(self):
+        super().__init__(1)
+    
+    def inc(self, amount: float = 1) -> None:
+        self._slot()[0] += amount
+    
+    def dec(self, amount: float = 1) -> None:
+        self._slot()[0] -= amount
+    
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+    
+    def samples(self, labels: Dict[str, str]) -> List[Sample]:
+        return [('', labels, self.value)]
+
+
+class Histogram(_Sharded):
+    """Observations counted into cumulative buckets, plus their sum"""
+    
+    __slots__ = ('buckets',)
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket, one for +Inf, then the sum
+        super().__init__(len(self.buckets) + 2)
+    
+    def observe(self, value: float) -> None:
+        slot = self._slot()
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+    
+    def samples(self, labels: Dict[str, str]) -> List[Sample]:
+        totals = self._totals()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), totals):
+            cumulative += count
+            samples.append(('_bucket', dict(labels, le=_format_value(bound)), cumulative))
+        samples.append(('_sum', labels, totals[-1]))
+        samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values"""
+    
+    def __init__(self, name: str, kind: str, help_text: str, label_names: Sequence[str],
+                 factory: Callable[[], Any]):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._children[()] = factory()
+    
+    def labels(self, *values: str) -> Any:
+        """
+        Get the child for a combination of label values, creating it on first use
+        
+        Args:
+            *values: One value per label name, in order
+        
+        Returns:
+            Counter, Gauge or Histogram
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+    
+    def collect(self) -> List[Sample]:
+        with self._lock:
+            children = sorted(self._children.items())
+        samples = []
+        for values, child in children:
+            samples.extend(child.samples(dict(zip(self.label_names, values))))
+        return samples
+
+
+class Registry:
+    """Metric families and scrape-time collectors rendered together"""
+    
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+    
+    def _family(self, name: str, kind: str, help_text: str, label_names: Sequence[str],
+                factory: Callable[[], Any]) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, kind, help_text, label_names, factory)
+            return family
+    
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> MetricFamily:
+        """Register (or return the existing) counter family; `name` excludes the _total suffix"""
+        return self._family(name, 'counter', help_text, label_names, Counter)
+    
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> MetricFamily:
+        """Register (or return the existing) gauge family"""
+        return self._family(name, 'gauge', help_text, label_names, Gauge)
+    
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        """Register (or return the existing) histogram family"""
+        return self._family(name, 'histogram', help_text, label_names, lambda: Histogram(buckets))
+    
+    def register_collector(self, collector: Collector) -> None:
+        """
+        Add a callable run at every scrape
+        
+        Args:
+            collector: Returns (name, type, help, samples) tuples for values
+                that are already counted elsewhere (e.g. cache statistics)
+        """
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def unregister_collector(self, collector: Collector) -> None:
+        """Remove a collector added by register_collector, if present"""
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+    
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        
+        Returns:
+            Exposition text
+        """
+        with self._lock:
+            families = sorted(self._families.values(), key=lambda family: family.name)
+            collectors = list(self._collectors)
+        
+        lines = []
+        
+        def emit(name: str, kind: str, help_text: str, samples: List[Sample]) -> None:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        
+        for family in families:
+            emit(family.name, family.kind, family.help, family.collect())
+        for collector in collectors:
+            try:
+                for name, kind, help_text, samples in collector():
+                    emit(name, kind, help_text, samples)
+            except Exception:
+                continue  # a failing backend (e.g. Redis down) must not break the scrape
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'weather_http_requests', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'weather_http_request_duration_seconds', 'HTTP request latency by route', ('route',))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'weather_http_requests_in_flight', 'HTTP requests being handled by route', ('route',))
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    'weather_upstream_request_duration_seconds',
+    'Upstream call latency by provider, endpoint and status (error = no response)', ('provider', 'endpoint', 'status'))
+ERRORS = REGISTRY.counter(
+    'weather_errors', 'Errors by class as mapped for API responses', ('error',))
+
+
+def begin_request(route: str) -> float:
+    """
+    Mark a request as in flight
+    
+    Args:
+        route: Route template (bounded set of values, never the raw path)
+    
+    Returns:
+        Start time to pass to end_request
+    """
+    HTTP_IN_FLIGHT.labels(route).inc()
+    return time.perf_counter()
+
+
+def end_request(route: str, method: str, status_code: int, started: float) -> None:
+    """
+    Record a finished request
+    
+    Args:
+        route: Route template passed to begin_request
+        method: HTTP method
+        status_code: Response status
+        started: Value returned by begin_request
+    """
+    HTTP_LATENCY.labels(route).observe(time.perf_counter() - started)
+    HTTP_REQUESTS.labels(route, method, str(status_code)).inc()
+    HTTP_IN_FLIGHT.labels(route).dec()
+
+
+def observe_upstream(provider: str, endpoint: str, status: Optional[int], seconds: float) -> None:
+    """
+    Record one upstream attempt
+    
+    Args:
+        provider: Provider name (e.g. 'openweathermap')
+        endpoint: API endpoint (e.g. '/weather')
+        status: HTTP status, or None when no response arrived
+        seconds: Attempt duration
+    """
+    UPSTREAM_LATENCY.labels(provider, endpoint, 'error' if status is None else str(status)).observe(seconds)
+
+
+def service_collector(service: Any, *others: Any) -> Collector:
+    """
+    Build a scrape-time collector for weather service statistics
+    
+    Services passed together must share their cache, quota, circuit
+    breaker and providers (as the ASGI app's sync and async services do);
+    those are read from the first one, while the per-service single-flight
+    and micro-batching counters are summed across all of them.
+    
+    Args:
+        service: WeatherService or AsyncWeatherService
+        *others: Further services sharing service's components
+    
+    Returns:
+        Collector for Registry.register_collector
+    """
+    services = (service,) + others
+    
+    def collect() -> Iterable[Tuple[str, str, str, List[Sample]]]:
+        cache = service.get_cache_stats()
+        backend = {'backend': str(cache.get('backend', ''))}
+        yield ('weather_cache_lookups', 'counter', 'Response cache lookups by result', [
+            ('_total', dict(backend, result='hit'), cache.get('hits', 0)),
+            ('_total', dict(backend, result='stale'), cache.get('staleHits', 0)),
+            ('_total', dict(backend, result='miss'), cache.get('misses', 0)),
+        ])
+        yield ('weather_cache_hit_ratio', 'gauge', 'Fresh and stale hits over all response cache lookups',
+               [('', backend, cache.get('hitRatio', 0.0))])
+        yield ('weather_cache_evictions', 'counter', 'Response cache LRU evictions',
+               [('_total', backend, cache.get('evictions', 0))])
+        if cache.get('size') is not None:
+            yield ('weather_cache_entries', 'gauge', 'Response cache entries', [('', backend, cache['size'])])
+        
+        bodies = service.get_body_cache_stats()
+        lookups = bodies['hits'] + bodies['misses']
+        yield ('weather_body_cache_lookups', 'counter', 'Encoded body cache lookups by result', [
+            ('_total', {'result': 'hit'}, bodies['hits']),
+            ('_total', {'result': 'miss'}, bodies['misses']),
+        ])
+        yield ('weather_body_cache_hit_ratio', 'gauge', 'Encoded body cache hits over lookups',
+               [('', {}, round(bodies['hits'] / lookups, 4) if lookups else 0.0)])
+        
+        coalescing = [other.get_coalescing_stats() for other in services]
+        yield ('weather_upstream_fetches_in_flight', 'gauge', 'Single-flight upstream fetches running',
+               [('', {}, sum(stats['inFlight'] for stats in coalescing))])
+        yield ('weather_coalesced_requests', 'counter', 'Requests that waited for an identical in-flight fetch',
+               [('_total', {}, sum(stats['coalesced'] for stats in coalescing))])
+        
+        grouping = [stats for stats in (other.get_grouping_stats() for other in services) if stats is not None]
+        if grouping:
+            yield ('weather_group_batches', 'counter', 'Micro-batches of current-weather misses sent upstream',
+                   [('_total', {}, sum(stats['batches'] for stats in grouping))])
+            yield ('weather_group_items', 'counter', 'City IDs sent in micro-batches',
+                   [('_total', {}, sum(stats['items'] for stats in grouping))])
+        
+        providers = service.get_provider_stats()
+        if providers is not None:
+            hedging = providers['hedging']
+            yield ('weather_hedged_requests', 'counter', 'Slow primary calls duplicated to the secondary provider',
+                   [('_total', {'result': 'won'}, hedging['hedgeWins']),
+                    ('_total', {'result': 'lost'}, hedging['hedged'] - hedging['hedgeWins'])])
+            yield ('weather_failovers', 'counter', 'Secondary provider calls after a primary error',
+                   [('_total', {'result': 'won'}, hedging['failoverWins']),
+                    ('_total', {'result': 'lost'}, hedging['failovers'] - hedging['failoverWins'])])
+        
+        circuit = service.get_circuit_stats()
+        yield ('weather_circuit_state', 'gauge', 'Upstream circuit breaker state (1 for the current state)',
+               [('', {'state': state}, int(circuit['state'] == state)) for state in CIRCUIT_STATES])
+        
+        quota = service.get_quota_stats()
+        yield ('weather_quota_throttled', 'counter', 'Upstream calls refused by the local quota governor',
+               [('_total', {}, quota['throttled'])])
+        remaining = [('', {'window': window}, quota[key])
+                     for window, key in (('minute', 'minuteRemaining'), ('day', 'dayRemaining'))
+                     if quota.get(key) is not None]
+        if remaining:
+            yield ('weather_quota_remaining', 'gauge', 'Upstream calls left in each enabled quota window', remaining)
+    
+    return collect
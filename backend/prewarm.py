@@ -0,0 +1,281 @@
+"""
+Weather API Application - Cache Prewarming
+Tracks which cities are requested most and refreshes their cached current
+weather and forecast shortly before it expires, so popular requests keep
+hitting fresh entries instead of paying for the upstream call
+"""
+
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from operator import itemgetter
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from backend.circuit_breaker import CircuitOpenError
+from backend.quota import QuotaExceededError
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityCounter:
+    """
+    Exponentially decayed request counts, bounded to the most popular keys
+    
+    Uses forward decay: a hit adds 2 ** (elapsed / half_life) measured from a
+    fixed landmark, so older hits weigh relatively less without touching the
+    other keys on each update. Scores are rescaled to the current time when
+    the weights grow large. Once more than twice `capacity` keys are tracked
+    the least popular are dropped, which keeps memory bounded for long-tail
+    traffic while leaving a newly popular key room to climb.
+    """
+    
+    HALF_LIFE = 900.0  # seconds for a hit to lose half its weight
+    CAPACITY = 512  # keys kept after pruning
+    RESCALE_EXPONENT = 64  # rescale before the weights lose float precision
+    
+    def __init__(self, half_life: Optional[float] = None, capacity: Optional[int] = None):
+        """
+        Initialize PopularityCounter
+        
+        Args:
+            half_life: Seconds for a hit to lose half its weight
+            capacity: Keys kept after pruning
+        """
+        self.half_life = self.HALF_LIFE if half_life is None else half_life
+        self.capacity = self.CAPACITY if capacity is None else capacity
+        if self.half_life <= 0 or self.capacity <= 0:
+            raise ValueError("Half-life and capacity must be positive")
+        self._scores: Dict[Hashable, float] = {}
+        self._landmark = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._scores)
+    
+    def record(self, key: Hashable, now: Optional[float] = None) -> None:
+        """
+        Count one request
+        
+        Args:
+            key: Request key, e.g. (endpoint, city, unit)
+            now: time.monotonic() of the request (defaults to now)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            exponent = (now - self._landmark) / self.half_life
+            if exponent > self.RESCALE_EXPONENT:
+                self._rescale(now)
+                exponent = 0.0
+            self._scores[key] = self._scores.get(key, 0.0) + 2.0 ** exponent
+            if len(self._scores) > 2 * self.capacity:
+                self._scores = dict(heapq.nlargest(self.capacity, self._scores.items(), key=itemgetter(1)))
+    
+    def _rescale(self, now: float) -> None:
+        """Move the landmark to now, dropping keys whose weight has decayed away"""
+        factor = 2.0 ** (-(now - self._landmark) / self.half_life)
+        self._scores = {key: score * factor for key, score in self._scores.items() if score * factor > 1e-6}
+        self._landmark = now
+    
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Return the most popular keys
+        
+        Args:
+            n: Number of keys
+            now: time.monotonic() the scores are decayed to (defaults to now)
+        
+        Returns:
+            List of (key, score) pairs, most popular first. A score is the
+            number of hits, each weighted by 2 ** -(age / half_life).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            items = heapq.nlargest(n, self._scores.items(), key=itemgetter(1))
+            scale = 2.0 ** (-(now - self._landmark) / self.half_life)
+        return [(key, score * scale) for key, score in items]
+
+
+class Prewarmer:
+    """
+    Background thread that refreshes the hottest cache entries before they expire
+    
+    Every `interval` seconds (randomized by +/-20%) it takes the `top_n` most
+    requested (endpoint, city, unit) keys from the service's
+    PopularityCounter and refreshes each entry whose freshness runs out
+    within the next `lead` seconds. Each key gets its own point in the
+    second half of the lead window and refreshes within a pass are spaced
+    across the interval, so entries that were fetched together do not all
+    expire and refresh together. Units share one upstream entry, so a city
+    requested in both units is refreshed once.
+    
+    Refreshes go through the service's call budget and circuit breaker and
+    stop for the pass while the breaker is not closed or less than
+    `reserve` of either quota bucket is left, keeping that share for
+    requests that missed the cache.
+    
+    Background threads do not survive fork(): call start() in each worker
+    process and stop() before it exits (see gunicorn.conf.py).
+    """
+    
+    INTERVAL = 10.0  # seconds between passes
+    LEAD = 60.0  # seconds before expiry at which entries become due
+    RESERVE = 0.5  # fraction of each quota bucket kept for cache misses
+    MIN_SCORE = 2.0  # decayed hits below which a key is not worth an upstream call
+    JOIN_TIMEOUT = 5.0  # seconds stop() waits for a refresh in progress
+    
+    def __init__(self, service: Any, top_n: int = 20, lead: Optional[float] = None,
+                 interval: Optional[float] = None, reserve: Optional[float] = None):
+        """
+        Initialize Prewarmer
+        
+        Args:
+            service: WeatherService created with a PopularityCounter
+            top_n: Number of most requested keys kept warm
+            lead: Seconds before expiry at which entries become due
+            interval: Seconds between passes
+            reserve: Fraction of each quota bucket left for cache misses
+        """
+        if service.popularity is None:
+            raise ValueError("The weather service must be created with a PopularityCounter")
+        self.service = service
+        self.popularity = service.popularity
+        self.top_n = top_n
+        self.lead = self.LEAD if lead is None else lead
+        self.interval = self.INTERVAL if interval is None else interval
+        self.reserve = self.RESERVE if reserve is None else reserve
+        if self.interval <= 0 or self.lead < 2 * self.interval:
+            raise ValueError("Prewarm lead must be at least twice the (positive) interval")
+        self._salt = random.random()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._passes = 0
+        self._refreshed = 0
+        self._budget_skips = 0
+        self._errors = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+    
+    def start(self) -> None:
+        """Start the background thread in this process (no-op if it is already running)"""
+        with self._lock:
+            if self.running:
+                return
+            self._stop = threading.Event()
+            self._salt = random.random()  # per process, so workers pick different refresh points
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='weather-prewarm', daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread
+        
+        Args:
+            timeout: Seconds to wait for a refresh in progress (defaults to JOIN_TIMEOUT)
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread is not threading.current_thread():
+            thread.join(self.JOIN_TIMEOUT if timeout is None else timeout)
+        self._thread = None
+    
+    def _run(self) -> None:
+        stop = self._stop
+        # Random start so workers forked together do not run their passes in step
+        if stop.wait(random.uniform(0, self.interval)):
+            return
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Prewarm pass failed")
+            stop.wait(self.interval * random.uniform(0.8, 1.2))
+    
+    def run_once(self) -> int:
+        """
+        Refresh the due entries among the hottest keys
+        
+        Returns:
+            Number of entries refreshed
+        """
+        self._count('_passes')
+        candidates = [key for key, score in self.popularity.top(self.top_n) if score >= self.MIN_SCORE]
+        if not candidates:
+            return 0
+        spacing = self.interval / len(candidates)
+        refreshed = 0
+        for key in candidates:
+            if self._stop.is_set():
+                break
+            if not self._within_budget():
+                self._count('_budget_skips')
+                break
+            endpoint, city, _ = key
+            try:
+                if not self.service.refresh(endpoint, city, time.time() + self.lead * (0.5 + 0.5 * self._spread(key))):
+                    continue
+            except (QuotaExceededError, CircuitOpenError):
+                self._count('_budget_skips')
+                break
+            except Exception as e:
+                self._count('_errors')
+                logger.debug("Prewarming %s failed: %s", key, e)
+                continue
+            refreshed += 1
+            self._count('_refreshed')
+            self._stop.wait(spacing)
+        return refreshed
+    
+    def _spread(self, key: Hashable) -> float:
+        """Stable per-key position in [0, 1) within the lead window"""
+        return (zlib.crc32(repr(key).encode('utf-8')) / 2 ** 32 + self._salt) % 1.0
+    
+    def _within_budget(self) -> bool:
+        """Return True while a refresh would leave the reserved share of the quota untouched"""
+        if self.service.is_degraded():
+            return False
+        stats = self.service.get_quota_stats()
+        if stats['blockedFor'] is None or stats['blockedFor'] > 0:
+            return False
+        quota = self.service.quota
+        for remaining, limit in ((stats['minuteRemaining'], quota.per_minute), (stats['dayRemaining'], quota.per_day)):
+            if limit and (remaining is None or remaining <= limit * self.reserve):
+                return False
+        return True
+    
+    def _count(self, counter: str) -> None:
+        """Increment a statistics counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prewarming statistics
+        
+        Returns:
+            Dictionary with settings, pass/refresh counters and the hottest keys
+        """
+        hottest = [
+            {'endpoint': endpoint, 'city': city, 'unit': unit, 'score': round(score, 1)}
+            for (endpoint, city, unit), score in self.popularity.top(5)
+        ]
+        with self._lock:
+            return {
+                'running': self.running,
+                'topN': self.top_n,
+                'lead': self.lead,
+                'interval': self.interval,
+                'tracked': len(self.popularity),
+                'passes': self._passes,
+                'refreshed': self._refreshed,
+                'budgetSkips': self._budget_skips,
+                'errors': self._errors,
+                'hottest': hottest,
+            }
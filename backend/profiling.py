@@ -0,0 +1,234 @@
+"""
+Weather API Application - Request Profiling
+Phase-level timing breakdowns (validate, cache, upstream, decode, parse,
+serialize) for sampled, debug-header and slow requests, with optional
+cProfile dumps
+"""
+
+import hmac
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+PROFILE_HEADER = 'X-Debug-Profile'  # value must equal the configured token
+PHASES = ('validate', 'cache', 'upstream', 'decode', 'parse', 'serialize')
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('weather_profile', default=None)
+_parent: ContextVar[Optional['_Phase']] = ContextVar('weather_profile_phase', default=None)
+
+
+class RequestProfile:
+    """Exclusive time per phase for one request"""
+    
+    __slots__ = ('method', 'route', 'detailed', 'debug', 'started', 'phases', 'cprofile', '_token')
+    
+    def __init__(self, method: str, route: str, detailed: bool, debug: bool):
+        self.method = method
+        self.route = route
+        self.detailed = detailed  # sampled or debug: always logged, cProfile eligible
+        self.debug = debug  # authorized header: breakdown returned in Server-Timing
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.cprofile: Any = None  # cProfile.Profile while a dump is being recorded
+        self._token = None
+    
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+    
+    def breakdown(self, total: float) -> List[tuple]:
+        """(phase, milliseconds) in PHASES order, then the unaccounted remainder as 'other'"""
+        rows = [(name, self.phases[name] * 1000) for name in PHASES if name in self.phases]
+        rows.extend((name, seconds * 1000) for name, seconds in self.phases.items() if name not in PHASES)
+        rows.append(('other', max(total - sum(self.phases.values()), 0.0) * 1000))
+        return rows
+
+
+class _Phase:
+    """
+    Times one phase of the current request
+    
+    Phases nest: time spent in an inner phase is subtracted from the outer
+    one, so a cache write inside an upstream fetch is not counted twice.
+    """
+    
+    __slots__ = ('name', 'profile', 'children', 'started', '_token')
+    
+    def __init__(self, name: str, profile: RequestProfile):
+        self.name = name
+        self.profile = profile
+        self.children = 0.0
+    
+    def __enter__(self) -> '_Phase':
+        self._token = _parent.set(self)
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.started
+        _parent.reset(self._token)
+        self.profile.add(self.name, elapsed - self.children)
+        outer = _parent.get()
+        if outer is not None:
+            outer.children += elapsed
+
+
+class _NoPhase:
+    """Shared no-op used when the request is not being profiled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self) -> None:
+        return None
+    
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str):
+    """
+    Context manager timing a phase of the current request
+    
+    Costs one context variable lookup when the request is not profiled.
+    
+    Args:
+        name: Phase name (see PHASES)
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NO_PHASE
+    return _Phase(name, profile)
+
+
+class Profiler:
+    """
+    Decides which requests to profile and reports their breakdowns
+    
+    Every request is timed per phase while slow-request logging is on
+    (a handful of perf_counter calls). A sampled fraction of requests and
+    requests carrying PROFILE_HEADER with the configured token are always
+    logged; the header also returns the breakdown as a Server-Timing
+    header. With profile_dir set, those requests also write a cProfile
+    dump (one at a time per process; cProfile only sees the request's own
+    thread).
+    """
+    
+    def __init__(self, sample_rate: float = 0.0, token: Optional[str] = None,
+                 slow_ms: float = 1000.0, profile_dir: Optional[str] = None):
+        """
+        Initialize Profiler
+        
+        Args:
+            sample_rate: Fraction of requests to profile (0 disables sampling)
+            token: Secret enabling PROFILE_HEADER (None or empty disables it)
+            slow_ms: Log requests slower than this with their breakdown (0 disables)
+            profile_dir: Directory for cProfile dumps (None disables them)
+        """
+        self.sample_rate = max(0.0, min(sample_rate, 1.0))
+        self.token = token or None
+        self.slow_ms = slow_ms
+        self.profile_dir = profile_dir or None
+        self._dump_lock = threading.Lock()
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sample_rate or self.token or self.slow_ms > 0)
+    
+    def _authorized(self, header: Optional[str]) -> bool:
+        return bool(self.token and header) and hmac.compare_digest(header.encode('utf-8'), self.token.encode('utf-8'))
+    
+    def start(self, method: str, route: str, debug_header: Optional[str] = None) -> Optional[RequestProfile]:
+        """
+        Begin profiling a request, if it qualifies
+        
+        Args:
+            method: HTTP method
+            route: Route template (used in logs and dump file names)
+            debug_header: Value of PROFILE_HEADER, if sent
+        
+        Returns:
+            RequestProfile to pass to finish(), or None
+        """
+        if not self.enabled:
+            return None
+        debug = self._authorized(debug_header)
+        detailed = debug or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not detailed and self.slow_ms <= 0:
+            return None
+        
+        profile = RequestProfile(method, route, detailed, debug)
+        profile._token = _current.set(profile)
+        if detailed and self.profile_dir and self._dump_lock.acquire(blocking=False):
+            import cProfile
+            
+            profile.cprofile = cProfile.Profile()
+            try:
+                profile.cprofile.enable()
+            except ValueError:  # another profiler is active in this thread
+                profile.cprofile = None
+                self._dump_lock.release()
+        return profile
+    
+    def finish(self, profile: Optional[RequestProfile], status_code: int) -> Dict[str, str]:
+        """
+        Stop profiling a request and report it
+        
+        Args:
+            profile: Value returned by start()
+            status_code: Response status
+        
+        Returns:
+            Extra response headers (Server-Timing for authorized debug requests)
+        """
+        if profile is None or profile._token is None:
+            return {}
+        total = time.perf_counter() - profile.started
+        _current.reset(profile._token)
+        profile._token = None
+        
+        dump_path = None
+        if profile.cprofile is not None:
+            profile.cprofile.disable()
+            try:
+                dump_path = self._dump(profile, total)
+            finally:
+                profile.cprofile = None
+                self._dump_lock.release()
+        
+        slow = self.slow_ms > 0 and total * 1000 >= self.slow_ms
+        if slow or profile.detailed:
+            breakdown = ' '.join(f"{name}={ms:.1f}" for name, ms in profile.breakdown(total))
+            logger.log(
+                logging.WARNING if slow else logging.INFO,
+                "%s request %s %s %d %.1f ms: %s%s",
+                'slow' if slow else 'profiled', profile.method, profile.route, status_code, total * 1000,
+                breakdown, f" (cProfile: {dump_path})" if dump_path else '',
+            )
+        if not profile.debug:
+            return {}
+        timings = [f"{name};dur={ms:.2f}" for name, ms in profile.breakdown(total)]
+        timings.append(f"total;dur={total * 1000:.2f}")
+        return {'Server-Timing': ', '.join(timings)}
+    
+    def _dump(self, profile: RequestProfile, total: float) -> Optional[str]:
+        """Write a request's cProfile stats; returns the file path"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', profile.route).strip('-') or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{total * 1000:.0f}ms-{os.getpid()}.prof"
+        path = os.path.join(self.profile_dir, name)
+        try:
+            profile.cprofile.dump_stats(path)
+        except OSError:
+            logger.exception("Could not write profile %s", path)
+            return None
+        return path
@@ -0,0 +1,449 @@
+"""
+Weather API Application - Upstream Providers
+Request building and response normalization for each weather API the
+services can call, plus the policy for hedging slow calls to a secondary
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from backend.circuit_breaker import CircuitBreaker
+from backend.gazetteer import City
+
+MAX_VISIBILITY = 10000  # metres; OpenWeatherMap caps visibility here
+
+
+class Provider:
+    """
+    One upstream weather API
+    
+    A provider turns a city lookup into a request and its response into
+    the OpenWeatherMap payload shape, so the services parse every
+    provider's data with the same parsers into the same schema. Each
+    provider has its own circuit breaker and keeps the latency of its
+    recent attempts per endpoint.
+    """
+    
+    name = ''
+    BASE_URL = ''
+    metered = False  # attempts are charged to the OpenWeatherMap call budget
+    needs_place = False  # params() needs the City (or coordinates) of the lookup
+    LATENCY_WINDOW = 200  # recent successful attempts kept per endpoint
+    
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize Provider
+        
+        Args:
+            base_url: API root (defaults to BASE_URL)
+            api_key: API key, if the provider takes one
+            breaker: Circuit breaker guarding its calls (defaults to a new
+                CircuitBreaker)
+        """
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.api_key = api_key
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+    
+    def url(self, endpoint: str) -> str:
+        """Return the URL serving a service endpoint ('/weather', '/forecast' or '/group')"""
+        return f"{self.base_url}{endpoint}"
+    
+    def params(self, endpoint: str, query: Dict[str, Any], place: Optional[City] = None) -> Optional[Dict[str, Any]]:
+        """
+        Build the query parameters of a lookup
+        
+        Args:
+            endpoint: Service endpoint
+            query: City selector from _resolve_city ('id', 'q' or 'lat'/'lon')
+            place: Indexed city or coordinates of the lookup, when known
+        
+        Returns:
+            Query parameters without credentials, or None if the provider
+            cannot answer this lookup
+        """
+        raise NotImplementedError
+    
+    def authorize(self, params: Dict[str, Any]) -> None:
+        """Add the API key to query parameters (in place)"""
+    
+    def normalize(self, endpoint: str, data: Dict[str, Any], place: Optional[City] = None) -> Dict[str, Any]:
+        """
+        Convert a response to the OpenWeatherMap payload of the endpoint
+        
+        Args:
+            endpoint: Service endpoint the response answers
+            data: Decoded response
+            place: The place passed to params()
+        
+        Returns:
+            OpenWeatherMap-shaped payload (metric units)
+        """
+        return data
+    
+    def observe(self, endpoint: str, seconds: float) -> None:
+        """Record the latency of an attempt that got an answer"""
+        with self._lock:
+            window = self._latencies.get(endpoint)
+            if window is None:
+                window = self._latencies[endpoint] = deque(maxlen=self.LATENCY_WINDOW)
+            window.append(seconds)
+    
+    def percentile(self, endpoint: str, fraction: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Get a latency percentile of the recent attempts for an endpoint
+        
+        Args:
+            endpoint: Service endpoint
+            fraction: Percentile as a fraction (0.95 for p95)
+            min_samples: Attempts needed before the percentile is trusted
+        
+        Returns:
+            Latency in seconds, or None with fewer than min_samples attempts
+        """
+        with self._lock:
+            window = self._latencies.get(endpoint)
+            if window is None or len(window) < min_samples:
+                return None
+            ordered = sorted(window)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get provider state
+        
+        Returns:
+            Dictionary with the name, circuit state and p95 latency per endpoint
+        """
+        with self._lock:
+            endpoints = list(self._latencies)
+        return {
+            'name': self.name,
+            'circuit': self.breaker.state,
+            'p95Ms': {endpoint: round(self.percentile(endpoint, 0.95) * 1000, 1) for endpoint in endpoints},
+        }
+
+
+class OpenWeatherMapProvider(Provider):
+    """OpenWeatherMap, or any endpoint speaking its 2.5 API"""
+    
+    name = 'openweathermap'
+    BASE_URL = 'https://api.openweathermap.org/data/2.5'
+    metered = True
+    
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        if not api_key:
+            raise ValueError("API key is required")
+        super().__init__(base_url, api_key, breaker)
+    
+    def params(self, endpoint: str, query: Dict[str, Any], place: Optional[City] = None) -> Optional[Dict[str, Any]]:
+        # Always metric (the services' CANONICAL_UNIT); other units are converted locally
+        return dict(query, units='metric', lang='en')
+    
+    def authorize(self, params: Dict[str, Any]) -> None:
+        params['appid'] = self.api_key
+
+
+# WMO weather interpretation codes -> OpenWeatherMap (condition id, main, description, icon)
+WMO_CONDITIONS: Dict[int, Tuple[int, str, str, str]] = {
+    0: (800, 'Clear', 'clear sky', '01'),
+    1: (801, 'Clouds', 'few clouds', '02'),
+    2: (802, 'Clouds', 'scattered clouds', '03'),
+    3: (804, 'Clouds', 'overcast clouds', '04'),
+    45: (741, 'Fog', 'fog', '50'),
+    48: (741, 'Fog', 'fog', '50'),
+    51: (300, 'Drizzle', 'light intensity drizzle', '09'),
+    53: (301, 'Drizzle', 'drizzle', '09'),
+    55: (302, 'Drizzle', 'heavy intensity drizzle', '09'),
+    56: (300, 'Drizzle', 'light intensity drizzle', '09'),
+    57: (302, 'Drizzle', 'heavy intensity drizzle', '09'),
+    61: (500, 'Rain', 'light rain', '10'),
+    63: (501, 'Rain', 'moderate rain', '10'),
+    65: (502, 'Rain', 'heavy intensity rain', '10'),
+    66: (511, 'Rain', 'freezing rain', '13'),
+    67: (511, 'Rain', 'freezing rain', '13'),
+    71: (600, 'Snow', 'light snow', '13'),
+    73: (601, 'Snow', 'snow', '13'),
+    75: (602, 'Snow', 'heavy snow', '13'),
+    77: (600, 'Snow', 'light snow', '13'),
+    80: (520, 'Rain', 'light intensity shower rain', '09'),
+    81: (521, 'Rain', 'shower rain', '09'),
+    82: (522, 'Rain', 'heavy intensity shower rain', '09'),
+    85: (620, 'Snow', 'light shower snow', '13'),
+    86: (622, 'Snow', 'heavy shower snow', '13'),
+    95: (211, 'Thunderstorm', 'thunderstorm', '11'),
+    96: (201, 'Thunderstorm', 'thunderstorm with rain', '11'),
+    99: (202, 'Thunderstorm', 'thunderstorm with heavy rain', '11'),
+}
+
+
+def wmo_condition(code: Any, is_day: Any) -> Dict[str, Any]:
+    """
+    Convert a WMO weather code to an OpenWeatherMap weather entry
+    
+    Args:
+        code: WMO weather interpretation code
+        is_day: 1 for daylight, 0 for night (picks the icon variant)
+    
+    Returns:
+        Dictionary with id, main, description and icon (empty for an
+        unknown code, so the parsers fall back to their defaults)
+    """
+    condition = WMO_CONDITIONS.get(code)
+    if condition is None:
+        return {}
+    condition_id, main, description, icon = condition
+    return {'id': condition_id, 'main': main, 'description': description, 'icon': icon + ('n' if is_day == 0 else 'd')}
+
+
+class OpenMeteoProvider(Provider):
+    """
+    Open-Meteo forecast API
+    
+    Open-Meteo is queried by coordinates only, so it answers lookups of
+    indexed cities and of coordinates; free-text names stay with the
+    primary. It reports no place names: indexed cities keep theirs, while
+    coordinates come back unnamed. Hourly forecasts are reduced to the
+    3-hour UTC grid of OpenWeatherMap, with the precipitation of the three
+    hours up to each grid point.
+    """
+    
+    name = 'openmeteo'
+    BASE_URL = 'https://api.open-meteo.com/v1'
+    needs_place = True
+    CURRENT_FIELDS = ('temperature_2m', 'relative_humidity_2m', 'apparent_temperature', 'is_day', 'weather_code',
+                      'pressure_msl', 'wind_speed_10m', 'wind_direction_10m', 'visibility')
+    HOURLY_FIELDS = ('temperature_2m', 'relative_humidity_2m', 'apparent_temperature', 'is_day', 'weather_code',
+                     'pressure_msl', 'wind_speed_10m', 'wind_direction_10m', 'precipitation')
+    FORECAST_HOURS = 120  # OpenWeatherMap forecasts cover 5 days
+    GRID = 10800  # seconds between OpenWeatherMap forecast items
+    
+    def url(self, endpoint: str) -> str:
+        return f"{self.base_url}/forecast"
+    
+    def params(self, endpoint: str, query: Dict[str, Any], place: Optional[City] = None) -> Optional[Dict[str, Any]]:
+        if place is None:
+            return None
+        params = {'latitude': place.lat, 'longitude': place.lon, 'wind_speed_unit': 'ms', 'timeformat': 'unixtime'}
+        if endpoint == '/weather':
+            params.update(current=','.join(self.CURRENT_FIELDS), daily='sunrise,sunset', forecast_days=1, timezone='auto')
+        elif endpoint == '/forecast':
+            params.update(hourly=','.join(self.HOURLY_FIELDS), forecast_hours=self.FORECAST_HOURS)
+        else:
+            return None
+        return params
+    
+    def authorize(self, params: Dict[str, Any]) -> None:
+        # Only the commercial API (customer-api.open-meteo.com) takes a key
+        if self.api_key:
+            params['apikey'] = self.api_key
+    
+    def normalize(self, endpoint: str, data: Dict[str, Any], place: Optional[City] = None) -> Dict[str, Any]:
+        if endpoint == '/forecast':
+            return self._normalize_forecast(data, place)
+        return self._normalize_current(data, place)
+    
+    @staticmethod
+    def _normalize_current(data: Dict[str, Any], place: City) -> Dict[str, Any]:
+        """Build a /weather payload from the current conditions and today's sun times"""
+        current = data.get('current') or {}
+        daily = data.get('daily') or {}
+        visibility = current.get('visibility')
+        return {
+            'id': place.id or None,
+            'name': place.name,
+            'dt': current.get('time'),
+            'coord': {'lat': place.lat, 'lon': place.lon},
+            'weather': [wmo_condition(current.get('weather_code'), current.get('is_day'))],
+            'main': {
+                'temp': current.get('temperature_2m'),
+                'feels_like': current.get('apparent_temperature'),
+                'humidity': current.get('relative_humidity_2m'),
+                'pressure': current.get('pressure_msl'),
+            },
+            'visibility': None if visibility is None else min(visibility, MAX_VISIBILITY),
+            'wind': {'speed': current.get('wind_speed_10m'), 'deg': current.get('wind_direction_10m')},
+            'sys': {
+                'country': place.country,
+                'sunrise': (daily.get('sunrise') or [None])[0],
+                'sunset': (daily.get('sunset') or [None])[0],
+            },
+        }
+    
+    def _normalize_forecast(self, data: Dict[str, Any], place: City) -> Dict[str, Any]:
+        """Build a /forecast payload from the 3-hourly grid points of the hourly series"""
+        hourly = data.get('hourly') or {}
+        times = hourly.get('time') or []
+        
+        def column(name: str) -> List[Any]:
+            values = hourly.get(name) or []
+            return values if len(values) >= len(times) else values + [None] * (len(times) - len(values))
+        
+        (temperature, humidity, feels_like, is_day, code,
+         pressure, wind_speed, wind_deg, precipitation) = (column(name) for name in self.HOURLY_FIELDS)
+        items = []
+        for index, timestamp in enumerate(times):
+            if timestamp % self.GRID:
+                continue
+            item = {
+                'dt': timestamp,
+                'main': {
+                    'temp': temperature[index],
+                    'feels_like': feels_like[index],
+                    'humidity': humidity[index],
+                    'pressure': pressure[index],
+                },
+                'weather': [wmo_condition(code[index], is_day[index])],
+                'wind': {'speed': wind_speed[index], 'deg': wind_deg[index]},
+            }
+            rain = sum(amount for amount in precipitation[max(index - 2, 0):index + 1] if amount)
+            if rain:
+                item['rain'] = {'3h': round(rain, 2)}
+            items.append(item)
+        return {
+            'cnt': len(items),
+            'list': items,
+            'city': {'id': place.id or None, 'name': place.name, 'country': place.country,
+                     'coord': {'lat': place.lat, 'lon': place.lon}},
+        }
+
+
+PROVIDERS = {
+    OpenWeatherMapProvider.name: OpenWeatherMapProvider,
+    OpenMeteoProvider.name: OpenMeteoProvider,
+}
+
+
+def create_provider(name: str, base_url: Optional[str] = None, api_key: Optional[str] = None) -> Provider:
+    """
+    Create a provider by name
+    
+    Args:
+        name: 'openweathermap' or 'openmeteo'
+        base_url: API root (defaults to the provider's public API)
+        api_key: API key (required for openweathermap)
+    
+    Returns:
+        Provider instance
+    """
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported weather provider: {name}")
+    return provider_class(base_url, api_key)
+
+
+class HedgePolicy:
+    """
+    When to duplicate a slow primary call to the secondary provider
+    
+    A hedge is sent once the primary call has been running longer than the
+    primary's recent `percentile` latency for the endpoint, so about that
+    share of calls never hedge. Hedges draw on a token bucket refilled by
+    `budget` tokens per lookup (at most `burst` saved up), which caps the
+    extra load at that share of lookups when the primary slows down as a
+    whole. Failovers after a primary error are not budgeted.
+    """
+    
+    PERCENTILE = 0.95
+    MIN_SAMPLES = 20  # primary attempts needed before the percentile is trusted
+    DEFAULT_DELAY = 1.0  # seconds before a hedge until then
+    MIN_DELAY = 0.01  # seconds; never hedge sooner than this
+    BUDGET = 0.1  # hedges allowed per lookup
+    BURST = 10  # hedges that may be sent back to back
+    
+    def __init__(self, percentile: float = PERCENTILE, budget: float = BUDGET, burst: int = BURST):
+        """
+        Initialize HedgePolicy
+        
+        Args:
+            percentile: Primary latency percentile (0-1) after which a hedge
+                is sent (0 disables hedging, keeping failover)
+            budget: Hedges allowed per lookup
+            burst: Hedges that may be sent back to back
+        """
+        if not 0 <= percentile < 1:
+            raise ValueError("Hedge percentile must be between 0 and 1")
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._lookups = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._over_budget = 0
+        self._failovers = 0
+        self._failover_wins = 0
+    
+    def delay(self, provider: Provider, endpoint: str) -> Optional[float]:
+        """
+        Seconds to wait for the primary before hedging a lookup
+        
+        Also refills the hedge budget, so call it once per lookup.
+        
+        Args:
+            provider: Primary provider
+            endpoint: Service endpoint
+        
+        Returns:
+            Delay in seconds, or None when hedging is disabled
+        """
+        with self._lock:
+            self._lookups += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+        if self.percentile <= 0:
+            return None
+        observed = provider.percentile(endpoint, self.percentile, self.MIN_SAMPLES)
+        return max(self.MIN_DELAY, self.DEFAULT_DELAY if observed is None else observed)
+    
+    def allow(self) -> bool:
+        """Take a hedge from the budget; False when it is spent"""
+        with self._lock:
+            if self._tokens < 1:
+                self._over_budget += 1
+                return False
+            self._tokens -= 1
+            self._hedged += 1
+            return True
+    
+    def record_failover(self) -> None:
+        """Count a secondary call sent because the primary failed"""
+        with self._lock:
+            self._failovers += 1
+    
+    def record_win(self, failover: bool) -> None:
+        """
+        Count a lookup answered by the secondary
+        
+        Args:
+            failover: True if the secondary was called after a primary error
+                rather than as a hedge
+        """
+        with self._lock:
+            if failover:
+                self._failover_wins += 1
+            else:
+                self._hedge_wins += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hedging counters
+        
+        Returns:
+            Dictionary with the percentile, lookups, hedges sent and won,
+            hedges refused by the budget, and failovers sent and won
+        """
+        with self._lock:
+            return {
+                'percentile': round(self.percentile * 100, 1),
+                'lookups': self._lookups,
+                'hedged': self._hedged,
+                'hedgeWins': self._hedge_wins,
+                'overBudget': self._over_budget,
+                'failovers': self._failovers,
+                'failoverWins': self._failover_wins,
+            }
@@ -0,0 +1,288 @@
+"""
+Weather API Application - Upstream Quota Governor
+Token buckets that keep OpenWeatherMap calls inside the plan's rate limits
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_RETRY_AFTER = 60.0  # seconds, used when an upstream 429 carries no Retry-After
+
+
+class QuotaExceededError(Exception):
+    """Raised when an upstream call would exceed the request budget"""
+    
+    def __init__(self, retry_after: float, message: str = "Upstream request quota exhausted. Please try again later."):
+        super().__init__(message)
+        self.retry_after = max(retry_after, 0.0)
+
+
+class QuotaGovernor:
+    """
+    Per-minute and per-day token buckets shared by every upstream call
+    
+    Each bucket starts full and refills continuously at its limit per period,
+    so bursts up to the limit are allowed while the long-run rate stays
+    within the plan. A limit of 0 disables that bucket. An upstream 429
+    blocks all calls until its Retry-After has passed.
+    
+    This implementation keeps the state in process memory; subclasses
+    persist it to share one budget between workers, and set `blocking`
+    when their calls may wait on I/O.
+    """
+    
+    name = 'memory'
+    blocking = False  # True when acquire() and block() may wait on a lock held by another process
+    
+    def __init__(self, per_minute: int = 0, per_day: int = 0):
+        """
+        Initialize QuotaGovernor
+        
+        Args:
+            per_minute: Upstream calls allowed per minute (0 for unlimited)
+            per_day: Upstream calls allowed per day (0 for unlimited)
+        """
+        if per_minute < 0 or per_day < 0:
+            raise ValueError("Quota limits must not be negative")
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self._lock = threading.Lock()
+        self._state = self._initial_state(time.time())
+        self._granted = 0
+        self._throttled = 0
+        self._upstream_limited = 0
+        self._fallbacks = 0
+    
+    def _initial_state(self, now: float) -> List[float]:
+        """Full buckets: [minute tokens, day tokens, updated at, blocked until]"""
+        return [float(self.per_minute), float(self.per_day), now, 0.0]
+    
+    def _refill(self, state: List[float], now: float) -> List[float]:
+        """Add the tokens earned since the state was last updated"""
+        elapsed = max(now - state[2], 0.0)
+        return [
+            min(float(self.per_minute), state[0] + elapsed * self.per_minute / 60.0),
+            min(float(self.per_day), state[1] + elapsed * self.per_day / 86400.0),
+            now,
+            state[3],
+        ]
+    
+    def _transact(self, update: Callable[[List[float], float], Tuple[List[float], Any]]) -> Any:
+        """
+        Apply an update to the bucket state atomically
+        
+        Args:
+            update: Function of (refilled state, now) returning (new state, result)
+        
+        Returns:
+            The update's result
+        """
+        with self._lock:
+            now = time.time()
+            self._state, result = update(self._refill(self._state, now), now)
+            return result
+    
+    def _take(self, state: List[float], now: float) -> Tuple[List[float], Optional[float]]:
+        """Consume one token from every enabled bucket, or report how long to wait"""
+        if now < state[3]:
+            return state, state[3] - now
+        waits = []
+        if self.per_minute and state[0] < 1:
+            waits.append((1 - state[0]) * 60.0 / self.per_minute)
+        if self.per_day and state[1] < 1:
+            waits.append((1 - state[1]) * 86400.0 / self.per_day)
+        if waits:
+            return state, max(waits)
+        return [state[0] - (1 if self.per_minute else 0), state[1] - (1 if self.per_day else 0), state[2], state[3]], None
+    
+    def acquire(self) -> None:
+        """
+        Take one upstream call from the budget
+        
+        Raises:
+            QuotaExceededError: If the budget is exhausted, with the number of
+                seconds until a call will be allowed again
+        """
+        if not self.per_minute and not self.per_day:
+            # Unlimited, but an upstream 429 still pauses calls
+            if time.time() >= self._state[3]:
+                self._count('_granted')
+                return
+        retry_after = self._transact(self._take)
+        if retry_after is not None:
+            self._count('_throttled')
+            raise QuotaExceededError(retry_after)
+        self._count('_granted')
+    
+    def block(self, seconds: float) -> None:
+        """
+        Pause all upstream calls after the provider answered 429
+        
+        Args:
+            seconds: Time to wait, from the response's Retry-After header
+        """
+        self._count('_upstream_limited')
+        
+        def update(state: List[float], now: float) -> Tuple[List[float], None]:
+            return [state[0], state[1], state[2], max(state[3], now + seconds)], None
+        
+        self._transact(update)
+    
+    def record_fallback(self) -> None:
+        """Count a request answered from stale cache because the budget ran out"""
+        self._count('_fallbacks')
+    
+    def _count(self, counter: str) -> None:
+        """Increment a statistics counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get budget usage
+        
+        Returns:
+            Dictionary with limits, remaining tokens and granted/throttled counters
+        """
+        try:
+            state = self._transact(lambda state, now: (state, state))
+        except Exception:
+            state = None
+        now = time.time()
+        with self._lock:
+            return {
+                'backend': self.name,
+                'perMinute': self.per_minute,
+                'perDay': self.per_day,
+                'minuteRemaining': int(state[0]) if state and self.per_minute else None,
+                'dayRemaining': int(state[1]) if state and self.per_day else None,
+                'blockedFor': round(max(state[3] - now, 0.0), 1) if state else None,
+                'granted': self._granted,
+                'throttled': self._throttled,
+                'upstreamLimited': self._upstream_limited,
+                'staleServed': self._fallbacks,
+            }
+
+
+class SQLiteQuotaGovernor(QuotaGovernor):
+    """
+    Quota governor whose buckets live in a SQLite file
+    
+    Every worker on the host updates the same row inside an IMMEDIATE
+    transaction, so the budget is shared instead of multiplied by the
+    worker count. Counters remain per process.
+    """
+    
+    name = 'sqlite'
+    blocking = True
+    BUSY_TIMEOUT = 2.0  # seconds to wait for a competing writer
+    
+    def __init__(self, path: str, per_minute: int = 0, per_day: int = 0):
+        """
+        Initialize SQLiteQuotaGovernor
+        
+        Args:
+            path: Database file path (created if missing; may be the cache file)
+            per_minute: Upstream calls allowed per minute (0 for unlimited)
+            per_day: Upstream calls allowed per day (0 for unlimited)
+        """
+        super().__init__(per_minute, per_day)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS weather_quota ('
+            ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+            ' minute_tokens REAL NOT NULL,'
+            ' day_tokens REAL NOT NULL,'
+            ' updated REAL NOT NULL,'
+            ' blocked_until REAL NOT NULL'
+            ')'
+        )
+        conn.execute('INSERT OR IGNORE INTO weather_quota VALUES (0, ?, ?, ?, ?)', self._state)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def _transact(self, update: Callable[[List[float], float], Tuple[List[float], Any]]) -> Any:
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT minute_tokens, day_tokens, updated, blocked_until FROM weather_quota WHERE id = 0'
+            ).fetchone()
+            now = time.time()
+            state, result = update(self._refill(list(row), now), now)
+            conn.execute(
+                'UPDATE weather_quota SET minute_tokens = ?, day_tokens = ?, updated = ?, blocked_until = ? WHERE id = 0',
+                state,
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+    
+    def acquire(self) -> None:
+        try:
+            if not self.per_minute and not self.per_day:
+                # Only the shared upstream 429 pause applies, and a read is enough to check it
+                row = self._connect().execute('SELECT blocked_until FROM weather_quota WHERE id = 0').fetchone()
+                retry_after = row[0] - time.time()
+                if retry_after > 0:
+                    self._count('_throttled')
+                    raise QuotaExceededError(retry_after)
+                self._count('_granted')
+                return
+            super().acquire()
+        except sqlite3.Error:
+            # Never fail requests because the budget file is unavailable
+            self._count('_granted')
+    
+    def block(self, seconds: float) -> None:
+        try:
+            super().block(seconds)
+        except sqlite3.Error:
+            pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['path'] = self.path
+        return stats
+
+
+def create_quota(url: Optional[str] = None, per_minute: int = 0, per_day: int = 0) -> QuotaGovernor:
+    """
+    Create a quota governor from a URL
+    
+    Supported URLs:
+        - memory:// (default): budget per process
+        - sqlite:///relative/quota.db or sqlite:////abs/quota.db: budget
+          shared by every worker on the host
+    
+    Args:
+        url: Governor URL (None or empty for memory)
+        per_minute: Upstream calls allowed per minute (0 for unlimited)
+        per_day: Upstream calls allowed per day (0 for unlimited)
+    
+    Returns:
+        Quota governor instance
+    """
+    parsed = urlparse(url or 'memory://')
+    if parsed.scheme == 'memory':
+        return QuotaGovernor(per_minute, per_day)
+    if parsed.scheme == 'sqlite':
+        return SQLiteQuotaGovernor(parsed.path[1:] or 'weather_quota.db', per_minute, per_day)
+    raise ValueError(f"Unsupported quota URL: {url}")
@@ -0,0 +1,224 @@
+"""
+Weather API Application - Redis Cache Backend
+Cache shared across hosts and serverless instances via any Redis-protocol server
+"""
+
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+from urllib.parse import urlparse, unquote
+from backend.cache import CacheBackend, CacheEntry, serialize_value, deserialize_value
+
+# stored_at, fresh_until, stale_until as big-endian doubles ahead of the payload
+_HEADER = struct.Struct('!3d')
+
+
+class RedisError(Exception):
+    """Error reply or protocol failure from the Redis server"""
+
+
+class RedisConnection:
+    """Minimal RESP2 client connection (one per thread)"""
+    
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 username: Optional[str] = None, timeout: float = 0.5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if password:
+            self.execute('AUTH', *([username] if username else []), password)
+        if db:
+            self.execute('SELECT', db)
+    
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+    
+    def execute(self, *args: Any) -> Any:
+        """
+        Send one command and read its reply
+        
+        Args:
+            *args: Command name and arguments (str, bytes or numbers)
+        
+        Returns:
+            Decoded reply (bytes, int, list or None)
+        """
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self.sock.sendall(b''.join(parts))
+        return self._read_reply()
+    
+    def _read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b'+':
+            return rest
+        if prefix == b'-':
+            raise RedisError(rest.decode('utf-8', 'replace'))
+        if prefix == b':':
+            return int(rest)
+        if prefix == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if prefix == b'*':
+            count = int(rest)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise RedisError(f'Unexpected reply: {line!r}')
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache backend stored in Redis (or Valkey, KeyDB, Dragonfly, ...)
+    
+    Entries are a packed freshness header plus the serialized payload, and
+    expire server-side RETAIN seconds after their stale window. Connection errors
+    are counted and treated as cache misses.
+    """
+    
+    name = 'redis'
+    blocking = True
+    REFRESH_LEASE = 30.0  # seconds a refresh claim is held before others may retry
+    
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, username: Optional[str] = None,
+                 prefix: str = 'weather:', timeout: float = 0.5):
+        """
+        Initialize RedisCache
+        
+        Args:
+            host: Server host
+            port: Server port
+            db: Database number
+            password: AUTH password, if required
+            username: ACL username, if required
+            prefix: Key prefix isolating this application's entries
+            timeout: Socket timeout in seconds
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.username = username
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisCache':
+        """
+        Create a RedisCache from a redis://[user:password@]host:port/db URL
+        
+        Args:
+            url: Redis URL
+        
+        Returns:
+            RedisCache instance
+        """
+        parsed = urlparse(url)
+        db = parsed.path.strip('/')
+        return cls(
+            host=parsed.hostname or 'localhost',
+            port=parsed.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parsed.password) if parsed.password else None,
+            username=unquote(parsed.username) if parsed.username else None,
+        )
+    
+    def _execute(self, *args: Any) -> Any:
+        """Run a command on this thread's connection, reconnecting once on failure"""
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = RedisConnection(self.host, self.port, self.db, self.password, self.username, self.timeout)
+                self._local.conn = conn
+            try:
+                return conn.execute(*args)
+            except RedisError:
+                raise
+            except OSError:
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+    
+    def _key(self, key: Hashable) -> str:
+        return self.prefix + self.key_to_str(key)
+    
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        data = self._execute('GET', self._key(key))
+        if data is None:
+            return None
+        stored_at, fresh_until, stale_until = _HEADER.unpack_from(data)
+        return CacheEntry(deserialize_value(data[_HEADER.size:]), stored_at, fresh_until, stale_until)
+    
+    def _store(self, key: Hashable, entry: CacheEntry) -> None:
+        ttl_ms = max(int((entry.stale_until + self.RETAIN - time.time()) * 1000), 1)
+        data = _HEADER.pack(entry.stored_at, entry.fresh_until, entry.stale_until) + serialize_value(entry.value)
+        self._execute('SET', self._key(key), data, 'PX', ttl_ms)
+    
+    def delete(self, key: Hashable) -> None:
+        self._execute('DEL', self._key(key))
+    
+    def _scan_keys(self) -> List[bytes]:
+        """Return every key under this cache's prefix"""
+        keys = []
+        cursor = b'0'
+        while True:
+            cursor, batch = self._execute('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', 500)
+            keys.extend(batch)
+            if cursor == b'0':
+                return keys
+    
+    def clear(self) -> None:
+        keys = self._scan_keys()
+        for start in range(0, len(keys), 500):
+            self._execute('DEL', *keys[start:start + 500])
+    
+    def size(self) -> Optional[int]:
+        # The database may hold other keys, and counting ours needs a full
+        # SCAN on every health check, so the size is reported as unknown
+        return None
+    
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Claim a cluster-wide refresh lease for a key"""
+        if not super().begin_refresh(key):
+            return False
+        try:
+            claimed = self._execute('SET', self._key(key) + ':refresh', 1, 'NX', 'PX', int(self.REFRESH_LEASE * 1000))
+        except (RedisError, OSError):
+            self._count('_errors')
+            claimed = None
+        if claimed is None:
+            super().end_refresh(key)
+            return False
+        return True
+    
+    def end_refresh(self, key: Hashable) -> None:
+        """Release the refresh lease"""
+        super().end_refresh(key)
+        try:
+            self._execute('DEL', self._key(key) + ':refresh')
+        except (RedisError, OSError):
+            self._count('_errors')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['server'] = f'{self.host}:{self.port}/{self.db}'
+        return stats
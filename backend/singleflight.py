@@ -0,0 +1,154 @@
+"""
+Weather API Application - Request Coalescing
+Single-flight helpers that collapse concurrent identical upstream fetches
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """In-flight call shared by a leader thread and its waiters"""
+    
+    __slots__ = ('event', 'result', 'error', 'waiters')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Thread-based single-flight group
+    
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and share its result or exception.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._leaders = 0
+        self._coalesced = 0
+    
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once per key among concurrent callers
+        
+        Args:
+            key: Key identifying identical calls
+            fn: Zero-argument function performing the call
+        
+        Returns:
+            The result of fn (shared with concurrent callers)
+        
+        Raises:
+            Exception: Whatever fn raised, re-raised in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._leaders += 1
+                leader = True
+        
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+        
+        Returns:
+            Dictionary with in-flight keys, leader calls and coalesced waiters
+        """
+        with self._lock:
+            return {
+                'inFlight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values()),
+                'leaders': self._leaders,
+                'coalesced': self._coalesced,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio single-flight group
+    
+    The shared fetch runs in its own task, so cancelling one caller never
+    cancels the fetch other callers are waiting on.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._leaders = 0
+        self._coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn once per key among concurrent callers
+        
+        Args:
+            key: Key identifying identical calls
+            fn: Zero-argument coroutine function performing the call
+        
+        Returns:
+            The result of fn (shared with concurrent callers)
+        """
+        task = self._tasks.get(key)
+        if task is not None:
+            self._coalesced += 1
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+        else:
+            self._leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._release(key, task))
+        return await asyncio.shield(task)
+    
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        """Forget a finished task so the next caller starts a fresh fetch"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller went away
+            task.exception()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get coalescing counters
+        
+        Returns:
+            Dictionary with in-flight keys, leader calls and coalesced waiters
+        """
+        return {
+            'inFlight': len(self._tasks),
+            'waiting': sum(self._waiters.values()),
+            'leaders': self._leaders,
+            'coalesced': self._coalesced,
+        }
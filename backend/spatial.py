@@ -0,0 +1,165 @@
+"""
+Weather API Application - Spatial Index
+Grid index over the coordinates of cached locations, so a lat/lon request
+can be answered from a nearby fresh observation
+"""
+
+import math
+import threading
+from typing import Any, Dict, Hashable, List, NamedTuple, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # along a meridian
+
+
+class Coordinates(NamedTuple):
+    """A point requested by latitude/longitude instead of city name"""
+    lat: float
+    lon: float
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class SpatialIndex:
+    """
+    Points bucketed into a fixed grid of latitude/longitude cells
+    
+    Cells are `cell_km` tall and about as many degrees wide, rounded up so
+    a whole number of columns spans 360 degrees; they narrow towards the
+    poles and a search there scans more columns.
+    With the cell size equal to the search radius, a lookup reads 3x3 cells
+    at mid latitudes and measures only the points inside them, which keeps
+    nearest-neighbour queries in the microseconds with hundreds of thousands
+    of points. Longitude wraps around the antimeridian. Beyond `max_points`
+    the oldest added points are dropped.
+    """
+    
+    CELL_KM = 5.0
+    MAX_POINTS = 200000
+    
+    def __init__(self, cell_km: float = CELL_KM, max_points: int = MAX_POINTS):
+        """
+        Initialize SpatialIndex
+        
+        Args:
+            cell_km: Height of a grid cell in kilometres (use the usual search radius)
+            max_points: Points kept before the oldest are dropped
+        """
+        if cell_km <= 0:
+            raise ValueError("Cell size must be positive")
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        # Columns divide 360 degrees exactly, so the first and last are neighbours
+        self.columns = max(int(360 // self.cell_deg), 1)
+        self.column_deg = 360 / self.columns
+        self.max_points = max_points
+        self._cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float]]] = {}
+        self._points: Dict[Hashable, Tuple[int, int]] = {}  # key -> cell, oldest first
+        self._lock = threading.Lock()
+        self._nearby_hits = 0
+        self._misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._points)
+    
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int((lat + 90) // self.cell_deg), int((lon + 180) // self.column_deg) % self.columns
+    
+    def add(self, key: Hashable, lat: float, lon: float) -> None:
+        """
+        Add or move a point
+        
+        Args:
+            key: Point identifier (e.g., a cache location key)
+            lat: Latitude in degrees
+            lon: Longitude in degrees
+        """
+        cell = self._cell(lat, lon)
+        with self._lock:
+            self._remove(key)
+            self._cells.setdefault(cell, {})[key] = (lat, lon)
+            self._points[key] = cell
+            while len(self._points) > self.max_points:
+                self._remove(next(iter(self._points)))
+    
+    def discard(self, key: Hashable) -> None:
+        """Remove a point if present"""
+        with self._lock:
+            self._remove(key)
+    
+    def _remove(self, key: Hashable) -> None:
+        cell = self._points.pop(key, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+    
+    def nearest(self, lat: float, lon: float, radius_km: float, limit: int = 4) -> List[Tuple[Hashable, float]]:
+        """
+        Find the points closest to a location
+        
+        Args:
+            lat: Latitude in degrees
+            lon: Longitude in degrees
+            radius_km: Only return points within this distance
+            limit: Maximum number of points
+        
+        Returns:
+            List of (key, distance in km), nearest first
+        """
+        radius_deg = radius_km / KM_PER_DEGREE
+        row, column = self._cell(lat, lon)
+        rows = math.ceil(radius_deg / self.cell_deg)
+        # A degree of longitude shrinks with cos(latitude); use the band edge nearest the pole
+        edge = min(abs(lat) + radius_deg, 90.0)
+        shrink = math.cos(math.radians(edge))
+        columns = self.columns // 2 if shrink < 1e-9 else min(math.ceil(radius_deg / shrink / self.column_deg), self.columns // 2)
+        
+        # A set, so a search spanning every column near a pole reads each once
+        scanned = {c % self.columns for c in range(column - columns, column + columns + 1)}
+        found = []
+        with self._lock:
+            for r in range(row - rows, row + rows + 1):
+                for c in scanned:
+                    bucket = self._cells.get((r, c))
+                    if bucket:
+                        found.extend(bucket.items())
+        matches = []
+        for key, (point_lat, point_lon) in found:
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                matches.append((key, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches[:limit]
+    
+    def record(self, nearby: bool) -> None:
+        """Count a lookup answered from a nearby point (True) or not"""
+        with self._lock:
+            if nearby:
+                self._nearby_hits += 1
+            else:
+                self._misses += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get index statistics
+        
+        Returns:
+            Dictionary with the point and cell counts and lookup counters
+            (a request can look up twice: body cache, then response cache)
+        """
+        with self._lock:
+            return {
+                'points': len(self._points),
+                'cells': len(self._cells),
+                'cellKm': round(self.cell_deg * KM_PER_DEGREE, 3),
+                'nearbyHits': self._nearby_hits,
+                'misses': self._misses,
+            }
@@ -0,0 +1,140 @@
+"""
+Weather API Application - SQLite Cache Backend
+Host-wide cache shared by every gunicorn worker and surviving restarts
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional
+from backend.cache import CacheBackend, CacheEntry, serialize_value, deserialize_value
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache backend stored in a WAL-mode SQLite file
+    
+    WAL lets readers in every worker proceed while one worker writes. Each
+    thread keeps its own connection. Refresh claims are leases stored in the
+    database, so only one worker on the host refreshes a stale key.
+    """
+    
+    name = 'sqlite'
+    blocking = True
+    BUSY_TIMEOUT = 2.0  # seconds to wait for a competing writer
+    REFRESH_LEASE = 30.0  # seconds a refresh claim is held before others may retry
+    PRUNE_INTERVAL = 60.0  # seconds between sweeps of expired rows
+    
+    def __init__(self, path: str, max_entries: int = 10000):
+        """
+        Initialize SQLiteCache
+        
+        Args:
+            path: Database file path (created if missing)
+            max_entries: Maximum rows kept; the oldest are evicted first
+        """
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._last_prune = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS weather_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' value BLOB NOT NULL,'
+                ' stored_at REAL NOT NULL,'
+                ' fresh_until REAL NOT NULL,'
+                ' stale_until REAL NOT NULL,'
+                ' refresh_until REAL NOT NULL DEFAULT 0'
+                ') WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS weather_cache_stored_at ON weather_cache (stored_at)')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def _load(self, key: Hashable) -> Optional[CacheEntry]:
+        row = self._connect().execute(
+            'SELECT value, stored_at, fresh_until, stale_until FROM weather_cache WHERE key = ?',
+            (self.key_to_str(key),),
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(deserialize_value(row[0]), row[1], row[2], row[3])
+    
+    def _store(self, key: Hashable, entry: CacheEntry) -> None:
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO weather_cache (key, value, stored_at, fresh_until, stale_until) VALUES (?, ?, ?, ?, ?)'
+            ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at,'
+            ' fresh_until = excluded.fresh_until, stale_until = excluded.stale_until, refresh_until = 0',
+            (self.key_to_str(key), serialize_value(entry.value), entry.stored_at, entry.fresh_until, entry.stale_until),
+        )
+        if entry.stored_at - self._last_prune >= self.PRUNE_INTERVAL:
+            self._last_prune = entry.stored_at
+            self._prune(conn, entry.stored_at)
+    
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop rows past their retention, then the oldest rows beyond max_entries"""
+        expired = conn.execute('DELETE FROM weather_cache WHERE stale_until <= ?', (now - self.RETAIN,)).rowcount
+        evicted = conn.execute(
+            'DELETE FROM weather_cache WHERE key IN ('
+            ' SELECT key FROM weather_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        ).rowcount
+        if expired > 0:
+            self._count('_expirations', expired)
+        if evicted > 0:
+            self._count('_evictions', evicted)
+    
+    def delete(self, key: Hashable) -> None:
+        self._connect().execute('DELETE FROM weather_cache WHERE key = ?', (self.key_to_str(key),))
+    
+    def clear(self) -> None:
+        self._connect().execute('DELETE FROM weather_cache')
+    
+    def size(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM weather_cache').fetchone()[0]
+    
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Claim a host-wide refresh lease for a key"""
+        if not super().begin_refresh(key):
+            return False
+        now = time.time()
+        try:
+            claimed = self._connect().execute(
+                'UPDATE weather_cache SET refresh_until = ? WHERE key = ? AND refresh_until < ?',
+                (now + self.REFRESH_LEASE, self.key_to_str(key), now),
+            ).rowcount
+        except sqlite3.Error:
+            self._count('_errors')
+            claimed = 0
+        if claimed != 1:
+            super().end_refresh(key)
+            return False
+        return True
+    
+    def end_refresh(self, key: Hashable) -> None:
+        """Release the refresh lease (a successful store already cleared it)"""
+        super().end_refresh(key)
+        try:
+            self._connect().execute('UPDATE weather_cache SET refresh_until = 0 WHERE key = ?', (self.key_to_str(key),))
+        except sqlite3.Error:
+            self._count('_errors')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['maxEntries'] = self.max_entries
+        stats['path'] = self.path
+        return stats
@@ -0,0 +1,127 @@
+"""
+Weather API Application - Static Files
+Lookup table of frontend assets and their precompressed variants, built once at startup
+"""
+
+import json
+import mimetypes
+import os
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from backend.json_codec import accepted_encodings
+
+MANIFEST_NAME = 'asset-manifest.json'  # written by build.py
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'  # fingerprinted files
+REVALIDATE_CACHE = 'no-cache'  # everything else is revalidated with ETag/Last-Modified
+SERVED_DIRS = ('js', 'css', 'assets')  # directories served recursively
+SERVED_SUFFIXES = frozenset({'.html', '.ico', '.png', '.svg', '.webmanifest'})  # top-level files; no .txt, the root may be the repository
+ENCODED_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))  # in order of preference
+
+
+class StaticFile(NamedTuple):
+    """One servable asset"""
+    path: str  # identity-encoded file on disk
+    mimetype: str
+    cache_control: str
+    variants: Tuple[Tuple[str, str], ...]  # (content coding, file) in order of preference
+    
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, Optional[str]]:
+        """
+        Pick the file to send for an Accept-Encoding header
+        
+        Args:
+            accept_encoding: Header value (may be None or empty)
+        
+        Returns:
+            Tuple of (file path, Content-Encoding or None)
+        """
+        if self.variants:
+            accepted = accepted_encodings(accept_encoding)
+            for coding, path in self.variants:
+                if coding in accepted or '*' in accepted:
+                    return path, coding
+        return self.path, None
+
+
+class StaticFiles:
+    """
+    Frontend assets under a directory, indexed by URL path
+    
+    The directory is walked once; requests are answered with a dictionary
+    lookup instead of probing the filesystem. Only index.html-style top-level
+    files and the js/, css/ and assets/ trees are exposed. Files listed as
+    immutable in build.py's manifest get a one-year immutable Cache-Control.
+    """
+    
+    def __init__(self, root: str):
+        """
+        Initialize StaticFiles
+        
+        Args:
+            root: Directory holding index.html (the repository root or build.py's output)
+        """
+        self.root = os.path.abspath(root)
+        self.manifest = self._read_manifest()
+        immutable = set(self.manifest.get('immutable', ()))
+        self._files: Dict[str, StaticFile] = {}
+        for url_path, path in self._walk():
+            variants = tuple(
+                (coding, path + suffix) for coding, suffix in ENCODED_SUFFIXES if os.path.isfile(path + suffix)
+            )
+            self._files[url_path] = StaticFile(
+                path,
+                mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                IMMUTABLE_CACHE if url_path in immutable else REVALIDATE_CACHE,
+                variants,
+            )
+    
+    def _read_manifest(self) -> Dict:
+        """Load build.py's manifest, or an empty one for an unbuilt tree"""
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _walk(self) -> Iterator[Tuple[str, str]]:
+        """Yield (URL path, file path) for every servable file"""
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if os.path.isfile(path) and not name.startswith('.') and os.path.splitext(name)[1] in SERVED_SUFFIXES:
+                yield name, path
+        for directory in SERVED_DIRS:
+            top = os.path.join(self.root, directory)
+            for dirpath, dirnames, filenames in os.walk(top):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                for name in sorted(filenames):
+                    if name.startswith('.') or name.endswith(('.gz', '.br')):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    yield os.path.relpath(path, self.root).replace(os.sep, '/'), path
+    
+    @property
+    def built(self) -> bool:
+        """True when serving build.py output (a manifest was found)"""
+        return bool(self.manifest)
+    
+    def get(self, url_path: str) -> Optional[StaticFile]:
+        """Return the asset for a URL path (without leading slash), or None"""
+        return self._files.get(url_path)
+    
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+def default_static_root(candidates: Tuple[str, ...] = ('public', '.')) -> str:
+    """
+    Pick the directory to serve: the first one built by build.py, else the last candidate
+    
+    Args:
+        candidates: Directories to check, in order of preference
+    
+    Returns:
+        Directory path
+    """
+    for candidate in candidates:
+        if os.path.isfile(os.path.join(candidate, MANIFEST_NAME)):
+            return candidate
+    return candidates[-1]
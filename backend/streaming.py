@@ -0,0 +1,251 @@
+"""
+Weather API Application - Live Weather Streams
+Server-Sent Events fan-out: one poller per (city, unit) fetches current
+weather through AsyncWeatherService and pushes each change to every
+subscribed connection
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Set, Tuple
+from backend.gazetteer import normalize_city_name
+from backend.json_codec import dumps
+from backend.utils import map_error
+
+
+def encode_event(event: str, data: bytes) -> bytes:
+    """Frame one SSE event (data must be single-line JSON)"""
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + data + b'\n\n'
+
+
+class Subscriber:
+    """
+    One open stream: encoded SSE chunks waiting to be sent
+    
+    A stalled client must not make the hub hold every update. Events are
+    queued under their (city, unit) key and a newer event replaces the one
+    still pending for that city, so at most one per city is kept and the
+    latest always gets through. Of the keep-alive comments only the newest
+    MAX_PENDING are kept. The retry hint and the end of the stream (None)
+    are never dropped.
+    """
+    
+    MAX_PENDING = 16  # keep-alive comments kept for a stalled client
+    RETRY_KEY = 'retry'
+    END_KEY = 'end'
+    
+    __slots__ = ('keys', 'pending', 'dropped', '_comments', '_seq', '_ready')
+    
+    def __init__(self, keys: List[Tuple[str, str]]):
+        self.keys = keys
+        self.pending: 'OrderedDict[Hashable, Optional[bytes]]' = OrderedDict()
+        self.dropped = 0  # superseded events and comments discarded unsent
+        self._comments: Deque[int] = deque()  # pending comment keys, oldest first
+        self._seq = 0
+        self._ready = asyncio.Event()
+    
+    def push(self, chunk: Optional[bytes], key: Optional[Hashable] = None) -> None:
+        """
+        Queue a chunk for the client
+        
+        Args:
+            chunk: Encoded SSE chunk, or None to end the stream
+            key: (city, unit) of an event, replacing a pending event for the
+                same city, or RETRY_KEY; None for a comment
+        """
+        if chunk is None:
+            key = self.END_KEY
+        elif key is None:
+            if len(self._comments) >= self.MAX_PENDING:
+                del self.pending[self._comments.popleft()]
+                self.dropped += 1
+            self._seq += 1
+            key = self._seq
+            self._comments.append(key)
+        elif key in self.pending:
+            self.dropped += 1
+        self.pending[key] = chunk
+        self._ready.set()
+    
+    async def next(self) -> Optional[bytes]:
+        """Wait for the next chunk; None when the stream is over"""
+        while not self.pending:
+            self._ready.clear()
+            await self._ready.wait()
+        key, chunk = self.pending.popitem(last=False)
+        if self._comments and self._comments[0] == key:
+            self._comments.popleft()
+        return chunk
+
+
+class _Poller:
+    """Poll state for one (city, unit), shared by all its subscribers"""
+    
+    __slots__ = ('key', 'city', 'unit', 'subscribers', 'task', 'data', 'event')
+    
+    def __init__(self, key: Tuple[str, str], city: str, unit: str):
+        self.key = key  # (normalized city, unit)
+        self.city = city  # spelling of the first subscriber; later ones share the poll
+        self.unit = unit
+        self.subscribers: Set[Subscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.data: Optional[bytes] = None  # last parsed payload, compared to detect changes
+        self.event: Optional[bytes] = None  # last event, replayed to new subscribers
+
+
+class WeatherStreamHub:
+    """
+    Shares one upstream poll per (city, unit) between all open streams
+    
+    A poller fetches through the service (so it is served from the shared
+    cache, counted by the quota and coalesced with requests), then sleeps
+    until the entry stops being fresh plus a random offset of up to JITTER
+    seconds, so pollers started together drift apart. An event is sent only
+    when the parsed payload, ignoring its parse timestamp, differs from the
+    previous poll. Pollers stop when their last subscriber leaves.
+    
+    Idle connections cost a queue and a parked coroutine; one task sends
+    the keep-alive comment to all of them every `heartbeat` seconds.
+    close() sends a final heartbeat and ends every stream, telling clients
+    to reconnect after RETRY_MS.
+    """
+    
+    HEARTBEAT = 15.0  # seconds between keep-alive comments
+    MIN_INTERVAL = 5.0  # seconds between polls while the entry is stale
+    ERROR_INTERVAL = 30.0  # seconds between polls after an error
+    JITTER = 5.0  # seconds of random delay added to each poll
+    RETRY_MS = 5000  # client reconnect delay sent at the start of each stream
+    MAX_CITIES = 20  # cities per stream
+    
+    def __init__(self, service: Any, heartbeat: Optional[float] = None):
+        """
+        Initialize WeatherStreamHub
+        
+        Args:
+            service: AsyncWeatherService used for the polls
+            heartbeat: Seconds between keep-alive comments
+        """
+        self.service = service
+        self.heartbeat = self.HEARTBEAT if heartbeat is None else heartbeat
+        self._pollers: Dict[Tuple[str, str], _Poller] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._polls = 0
+        self._events = 0
+    
+    @property
+    def closed(self) -> bool:
+        return self._closed
+    
+    def subscribe(self, items: List[Tuple[str, str]]) -> Subscriber:
+        """
+        Open a stream for some cities
+        
+        The retry hint and the latest known event of every city that is
+        already being polled are queued immediately.
+        
+        Args:
+            items: List of (city, unit) tuples
+        
+        Returns:
+            Subscriber to read chunks from; pass it to unsubscribe() when done
+        """
+        cities: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for city, unit in items:
+            cities.setdefault((normalize_city_name(city), unit), (city, unit))
+        subscriber = Subscriber(list(cities))
+        subscriber.push(f'retry: {self.RETRY_MS}\n\n'.encode('ascii'), Subscriber.RETRY_KEY)
+        if self._closed:
+            subscriber.push(None)
+            return subscriber
+        
+        self._subscribers.add(subscriber)
+        for key, (city, unit) in cities.items():
+            poller = self._pollers.get(key)
+            if poller is None:
+                poller = self._pollers[key] = _Poller(key, city, unit)
+                poller.task = asyncio.ensure_future(self._poll(poller))
+            elif poller.event is not None:
+                subscriber.push(poller.event, key)
+            poller.subscribers.add(subscriber)
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.ensure_future(self._beat())
+        return subscriber
+    
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Close a stream, stopping pollers that have no subscribers left"""
+        self._subscribers.discard(subscriber)
+        for key in subscriber.keys:
+            poller = self._pollers.get(key)
+            if poller is None:
+                continue
+            poller.subscribers.discard(subscriber)
+            if not poller.subscribers:
+                del self._pollers[key]
+                poller.task.cancel()
+    
+    def close(self) -> None:
+        """Send a final heartbeat, end every stream and stop all polling"""
+        if self._closed:
+            return
+        self._closed = True
+        for subscriber in self._subscribers:
+            subscriber.push(b': closing\n\n')
+            subscriber.push(None)
+        for poller in self._pollers.values():
+            poller.task.cancel()
+        self._pollers.clear()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+    
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscriber in self._subscribers:
+                subscriber.push(b': ping\n\n')
+    
+    async def _poll(self, poller: _Poller) -> None:
+        while True:
+            self._polls += 1
+            try:
+                result = await self.service.get_current_weather_result(poller.city, poller.unit)
+                # 'timestamp' is the parse time, new on every refetch even when nothing changed
+                data = dumps({k: v for k, v in result.data.items() if k != 'timestamp'})
+                event = 'weather'
+                body = {'city': poller.city, 'unit': poller.unit, 'success': True, 'stale': result.stale, 'data': result.data}
+                delay = max(result.fresh_until - time.time(), self.MIN_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                payload, status_code = map_error(e)
+                data = dumps(payload)
+                event = 'error'
+                body = dict(payload, city=poller.city, unit=poller.unit, status=status_code)
+                delay = max(float(payload.get('retryAfter') or 0), self.ERROR_INTERVAL)
+            
+            if data != poller.data:
+                poller.data = data
+                poller.event = encode_event(event, dumps(body))
+                self._events += 1
+                for subscriber in poller.subscribers:
+                    subscriber.push(poller.event, poller.key)
+            await asyncio.sleep(delay + random.uniform(0, self.JITTER))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get stream statistics
+        
+        Returns:
+            Dictionary with open streams, active pollers, polls, events sent
+            and chunks superseded or dropped for slow clients
+        """
+        return {
+            'streams': len(self._subscribers),
+            'pollers': len(self._pollers),
+            'polls': self._polls,
+            'events': self._events,
+            'dropped': sum(subscriber.dropped for subscriber in self._subscribers),
+        }
@@ -1,10 +1,18 @@
 """
 Weather API Application - Utility Functions
 Helper functions for validation and error handling
+
+Framework-free: Flask is only imported by handle_error, so entry points that
+do not use Flask (api/index.py) never load it.
 """
 
-from flask import jsonify
+from datetime import datetime
+from typing import Any, Optional
+import math
 import re
+from backend.metrics import ERRORS
+from backend.profiling import phase
+from backend.spatial import Coordinates
 
 
 def validate_city(city: str) -> bool:
@@ -17,20 +25,93 @@ def validate_city(city: str) -> bool:
     Returns:
         True if valid, False otherwise
     """
-    if not city or not isinstance(city, str):
-        return False
+    with phase('validate'):
+        if not city or not isinstance(city, str):
+            return False
+        
+        city = city.strip()
+        
+        # Check length
+        if len(city) == 0 or len(city) > 100:
+            return False
+        
+        # Check for valid characters (letters, spaces, hyphens, apostrophes)
+        if not re.match(r"^[a-zA-Z\s\-'\.]+$", city):
+            return False
+        
+        return True
+
+
+def parse_coordinates(lat: Any, lon: Any) -> Optional[Coordinates]:
+    """
+    Validate latitude/longitude query parameters
+    
+    Args:
+        lat: Latitude in degrees (string or number)
+        lon: Longitude in degrees (string or number)
+    
+    Returns:
+        Coordinates, or None if either value is missing or out of range
+    """
+    with phase('validate'):
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return None
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        return Coordinates(lat, lon)
+
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """
+    Parse a point in time given as Unix seconds or ISO 8601
     
-    city = city.strip()
+    Args:
+        value: e.g. '1714557600' or '2024-05-01T12:00' (no offset means local time)
     
-    # Check length
-    if len(city) == 0 or len(city) > 100:
-        return False
+    Returns:
+        Unix seconds, or None if the value is not a valid time
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = datetime.fromisoformat(value).timestamp()
+        except (ValueError, OverflowError, OSError):
+            return None
+    return int(seconds) if math.isfinite(seconds) and abs(seconds) < 2 ** 40 else None
+
+
+def parse_duration(value: Any) -> Optional[int]:
+    """
+    Parse a duration given in seconds or with an s/m/h/d suffix
     
-    # Check for valid characters (letters, spaces, hyphens, apostrophes)
-    if not re.match(r"^[a-zA-Z\s\-'\.]+$", city):
-        return False
+    Args:
+        value: e.g. '900', '15m', '1h' or '1d'
     
-    return True
+    Returns:
+        Whole seconds (at least 0), or None if the value is invalid
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    factor = DURATION_UNITS.get(value[-1:], None)
+    if factor is not None:
+        value = value[:-1]
+    try:
+        seconds = int(value) * (factor or 1)
+    except ValueError:
+        return None
+    return seconds if 0 <= seconds < 2 ** 40 else None
 
 
 def sanitize_input(input_str: str) -> str:
@@ -51,48 +132,238 @@ def sanitize_input(input_str: str) -> str:
     return sanitized
 
 
-def handle_error(error: Exception) -> tuple:
+def classify_error(error: Exception) -> tuple:
     """
-    Handle errors and return appropriate JSON response
+    Classify an exception and build its error payload
     
     Args:
         error: Exception object
-        
+    
     Returns:
-        Tuple of (JSON response, status code)
+        Tuple of (error class, error payload dictionary, status code)
     """
     error_message = str(error)
     
     # Map common error messages
     if 'City not found' in error_message or '404' in error_message:
-        return jsonify({
+        return 'not_found', {
             'success': False,
             'error': 'City not found. Please check the spelling and try again.'
-        }), 404
+        }, 404
     
     elif 'Invalid API key' in error_message or '401' in error_message:
-        return jsonify({
+        return 'invalid_api_key', {
             'success': False,
             'error': 'Invalid API key. Please check your configuration.'
-        }), 401
+        }, 401
+    
+    elif 'temporarily unavailable' in error_message:
+        retry_after = getattr(error, 'retry_after', None)
+        return 'unavailable', {
+            'success': False,
+            'error': 'Weather service temporarily unavailable. Please try again later.',
+            'retryAfter': math.ceil(retry_after) if retry_after is not None else 30
+        }, 503
     
     elif 'Network error' in error_message or 'Connection' in error_message:
-        return jsonify({
+        return 'network', {
             'success': False,
             'error': 'Network error. Please check your internet connection.'
-        }), 503
+        }, 503
+    
+    elif 'quota exhausted' in error_message:
+        retry_after = getattr(error, 'retry_after', None)
+        return 'quota', {
+            'success': False,
+            'error': 'Too many requests. Please try again later.',
+            'retryAfter': math.ceil(retry_after) if retry_after is not None else 60
+        }, 429
+    
+    elif 'history is not enabled' in error_message:
+        return 'history_disabled', {
+            'success': False,
+            'error': 'Weather history is not enabled on this server.'
+        }, 404
     
     elif 'timed out' in error_message.lower():
-        return jsonify({
+        return 'timeout', {
             'success': False,
             'error': 'Request timed out. Please try again.'
-        }), 504
+        }, 504
     
     else:
-        return jsonify({
+        return 'internal', {
             'success': False,
             'error': error_message or 'An unexpected error occurred. Please try again.'
-        }), 500
+        }, 500
+
+
+def map_error(error: Exception) -> tuple:
+    """
+    Map an exception to an error payload without building a response
+    
+    The error class is counted in the weather_errors_total metric.
+    
+    Args:
+        error: Exception object
+    
+    Returns:
+        Tuple of (error payload dictionary, status code)
+    """
+    error_class, payload, status_code = classify_error(error)
+    ERRORS.labels(error_class).inc()
+    return payload, status_code
+
+
+def bundle_response(bundle: dict) -> tuple:
+    """
+    Build the envelope for a current + forecast bundle
+    
+    Args:
+        bundle: Dictionary with 'current' and 'forecast' sections
+    
+    Returns:
+        Tuple of (response payload, status code). The status is 200 when at
+        least one section succeeded, otherwise the current section's error.
+    """
+    success = any(section['success'] for section in bundle.values())
+    status_code = 200 if success else bundle['current'].get('status', 500)
+    payload = {'success': success, 'data': bundle}
+    if not success and 'retryAfter' in bundle['current']:
+        payload['retryAfter'] = bundle['current']['retryAfter']
+    return payload, status_code
+
+
+def result_payload(result: Any) -> dict:
+    """
+    Build the success envelope for a weather result
+    
+    Args:
+        result: WeatherResult from the weather service
+    
+    Returns:
+        {'success': True, 'data': ...}, plus 'stale' and 'cachedAt' when the
+        data is a last-known value served because upstream could not be called
+    """
+    payload = {'success': True, 'data': result.data}
+    if result.stale:
+        payload['stale'] = True
+        payload['cachedAt'] = datetime.fromtimestamp(result.stored_at).isoformat()
+    return payload
+
+
+def error_headers(payload: dict) -> dict:
+    """
+    Extra response headers for an error payload
+    
+    Args:
+        payload: Error payload from map_error or bundle_response
+    
+    Returns:
+        {'Retry-After': seconds} for rate-limited responses, otherwise {}
+    """
+    if 'retryAfter' in payload:
+        return {'Retry-After': str(payload['retryAfter'])}
+    return {}
+
+
+def handle_error(error: Exception) -> tuple:
+    """
+    Handle errors and return appropriate JSON response
+    
+    Args:
+        error: Exception object
+        
+    Returns:
+        Tuple of (JSON response, status code)
+    """
+    from flask import jsonify
+    
+    payload, status_code = map_error(error)
+    response = jsonify(payload)
+    response.headers.update(error_headers(payload))
+    return response, status_code
+
+
+def normalize_unit(unit: str) -> str:
+    """
+    Normalize a unit parameter
+    
+    Args:
+        unit: Requested unit type
+    
+    Returns:
+        'imperial' if requested, otherwise 'metric'
+    """
+    unit = unit.strip().lower() if isinstance(unit, str) else ''
+    return unit if unit in ['metric', 'imperial'] else 'metric'
+
+
+def parse_limit(value: Any, default: int, maximum: int) -> int:
+    """
+    Parse a result-count parameter
+    
+    Args:
+        value: Raw parameter value
+        default: Value used when missing or invalid
+        maximum: Upper bound
+    
+    Returns:
+        Integer between 1 and maximum
+    """
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def parse_batch_items(cities: Any, default_unit: str = 'metric') -> list:
+    """
+    Parse the city list of a batch request
+    
+    Accepts a comma-separated string, a list of city names, or a list of
+    {"city": ..., "unit": ...} objects.
+    
+    Args:
+        cities: Raw cities value from the query string or JSON body
+        default_unit: Unit used for items that do not specify one
+    
+    Returns:
+        List of (city, unit) tuples
+    """
+    if isinstance(cities, str):
+        cities = cities.split(',')
+    if not isinstance(cities, list):
+        return []
+    
+    items = []
+    for item in cities:
+        if isinstance(item, dict):
+            city = item.get('city', '')
+            unit = normalize_unit(item.get('unit', default_unit))
+        else:
+            city = item
+            unit = default_unit
+        city = city.strip() if isinstance(city, str) else ''
+        if city:
+            items.append((city, unit))
+    return items
+
+
+def json_default(value: Any) -> Any:
+    """
+    JSON fallback encoder for values the json module cannot serialize
+    
+    Args:
+        value: Value to encode
+    
+    Returns:
+        ISO 8601 string for datetimes
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
 def format_temperature(temp: float, unit: str = 'metric') -> str:
@@ -152,6 +423,84 @@ def convert_pressure_to_inhg(pressure_hpa: float) -> float:
     return round(pressure_hpa * 0.0295299830714, 2)
 
 
+def convert_temperature(temp_c: float, unit: str = 'metric') -> float:
+    """
+    Convert a temperature from Celsius to the requested unit
+    
+    Args:
+        temp_c: Temperature in degrees Celsius
+        unit: Unit type ('metric' or 'imperial')
+    
+    Returns:
+        Temperature in °C for metric, °F for imperial
+    """
+    if temp_c is None or unit != 'imperial':
+        return temp_c
+    
+    # OpenWeatherMap reports imperial temperatures with two decimals
+    return round(temp_c * 9 / 5 + 32, 2)
+
+
+def convert_wind_speed(speed_ms: float, unit: str = 'metric') -> float:
+    """
+    Convert a wind speed from meters/sec to the requested unit
+    
+    Args:
+        speed_ms: Wind speed in meters per second
+        unit: Unit type ('metric' or 'imperial')
+    
+    Returns:
+        Wind speed in m/s for metric, miles/hour for imperial
+    """
+    if speed_ms is None or unit != 'imperial':
+        return speed_ms
+    
+    # 1 m/s = 3600 / 1609.344 mph = 2.2369362920544 mph
+    return round(speed_ms * 2.2369362920544, 2)
+
+
+def convert_weather_units(data: dict, unit: str) -> dict:
+    """
+    Convert parsed current weather (or a forecast item) from metric
+    
+    Precipitation stays in millimeters, as OpenWeatherMap reports it for
+    every unit system.
+    
+    Args:
+        data: Parsed weather dictionary in metric units (not modified)
+        unit: Target unit type ('metric' or 'imperial')
+    
+    Returns:
+        Copy of data with temperatures and windSpeed converted
+    """
+    converted = dict(data)
+    for key in ('temperature', 'feelsLike', 'tempMin', 'tempMax'):
+        if key in converted:
+            converted[key] = convert_temperature(converted[key], unit)
+    if 'windSpeed' in converted:
+        converted['windSpeed'] = convert_wind_speed(converted['windSpeed'], unit)
+    return converted
+
+
+def convert_forecast_units(days: list, unit: str) -> list:
+    """
+    Convert a parsed forecast from metric
+    
+    Args:
+        days: Parsed forecast days in metric units (not modified)
+        unit: Target unit type ('metric' or 'imperial')
+    
+    Returns:
+        Converted copy of the forecast days and their items
+    """
+    converted = []
+    for day in days:
+        day = convert_weather_units(day, unit)
+        day['items'] = [convert_weather_units(item, unit) for item in day.get('items', [])]
+        converted.append(day)
+    return converted
+
+
 def format_pressure(pressure_hpa: float) -> str:
     """
     Format pressure in inHg
@@ -3,104 +3,733 @@ Weather API Application - Weather Service
 Handles all interactions with OpenWeatherMap API
 """
 
+import contextvars
+import random
 import requests
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from backend.utils import convert_pressure_to_inhg
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Dict, Hashable, List, NamedTuple, Optional, Any, Callable, Iterator, Tuple, Union
+from backend.batching import MISSING, MicroBatcher
+from backend.cache import CacheBackend, CacheEntry, ResponseCache
+from backend.circuit_breaker import CLOSED, CircuitBreaker, CircuitOpenError
+from backend.forecast import parse_forecast
+from backend.gazetteer import City, CityIndex, get_city_index, normalize_city_name
+from backend.history import HistoryStore
+from backend.json_codec import EncodedBody, EncodedBodyCache, encode_body
+from backend.metrics import observe_upstream
+from backend.prewarm import PopularityCounter
+from backend.profiling import phase
+from backend.providers import HedgePolicy, OpenWeatherMapProvider, Provider
+from backend.quota import DEFAULT_RETRY_AFTER, QuotaExceededError, QuotaGovernor
+from backend.singleflight import SingleFlight
+from backend.spatial import Coordinates, SpatialIndex
+from backend.utils import convert_pressure_to_inhg, convert_weather_units, convert_forecast_units, validate_city, map_error, result_payload
 
 
-class WeatherService:
-    """Service class for fetching weather data from OpenWeatherMap API"""
+class CityNotFoundError(Exception):
+    """Raised when OpenWeatherMap (or the authoritative city index) has no such city"""
+    
+    def __init__(self, message: str = "City not found. Please check the spelling and try again."):
+        super().__init__(message)
+
+
+class HistoryDisabledError(Exception):
+    """Raised when history is requested from a service without a history store"""
+    
+    def __init__(self, message: str = "Weather history is not enabled on this server"):
+        super().__init__(message)
+
+
+class WeatherResult(NamedTuple):
+    """Parsed data together with the cache metadata it was served from"""
+    data: Any
+    stored_at: float
+    fresh_until: float
+    stale: bool  # True when served past its stale window because upstream could not be called
+
+
+class WeatherServiceBase:
+    """
+    Shared configuration, cache keys and parsing for the weather services
+    
+    Subclasses provide the HTTP client and the blocking or async fetch path;
+    both produce identical parsed output.
+    """
     
     BASE_URL = 'https://api.openweathermap.org/data/2.5'
-    TIMEOUT = 10  # seconds
+    CONNECT_TIMEOUT = 3.05  # seconds
+    READ_TIMEOUT = 10  # seconds
+    POOL_SIZE = 10  # keep-alive connections kept per host
+    MAX_RETRIES = 2  # retries after the first attempt
+    BACKOFF_BASE = 0.25  # seconds, doubled on each retry
+    BACKOFF_MAX = 4.0  # seconds, also the longest Retry-After we will wait for
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    BATCH_WORKERS = 16  # concurrent upstream fetches for batch requests
+    MAX_BATCH_SIZE = 500
+    CURRENT_TTL = 600  # seconds
+    FORECAST_TTL = 1800  # seconds
+    STALE_TTL = 300  # seconds an expired entry may still be served while refreshing
+    CANONICAL_UNIT = 'metric'  # unit system requested upstream; others are converted locally
+    SUGGEST_LIMIT = 10  # default number of autocomplete suggestions
+    MAX_SUGGEST_LIMIT = 50
+    NEGATIVE_TTL = 3600  # seconds a city name that returned 404 is remembered
+    NOT_FOUND_PREFIX = '/notfound'  # cache key namespace for negative entries
+    FALLBACK_ERRORS = (QuotaExceededError, CircuitOpenError)  # answered with the last cached value
+    GEO_RADIUS_KM = 5.0  # lat/lon requests reuse a fresh entry this close
+    GEO_CANDIDATES = 4  # nearest cached locations checked for a fresh entry
+    GEO_PRECISION = 3  # decimals kept in upstream lat/lon queries (about 110 m)
+    GROUP_ENDPOINT = '/group'  # current weather for several city IDs in one call
+    GROUP_MAX_SIZE = 20  # city IDs OpenWeatherMap accepts per group call
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[CacheBackend] = None,
+                 current_ttl: Optional[float] = None, forecast_ttl: Optional[float] = None,
+                 stale_ttl: Optional[float] = None, pool_size: Optional[int] = None,
+                 max_retries: Optional[int] = None, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, negative_ttl: Optional[float] = None,
+                 city_index: Optional[CityIndex] = None, quota: Optional[QuotaGovernor] = None,
+                 breaker: Optional[CircuitBreaker] = None, bodies: Optional[EncodedBodyCache] = None,
+                 base_url: Optional[str] = None, popularity: Optional[PopularityCounter] = None,
+                 geo_radius_km: Optional[float] = None, places: Optional[SpatialIndex] = None,
+                 history: Optional[HistoryStore] = None, group_window: Optional[float] = None,
+                 group_max_size: Optional[int] = None, secondary: Optional[Provider] = None,
+                 hedge: Optional[HedgePolicy] = None):
         """
-        Initialize WeatherService
+        Initialize the shared service configuration
         
         Args:
             api_key: OpenWeatherMap API key
+            cache: Cache backend (defaults to a new in-process ResponseCache)
+            current_ttl: Seconds current weather stays fresh
+            forecast_ttl: Seconds a forecast stays fresh
+            stale_ttl: Seconds an expired entry is served while one refresh runs
+            pool_size: Maximum keep-alive connections held in the HTTP pool
+            max_retries: Retries for connection resets, 5xx and 429 responses
+            connect_timeout: Seconds to wait for the TCP/TLS connection
+            read_timeout: Seconds to wait for the response once connected
+            negative_ttl: Seconds an unknown city is answered locally (0 disables)
+            city_index: City index (defaults to the shared lazily loaded index)
+            quota: Upstream call budget (defaults to an unlimited governor that
+                still honors upstream 429s)
+            breaker: Circuit breaker guarding upstream calls (defaults to a new
+                CircuitBreaker with its class defaults)
+            bodies: Cache of encoded response bodies (defaults to a new
+                in-process EncodedBodyCache)
+            base_url: Upstream API root (defaults to BASE_URL; point it at a
+                stand-in server for load tests)
+            popularity: Request counter fed by every weather lookup, read by
+                a Prewarmer (None disables tracking)
+            geo_radius_km: Distance within which a lat/lon request is served
+                from another location's fresh entry (0 disables reuse)
+            places: Spatial index of cached locations (defaults to a new
+                SpatialIndex with cells of geo_radius_km)
+            history: Store every fetched observation and forecast is
+                appended to (None disables history)
+            group_window: Seconds a current-weather miss for a city ID waits
+                for others to share a group call (0 or None disables)
+            group_max_size: City IDs per group call (at most GROUP_MAX_SIZE)
+            secondary: Provider raced against OpenWeatherMap when a call is
+                slow and called when it fails (None disables both)
+            hedge: When to send hedged calls to the secondary (defaults to
+                a new HedgePolicy)
         """
         if not api_key:
             raise ValueError("API key is required")
         self.api_key = api_key
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        self.cache = cache if cache is not None else ResponseCache()
+        self.ttls = {
+            '/weather': self.CURRENT_TTL if current_ttl is None else current_ttl,
+            '/forecast': self.FORECAST_TTL if forecast_ttl is None else forecast_ttl,
+        }
+        self.stale_ttl = self.STALE_TTL if stale_ttl is None else stale_ttl
+        self.negative_ttl = self.NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        self._city_index = city_index
+        self.quota = quota if quota is not None else QuotaGovernor()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.primary = OpenWeatherMapProvider(self.base_url, api_key, self.breaker)
+        self.secondary = secondary
+        self.hedge = hedge if hedge is not None else HedgePolicy()
+        self.bodies = bodies if bodies is not None else EncodedBodyCache()
+        self.popularity = popularity
+        self.geo_radius_km = self.GEO_RADIUS_KM if geo_radius_km is None else geo_radius_km
+        self.places = places if places is not None else SpatialIndex(self.geo_radius_km or SpatialIndex.CELL_KM)
+        self.history = history
+        self.group_window = group_window or 0.0
+        self.group_max_size = self.GROUP_MAX_SIZE if group_max_size is None else group_max_size
+        if not 1 <= self.group_max_size <= self.GROUP_MAX_SIZE:
+            raise ValueError(f"Group size must be between 1 and {self.GROUP_MAX_SIZE}")
+        self._parsers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            '/weather': self._parse_current_weather,
+            '/forecast': self._parse_forecast,
+        }
+        self.pool_size = self.POOL_SIZE if pool_size is None else pool_size
+        self.max_retries = self.MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = (
+            self.CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+            self.READ_TIMEOUT if read_timeout is None else read_timeout,
+        )
     
-    def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    def _record_attempt(self, endpoint: str, started: float, status_code: Optional[int] = None,
+                        provider: Optional[Provider] = None) -> None:
         """
-        Make HTTP request to OpenWeatherMap API
+        Report one upstream attempt to the circuit breaker and the latency metrics
         
         Args:
-            endpoint: API endpoint (e.g., '/weather', '/forecast')
-            params: Query parameters
-            
+            endpoint: API endpoint (e.g., '/weather')
+            started: time.monotonic() when the attempt began
+            status_code: Response status, or None if no response arrived
+            provider: Provider called (defaults to the primary)
+        """
+        provider = provider or self.primary
+        elapsed = time.monotonic() - started
+        failed = status_code is None or status_code >= 500
+        provider.breaker.record(elapsed, failed=failed)
+        if not failed:
+            provider.observe(endpoint, elapsed)
+        observe_upstream(provider.name, endpoint, status_code, elapsed)
+    
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Compute how long to wait before the next retry
+        
+        Uses full-jitter exponential backoff, or the server's Retry-After
+        header when present.
+        
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            retry_after: Retry-After header of the failed response, if any
+        
         Returns:
-            JSON response as dictionary
-            
-        Raises:
-            Exception: If request fails
+            Delay in seconds, or None if the server asked us to wait longer
+            than BACKOFF_MAX
+        """
+        delay = self._parse_retry_after(retry_after)
+        if delay is not None:
+            return delay if delay <= self.BACKOFF_MAX else None
+        
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * (2 ** attempt)))
+    
+    @staticmethod
+    def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
         """
-        url = f"{self.BASE_URL}{endpoint}"
-        params['appid'] = self.api_key
+        Parse a Retry-After header (delta-seconds or HTTP date)
         
+        Args:
+            retry_after: Header value, if any
+        
+        Returns:
+            Non-negative delay in seconds, or None if missing or malformed
+        """
+        if not retry_after:
+            return None
         try:
-            response = requests.get(url, params=params, timeout=self.TIMEOUT)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.Timeout:
-            raise Exception("Request timed out. Please try again.")
-        except requests.exceptions.ConnectionError:
-            raise Exception("Network error. Please check your internet connection.")
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                raise Exception("City not found. Please check the spelling and try again.")
-            elif e.response.status_code == 401:
-                raise Exception("Invalid API key. Please check your configuration.")
-            else:
-                error_data = e.response.json() if e.response.content else {}
-                raise Exception(error_data.get('message', 'Unable to fetch weather data. Please try again later.'))
-        except Exception as e:
-            raise Exception(f"An unexpected error occurred: {str(e)}")
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return max(delay, 0.0)
     
-    def get_current_weather(self, city: str, unit: str = 'metric') -> Dict[str, Any]:
+    def _admit(self, provider: Optional[Provider] = None) -> None:
         """
-        Get current weather for a city
+        Pass the provider's circuit breaker and take a call from the budget
         
         Args:
-            city: City name
-            unit: Unit type ('metric' or 'imperial')
+            provider: Provider about to be called (defaults to the primary);
+                only metered providers are charged to the budget
+        
+        Raises:
+            CircuitOpenError: If the breaker is rejecting calls
+            QuotaExceededError: If the call budget is exhausted
+        """
+        provider = provider or self.primary
+        provider.breaker.before_call()
+        if not provider.metered:
+            return
+        try:
+            self.quota.acquire()
+        except QuotaExceededError:
+            provider.breaker.release()
+            raise
+    
+    def _rate_limited(self, retry_after: Optional[str], provider: Optional[Provider] = None) -> QuotaExceededError:
+        """
+        Pause upstream calls after a 429 that survived our retries
+        
+        Args:
+            retry_after: Retry-After header of the 429 response
+            provider: Provider that answered (defaults to the primary); the
+                budget is only paused for metered providers
+        
+        Returns:
+            Exception to raise for the current request
+        """
+        delay = self._parse_retry_after(retry_after)
+        delay = DEFAULT_RETRY_AFTER if delay is None else delay
+        if (provider or self.primary).metered:
+            self.quota.block(delay)
+        return QuotaExceededError(delay)
+    
+    def _http_error(self, status_code: int, error_data: Dict[str, Any]) -> Exception:
+        """
+        Build the exception raised for a failed upstream response
+        
+        Args:
+            status_code: HTTP status code returned by OpenWeatherMap
+            error_data: Decoded error body (may be empty)
             
         Returns:
-            Parsed weather data dictionary
+            Exception with a user-facing message
+        """
+        if status_code == 404:
+            return CityNotFoundError()
+        elif status_code == 401:
+            return Exception("Invalid API key. Please check your configuration.")
+        else:
+            return Exception(error_data.get('message', 'Unable to fetch weather data. Please try again later.'))
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get response cache counters
+        
+        Returns:
+            Dictionary of cache hit/miss/eviction counters
+        """
+        return self.cache.get_stats()
+    
+    def get_body_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get encoded response body cache counters
+        
+        Returns:
+            Dictionary with size, hits, misses and the active JSON encoder
+        """
+        return self.bodies.get_stats()
+    
+    def get_quota_stats(self) -> Dict[str, Any]:
+        """
+        Get upstream budget usage
+        
+        Returns:
+            Dictionary with limits, remaining calls and throttling counters
+        """
+        return self.quota.get_stats()
+    
+    def get_circuit_stats(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker state
+        
+        Returns:
+            Dictionary with breaker state, recent failure/slow rates and counters
+        """
+        return self.breaker.get_stats()
+    
+    def is_degraded(self) -> bool:
+        """Return True while the circuit breaker is not closed"""
+        return self.breaker.state != CLOSED
+    
+    def get_geo_stats(self) -> Dict[str, Any]:
+        """
+        Get spatial index statistics
+        
+        Returns:
+            Dictionary with indexed locations and nearby-reuse counters
+        """
+        return dict(self.places.get_stats(), radiusKm=self.geo_radius_km)
+    
+    def get_grouping_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get micro-batching statistics
+        
+        Returns:
+            Dictionary with batch counters and sizes, or None when group
+            calls are disabled
         """
-        params = {
-            'q': city,
-            'units': unit,
-            'lang': 'en'
+        return None if self._grouper is None else self._grouper.get_stats()
+    
+    def get_provider_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get upstream provider and hedging statistics
+        
+        Returns:
+            Dictionary with 'primary', 'secondary' and 'hedging', or None
+            without a secondary provider
+        """
+        if self.secondary is None:
+            return None
+        return {
+            'primary': self.primary.get_stats(),
+            'secondary': self.secondary.get_stats(),
+            'hedging': self.hedge.get_stats(),
         }
+    
+    def get_coalescing_stats(self) -> Dict[str, int]:
+        """
+        Get single-flight counters
         
-        data = self._make_request('/weather', params)
-        return self._parse_current_weather(data)
+        Returns:
+            Dictionary with in-flight fetches and coalesced waiter counts
+        """
+        return self._flight.get_stats()
+    
+    @property
+    def city_index(self) -> CityIndex:
+        """City index used to resolve names, loaded on first use"""
+        if self._city_index is None:
+            self._city_index = get_city_index()
+        return self._city_index
     
-    def get_forecast(self, city: str, unit: str = 'metric') -> List[Dict[str, Any]]:
+    def suggest_cities(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        Get 5-day forecast for a city
+        Autocomplete city names from the local index
+        
+        Args:
+            prefix: Name prefix as typed
+            limit: Maximum number of suggestions
+        
+        Returns:
+            List of city dictionaries with id, name, country and coord
+        """
+        return [city.to_dict() for city in self.city_index.suggest(prefix, limit)]
+    
+    def _resolve_city(self, city: Union[str, Coordinates], endpoint: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Map a city name or coordinates to its canonical upstream lookup
+        
+        Names in the index are queried by OpenWeatherMap city ID, so every
+        spelling of a known city shares one cache entry. Other names are
+        queried by their normalized text. Coordinates are resolved by
+        _resolve_coordinates.
+        
+        Args:
+            city: City name, or Coordinates
+            endpoint: Endpoint being served, for nearby reuse of coordinates
+        
+        Returns:
+            Tuple of (location key used in cache keys, query parameters)
+        
+        Raises:
+            CityNotFoundError: If the index is authoritative and has no match
+        """
+        if isinstance(city, Coordinates):
+            return self._resolve_coordinates(city, endpoint)
+        match = self.city_index.lookup(city)
+        if match is not None:
+            return f'id:{match.id}', {'id': match.id}
+        if self.city_index.authoritative:
+            raise CityNotFoundError()
+        return f'q:{normalize_city_name(city)}', {'q': city}
+    
+    def _resolve_coordinates(self, point: Coordinates, endpoint: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Map coordinates to a location key
+        
+        The nearest indexed location within geo_radius_km that has a fresh
+        entry for the endpoint is reused, so GPS fixes a few metres apart
+        (or a point inside a cached city) need no upstream call. Otherwise
+        the point is rounded to GEO_PRECISION decimals and queried by lat/lon.
         
         Args:
-            city: City name
+            point: Requested coordinates
+            endpoint: Endpoint being served (None skips nearby reuse)
+        
+        Returns:
+            Tuple of (location key used in cache keys, query parameters)
+        """
+        if endpoint is not None and self.geo_radius_km > 0:
+            now = time.time()
+            for location, _ in self.places.nearest(point.lat, point.lon, self.geo_radius_km, self.GEO_CANDIDATES):
+                entry = self.cache.peek((endpoint, location))
+                if entry is not None and entry.is_fresh(now):
+                    self.places.record(True)
+                    return location, self._location_query(location)
+            self.places.record(False)
+        lat, lon = round(point.lat, self.GEO_PRECISION), round(point.lon, self.GEO_PRECISION)
+        return f'geo:{lat},{lon}', {'lat': lat, 'lon': lon}
+    
+    @staticmethod
+    def _location_query(location: str) -> Dict[str, Any]:
+        """Rebuild the upstream query parameters of a location key"""
+        kind, _, value = location.partition(':')
+        if kind == 'id':
+            return {'id': int(value)}
+        if kind == 'geo':
+            lat, lon = value.split(',')
+            return {'lat': float(lat), 'lon': float(lon)}
+        return {'q': value}
+    
+    def _index_location(self, location: str, endpoint: str, value: Any, query: Dict[str, Any]) -> None:
+        """Add a freshly stored location to the spatial index"""
+        if 'lat' in query:
+            self.places.add(location, query['lat'], query['lon'])
+        elif endpoint == '/weather' and value.get('coord'):
+            self.places.add(location, value['coord']['lat'], value['coord']['lon'])
+    
+    def _record_history(self, location: str, endpoint: str, value: Any, stored_at: float) -> None:
+        """Append a freshly fetched observation or forecast to the history store"""
+        if self.history is None:
+            return
+        if endpoint == '/weather':
+            # The payload's own timestamp is the parse time; stored_at is the same moment
+            self.history.append('observed', location, [
+                (stored_at, value['temperature'], value['humidity'], value['pressure'], value['windSpeed'])
+            ])
+        else:
+            self.history.append('forecast', location, [
+                (datetime.fromisoformat(item['time']).timestamp(), item['temperature'],
+                 item['humidity'], item['pressure'], item['windSpeed'])
+                for day in value for item in day['items']
+            ])
+    
+    def get_history(self, city: Union[str, Coordinates], start: int, end: int, step: int = 0,
+                    unit: str = 'metric', series: str = 'observed') -> Dict[str, Any]:
+        """
+        Read a city's recorded observations or forecasts
+        
+        Args:
+            city: City name, or Coordinates
+            start: First time included (Unix seconds)
+            end: Last time included (Unix seconds)
+            step: Seconds per averaged point (0 returns the samples as recorded)
             unit: Unit type ('metric' or 'imperial')
-            
+            series: 'observed' (fetched current weather) or 'forecast'
+                (the latest forecast for each 3-hour slot)
+        
         Returns:
-            List of forecast data dictionaries
+            Dictionary with the series, range, step used and points, each
+            with 'time', temperature, humidity, pressure and windSpeed
+        
+        Raises:
+            HistoryDisabledError: If the service has no history store
+            CityNotFoundError: If the index is authoritative and has no match
         """
-        params = {
-            'q': city,
-            'units': unit,
-            'lang': 'en'
+        if self.history is None:
+            raise HistoryDisabledError()
+        location, _ = self._resolve_city(city)
+        step, points = self.history.query(series, location, start, end, step)
+        return {
+            'series': series,
+            'from': start,
+            'to': end,
+            'step': step,
+            'points': [convert_weather_units(point, unit) for point in points],
         }
+    
+    def get_history_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Get history store statistics
+        
+        Returns:
+            Dictionary of store counters, or None when history is disabled
+        """
+        return None if self.history is None else self.history.get_stats()
+    
+    def _groupable(self, endpoint: str, query: Dict[str, Any]) -> bool:
+        """Return True for a lookup the group collector can serve"""
+        return self._grouper is not None and endpoint == '/weather' and 'id' in query
+    
+    def _group_params(self, ids: List[int]) -> Dict[str, Any]:
+        """Build upstream query parameters for a group call"""
+        return self._request_params({'id': ','.join(str(city_id) for city_id in ids)})
+    
+    def _split_group(self, data: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """Parse a group response into current weather per city ID"""
+        return {item.get('id'): self._parse_current_weather(item) for item in data.get('list') or ()}
+    
+    def _alternate(self, endpoint: str, query: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Optional[City]]]:
+        """
+        Build the secondary provider's request for a lookup
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            query: City selector from _resolve_city
+        
+        Returns:
+            Tuple of (query parameters, place), or None when there is no
+            secondary or it cannot answer the lookup
+        """
+        if self.secondary is None:
+            return None
+        place = None
+        if self.secondary.needs_place:
+            if 'id' in query:
+                place = self.city_index.get(query['id'])
+            elif 'lat' in query:
+                place = City(0, '', '', query['lat'], query['lon'])
+        params = self.secondary.params(endpoint, query, place)
+        return None if params is None else (params, place)
+    
+    def _check_not_found(self, location: str) -> None:
+        """Raise CityNotFoundError if upstream recently returned 404 for a location"""
+        if not location.startswith('q:'):
+            return
+        # peek() keeps the check out of the hit/miss counters, which describe weather lookups
+        entry = self.cache.peek((self.NOT_FOUND_PREFIX, location))
+        if entry is not None and entry.is_fresh():
+            raise CityNotFoundError()
+    
+    def _remember_not_found(self, location: str) -> None:
+        """Cache a 404 for a location so repeat lookups skip the network"""
+        if self.negative_ttl > 0:
+            self.cache.set((self.NOT_FOUND_PREFIX, location), True, self.negative_ttl)
+    
+    def _fallback(self, key: Tuple[str, str], error: Exception) -> WeatherResult:
+        """
+        Answer with the last cached value when the upstream cannot be called
+        
+        Args:
+            key: Cache key of the request
+            error: The upstream error (re-raised when nothing is cached)
+        
+        Returns:
+            The retained entry, marked stale
+        """
+        entry = self.cache.peek(key)
+        if entry is None:
+            raise error
+        if isinstance(error, CircuitOpenError):
+            self.breaker.record_fallback()
+        else:
+            self.quota.record_fallback()
+        return WeatherResult(entry.value, entry.stored_at, entry.fresh_until, True)
+    
+    def _record_demand(self, endpoint: str, city: Union[str, Coordinates], unit: str) -> None:
+        """Count a lookup for the prewarmer, if popularity tracking is on"""
+        if self.popularity is None:
+            return
+        if isinstance(city, Coordinates):
+            # About 1 km, so nearby GPS fixes count as one place
+            place = Coordinates(round(city.lat, 2), round(city.lon, 2))
+        else:
+            place = normalize_city_name(city)
+        self.popularity.record((endpoint, place, unit))
+    
+    def _convert_result(self, endpoint: str, result: WeatherResult, unit: str) -> WeatherResult:
+        """Convert a result's data to the requested unit system"""
+        return result._replace(data=self._convert_units(endpoint, result.data, unit))
+    
+    def _cached_body(self, endpoint: str, city: Union[str, Coordinates], unit: str,
+                     encoding: Optional[str]) -> Tuple[Hashable, Optional[EncodedBody]]:
+        """
+        Look up the encoded response body for a request
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            city: City name, or Coordinates
+            unit: Unit type
+            encoding: Negotiated content coding, or None for identity
+        
+        Returns:
+            Tuple of (body cache key, still-fresh body or None)
+        """
+        with phase('cache'):
+            location, _ = self._resolve_city(city, endpoint)
+            key = (endpoint, location, unit, encoding)
+            return key, self.bodies.get(key, time.time())
+    
+    def _encode_result(self, key: Hashable, result: WeatherResult, encoding: Optional[str]) -> EncodedBody:
+        """
+        Encode a result's success envelope, or reuse the bytes encoded from the same data
+        
+        Stale-while-revalidate and fallback bodies are matched on the fetch
+        time of the data they were built from, so they are encoded once per
+        stale entry (If-None-Match revalidations then cost no serialization)
+        and a refreshed entry is picked up as soon as it lands.
+        
+        Args:
+            key: Body cache key from _cached_body
+            result: Result in the requested unit system
+            encoding: Negotiated content coding, or None for identity
+        
+        Returns:
+            EncodedBody
+        """
+        body = self.bodies.reuse(key, result.stored_at, result.stale)
+        if body is None:
+            body = encode_body(result_payload(result), encoding, result.stored_at, result.fresh_until,
+                               result.stale, self.stale_ttl)
+            self.bodies.put(key, body)
+        return body
+    
+    def _request_params(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build OpenWeatherMap query parameters for a city lookup
+        
+        Args:
+            query: City selector from _resolve_city ('id' or 'q')
+        
+        Returns:
+            Query parameters (without the API key), always in CANONICAL_UNIT
+        """
+        return self.primary.params('/weather', query)
+    
+    def _convert_units(self, endpoint: str, value: Any, unit: str) -> Any:
+        """
+        Convert canonical parsed data to the requested unit system
+        
+        Args:
+            endpoint: API endpoint the data came from
+            value: Parsed data in CANONICAL_UNIT (never mutated)
+            unit: Requested unit type ('metric' or 'imperial')
+        
+        Returns:
+            The cached value itself for the canonical unit, otherwise a
+            converted copy
+        """
+        if unit == self.CANONICAL_UNIT:
+            return value
+        if endpoint == '/forecast':
+            return convert_forecast_units(value, unit)
+        return convert_weather_units(value, unit)
+    
+    @staticmethod
+    def _batch_result(index: int, city: str, unit: str, result: Optional[WeatherResult] = None,
+                      error: Optional[Exception] = None) -> Dict[str, Any]:
+        """
+        Build one row of a batch response
+        
+        Args:
+            index: Position of the city in the request
+            city: City name as requested
+            unit: Unit type
+            result: Weather result on success
+            error: Exception on failure (ValueError marks invalid input)
+        
+        Returns:
+            Row dictionary with 'success' and either 'data' or 'error'/'status'
+        """
+        row = {'index': index, 'city': city, 'unit': unit}
+        if error is None:
+            row.update(result_payload(result))
+        elif isinstance(error, ValueError):
+            row.update({'success': False, 'error': str(error), 'status': 400})
+        else:
+            payload, status_code = map_error(error)
+            row.update(payload)
+            row['status'] = status_code
+        return row
+    
+    @staticmethod
+    def _section_result(result: Optional[WeatherResult] = None, error: Optional[Exception] = None) -> Dict[str, Any]:
+        """
+        Build one section of a bundle response
         
-        data = self._make_request('/forecast', params)
-        return self._parse_forecast(data)
+        Args:
+            result: Weather result on success
+            error: Exception on failure
+        
+        Returns:
+            {'success': True, 'data': ...} or the mapped error with its 'status'
+        """
+        if error is None:
+            return result_payload(result)
+        payload, status_code = map_error(error)
+        return dict(payload, status=status_code)
     
     def _parse_current_weather(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -142,56 +771,539 @@ class WeatherService:
             data: Raw API response
             
         Returns:
-            List of parsed forecast data
+            List of daily forecasts with mean/min/max temperature,
+            precipitation, dominant condition and 3-hour items
+        """
+        return parse_forecast(data)
+
+
+class WeatherService(WeatherServiceBase):
+    """Service class for fetching weather data from OpenWeatherMap API"""
+    
+    HEDGE_WORKERS = 64  # threads running upstream calls that may be hedged
+    
+    def __init__(self, api_key: str, cache: Optional[CacheBackend] = None,
+                 session: Optional[requests.Session] = None, **options: Any):
+        """
+        Initialize WeatherService
+        
+        Args:
+            api_key: OpenWeatherMap API key
+            cache: Cache backend (defaults to a new in-process ResponseCache)
+            session: Pre-configured requests session (defaults to a pooled session)
+            **options: TTL, pool, retry and timeout settings (see WeatherServiceBase)
+        """
+        super().__init__(api_key, cache, **options)
+        self._flight = SingleFlight()
+        self._grouper = MicroBatcher(self._fetch_group, self.group_window, self.group_max_size) if self.group_window > 0 else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.session = session if session is not None else self._create_session(self.pool_size)
+    
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """
+        Create a keep-alive session backed by a bounded connection pool
+        
+        The underlying urllib3 pool is thread-safe, so a single session is
+        shared by every worker thread. Retries are handled in _make_request.
+        
+        Args:
+            pool_size: Maximum connections kept open per host
+        
+        Returns:
+            Configured requests session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def close(self) -> None:
+        """Close pooled upstream connections and the worker pools"""
+        for executor in (self._executor, self._hedge_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+    
+    def _make_request(self, endpoint: str, params: Dict[str, Any], provider: Optional[Provider] = None,
+                      cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
-        if not data.get('list') or not isinstance(data.get('list'), list):
-            return []
+        Make HTTP request to OpenWeatherMap API (or another provider)
         
-        # Group forecasts by date
-        forecasts_by_date = {}
+        Uses the pooled keep-alive session and retries connection errors,
+        5xx and 429 responses with jittered exponential backoff. Every
+        attempt must pass the provider's circuit breaker, is charged to the
+        quota governor (metered providers only) and reports its outcome and
+        latency to the breaker and metrics.
         
-        for item in data['list']:
-            date = datetime.fromtimestamp(item.get('dt', 0))
-            date_key = date.date().isoformat()
-            
-            if date_key not in forecasts_by_date:
-                forecasts_by_date[date_key] = {
-                    'date': date.isoformat(),
-                    'items': [],
-                }
-            
-            forecasts_by_date[date_key]['items'].append({
-                'time': date.isoformat(),
-                'temperature': item.get('main', {}).get('temp'),
-                'feelsLike': item.get('main', {}).get('feels_like'),
-                'humidity': item.get('main', {}).get('humidity'),
-                'pressure': convert_pressure_to_inhg(item.get('main', {}).get('pressure')),
-                'windSpeed': item.get('wind', {}).get('speed'),
-                'description': item.get('weather', [{}])[0].get('description', ''),
-                'icon': item.get('weather', [{}])[0].get('icon', '01d'),
-                'main': item.get('weather', [{}])[0].get('main', ''),
-            })
-        
-        # Convert to array and get daily averages
-        forecast_array = []
-        for date_key, day_data in list(forecasts_by_date.items())[:5]:  # Limit to 5 days
-            items = day_data['items']
-            temps = [item['temperature'] for item in items if item.get('temperature') is not None]
-            avg_temp = sum(temps) / len(temps) if temps else None
+        Args:
+            endpoint: API endpoint (e.g., '/weather', '/forecast')
+            params: Query parameters
+            provider: Provider to call (defaults to the primary)
+            cancel: Event set once the answer is no longer needed; no
+                further attempt starts after it is set
+        
+        Returns:
+            JSON response as dictionary
+        
+        Raises:
+            QuotaExceededError: If the call budget is exhausted or upstream
+                kept answering 429
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            CancelledError: If `cancel` was set before an attempt
+            Exception: If request fails
+        """
+        provider = provider or self.primary
+        url = provider.url(endpoint)
+        provider.authorize(params)
+        
+        try:
+            for attempt in range(self.max_retries + 1):
+                if cancel is not None and cancel.is_set():
+                    raise CancelledError()
+                retries_left = attempt < self.max_retries
+                self._admit(provider)
+                started = time.monotonic()
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                except requests.exceptions.ConnectionError:
+                    self._record_attempt(endpoint, started, provider=provider)
+                    # GETs are idempotent, so connection resets and connect
+                    # timeouts are always safe to retry.
+                    if not retries_left:
+                        raise
+                    time.sleep(self._backoff_delay(attempt))
+                    continue
+                except requests.exceptions.RequestException:
+                    self._record_attempt(endpoint, started, provider=provider)
+                    raise
+                self._record_attempt(endpoint, started, response.status_code, provider)
+                
+                if response.status_code in self.RETRY_STATUSES and retries_left:
+                    delay = self._backoff_delay(attempt, response.headers.get('Retry-After'))
+                    if delay is not None:
+                        response.close()
+                        time.sleep(delay)
+                        continue
+                
+                if response.status_code == 429:
+                    raise self._rate_limited(response.headers.get('Retry-After'), provider)
+                response.raise_for_status()
+                with phase('decode'):
+                    return response.json()
+        except requests.exceptions.Timeout:
+            raise Exception("Request timed out. Please try again.")
+        except requests.exceptions.ConnectionError:
+            raise Exception("Network error. Please check your internet connection.")
+        except requests.exceptions.HTTPError as e:
+            error_data = e.response.json() if e.response.content else {}
+            raise self._http_error(e.response.status_code, error_data)
+        except (QuotaExceededError, CircuitOpenError, CancelledError):
+            raise
+        except Exception as e:
+            raise Exception(f"An unexpected error occurred: {str(e)}")
+    
+    def get_current_weather(self, city: Union[str, Coordinates], unit: str = 'metric') -> Dict[str, Any]:
+        """
+        Get current weather for a city
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            Parsed weather data dictionary
+        """
+        return self.get_current_weather_result(city, unit).data
+    
+    def get_current_weather_result(self, city: Union[str, Coordinates], unit: str = 'metric') -> WeatherResult:
+        """
+        Get current weather for a city with its cache metadata
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            WeatherResult whose data is the parsed weather dictionary
+        """
+        self._record_demand('/weather', city, unit)
+        return self._convert_result('/weather', self._get_result('/weather', city), unit)
+    
+    def get_current_weather_body(self, city: Union[str, Coordinates], unit: str = 'metric', encoding: Optional[str] = None) -> EncodedBody:
+        """
+        Get the encoded success response for current weather
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+            encoding: Content coding from negotiate_encoding (None for identity)
+        
+        Returns:
+            EncodedBody, reused without re-serializing while the data is fresh
+        """
+        key, body = self._cached_body('/weather', city, unit, encoding)
+        if body is not None:
+            self._record_demand('/weather', city, unit)
+            return body
+        return self._encode_result(key, self.get_current_weather_result(city, unit), encoding)
+    
+    def get_forecast(self, city: Union[str, Coordinates], unit: str = 'metric') -> List[Dict[str, Any]]:
+        """
+        Get 5-day forecast for a city
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            List of forecast data dictionaries
+        """
+        return self.get_forecast_result(city, unit).data
+    
+    def get_forecast_result(self, city: Union[str, Coordinates], unit: str = 'metric') -> WeatherResult:
+        """
+        Get 5-day forecast for a city with its cache metadata
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            WeatherResult whose data is the list of forecast days
+        """
+        self._record_demand('/forecast', city, unit)
+        return self._convert_result('/forecast', self._get_result('/forecast', city), unit)
+    
+    def get_forecast_body(self, city: Union[str, Coordinates], unit: str = 'metric', encoding: Optional[str] = None) -> EncodedBody:
+        """
+        Get the encoded success response for a 5-day forecast
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+            encoding: Content coding from negotiate_encoding (None for identity)
+        
+        Returns:
+            EncodedBody, reused without re-serializing while the data is fresh
+        """
+        key, body = self._cached_body('/forecast', city, unit, encoding)
+        if body is not None:
+            self._record_demand('/forecast', city, unit)
+            return body
+        return self._encode_result(key, self.get_forecast_result(city, unit), encoding)
+    
+    def get_bundle(self, city: Union[str, Coordinates], unit: str = 'metric') -> Dict[str, Dict[str, Any]]:
+        """
+        Get current weather and forecast for a city concurrently
+        
+        The forecast runs on the batch worker pool while current weather is
+        fetched on the calling thread, so latency is about the slower of the
+        two. A failure in one section does not discard the other.
+        
+        Args:
+            city: City name, or Coordinates
+            unit: Unit type ('metric' or 'imperial')
+        
+        Returns:
+            Dictionary with 'current' and 'forecast' sections
+        """
+        # The copied context carries the request's profile (if any) to the worker
+        forecast_future = self._get_executor().submit(contextvars.copy_context().run, self.get_forecast_result, city, unit)
+        try:
+            current = self._section_result(result=self.get_current_weather_result(city, unit))
+        except Exception as e:
+            current = self._section_result(error=e)
+        try:
+            forecast = self._section_result(result=forecast_future.result())
+        except Exception as e:
+            forecast = self._section_result(error=e)
+        return {'current': current, 'forecast': forecast}
+    
+    def iter_current_weather(self, items: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+        """
+        Fetch current weather for many cities concurrently
+        
+        Results are yielded in completion order, so fast (or cached) cities
+        are available before the slowest upstream call finishes.
+        
+        Args:
+            items: List of (city, unit) tuples
+        
+        Yields:
+            Result dictionaries with 'index', 'city', 'unit', 'success' and
+            either 'data' or 'error'/'status'
+        """
+        futures = {}
+        executor = self._get_executor()
+        try:
+            for index, (city, unit) in enumerate(items):
+                if not validate_city(city):
+                    yield self._batch_result(index, city, unit, error=ValueError('Invalid city name'))
+                    continue
+                futures[executor.submit(self.get_current_weather_result, city, unit)] = (index, city, unit)
             
-            # Get most common weather condition for the day
-            main_weather = items[0].get('main', '') if items else ''
-            icon = items[0].get('icon', '01d') if items else '01d'
-            description = items[0].get('description', '') if items else ''
+            for future in as_completed(futures):
+                index, city, unit = futures[future]
+                try:
+                    yield self._batch_result(index, city, unit, result=future.result())
+                except Exception as e:
+                    yield self._batch_result(index, city, unit, error=e)
+        finally:
+            # Stop queued work if the consumer went away early
+            for future in futures:
+                future.cancel()
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Return the shared batch worker pool, creating it on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.BATCH_WORKERS,
+                        thread_name_prefix='weather-batch',
+                    )
+        return self._executor
+    
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        """Return the pool running hedged upstream calls, creating it on first use"""
+        if self._hedge_executor is None:
+            with self._executor_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=self.HEDGE_WORKERS,
+                        thread_name_prefix='weather-hedge',
+                    )
+        return self._hedge_executor
+    
+    def _get_result(self, endpoint: str, city: Union[str, Coordinates]) -> WeatherResult:
+        """
+        Return parsed data for an endpoint, serving from cache when possible
+        
+        Fresh entries are returned directly. Stale entries inside the
+        stale-while-revalidate window are returned immediately and trigger a
+        single background refresh. Concurrent misses for the same key share
+        one upstream fetch, and names that recently returned 404 are
+        rejected without a fetch. When the call budget is exhausted the last
+        cached value is returned marked stale.
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            city: City name, or Coordinates
+        
+        Returns:
+            WeatherResult with data in the canonical unit system
+        """
+        with phase('cache'):
+            location, query = self._resolve_city(city, endpoint)
+            key = (endpoint, location)
+            entry = self.cache.get(key)
+            if entry is not None:
+                if not entry.is_fresh():
+                    self._schedule_refresh(key, endpoint, query)
+                return WeatherResult(entry.value, entry.stored_at, entry.fresh_until, False)
             
-            forecast_array.append({
-                'date': day_data['date'],
-                'temperature': avg_temp,
-                'description': description,
-                'icon': icon,
-                'main': main_weather,
-                'items': items,
-            })
-        
-        return forecast_array
-
+            self._check_not_found(location)
+        try:
+            # Waiting for another request's fetch counts as upstream time
+            with phase('upstream'):
+                entry = self._flight.do(key, lambda: self._fetch_and_store(key, endpoint, query))
+        except self.FALLBACK_ERRORS as e:
+            return self._fallback(key, e)
+        return WeatherResult(entry.value, entry.stored_at, entry.fresh_until, False)
+    
+    def _fetch_and_store(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any]) -> CacheEntry:
+        """Fetch from upstream and store the parsed result (or a 404) in the cache"""
+        try:
+            value = self._fetch(endpoint, query)
+        except CityNotFoundError:
+            self._remember_not_found(key[1])
+            raise
+        with phase('cache'):
+            self._index_location(key[1], endpoint, value, query)
+            entry = self.cache.set(key, value, self.ttls[endpoint], self.stale_ttl)
+            self._record_history(key[1], endpoint, value, entry.stored_at)
+            return entry
+    
+    def _fetch(self, endpoint: str, query: Dict[str, Any]) -> Any:
+        """
+        Fetch and parse data from the upstream API, bypassing the cache
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            query: City selector from _resolve_city
+        
+        Returns:
+            Parsed data for the endpoint, in the canonical unit system
+        """
+        if self._groupable(endpoint, query):
+            value = self._grouper.submit(query['id'])
+            if value is not MISSING:
+                return value
+        alternate = self._alternate(endpoint, query)
+        if alternate is not None:
+            return self._fetch_hedged(endpoint, query, *alternate)
+        return self._fetch_from(self.primary, endpoint, self._request_params(query))
+    
+    def _fetch_from(self, provider: Provider, endpoint: str, params: Dict[str, Any], place: Optional[City] = None,
+                    cancel: Optional[threading.Event] = None) -> Any:
+        """
+        Fetch from one provider and parse its normalized response
+        
+        Args:
+            provider: Provider to call
+            endpoint: API endpoint ('/weather' or '/forecast')
+            params: The provider's query parameters
+            place: Place passed to the provider's params()
+            cancel: Event set once the answer is no longer needed
+        
+        Returns:
+            Parsed data for the endpoint, in the canonical unit system
+        """
+        data = self._make_request(endpoint, params, provider, cancel)
+        with phase('parse'):
+            return self._parsers[endpoint](provider.normalize(endpoint, data, place))
+    
+    def _fetch_hedged(self, endpoint: str, query: Dict[str, Any], params: Dict[str, Any],
+                      place: Optional[City]) -> Any:
+        """
+        Fetch from the primary, racing the secondary if the primary is slow or fails
+        
+        The primary call runs on the hedge pool. If it has not answered
+        within the delay of the hedge policy (the primary's recent p95), the
+        same lookup is sent to the secondary and the first answer wins; if
+        it fails, the secondary is called instead. A 404 from the primary
+        is final. Threads cannot be interrupted mid-request, so the losing
+        call finishes its current attempt in the background, but makes no
+        further retries and its answer is dropped.
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            query: City selector from _resolve_city
+            params: The secondary's query parameters
+            place: Place passed to the secondary's params()
+        
+        Returns:
+            Parsed data for the endpoint, in the canonical unit system
+        
+        Raises:
+            Exception: The primary's error (or the secondary's, if the
+                primary's is unknown) when neither provider answered
+        """
+        executor = self._get_hedge_executor()
+        cancel = threading.Event()
+        legs: Dict[Future, Provider] = {}
+        errors: Dict[Provider, Exception] = {}
+        hedged = failover = False
+        
+        def start(provider: Provider, provider_params: Dict[str, Any], provider_place: Optional[City]) -> None:
+            future = executor.submit(contextvars.copy_context().run, self._fetch_from, provider, endpoint,
+                                     provider_params, provider_place, cancel)
+            legs[future] = provider
+        
+        start(self.primary, self._request_params(query), None)
+        done, _ = wait(legs, timeout=self.hedge.delay(self.primary, endpoint))
+        if not done and self.hedge.allow():
+            hedged = True
+            start(self.secondary, params, place)
+        try:
+            while legs:
+                done, _ = wait(legs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    provider = legs.pop(future)
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        errors[provider] = e
+                        if provider is self.primary:
+                            if isinstance(e, CityNotFoundError):
+                                raise
+                            if not hedged:
+                                hedged = failover = True
+                                self.hedge.record_failover()
+                                start(self.secondary, params, place)
+                        continue
+                    if provider is self.secondary:
+                        self.hedge.record_win(failover)
+                    return value
+            raise errors.get(self.primary) or errors[self.secondary]
+        finally:
+            cancel.set()
+    
+    def _fetch_group(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch current weather for a batch of city IDs
+        
+        IDs missing from a group response (all of them if the group call
+        answers 404, and the ID of a batch of one) are left out, so their
+        callers fall back to their own /weather call.
+        
+        Args:
+            ids: City IDs collected by the group collector
+        
+        Returns:
+            Parsed current weather per city ID
+        """
+        if len(ids) == 1:
+            return {}
+        try:
+            data = self._make_request(self.GROUP_ENDPOINT, self._group_params(ids))
+        except CityNotFoundError:
+            return {}
+        return self._split_group(data)
+    
+    def refresh(self, endpoint: str, city: Union[str, Coordinates], before: float) -> bool:
+        """
+        Re-fetch a cached entry ahead of its expiry
+        
+        Only entries that are still servable and stop being fresh before
+        `before` are refreshed, so callers that share the cache skip work
+        another process has already done. Runs in the caller's thread and
+        shares in-flight fetches with concurrent requests.
+        
+        Args:
+            endpoint: API endpoint ('/weather' or '/forecast')
+            city: City name, or Coordinates
+            before: Unix time by which the entry must expire to be refreshed
+        
+        Returns:
+            True if the entry was re-fetched
+        """
+        location, query = self._resolve_city(city, endpoint)
+        key = (endpoint, location)
+        entry = self.cache.peek(key)
+        if entry is None or not entry.is_usable() or entry.fresh_until > before:
+            return False
+        if not self.cache.begin_refresh(key):
+            return False
+        try:
+            self._flight.do(key, lambda: self._fetch_and_store(key, endpoint, query))
+        finally:
+            self.cache.end_refresh(key)
+        return True
+    
+    def _schedule_refresh(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any]) -> None:
+        """Start a background refresh for a stale key unless one is already running"""
+        if not self.cache.begin_refresh(key):
+            return
+        thread = threading.Thread(
+            target=self._refresh,
+            args=(key, endpoint, query),
+            name=f'weather-refresh-{endpoint.strip("/")}',
+            daemon=True,
+        )
+        thread.start()
+    
+    def _refresh(self, key: Tuple[str, str], endpoint: str, query: Dict[str, Any]) -> None:
+        """Re-fetch a stale key and store the result"""
+        try:
+            self._flight.do(key, lambda: self._fetch_and_store(key, endpoint, query))
+        except Exception:
+            # Keep serving the stale entry; the next request after the
+            # stale window closes will fetch synchronously and surface errors.
+            pass
+        finally:
+            self.cache.end_refresh(key)
@@ -0,0 +1,100 @@
+"""
+Weather API Application - Cold Start Benchmark
+Measures what a fresh serverless instance pays before and during its first
+requests to the Vercel handler (api/index.py)
+
+Run from the repository root:
+    python benchmarks/bench_cold_start.py [--runs 15] [--ref HEAD~1]
+
+Every run starts a new interpreter and reports the median of:
+    import      importing api.index
+    400         first request rejected by validation (no upstream call)
+    health      first /api/health (creates the weather service)
+With --ref the same measurements are taken on another commit (exported with
+`git archive`) for comparison.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import api.index as index
+imported = time.perf_counter()
+index.handler({'path': '/api/weather/current', 'method': 'GET', 'queryStringParameters': {'city': '12345'}})
+rejected = time.perf_counter()
+index.handler({'path': '/api/health', 'method': 'GET'})
+healthy = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    '400': (rejected - imported) * 1000,
+    'health': (healthy - rejected) * 1000,
+    'modules': len(sys.modules),
+    'flask': 'flask' in sys.modules,
+}))
+"""
+
+METRICS = ('import', '400', 'health')
+
+
+def measure(tree, runs):
+    """Run the probe in fresh interpreters and return median timings"""
+    env = dict(os.environ, PYTHONPATH=tree)
+    samples = []
+    for run in range(runs + 1):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=tree, env=env,
+            check=True, capture_output=True, text=True,
+        ).stdout
+        if run:  # the first run only writes bytecode caches
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    result = {metric: statistics.median(sample[metric] for sample in samples) for metric in METRICS}
+    result['modules'] = samples[-1]['modules']
+    result['flask'] = samples[-1]['flask']
+    return result
+
+
+def export_ref(ref, directory):
+    """Extract the tree of a git revision into a directory"""
+    archive = os.path.join(directory, 'tree.tar')
+    subprocess.run(['git', 'archive', '--format=tar', '-o', archive, ref], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(os.path.join(directory, 'tree'))
+    return os.path.join(directory, 'tree')
+
+
+def report(label, result):
+    print(f"{label:<12}" + ''.join(f"{result[metric]:>10.1f}" for metric in METRICS)
+          + f"{result['modules']:>10}{'yes' if result['flask'] else 'no':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cold starts of the Vercel handler')
+    parser.add_argument('--runs', type=int, default=15, help='fresh interpreters per tree')
+    parser.add_argument('--ref', help='git revision to compare against (e.g. HEAD~1)')
+    args = parser.parse_args()
+    
+    print(f"{'tree':<12}" + ''.join(f"{metric + ' ms':>10}" for metric in METRICS) + f"{'modules':>10}{'flask':>8}")
+    current = measure(ROOT, args.runs)
+    report('working', current)
+    if args.ref:
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = measure(export_ref(args.ref, directory), args.runs)
+        report(args.ref, baseline)
+        total = sum(current[metric] for metric in METRICS)
+        baseline_total = sum(baseline[metric] for metric in METRICS)
+        print(f"\nimport: {baseline['import'] / current['import']:.1f}x faster; "
+              f"import through first health check: {baseline_total:.0f} ms -> {total:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Weather API Application - Forecast Parser Benchmark
+Compares the single-pass forecast parser with the original two-pass parser
+
+Run from the repository root:
+    python benchmarks/bench_forecast_parser.py [--repeat 2000] [--bulk 200]
+
+Payloads in benchmarks/data are 40-item /forecast responses in
+OpenWeatherMap's wire format.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.forecast import load_numpy, parse_forecast, parse_forecasts
+from backend.utils import convert_pressure_to_inhg
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def legacy_parse_forecast(data):
+    """WeatherService._parse_forecast as it was before the single-pass rewrite"""
+    if not data.get('list') or not isinstance(data.get('list'), list):
+        return []
+    
+    forecasts_by_date = {}
+    for item in data['list']:
+        date = datetime.fromtimestamp(item.get('dt', 0))
+        date_key = date.date().isoformat()
+        if date_key not in forecasts_by_date:
+            forecasts_by_date[date_key] = {
+                'date': date.isoformat(),
+                'items': [],
+            }
+        forecasts_by_date[date_key]['items'].append({
+            'time': date.isoformat(),
+            'temperature': item.get('main', {}).get('temp'),
+            'feelsLike': item.get('main', {}).get('feels_like'),
+            'humidity': item.get('main', {}).get('humidity'),
+            'pressure': convert_pressure_to_inhg(item.get('main', {}).get('pressure')),
+            'windSpeed': item.get('wind', {}).get('speed'),
+            'description': item.get('weather', [{}])[0].get('description', ''),
+            'icon': item.get('weather', [{}])[0].get('icon', '01d'),
+            'main': item.get('weather', [{}])[0].get('main', ''),
+        })
+    
+    forecast_array = []
+    for date_key, day_data in list(forecasts_by_date.items())[:5]:
+        items = day_data['items']
+        temps = [item['temperature'] for item in items if item.get('temperature') is not None]
+        avg_temp = sum(temps) / len(temps) if temps else None
+        forecast_array.append({
+            'date': day_data['date'],
+            'temperature': avg_temp,
+            'description': items[0].get('description', '') if items else '',
+            'icon': items[0].get('icon', '01d') if items else '01d',
+            'main': items[0].get('main', '') if items else '',
+            'items': items,
+        })
+    return forecast_array
+
+
+def load_payloads():
+    """Load the sample /forecast payloads"""
+    payloads = {}
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, 'forecast_*.json'))):
+        with open(path, encoding='utf-8') as f:
+            payloads[os.path.basename(path)] = json.load(f)
+    return payloads
+
+
+def check_equivalent(payload):
+    """Make sure the new parser keeps the legacy fields and mean temperature"""
+    legacy = legacy_parse_forecast(payload)
+    current = parse_forecast(payload)
+    assert [day['date'] for day in legacy] == [day['date'] for day in current]
+    for old, new in zip(legacy, current):
+        assert abs(old['temperature'] - new['temperature']) < 1e-9
+        assert len(old['items']) == len(new['items'])
+        assert new['tempMin'] <= new['temperature'] <= new['tempMax']
+    if load_numpy() is not None:
+        assert parse_forecasts([payload], use_numpy=True)[0] == current
+
+
+def best_time(fn, repeat, rounds=5):
+    """Best per-call time in microseconds over several rounds"""
+    return min(timeit.repeat(fn, number=repeat, repeat=rounds)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the forecast parser')
+    parser.add_argument('--repeat', type=int, default=2000, help='calls per timing round')
+    parser.add_argument('--bulk', type=int, default=200, help='payloads per bulk parse')
+    args = parser.parse_args()
+    
+    payloads = load_payloads()
+    print(f"{'payload':<24}{'legacy us':>12}{'single-pass us':>16}{'speedup':>10}")
+    for name, payload in payloads.items():
+        check_equivalent(payload)
+        legacy = best_time(lambda: legacy_parse_forecast(payload), args.repeat)
+        current = best_time(lambda: parse_forecast(payload), args.repeat)
+        print(f"{name:<24}{legacy:>12.1f}{current:>16.1f}{legacy / current:>9.2f}x")
+    
+    bulk = [payloads[name] for name in sorted(payloads)] * (args.bulk // len(payloads) or 1)
+    repeat = max(args.repeat // len(bulk), 1)
+    print(f"\nbulk parse of {len(bulk)} payloads (ms per batch)")
+    legacy = best_time(lambda: [legacy_parse_forecast(p) for p in bulk], repeat) / 1000
+    python = best_time(lambda: parse_forecasts(bulk, use_numpy=False), repeat) / 1000
+    print(f"  legacy        {legacy:8.2f}")
+    print(f"  single-pass   {python:8.2f}  ({legacy / python:.2f}x)")
+    if load_numpy() is not None:
+        vectorized = best_time(lambda: parse_forecasts(bulk, use_numpy=True), repeat) / 1000
+        print(f"  numpy rollups {vectorized:8.2f}  ({legacy / vectorized:.2f}x)")
+    else:
+        print("  numpy rollups  skipped (NumPy not installed)")
+
+
+if __name__ == '__main__':
+    main()
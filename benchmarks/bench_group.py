@@ -0,0 +1,106 @@
+"""
+Weather API Application - Group Call Batching Benchmark
+Measures the latency/throughput trade-off of WEATHER_GROUP_WINDOW_MS against
+the local OpenWeatherMap stand-in (fake_owm.py)
+
+Run from the repository root:
+    python benchmarks/bench_group.py [--target asgi] [--windows 0 2 5 10 20]
+                                     [--requests 4000] [--concurrency 32] [--save group.json]
+
+A synthetic city list gives every request its own city ID, so each one
+misses the cache and needs upstream data: the worst case for latency and
+the best case for batching. Window 0 is the unbatched baseline. For each
+window the target is started in a fresh process (cold cache) and the
+report lists throughput, latency percentiles and upstream calls per
+request; the requests per call is the mean batch size.
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+
+from bench_load import TARGETS, city_path, describe_tree, parse_env, run_scenario, start_fake_upstream, stop, ROOT
+
+FIRST_ID = 9000000  # synthetic IDs stay clear of the seed gazetteer's
+
+
+def synthetic_cities(count, rng):
+    """City list entries with unique letter-only names (validate_city rejects digits)"""
+    names = (''.join(letters) for letters in itertools.product(string.ascii_lowercase, repeat=4))
+    return [
+        {'id': FIRST_ID + index, 'name': 'Groupton ' + next(names).capitalize(), 'country': 'XX',
+         'coord': {'lat': round(rng.uniform(-60, 70), 4), 'lon': round(rng.uniform(-180, 180), 4)}}
+        for index in range(count)
+    ]
+
+
+def report_header():
+    print(f"{'window':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'upstream/req':>14}{'req/call':>10}")
+
+
+def report_line(window, result):
+    per_request = result['upstreamPerRequest']
+    print(f"{window:>6g}ms{result['rps']:>9.0f}{result['p50']:>9.1f}{result['p95']:>9.1f}{result['p99']:>9.1f}"
+          f"{result['max']:>9.1f}{per_request:>14.3f}{(1 / per_request if per_request else 0):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure group call batching against a local OpenWeatherMap stand-in')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='asgi')
+    parser.add_argument('--windows', type=float, nargs='+', default=[0, 2, 5, 10, 20],
+                        help='WEATHER_GROUP_WINDOW_MS values to measure (0 = no batching)')
+    parser.add_argument('--max-size', type=int, default=20, help='WEATHER_GROUP_MAX_SIZE')
+    parser.add_argument('--requests', type=int, default=4000, help='requests per window, one city each')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent keep-alive connections')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the city list and upstream latency')
+    parser.add_argument('--env', action='append', metavar='NAME=VALUE',
+                        help='extra environment for the target (repeatable)')
+    parser.add_argument('--latency', type=float, default=40.0, help='upstream median latency in ms')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='upstream log-normal latency sigma')
+    parser.add_argument('--save', help='write results to this JSON file')
+    args = parser.parse_args()
+    args.error_rate = args.burst_every = args.burst_length = args.tail_rate = args.tail_latency = 0.0
+    
+    rng = random.Random(args.seed)
+    cities = synthetic_cities(args.requests, rng)
+    paths = [city_path('current', city['name'], 'metric') for city in cities]
+    rng.shuffle(paths)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        city_list = os.path.join(directory, 'city.list.json.gz')
+        with gzip.open(city_list, 'wt', encoding='utf-8') as f:
+            json.dump(cities, f)
+        fake, fake_url = start_fake_upstream(args, ['--city-list', city_list])
+        try:
+            commit = describe_tree(ROOT)
+            print(f"{commit}: {args.target}, {args.requests} cache misses/window, concurrency {args.concurrency}, "
+                  f"upstream {args.latency:g} ms")
+            report_header()
+            for window in args.windows:
+                run_args = argparse.Namespace(**vars(args))
+                run_args.env = dict(parse_env(args.env), WEATHER_CITY_INDEX=city_list,
+                                    WEATHER_GROUP_WINDOW_MS=str(window), WEATHER_GROUP_MAX_SIZE=str(args.max_size))
+                results[window] = run_scenario(ROOT, run_args, fake_url, paths)
+                report_line(window, results[window])
+        finally:
+            stop(fake)
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'commit': commit, 'target': args.target, 'concurrency': args.concurrency,
+                       'latency': args.latency, 'maxSize': args.max_size,
+                       'results': {str(window): result for window, result in results.items()}}, f, indent=2)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
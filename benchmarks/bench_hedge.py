@@ -0,0 +1,101 @@
+"""
+Weather API Application - Hedged Request Benchmark
+Measures what a secondary provider does to upstream tail latency, against
+the local OpenWeatherMap stand-in (fake_owm.py)
+
+Run from the repository root:
+    python benchmarks/bench_hedge.py [--target asgi] [--modes off 0 95]
+                                     [--tail-rate 0.03 --tail-latency 3000]
+                                     [--requests 3000] [--concurrency 16] [--save hedge.json]
+
+Every request asks for a different indexed city, so each one misses the
+cache and Open-Meteo can answer it too. The stand-in serves both APIs and
+delays a random --tail-rate of all its answers by --tail-latency, the
+occasional multi-second response that dominates p99. Modes:
+    off   no secondary provider
+    0     WEATHER_SECONDARY_PROVIDER=openmeteo, failover only
+    N     the same, hedging calls slower than the primary's recent pN
+Each mode is run against a fresh target; upstream/req counts calls to both
+providers and secondary/req those to Open-Meteo.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+
+from bench_group import synthetic_cities
+from bench_load import TARGETS, city_path, describe_tree, parse_env, run_scenario, start_fake_upstream, stop, ROOT
+
+
+def report_header():
+    print(f"{'mode':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'upstream/req':>14}{'secondary/req':>15}")
+
+
+def report_line(mode, result):
+    secondary = result['upstream'].get('/openmeteo', 0) / result['requests']
+    print(f"{mode:>6}{result['rps']:>9.0f}{result['p50']:>9.1f}{result['p95']:>9.1f}{result['p99']:>9.1f}"
+          f"{result['max']:>9.1f}{result['upstreamPerRequest']:>14.3f}{secondary:>15.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure hedged requests against a local OpenWeatherMap stand-in')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='asgi')
+    parser.add_argument('--modes', nargs='+', default=['off', '0', '95'],
+                        help="'off' (no secondary) or a WEATHER_HEDGE_PERCENTILE value (0 = failover only)")
+    parser.add_argument('--requests', type=int, default=3000, help='requests per mode, one city each')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent keep-alive connections')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the city list and upstream faults')
+    parser.add_argument('--env', action='append', metavar='NAME=VALUE',
+                        help='extra environment for the target (repeatable)')
+    parser.add_argument('--latency', type=float, default=40.0, help='upstream median latency in ms')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='upstream log-normal latency sigma')
+    parser.add_argument('--tail-rate', type=float, default=0.03, help='fraction of upstream calls delayed further')
+    parser.add_argument('--tail-latency', type=float, default=3000.0, help='extra delay of those calls in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls answered with 500')
+    parser.add_argument('--save', help='write results to this JSON file')
+    args = parser.parse_args()
+    args.burst_every = args.burst_length = 0.0
+    
+    rng = random.Random(args.seed)
+    cities = synthetic_cities(args.requests, rng)
+    paths = [city_path('current', city['name'], 'metric') for city in cities]
+    rng.shuffle(paths)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        city_list = os.path.join(directory, 'city.list.json.gz')
+        with gzip.open(city_list, 'wt', encoding='utf-8') as f:
+            json.dump(cities, f)
+        fake, fake_url = start_fake_upstream(args, ['--city-list', city_list])
+        try:
+            commit = describe_tree(ROOT)
+            print(f"{commit}: {args.target}, {args.requests} cache misses/mode, concurrency {args.concurrency}, "
+                  f"upstream {args.latency:g} ms with {args.tail_rate:.1%} at +{args.tail_latency:g} ms")
+            report_header()
+            for mode in args.modes:
+                run_args = argparse.Namespace(**vars(args))
+                run_args.env = dict(parse_env(args.env), WEATHER_CITY_INDEX=city_list)
+                if mode != 'off':
+                    run_args.env.update(WEATHER_SECONDARY_PROVIDER='openmeteo', WEATHER_HEDGE_PERCENTILE=mode,
+                                        WEATHER_SECONDARY_URL=fake_url.split('/data/', 1)[0] + '/v1')
+                results[mode] = run_scenario(ROOT, run_args, fake_url, paths)
+                report_line(mode, results[mode])
+        finally:
+            stop(fake)
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'commit': commit, 'target': args.target, 'concurrency': args.concurrency,
+                       'latency': args.latency, 'tailRate': args.tail_rate, 'tailLatency': args.tail_latency,
+                       'results': results}, f, indent=2)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""
+Weather API Application - Load Test Benchmark
+Drives the app against a local OpenWeatherMap stand-in (fake_owm.py) and
+reports throughput, tail latency and upstream calls per request
+
+Run from the repository root:
+    python benchmarks/bench_load.py [--target flask] [--scenario hot longtail units]
+                                    [--requests 5000] [--concurrency 16]
+                                    [--save results.json] [--compare old.json] [--ref HEAD~1]
+
+Targets (each started in a fresh process per scenario, so caches start cold):
+    flask      app.py on Werkzeug's threaded server
+    asgi       asgi.py on uvicorn
+    gunicorn   the Procfile command (asgi.py on gunicorn + uvicorn workers)
+    vercel     api/index.py's handler behind a threaded HTTP adapter
+Scenarios are fixed request sequences generated from --seed:
+    hot        Zipf-skewed popular cities, 85% current weather / 15% forecast
+    longtail   uniform over ~1,000 cities, so most requests miss the cache
+    units      20 popular cities with metric/imperial toggling across
+               current, forecast and bundle requests
+Upstream faults (latency, slow tail, 500s, 429 bursts) are configured on the stand-in.
+--save writes the results with the commit they were measured on; --compare
+prints the change against a saved file and --ref measures another commit
+(exported with `git archive`) in the same session.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from urllib.parse import quote
+
+from bench_cold_start import export_ref
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_PATH = os.path.join(ROOT, 'backend', 'data', 'cities.tsv')
+STARTUP_TIMEOUT = 30  # seconds to wait for a target to answer /api/health
+SCENARIOS = ('hot', 'longtail', 'units')
+METRICS = ('rps', 'p50', 'p95', 'p99', 'upstreamPerRequest')
+LOWER_IS_BETTER = {'p50', 'p95', 'p99', 'upstreamPerRequest'}
+
+# Points the services at the stand-in; setting the class attribute also
+# covers revisions that predate OPENWEATHER_BASE_URL
+BOOTSTRAP = r"""
+import os, sys
+import backend.weather_service as weather_service
+for name in ('WeatherServiceBase', 'WeatherService'):
+    if hasattr(weather_service, name):
+        setattr(getattr(weather_service, name), 'BASE_URL', os.environ['OPENWEATHER_BASE_URL'])
+host, port = '127.0.0.1', int(sys.argv[1])
+"""
+
+TARGETS = {
+    'flask': BOOTSTRAP + r"""
+import logging
+from werkzeug.serving import make_server
+from app import app
+logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+make_server(host, port, app, threaded=True).serve_forever()
+""",
+    'asgi': BOOTSTRAP + r"""
+import uvicorn
+uvicorn.run('asgi:app', host=host, port=port, log_level='warning')
+""",
+    'gunicorn': BOOTSTRAP + r"""
+from gunicorn.app.wsgiapp import run
+sys.argv = ['gunicorn', 'asgi:app', '-k', 'uvicorn.workers.UvicornWorker', '--bind', f'{host}:{port}',
+            '--workers', os.environ.get('BENCH_WORKERS', '2'), '--log-level', 'critical']
+run()
+""",
+    'vercel': BOOTSTRAP + r"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api.index import handler
+
+class Adapter(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def answer(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        response = handler({
+            'url': self.path,
+            'path': self.path.split('?', 1)[0],
+            'method': method,
+            'headers': dict(self.headers.items()),
+            'body': self.rfile.read(length).decode('utf-8') if length else None,
+        })
+        body = response['body'].encode('utf-8') if isinstance(response['body'], str) else response['body'] or b''
+        self.send_response(response['statusCode'])
+        for name, value in response['headers'].items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        self.answer('GET')
+    
+    def do_POST(self):
+        self.answer('POST')
+    
+    def log_message(self, format, *args):
+        pass
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+Server((host, port), Adapter).serve_forever()
+""",
+}
+
+
+def seed_cities():
+    """Seed gazetteer city names, most populous first as listed"""
+    with open(SEED_PATH, encoding='utf-8') as f:
+        return [line.split('\t')[1] for line in f if line.strip() and not line.startswith('#')]
+
+
+def long_tail_cities(count):
+    """Seed cities plus made-up (but valid) names, `count` in total"""
+    stems = ['Ash', 'Bel', 'Cor', 'Dun', 'El', 'Fair', 'Glen', 'Hol', 'Kings', 'Lin', 'Mar', 'New',
+             'Oak', 'Port', 'Ross', 'Stan', 'Thorn', 'West', 'Brook', 'Carr']
+    endings = ['bridge', 'burn', 'by', 'field', 'ford', 'ham', 'haven', 'mouth', 'ton', 'wick', 'wood', 'ville']
+    made_up = (f"{prefix}{stem}{ending}" for prefix in ('', 'North ', 'South ', 'Upper ', 'Lower ')
+               for stem in stems for ending in endings)
+    return list(itertools.islice(itertools.chain(seed_cities(), made_up), count))
+
+
+def zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def city_path(endpoint, city, unit):
+    return f"/api/weather/{endpoint}?city={quote(city)}&unit={unit}"
+
+
+def build_scenario(name, count, rng):
+    """
+    Generate a scenario's request paths
+    
+    Args:
+        name: Scenario name (see SCENARIOS)
+        count: Number of requests
+        rng: Seeded random generator
+    
+    Returns:
+        List of request paths
+    """
+    if name == 'hot':
+        cities = seed_cities()
+        picks = rng.choices(cities, zipf_weights(len(cities)), k=count)
+        return [city_path('current' if rng.random() < 0.85 else 'forecast', city, 'metric') for city in picks]
+    if name == 'longtail':
+        cities = long_tail_cities(1000)
+        return [city_path('current', rng.choice(cities), 'metric') for _ in range(count)]
+    if name == 'units':
+        cities = seed_cities()[:20]
+        endpoints = ('current', 'forecast', 'bundle')
+        return [city_path(rng.choice(endpoints), rng.choice(cities), ('metric', 'imperial')[i % 2])
+                for i in range(count)]
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def http_json(url, method='GET'):
+    request = urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def start_fake_upstream(args, extra_args=()):
+    """Start fake_owm.py and return (process, base URL)"""
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_owm.py'), '--port', '0',
+               '--latency', str(args.latency), '--latency-sigma', str(args.latency_sigma),
+               '--error-rate', str(args.error_rate), '--burst-every', str(args.burst_every),
+               '--burst-length', str(args.burst_length), '--tail-rate', str(args.tail_rate),
+               '--tail-latency', str(args.tail_latency), '--seed', str(args.seed), *extra_args]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline().strip()
+    if not line.startswith('OPENWEATHER_BASE_URL='):
+        process.kill()
+        raise SystemExit("fake_owm.py did not start")
+    return process, line.split('=', 1)[1]
+
+
+def start_target(tree, target, base_url, extra_env):
+    """Start a target app in a fresh process and wait until it answers /api/health"""
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=tree, OPENWEATHER_API_KEY='bench', OPENWEATHER_BASE_URL=base_url,
+               WEATHER_QUOTA_PER_MINUTE='0', WEATHER_QUOTA_PER_DAY='0', **extra_env)
+    process = subprocess.Popen([sys.executable, '-c', TARGETS[target], str(port)], cwd=tree, env=env,
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{target} target exited with status {process.returncode}")
+        try:
+            http_json(f"http://127.0.0.1:{port}/api/health")
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit(f"{target} target did not answer within {STARTUP_TIMEOUT}s")
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def drive(port, paths, concurrency):
+    """
+    Send paths over `concurrency` keep-alive connections as fast as they are answered
+    
+    Returns:
+        Tuple of (latencies in seconds, status counter, wall time in seconds)
+    """
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    position = itertools.count()  # next() is atomic under the GIL
+    
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        mine = []
+        seen = Counter()
+        while True:
+            index = next(position)
+            if index >= len(paths):
+                break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', paths[index], headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = 0  # connection failure
+            mine.append(time.perf_counter() - started)
+            seen[status] += 1
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            statuses.update(seen)
+    
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def run_scenario(tree, args, fake_url, paths):
+    """Measure one scenario against a freshly started target"""
+    process, port = start_target(tree, args.target, fake_url, args.env)
+    try:
+        fake_root = fake_url.split('/data/', 1)[0]
+        http_json(f"{fake_root}/__reset", 'POST')
+        latencies, statuses, elapsed = drive(port, paths, args.concurrency)
+        upstream = http_json(f"{fake_root}/__stats")
+    finally:
+        stop(process)
+    ordered = sorted(latencies)
+    return {
+        'requests': len(paths),
+        'rps': len(paths) / elapsed,
+        'p50': percentile(ordered, 0.50) * 1000,
+        'p95': percentile(ordered, 0.95) * 1000,
+        'p99': percentile(ordered, 0.99) * 1000,
+        'max': ordered[-1] * 1000,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'upstreamPerRequest': upstream['requests'] / len(paths),
+        'upstream': upstream,
+    }
+
+
+def measure(tree, args, fake_url):
+    results = {}
+    for name in args.scenario:
+        paths = build_scenario(name, args.requests, random.Random(f"{args.seed}:{name}"))
+        results[name] = run_scenario(tree, args, fake_url, paths)
+        report_line(name, results[name])
+    return results
+
+
+def describe_tree(tree):
+    """Commit id of a tree, marked -dirty when it has uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=tree, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=tree,
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def report_header():
+    print(f"{'scenario':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'upstream/req':>14}  non-2xx")
+
+
+def report_line(name, result):
+    failures = {status: count for status, count in result['statuses'].items() if not status.startswith(('2', '3'))}
+    print(f"{name:<10}{result['rps']:>9.0f}{result['p50']:>9.1f}{result['p95']:>9.1f}{result['p99']:>9.1f}"
+          f"{result['max']:>9.1f}{result['upstreamPerRequest']:>14.3f}  "
+          + (' '.join(f"{status}x{count}" for status, count in failures.items()) or '-'))
+
+
+def compare(baseline, current):
+    """Print the relative change of each metric (+ is better)"""
+    print(f"\nchange vs {baseline['commit']} (+ is better)")
+    if (baseline['target'], baseline['config']) != (current['target'], current['config']):
+        print(f"note: measured with a different target or settings ({baseline['target']}, {baseline['config']})")
+    print(f"{'scenario':<10}" + ''.join(f"{metric:>24}" for metric in METRICS))
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        cells = []
+        for metric in METRICS:
+            if not before[metric]:
+                cells.append(f"{'n/a':>24}")
+                continue
+            change = (result[metric] - before[metric]) / before[metric] * 100
+            if metric in LOWER_IS_BETTER:
+                change = -change
+            cells.append(f"{before[metric]:>9.2f} ->{result[metric]:>7.2f} {change:+.0f}%".rjust(24))
+        print(f"{name:<10}" + ''.join(cells))
+
+
+def run(tree, label, args, fake_url):
+    print(f"\n{label}: {args.target}, {args.requests} requests/scenario, concurrency {args.concurrency}")
+    report_header()
+    return {
+        'commit': label,
+        'target': args.target,
+        'config': {key: getattr(args, key) for key in ('requests', 'concurrency', 'seed', 'latency', 'latency_sigma',
+                                                         'error_rate', 'burst_every', 'burst_length', 'tail_rate',
+                                                         'tail_latency', 'env')},
+        'results': measure(tree, args, fake_url),
+    }
+
+
+def parse_env(values):
+    env = {}
+    for value in values or ():
+        name, _, setting = value.partition('=')
+        env[name] = setting
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the weather API against a local OpenWeatherMap stand-in')
+    parser.add_argument('--target', choices=sorted(TARGETS), default='flask')
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=5000, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent keep-alive connections')
+    parser.add_argument('--seed', type=int, default=1, help='seed for request sequences and upstream faults')
+    parser.add_argument('--env', action='append', metavar='NAME=VALUE',
+                        help='extra environment for the target, e.g. WEATHER_CACHE_URL=sqlite:////tmp/w.db')
+    parser.add_argument('--latency', type=float, default=40.0, help='upstream median latency in ms')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='upstream log-normal latency sigma')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls answered with 500')
+    parser.add_argument('--burst-every', type=float, default=0.0, help='seconds between upstream 429 bursts')
+    parser.add_argument('--burst-length', type=float, default=0.0, help='seconds each upstream 429 burst lasts')
+    parser.add_argument('--tail-rate', type=float, default=0.0, help='fraction of upstream calls delayed by --tail-latency')
+    parser.add_argument('--tail-latency', type=float, default=0.0, help='extra delay of those upstream calls in ms')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='results file saved by an earlier run')
+    parser.add_argument('--ref', help='git revision to measure in the same session (e.g. HEAD~1)')
+    args = parser.parse_args()
+    args.env = parse_env(args.env)
+    
+    fake, fake_url = start_fake_upstream(args)
+    try:
+        current = run(ROOT, describe_tree(ROOT), args, fake_url)
+        baseline = None
+        if args.ref:
+            with tempfile.TemporaryDirectory() as directory:
+                baseline = run(export_ref(args.ref, directory), args.ref, args, fake_url)
+    finally:
+        stop(fake)
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), current)
+    if baseline:
+        compare(baseline, current)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
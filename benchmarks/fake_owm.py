@@ -0,0 +1,362 @@
+"""
+Weather API Application - OpenWeatherMap Stand-in Server
+Replays the recorded /weather and /forecast payloads in benchmarks/data so the
+app can be load tested without the real API or its quota
+
+Run from the repository root:
+    python benchmarks/fake_owm.py [--port 8090] [--latency 40] [--error-rate 0.01]
+                                  [--burst-every 30 --burst-length 2] [--city-list cities.json.gz]
+                                  [--tail-rate 0.02 --tail-latency 3000]
+
+Then start the app with OPENWEATHER_BASE_URL=http://127.0.0.1:8090/data/2.5.
+The same server answers Open-Meteo requests under /v1/forecast (use it with
+WEATHER_SECONDARY_PROVIDER=openmeteo WEATHER_SECONDARY_URL=http://127.0.0.1:8090/v1),
+converting the payload recorded for the city at those coordinates.
+
+Cities are looked up by `id` (seed gazetteer IDs, plus those of --city-list), `q` or
+`lat`/`lon`; any other valid name gets a recorded payload renamed to it, and names
+starting with "Nowhere" are answered with 404 like an unknown city. /group?id=1,2,...
+answers up to 20 known IDs in one call and leaves unknown ones out. Injected faults:
+    --latency / --latency-sigma   log-normal response delay (median ms, sigma)
+    --tail-rate / --tail-latency  fraction of responses delayed by a further fixed ms
+    --error-rate                  fraction of requests answered with 500
+    --burst-every / --burst-length
+                                  every N seconds, answer 429 for M seconds
+GET /__stats returns the request counters as JSON; POST /__reset clears them.
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+SEED_PATH = os.path.join(ROOT, 'backend', 'data', 'cities.tsv')
+API_PREFIX = '/data/2.5'
+OPEN_METEO_PATH = '/v1/forecast'
+NOT_FOUND_PREFIX = 'nowhere'
+GROUP_LIMIT = 20  # IDs per /group call, as upstream
+
+
+def wmo_code(condition_id):
+    """Map an OpenWeatherMap condition ID to the nearest WMO weather code"""
+    if condition_id < 300:
+        return 95
+    if condition_id < 400:
+        return 53
+    if condition_id < 600:
+        return {500: 61, 501: 63, 511: 66, 520: 80, 521: 81, 522: 82}.get(condition_id, 65)
+    if condition_id < 700:
+        return {600: 71, 601: 73}.get(condition_id, 75)
+    if condition_id < 800:
+        return 45
+    return {800: 0, 801: 1, 802: 2}.get(condition_id, 3)
+
+
+def load_templates(kind):
+    """Recorded payloads for an endpoint ('weather' or 'forecast'), in file name order"""
+    templates = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, f'{kind}_*.json'))):
+        with open(path, encoding='utf-8') as f:
+            templates.append(json.load(f))
+    if not templates:
+        raise SystemExit(f"No recorded {kind} payloads in {DATA_DIR}")
+    return templates
+
+
+def load_seed_cities():
+    """Map seed gazetteer IDs to (name, country, lat, lon)"""
+    cities = {}
+    with open(SEED_PATH, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            city_id, name, country, lat, lon = line.rstrip('\n').split('\t')
+            cities[city_id] = (name, country, float(lat), float(lon))
+    return cities
+
+
+def load_city_list(path):
+    """Map the IDs of an OpenWeatherMap city.list.json(.gz) to (name, country, lat, lon)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return {
+            str(city['id']): (city['name'], city.get('country', ''), city['coord']['lat'], city['coord']['lon'])
+            for city in json.load(f)
+        }
+
+
+class FakeOpenWeatherMap:
+    """Payload generation, fault injection and counters shared by the request handlers"""
+    
+    def __init__(self, latency_ms=0.0, latency_sigma=0.0, error_rate=0.0,
+                 burst_every=0.0, burst_length=0.0, seed=None, city_list=None,
+                 tail_rate=0.0, tail_latency_ms=0.0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tail_rate = tail_rate
+        self.tail_latency_ms = tail_latency_ms
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.templates = {'/weather': load_templates('weather'), '/forecast': load_templates('forecast')}
+        self.cities = load_seed_cities()
+        if city_list:
+            self.cities.update(load_city_list(city_list))
+        self.coordinates = {(round(lat, 2), round(lon, 2)): city_id
+                            for city_id, (_, _, lat, lon) in self.cities.items()}
+        self._bodies = {}  # (endpoint, city) -> encoded payload
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.counts = {'requests': 0, '/weather': 0, '/forecast': 0, '/group': 0, '/openmeteo': 0, 'ok': 0,
+                           'notFound': 0, 'rateLimited': 0, 'errors': 0}
+    
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+    
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self.counts[name] += 1
+    
+    def delay(self):
+        """Seconds to wait before answering"""
+        tail = self.tail_latency_ms / 1000 if self.tail_rate and self.random.random() < self.tail_rate else 0.0
+        if self.latency_ms <= 0:
+            return tail
+        if self.latency_sigma <= 0:
+            return tail + self.latency_ms / 1000
+        return tail + self.random.lognormvariate(math.log(self.latency_ms), self.latency_sigma) / 1000
+    
+    def in_burst(self):
+        """True while a 429 burst is in progress"""
+        if self.burst_every <= 0 or self.burst_length <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_length
+    
+    def body(self, endpoint, query):
+        """Encoded payload for a request, or None for an unknown city"""
+        city_id = query.get('id', '')
+        name = query.get('q', '').strip()
+        if 'lat' in query and 'lon' in query:
+            try:
+                lat, lon = float(query['lat']), float(query['lon'])
+            except ValueError:
+                return None
+            key = f'll:{lat},{lon}'
+        elif city_id:
+            if city_id not in self.cities:
+                return None
+            key = 'id:' + city_id
+        elif name and not name.lower().startswith(NOT_FOUND_PREFIX):
+            key = 'q:' + name.lower()
+        else:
+            return None
+        
+        body = self._bodies.get((endpoint, key))
+        if body is None:
+            templates = self.templates[endpoint]
+            payload = json.loads(json.dumps(templates[zlib.crc32(key.encode('utf-8')) % len(templates)]))
+            if key.startswith('ll:'):
+                name, country = f'Near {lat:.2f},{lon:.2f}', 'XX'
+            elif city_id:
+                name, country, lat, lon = self.cities[city_id]
+            else:
+                country, lat, lon = 'XX', 0.0, 0.0
+            place = payload['city'] if endpoint == '/forecast' else payload
+            place['name'] = name
+            place['id'] = int(city_id) if city_id else zlib.crc32(key.encode('utf-8'))
+            place['coord'] = {'lat': lat, 'lon': lon}
+            (place if endpoint == '/forecast' else payload['sys'])['country'] = country
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            self._bodies[(endpoint, key)] = body
+        return body
+    
+    def group_body(self, query):
+        """Encoded /group payload, or None when the ID list is empty or too long"""
+        ids = [city_id for city_id in query.get('id', '').split(',') if city_id]
+        if not ids or len(ids) > GROUP_LIMIT:
+            return None
+        bodies = [self.body('/weather', {'id': city_id}) for city_id in ids]
+        bodies = [body for body in bodies if body is not None]
+        return b'{"cnt":%d,"list":[%s]}' % (len(bodies), b','.join(bodies))
+    
+    def open_meteo_body(self, query):
+        """Encoded Open-Meteo payload built from the recorded payload for its coordinates, or None"""
+        try:
+            lat, lon = float(query['latitude']), float(query['longitude'])
+        except (KeyError, ValueError):
+            return None
+        city_id = self.coordinates.get((round(lat, 2), round(lon, 2)))
+        lookup = {'id': city_id} if city_id else {'lat': str(lat), 'lon': str(lon)}
+        payload = {'latitude': lat, 'longitude': lon, 'utc_offset_seconds': 0, 'timezone': 'GMT'}
+        if 'current' in query:
+            weather = json.loads(self.body('/weather', lookup))
+            main, condition = weather['main'], weather['weather'][0]
+            payload['current'] = {
+                'time': weather['dt'], 'interval': 900,
+                'temperature_2m': main['temp'], 'relative_humidity_2m': main['humidity'],
+                'apparent_temperature': main['feels_like'], 'is_day': int(condition['icon'].endswith('d')),
+                'weather_code': wmo_code(condition['id']), 'pressure_msl': main['pressure'],
+                'wind_speed_10m': weather['wind']['speed'], 'wind_direction_10m': weather['wind'].get('deg'),
+                'visibility': weather.get('visibility'),
+            }
+            payload['daily'] = {'time': [weather['dt'] - weather['dt'] % 86400],
+                                'sunrise': [weather['sys']['sunrise']], 'sunset': [weather['sys']['sunset']]}
+        if 'hourly' in query:
+            hourly = {name: [] for name in ('time', 'temperature_2m', 'relative_humidity_2m', 'apparent_temperature',
+                                            'is_day', 'weather_code', 'pressure_msl', 'wind_speed_10m',
+                                            'wind_direction_10m', 'precipitation')}
+            for item in json.loads(self.body('/forecast', lookup))['list']:
+                main, condition = item['main'], item['weather'][0]
+                precipitation = (item.get('rain') or {}).get('3h', 0.0) + (item.get('snow') or {}).get('3h', 0.0)
+                # Each 3-hour item becomes the three hours ending at its timestamp
+                for hours_before in (2, 1, 0):
+                    for name, value in (('time', item['dt'] - 3600 * hours_before), ('temperature_2m', main['temp']),
+                                        ('relative_humidity_2m', main['humidity']),
+                                        ('apparent_temperature', main['feels_like']),
+                                        ('is_day', int(condition['icon'].endswith('d'))),
+                                        ('weather_code', wmo_code(condition['id'])),
+                                        ('pressure_msl', main['pressure']), ('wind_speed_10m', item['wind']['speed']),
+                                        ('wind_direction_10m', item['wind'].get('deg')),
+                                        ('precipitation', round(precipitation / 3, 4))):
+                        hourly[name].append(value)
+            payload['hourly'] = hourly
+        return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    
+    def respond(self, endpoint, query):
+        """
+        Answer one API request
+        
+        Returns:
+            Tuple of (status code, extra headers, body)
+        """
+        self._count('requests', endpoint)
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        if self.in_burst():
+            self._count('rateLimited')
+            return 429, {'Retry-After': '1'}, b'{"cod":429,"message":"Your account is temporary blocked due to exceeding of requests limitation of your subscription type."}'
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._count('errors')
+            return 500, {}, b'{"cod":500,"message":"Internal error"}'
+        if endpoint == '/group':
+            body = self.group_body(query)
+        elif endpoint == '/openmeteo':
+            body = self.open_meteo_body(query)
+        else:
+            body = self.body(endpoint, query)
+        if body is None:
+            self._count('notFound')
+            return 404, {}, b'{"cod":"404","message":"city not found"}'
+        self._count('ok')
+        return 200, {}, body
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    server_version = 'fake-openweathermap'
+    
+    def do_GET(self):
+        url = urlsplit(self.path)
+        fake = self.server.fake
+        if url.path == '/__stats':
+            self.send(200, {}, json.dumps(fake.stats()).encode('utf-8'))
+            return
+        if url.path == OPEN_METEO_PATH:
+            endpoint = '/openmeteo'
+        else:
+            endpoint = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        if endpoint not in ('/weather', '/forecast', '/group', '/openmeteo'):
+            self.send(404, {}, b'{"cod":"404","message":"Internal error"}')
+            return
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.send(*fake.respond(endpoint, query))
+    
+    def do_POST(self):
+        if urlsplit(self.path).path == '/__reset':
+            self.server.fake.reset()
+            self.send(200, {}, b'{}')
+        else:
+            self.send(404, {}, b'{}')
+    
+    def send(self, status_code, headers, body):
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default of 5 drops SYNs under load
+    
+    def handle_error(self, request, client_address):
+        # Clients that cancel a hedged request hang up before the answer
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def create_server(fake, host='127.0.0.1', port=0):
+    """Create a threaded stand-in server (port 0 picks a free port)"""
+    server = FakeServer((host, port), RequestHandler)
+    server.fake = fake
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded OpenWeatherMap payloads for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090, help='0 picks a free port')
+    parser.add_argument('--latency', type=float, default=40.0, help='median response delay in ms')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='log-normal sigma of the delay (0 = fixed)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--burst-every', type=float, default=0.0, help='seconds between 429 bursts (0 = none)')
+    parser.add_argument('--burst-length', type=float, default=0.0, help='seconds each 429 burst lasts')
+    parser.add_argument('--seed', type=int, help='seed for the latency and error draws')
+    parser.add_argument('--city-list', help='city.list.json(.gz) whose IDs are answered like the seed cities')
+    parser.add_argument('--tail-rate', type=float, default=0.0, help='fraction of responses delayed by --tail-latency')
+    parser.add_argument('--tail-latency', type=float, default=0.0, help='extra delay of tail responses in ms')
+    args = parser.parse_args()
+    
+    fake = FakeOpenWeatherMap(args.latency, args.latency_sigma, args.error_rate,
+                              args.burst_every, args.burst_length, args.seed, args.city_list,
+                              args.tail_rate, args.tail_latency)
+    server = create_server(fake, args.host, args.port)
+    host, port = server.server_address[:2]
+    # bench_load.py reads the base URL from this line
+    print(f"OPENWEATHER_BASE_URL=http://{host}:{port}{API_PREFIX}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
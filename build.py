@@ -1,14 +1,306 @@
 #!/usr/bin/env python3
 """
-Build script for Vercel - copies frontend to public directory
+Build script for Vercel and production Flask - copies frontend to public directory,
+bundles and minifies the JS/CSS referenced by index.html into content-hashed files,
+writes .gz/.br siblings and an asset manifest
+
+Usage:
+    python build.py [--source frontend] [--out public] [--no-minify]
 """
-import os
+import argparse
+import gzip
+import hashlib
+import json
+import re
 import shutil
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:  # optional; only .gz siblings are written
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # optional; the built-in conservative minifier is used
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:  # optional; the built-in minifier is used
+    rcssmin = None
+
+MANIFEST_NAME = 'asset-manifest.json'
+HASH_LENGTH = 10  # hex digits of SHA-256 in fingerprinted file names
+COMPRESSIBLE = {'.html', '.js', '.css', '.svg', '.json', '.txt', '.xml', '.map'}
+MIN_COMPRESS_SIZE = 1024  # bytes; smaller files are not worth a request header lookup
+
+# Local stylesheets and scripts referenced by index.html (remote URLs are left alone)
+STYLESHEET_TAG = re.compile(r'[ \t]*<link rel="stylesheet" href="(?!https?:|//)([^"]+)">[ \t]*\n?')
+SCRIPT_TAG = re.compile(r'[ \t]*<script src="(?!https?:|//)([^"]+)"></script>[ \t]*\n?')
+
+# Keywords after which a '/' starts a regular expression rather than a division
+REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+                  'throw', 'case', 'do', 'else', 'yield', 'await'}
+
+
+def _is_word(char):
+    return char.isalnum() or char in '_$' or ord(char) > 127
+
+
+def _skip_string(source, i):
+    """Return the index after the string literal starting at source[i]"""
+    quote = source[i]
+    i += 1
+    depth = 0  # nesting of ${...} inside template literals
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '`':
+            if source.startswith('${', i):
+                depth += 1
+                i += 2
+                continue
+            if char == '}' and depth:
+                depth -= 1
+            elif char == '`' and not depth:
+                return i + 1
+        elif char == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_regex(source, i):
+    """Return the index after the regular expression literal (and flags) starting at source[i]"""
+    i += 1
+    in_class = False
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and _is_word(source[i]):
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """
+    Minify JavaScript conservatively
+    
+    Comments, indentation and blank lines are removed and spaces are kept only
+    between tokens that would otherwise merge. Line breaks are kept wherever
+    automatic semicolon insertion could depend on them, so the output behaves
+    exactly like the input. Uses rjsmin instead when it is installed.
+    
+    Args:
+        source: JavaScript source
+    
+    Returns:
+        Minified source
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    
+    out = []
+    last = ''  # last emitted non-whitespace character
+    last_word = ''  # last emitted identifier or keyword
+    pending = ''  # whitespace seen since the last token: '', ' ' or '\n'
+    i = 0
+    n = len(source)
+    
+    def emit(token):
+        nonlocal last, pending
+        if pending == '\n' and last and last not in '{;,([' and token[0] not in ')]},;':
+            out.append('\n')
+        elif pending and last and (
+                (_is_word(last) and _is_word(token[0]))
+                or (last in '+-/' and token[0] == last)):
+            out.append(' ')
+        out.append(token)
+        last = token[-1]
+        pending = ''
+    
+    while i < n:
+        char = source[i]
+        if char in ' \t\r\n\f\v':
+            if char == '\n' or pending == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = n if end < 0 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if '\n' in source[i:end]:
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i = end
+        elif char in '"\'`':
+            end = _skip_string(source, i)
+            emit(source[i:end])
+            last_word = ''
+            i = end
+        elif char == '/' and (not last or last in '(,=:[!&|?{};+-*%<>~^' or
+                              (_is_word(last) and last_word in REGEX_KEYWORDS)):
+            end = _skip_regex(source, i)
+            emit(source[i:end])
+            last_word = ''
+            i = end
+        elif _is_word(char):
+            end = i + 1
+            while end < n and _is_word(source[end]):
+                end += 1
+            last_word = source[i:end]
+            emit(last_word)
+            i = end
+        else:
+            emit(char)
+            last_word = ''
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """
+    Minify CSS
+    
+    Removes comments and redundant whitespace and the last semicolon of each
+    block; string contents and spaces that separate selector parts or values
+    are kept. Uses rcssmin instead when it is installed.
+    
+    Args:
+        source: CSS source
+    
+    Returns:
+        Minified source
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    
+    out = []
+    i = 0
+    n = len(source)
+    pending = False
+    while i < n:
+        char = source[i]
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if char.isspace():
+            pending = True
+            i += 1
+            continue
+        if char in '"\'':
+            end = _skip_string(source, i)
+            token = source[i:end]
+            i = end
+        else:
+            token = char
+            i += 1
+        previous = out[-1][-1] if out else ''
+        if pending and previous and previous not in '{};,:>' and token not in '{};,>' and token != '!':
+            out.append(' ')
+        pending = False
+        if token == '}' and previous == ';':
+            out[-1] = out[-1][:-1]
+        out.append(token)
+    return ''.join(out) + '\n'
+
+
+def fingerprint(content):
+    """Short content hash used in file names"""
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def bundle(public_dir, html, tag, kind, minify, separator):
+    """
+    Replace the local assets matched by tag with one fingerprinted bundle
+    
+    Args:
+        public_dir: Build output directory
+        html: index.html contents
+        tag: Pattern matching a local asset tag; group 1 is the path
+        kind: 'js' or 'css'
+        minify: Minifier function, or None to concatenate only
+        separator: Text placed between concatenated files
+    
+    Returns:
+        Tuple of (rewritten html, manifest entry or None)
+    """
+    matches = list(tag.finditer(html))
+    if not matches:
+        return html, None
+    
+    sources = [match.group(1) for match in matches]
+    parts = []
+    for source in sources:
+        path = public_dir / source
+        text = path.read_text(encoding='utf-8')
+        parts.append(minify(text) if minify else text)
+        path.unlink()
+    content = separator.join(parts).encode('utf-8')
+    
+    name = f"{kind}/app.{fingerprint(content)}.{kind}"
+    (public_dir / name).parent.mkdir(parents=True, exist_ok=True)
+    (public_dir / name).write_bytes(content)
+    
+    indent = re.match(r'[ \t]*', matches[0].group(0)).group(0)
+    if kind == 'js':
+        replacement = f'{indent}<script src="{name}"></script>\n'
+    else:
+        replacement = f'{indent}<link rel="stylesheet" href="{name}">\n'
+    # The bundle takes the place of the first tag; the others are dropped
+    html = html[:matches[0].start()] + replacement + tag.sub('', html[matches[0].end():])
+    return html, {'file': name, 'sources': sources, 'size': len(content)}
+
+
+def precompress(public_dir):
+    """
+    Write .gz (and .br when brotli is installed) siblings for text files
+    
+    Returns:
+        Number of files compressed
+    """
+    count = 0
+    for path in sorted(public_dir.rglob('*')):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE:
+            continue
+        content = path.read_bytes()
+        if len(content) < MIN_COMPRESS_SIZE:
+            continue
+        path.with_name(path.name + '.gz').write_bytes(gzip.compress(content, 9, mtime=0))
+        if brotli is not None:
+            path.with_name(path.name + '.br').write_bytes(brotli.compress(content, quality=11))
+        count += 1
+    return count
+
+
 def main():
-    frontend_dir = Path("frontend")
-    public_dir = Path("public")
+    parser = argparse.ArgumentParser(description='Build the frontend into a deployable directory')
+    parser.add_argument('--source', default='frontend', help='frontend source directory')
+    parser.add_argument('--out', default='public', help='output directory')
+    parser.add_argument('--no-minify', action='store_true', help='bundle without minifying')
+    args = parser.parse_args()
+    
+    frontend_dir = Path(args.source)
+    public_dir = Path(args.out)
     
     if not frontend_dir.exists():
         print("Error: frontend directory not found")
@@ -27,9 +319,27 @@ def main():
         else:
             shutil.copy2(item, dest)
     
-    print("Build complete! Frontend files copied to public/")
+    # Bundle, minify and fingerprint the assets index.html loads
+    index_path = public_dir / 'index.html'
+    html = index_path.read_text(encoding='utf-8')
+    html, css = bundle(public_dir, html, STYLESHEET_TAG, 'css', None if args.no_minify else minify_css, '\n')
+    html, js = bundle(public_dir, html, SCRIPT_TAG, 'js', None if args.no_minify else minify_js, ';\n')
+    index_path.write_text(html, encoding='utf-8')
+    
+    manifest = {'files': {}}
+    for logical, entry in (('css/app.css', css), ('js/app.js', js)):
+        if entry:
+            manifest['files'][logical] = entry
+    manifest['immutable'] = sorted(entry['file'] for entry in manifest['files'].values())
+    (public_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    
+    compressed = precompress(public_dir)
+    
+    for logical, entry in manifest['files'].items():
+        print(f"  {logical} -> {entry['file']} ({len(entry['sources'])} files, {entry['size']} bytes)")
+    print(f"  {compressed} files precompressed ({'gzip + brotli' if brotli else 'gzip'})")
+    print(f"Build complete! Frontend built into {public_dir}/")
     return 0
 
 if __name__ == "__main__":
     exit(main())
-
@@ -0,0 +1,35 @@
+"""
+Weather API Application - Gunicorn Settings
+Loaded automatically by gunicorn when started from the repository root
+(see Procfile). Only the worker lifecycle hooks are set; pass everything
+else on the command line as before.
+"""
+
+import sys
+
+
+def _prewarmer():
+    """The worker's Prewarmer, if app.py has been imported and prewarming is on"""
+    app_module = sys.modules.get('app')
+    return getattr(app_module, 'prewarmer', None)
+
+
+def when_ready(server):
+    """With preload_app the app is imported in the master, which serves no requests: stop its thread"""
+    prewarmer = _prewarmer()
+    if prewarmer is not None:
+        prewarmer.stop()
+
+
+def post_fork(server, worker):
+    """Restart prewarming in the worker: threads started before a preload fork do not survive it"""
+    prewarmer = _prewarmer()
+    if prewarmer is not None:
+        prewarmer.start()
+
+
+def worker_exit(server, worker):
+    """Stop prewarming before the worker exits (shutdown, max_requests recycling, reload)"""
+    prewarmer = _prewarmer()
+    if prewarmer is not None:
+        prewarmer.stop()
@@ -0,0 +1,102 @@
+"""
+Shared fixtures for the backend tests
+
+Nothing here opens a network connection: upstream calls are replaced with
+in-process fakes and time is driven by a manual clock.
+"""
+
+import json
+import os
+import types
+import pytest
+import requests
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'data')
+
+
+class FakeClock:
+    """Manually advanced stand-in for the time module"""
+    
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+        self.sleeps = []
+    
+    def time(self) -> float:
+        return self.now
+    
+    monotonic = time
+    
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+    
+    def sleep(self, seconds: float) -> None:
+        """Record the delay and advance instead of blocking"""
+        self.sleeps.append(seconds)
+        self.advance(seconds)
+    
+    def install(self, monkeypatch, *modules: types.ModuleType) -> 'FakeClock':
+        """Replace the `time` global of each module with this clock"""
+        for module in modules:
+            monkeypatch.setattr(module, 'time', self)
+        return self
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """A FakeClock; tests install it into the modules they exercise"""
+    return FakeClock()
+
+
+class FakeResponse:
+    """Minimal requests.Response for WeatherService._make_request"""
+    
+    def __init__(self, status_code: int = 200, payload: object = None, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload if payload is not None else {}
+        self.content = json.dumps(self._payload).encode('utf-8')
+    
+    def json(self) -> object:
+        return self._payload
+    
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} Error', response=self)
+    
+    def close(self) -> None:
+        pass
+
+
+class FakeSession:
+    """
+    requests.Session stand-in answering from a script
+    
+    Each call takes the next response (or raises the next exception); the
+    last one is repeated once the script runs out.
+    """
+    
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+    
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, dict(params or {})))
+        item = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        if isinstance(item, BaseException):
+            raise item
+        return item
+    
+    def close(self) -> None:
+        pass
+
+
+def load_payload(name: str) -> dict:
+    """Recorded OpenWeatherMap payload from benchmarks/data"""
+    with open(os.path.join(DATA_DIR, f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def london_weather() -> dict:
+    """Recorded /weather payload for London"""
+    return load_payload('weather_london')
@@ -0,0 +1,269 @@
+"""
+Weather API Application - Redis Stand-in Server
+Speaks enough RESP2 over TCP for backend/redis_cache.py, so RedisCache can be
+tested without a Redis server
+
+Supported commands: PING, AUTH, SELECT, GET, SET (EX/PX/NX), DEL, SCAN
+(MATCH/COUNT), DBSIZE and FLUSHALL, with one keyspace per database and
+expiry checked on access; anything else gets an error reply.
+drop_connections() closes every client socket to exercise reconnects.
+
+Run on its own for manual checks (WEATHER_CACHE_URL=redis://127.0.0.1:6390/0):
+    python -m tests.fake_redis [--port 6390] [--password secret]
+"""
+
+import argparse
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class SimpleString(bytes):
+    """Reply sent as a RESP simple string (+OK) rather than a bulk string"""
+
+
+class ReplyError(Exception):
+    """Reply sent as a RESP error (-ERR ...)"""
+
+
+def encode_reply(reply: Any) -> bytes:
+    """Encode a reply value as RESP2"""
+    if isinstance(reply, ReplyError):
+        return b'-%s\r\n' % str(reply).encode('utf-8')
+    if isinstance(reply, SimpleString):
+        return b'+%s\r\n' % reply
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(encode_reply(item) for item in reply)
+    raise TypeError(f"Cannot encode {type(reply).__name__}")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: read command arrays and answer them in order"""
+    
+    def handle(self) -> None:
+        fake: FakeRedis = self.server.fake
+        fake._opened(self.connection)
+        session = {'db': 0, 'authenticated': fake.password is None}
+        try:
+            while True:
+                args = self._read_command()
+                if args is None:
+                    return
+                try:
+                    reply = fake.execute(session, args)
+                except ReplyError as e:
+                    reply = e
+                self.wfile.write(encode_reply(reply))
+        except (OSError, ValueError):
+            return  # dropped by drop_connections() or a malformed request
+        finally:
+            fake._closed(self.connection)
+    
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if line[:1] != b'*':
+            raise ValueError('Only RESP arrays are supported')
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = self.rfile.readline()
+            if header[:1] != b'$':
+                raise ValueError('Expected a bulk string')
+            args.append(self.rfile.read(int(header[1:-2]) + 2)[:-2])
+        return args
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    fake: 'FakeRedis'
+
+
+class FakeRedis:
+    """
+    In-process Redis stand-in listening on 127.0.0.1
+    
+    Keys live in memory per database as (value, expires at) pairs; time
+    comes from `clock` (Unix seconds), so tests can expire keys without
+    sleeping. `commands` counts the commands received by name.
+    """
+    
+    def __init__(self, port: int = 0, password: Optional[str] = None, clock: Callable[[], float] = time.time):
+        """
+        Initialize FakeRedis
+        
+        Args:
+            port: TCP port (0 picks a free one)
+            password: Password AUTH must present (None accepts any client)
+            clock: Function returning the current Unix time
+        """
+        self.password = password
+        self.clock = clock
+        self.databases: Dict[int, Dict[bytes, Tuple[bytes, Optional[float]]]] = {}
+        self.commands: Counter = Counter()
+        self._lock = threading.Lock()
+        self._connections: Set[socket.socket] = set()
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.fake = self
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+    
+    def url(self, db: int = 0) -> str:
+        """redis:// URL of this server"""
+        auth = f':{self.password}@' if self.password else ''
+        return f'redis://{auth}127.0.0.1:{self.port}/{db}'
+    
+    def start(self) -> 'FakeRedis':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name='fake-redis', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Stop serving and close every connection"""
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+    
+    def drop_connections(self) -> None:
+        """Close every client connection, as a server restart or idle timeout would"""
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def _opened(self, conn: socket.socket) -> None:
+        with self._lock:
+            self._connections.add(conn)
+    
+    def _closed(self, conn: socket.socket) -> None:
+        with self._lock:
+            self._connections.discard(conn)
+    
+    def keys(self, db: int = 0) -> List[bytes]:
+        """Unexpired keys of a database, sorted"""
+        with self._lock:
+            return sorted(key for key in list(self._keyspace(db)) if self._live(db, key) is not None)
+    
+    def _keyspace(self, db: int) -> Dict[bytes, Tuple[bytes, Optional[float]]]:
+        return self.databases.setdefault(db, {})
+    
+    def _live(self, db: int, key: bytes) -> Optional[bytes]:
+        """Return a key's value, dropping it if it has expired (lock held)"""
+        item = self._keyspace(db).get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= self.clock():
+            del self._keyspace(db)[key]
+            return None
+        return value
+    
+    def execute(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        """
+        Run one command for a connection
+        
+        Args:
+            session: Per-connection state ('db', 'authenticated')
+            args: Command name and arguments
+        
+        Returns:
+            Reply value for encode_reply
+        
+        Raises:
+            ReplyError: For unknown commands and invalid arguments
+        """
+        if not args:
+            raise ReplyError('ERR empty command')
+        name = args[0].decode('latin-1').upper()
+        self.commands[name] += 1
+        if name == 'AUTH':
+            if self.password is None or args[-1].decode('utf-8') != self.password:
+                raise ReplyError('WRONGPASS invalid username-password pair or user is disabled.')
+            session['authenticated'] = True
+            return SimpleString(b'OK')
+        if not session['authenticated']:
+            raise ReplyError('NOAUTH Authentication required.')
+        handler = getattr(self, f'_cmd_{name.lower()}', None)
+        if handler is None:
+            raise ReplyError(f"ERR unknown command '{name}'")
+        with self._lock:
+            return handler(session, args[1:])
+    
+    def _cmd_ping(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        return SimpleString(b'PONG')
+    
+    def _cmd_select(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        session['db'] = int(args[0])
+        return SimpleString(b'OK')
+    
+    def _cmd_get(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        return self._live(session['db'], args[0])
+    
+    def _cmd_set(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires_at = None
+        for unit, scale in ((b'EX', 1.0), (b'PX', 0.001)):
+            if unit in options:
+                expires_at = self.clock() + int(args[2 + options.index(unit) + 1]) * scale
+        if b'NX' in options and self._live(session['db'], key) is not None:
+            return None
+        self._keyspace(session['db'])[key] = (value, expires_at)
+        return SimpleString(b'OK')
+    
+    def _cmd_del(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        removed = 0
+        for key in args:
+            removed += self._live(session['db'], key) is not None
+            self._keyspace(session['db']).pop(key, None)
+        return removed
+    
+    def _cmd_scan(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        cursor, options = int(args[0]), [arg.upper() for arg in args[1:]]
+        pattern = args[1 + options.index(b'MATCH') + 1].decode('latin-1') if b'MATCH' in options else '*'
+        count = int(args[1 + options.index(b'COUNT') + 1]) if b'COUNT' in options else 10
+        keys = sorted(key for key in list(self._keyspace(session['db'])) if self._live(session['db'], key) is not None)
+        page = keys[cursor:cursor + count]
+        following = cursor + count if cursor + count < len(keys) else 0
+        return [str(following).encode('ascii'), [key for key in page if fnmatch.fnmatchcase(key.decode('latin-1'), pattern)]]
+    
+    def _cmd_dbsize(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        return sum(1 for key in list(self._keyspace(session['db'])) if self._live(session['db'], key) is not None)
+    
+    def _cmd_flushall(self, session: Dict[str, Any], args: List[bytes]) -> Any:
+        self.databases.clear()
+        return SimpleString(b'OK')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=6390)
+    parser.add_argument('--password')
+    args = parser.parse_args()
+    server = FakeRedis(args.port, args.password)
+    print(f"Fake Redis listening on {server.url()}", flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Tests for the framework-free route table and the Vercel handler built on it"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+from backend.api_core import ApiRequest, WeatherApi, route_key
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Factory:
+    """Service factory counting how often it is called"""
+    
+    def __init__(self, *script):
+        self.script = script or (FakeResponse(200, load_payload('weather_london')),)
+        self.calls = 0
+    
+    def __call__(self) -> WeatherService:
+        self.calls += 1
+        return WeatherService('test-key', session=FakeSession(*self.script), max_retries=0)
+
+
+def request(path, method='GET', headers=None, body=None, **query) -> ApiRequest:
+    return ApiRequest(method, path, query, headers or {}, body)
+
+
+@pytest.mark.parametrize('path, key', [
+    ('/api/weather/current', '/weather/current'),
+    ('/weather/current/', '/weather/current'),
+    ('/api/health?verbose=1', '/health'),
+    ('/apiweather', '/apiweather'),
+])
+def test_route_key_strips_the_api_prefix(path, key):
+    assert route_key(path) == key
+
+
+@pytest.mark.parametrize('req, status', [
+    (request('/api/weather/current', method='OPTIONS'), 200),
+    (request('/api/nowhere'), 404),
+    (request('/api/weather/current'), 400),
+    (request('/api/weather/forecast', city='<script>'), 400),
+    (request('/api/weather/current', lat='91', lon='0'), 400),
+    (request('/api/weather/history', city='London', series='hourly'), 400),
+])
+def test_preflights_unknown_paths_and_invalid_input_skip_the_service(req, status):
+    factory = Factory()
+    api = WeatherApi(factory)
+    
+    assert api.dispatch(req).status == status
+    assert factory.calls == 0
+
+
+def test_service_is_created_once_on_first_use():
+    factory = Factory()
+    api = WeatherApi(factory)
+    
+    first = api.dispatch(request('/api/weather/current', city='London'))
+    second = api.dispatch(request('/weather/current', city='London', unit='imperial'))
+    
+    assert first.status == second.status == 200
+    assert json.loads(first.body)['data']['city'] == 'London'
+    assert factory.calls == 1
+    assert len(api.service.session.calls) == 1  # imperial is converted from the cached metric entry
+
+
+def test_current_weather_answers_304_for_a_matching_etag():
+    api = WeatherApi(Factory())
+    first = api.dispatch(request('/api/weather/current', city='London'))
+    
+    second = api.dispatch(request('/api/weather/current', headers={'if-none-match': first.headers['ETag']},
+                                  city='London'))
+    assert second.status == 304 and second.body == ''
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_upstream_errors_are_mapped():
+    api = WeatherApi(Factory(FakeResponse(404, {'cod': '404', 'message': 'city not found'})))
+    response = api.dispatch(request('/api/weather/current', city='Atlantis'))
+    
+    assert response.status == 404
+    assert response.body['success'] is False
+
+
+def test_batch_accepts_a_raw_json_body():
+    api = WeatherApi(Factory())
+    response = api.dispatch(request('/api/weather/batch', method='POST', body='{"cities": ["London"], "unit": "imperial"}'))
+    
+    assert response.status == 200 and response.headers['Content-Type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.body.splitlines()]
+    assert len(rows) == 1 and rows[0]['success'] is True and rows[0]['unit'] == 'imperial'
+
+
+def test_suggest_uses_the_city_index():
+    api = WeatherApi(Factory())
+    response = api.dispatch(request('/api/cities/suggest', prefix='lon', limit='1'))
+    
+    assert response.status == 200
+    assert [city['name'] for city in response.body['data']] == ['London']
+
+
+@pytest.fixture
+def index(monkeypatch):
+    """api/index.py with its WeatherApi backed by a scripted session"""
+    module = pytest.importorskip('api.index')
+    factory = Factory()
+    monkeypatch.setattr(module, 'api', WeatherApi(factory))
+    monkeypatch.setattr(module, 'factory', factory, raising=False)
+    return module
+
+
+def test_handler_routes_vercel_requests(index):
+    response = index.handler({'url': '/api/weather/current?city=London&unit=imperial', 'method': 'GET'})
+    
+    assert response['statusCode'] == 200
+    assert response['headers']['Access-Control-Allow-Origin'] == '*'
+    assert response['headers']['Content-Type'] == 'application/json'
+    assert json.loads(response['body'])['data']['city'] == 'London'
+    
+    response = index.handler({'path': '/weather/current', 'httpMethod': 'GET', 'queryStringParameters': {}})
+    assert response['statusCode'] == 400
+    assert json.loads(response['body']) == {'success': False, 'error': 'City parameter is required'}
+    assert index.factory.calls == 1
+
+
+def test_handler_import_loads_neither_flask_nor_the_http_client():
+    code = ("import sys, api.index; "
+            "print(sorted(m for m in ('flask', 'requests', 'backend.weather_service') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True,
+                            check=True)
+    assert result.stdout.strip() == '[]'
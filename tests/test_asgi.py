@@ -0,0 +1,64 @@
+"""Tests for the native ASGI route dispatch"""
+
+import asyncio
+import pytest
+from backend.profiling import Profiler, phase
+from backend.weather_service import CityNotFoundError
+
+asgi = pytest.importorskip('asgi')
+
+
+def call(path: str, query: bytes = b'', headers=()) -> list:
+    """Run one GET request through asgi.app and return the sent messages"""
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': list(headers)}
+    sent = []
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    
+    async def send(message):
+        sent.append(message)
+    
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent
+
+
+@pytest.fixture
+def lookup(monkeypatch):
+    """Replace the async current-weather lookup with one that awaits inside a profiled phase"""
+    async def get_current_weather_body(city, unit='metric', encoding=None):
+        with phase('upstream'):
+            await asyncio.sleep(0.01)
+        raise CityNotFoundError()
+    
+    monkeypatch.setattr(asgi.async_weather_service, 'get_current_weather_body', get_current_weather_body)
+
+
+def test_debug_header_returns_server_timing(monkeypatch, lookup):
+    monkeypatch.setattr(asgi, 'profiler', Profiler(token='secret', slow_ms=0))
+    
+    start = call('/api/weather/current', b'city=London', [(b'x-debug-profile', b'secret')])[0]
+    
+    headers = dict(start['headers'])
+    assert start['status'] == 404
+    timing = dict(part.split(';dur=') for part in headers[b'server-timing'].decode('latin-1').split(', '))
+    assert float(timing['upstream']) >= 5
+    assert float(timing['total']) >= float(timing['upstream'])
+
+
+def test_server_timing_needs_the_token(monkeypatch, lookup):
+    monkeypatch.setattr(asgi, 'profiler', Profiler(token='secret', slow_ms=0))
+    
+    start = call('/api/weather/current', b'city=London', [(b'x-debug-profile', b'guess')])[0]
+    
+    assert b'server-timing' not in dict(start['headers'])
+
+
+def test_slow_requests_are_logged(monkeypatch, lookup, caplog):
+    monkeypatch.setattr(asgi, 'profiler', Profiler(slow_ms=1))
+    
+    with caplog.at_level('WARNING', logger='backend.profiling'):
+        call('/api/weather/current', b'city=London')
+    
+    assert 'slow request GET /api/weather/current 404' in caplog.text
+    assert 'upstream=' in caplog.text
@@ -0,0 +1,128 @@
+"""Tests that AsyncWeatherService keeps blocking backends off the event loop"""
+
+import asyncio
+import threading
+import time
+from backend.async_weather_service import AsyncWeatherService
+from backend.cache import ResponseCache
+from backend.history import HistoryStore
+from backend.spatial import Coordinates
+
+
+class SlowCache(ResponseCache):
+    """Memory cache that stalls like a slow shared backend and records the calling threads"""
+    
+    blocking = True
+    
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.threads = set()
+    
+    def _load(self, key):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super()._load(key)
+    
+    def _store(self, key, entry):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        super()._store(key, entry)
+
+
+class SlowHistory(HistoryStore):
+    """History store whose appends stall like a slow disk and record the calling threads"""
+    
+    def __init__(self, root: str, delay: float):
+        super().__init__(root)
+        self.delay = delay
+        self.threads = set()
+    
+    def append(self, series, location, samples):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super().append(series, location, samples)
+
+
+async def fake_fetch(endpoint, query):
+    return {'temperature': 20.0, 'coord': {'lat': 51.5, 'lon': -0.12}}
+
+
+async def loop_stall(work) -> float:
+    """Run work while a ticker measures the longest gap between event loop iterations"""
+    longest = 0.0
+    done = False
+    
+    async def tick():
+        nonlocal longest
+        last = time.monotonic()
+        while not done:
+            await asyncio.sleep(0.005)
+            now = time.monotonic()
+            longest = max(longest, now - last)
+            last = now
+    
+    ticker = asyncio.ensure_future(tick())
+    try:
+        await work
+    finally:
+        done = True
+        await ticker
+    return longest
+
+
+def test_blocking_cache_calls_run_in_worker_threads():
+    cache = SlowCache(0.1)
+    service = AsyncWeatherService('test-key', cache=cache)
+    service._fetch = fake_fetch
+    
+    async def scenario():
+        stall = await loop_stall(asyncio.gather(
+            service.get_current_weather_result('Nowhere Special'),
+            service.get_current_weather_body(Coordinates(51.5, -0.12)),
+        ))
+        await service.aclose()
+        return stall, threading.get_ident()
+    
+    stall, loop_thread = asyncio.run(scenario())
+    assert cache.threads and loop_thread not in cache.threads
+    assert stall < 0.08
+
+
+def test_memory_cache_stays_on_the_event_loop():
+    cache = ResponseCache()
+    service = AsyncWeatherService('test-key', cache=cache)
+    service._fetch = fake_fetch
+    calls = []
+    original = cache._load
+    cache._load = lambda key: calls.append(threading.get_ident()) or original(key)
+    
+    async def scenario():
+        await service.get_current_weather_result('Nowhere Special')
+        return threading.get_ident()
+    
+    loop_thread = asyncio.run(scenario())
+    assert calls and set(calls) == {loop_thread}
+
+
+def test_history_appends_run_on_the_writer_thread_and_are_flushed(tmp_path):
+    history = SlowHistory(str(tmp_path), 0.1)
+    service = AsyncWeatherService('test-key', history=history)
+    
+    async def observation(endpoint, query):
+        return {'temperature': 20.0, 'humidity': 60, 'pressure': 1012, 'windSpeed': 3.5}
+    
+    service._fetch = observation
+    
+    async def scenario():
+        stall = await loop_stall(asyncio.gather(
+            service.get_current_weather_result('Nowhere Special'),
+            service.get_current_weather_result('Somewhere Else'),
+        ))
+        await service.aclose()
+        return stall, threading.get_ident()
+    
+    stall, loop_thread = asyncio.run(scenario())
+    assert len(history.threads) == 1 and loop_thread not in history.threads
+    assert stall < 0.08
+    assert history.get_stats()['appended'] == 2
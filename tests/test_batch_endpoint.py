@@ -0,0 +1,76 @@
+"""Tests for the streaming NDJSON batch endpoint"""
+
+import json
+import pytest
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+app_module = pytest.importorskip('app')
+
+CITY_IDS = {2643743: 'weather_london', 4887398: 'weather_chicago', 1275339: 'weather_mumbai'}
+
+
+class CitySession(FakeSession):
+    """Answers by city ID; names the seed index does not know get a 404"""
+    
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, dict(params or {})))
+        if params.get('id') in CITY_IDS:
+            return FakeResponse(200, load_payload(CITY_IDS[params['id']]))
+        return FakeResponse(404, {'cod': '404', 'message': 'city not found'})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Flask test client backed by a fresh service answering per city"""
+    service = WeatherService('test-key', session=CitySession(), max_retries=0)
+    monkeypatch.setattr(app_module, 'weather_service', service)
+    client = app_module.app.test_client()
+    client.service = service
+    yield client
+    service.close()
+
+
+def read_lines(response) -> list:
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode('utf-8').splitlines()
+    # Every line parses on its own, without the rest of the stream
+    return [json.loads(line) for line in lines]
+
+
+def test_each_line_is_a_standalone_json_row(client):
+    rows = read_lines(client.get('/api/weather/batch?cities=London,Chicago,Mumbai&unit=imperial'))
+    
+    assert sorted(row['index'] for row in rows) == [0, 1, 2]
+    for row in rows:
+        assert row['success'] is True and row['unit'] == 'imperial'
+        assert row['data']['city'] == row['city']
+
+
+def test_one_failing_city_does_not_abort_the_stream(client):
+    response = client.post('/api/weather/batch', json={
+        'cities': ['London', 'Atlantis', {'city': 'Mumbai', 'unit': 'imperial'}, '<script>'],
+    })
+    rows = {row['index']: row for row in read_lines(response)}
+    
+    assert len(rows) == 4
+    assert rows[0]['success'] is True and rows[2]['success'] is True and rows[2]['unit'] == 'imperial'
+    assert rows[1]['success'] is False and rows[1]['status'] == 404
+    assert rows[3]['success'] is False and rows[3]['status'] == 400
+
+
+def test_city_limit_is_enforced(client, monkeypatch):
+    monkeypatch.setattr(client.service, 'MAX_BATCH_SIZE', 2)
+    
+    response = client.get('/api/weather/batch?cities=London,Chicago,Mumbai')
+    
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'error': 'At most 2 cities per batch'}
+    assert client.service.session.calls == []
+    assert read_lines(client.get('/api/weather/batch?cities=London,Chicago'))
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.get('/api/weather/batch?cities=').status_code == 400
+    assert client.post('/api/weather/batch', json={'cities': []}).status_code == 400
@@ -0,0 +1,172 @@
+"""Tests for micro-batching concurrent current-weather lookups into /group calls"""
+
+import asyncio
+import threading
+import time
+import pytest
+from backend import cache as cache_module
+from backend.async_weather_service import AsyncWeatherService
+from backend.batching import MISSING, AsyncMicroBatcher, MicroBatcher
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+CITIES = {'London': 2643743, 'Chicago': 4887398, 'Mumbai': 1275339}
+
+
+def run_threads(target, items) -> dict:
+    """Call target(item) in one thread per item and collect results or exceptions"""
+    results = {}
+    
+    def call(item):
+        try:
+            results[item] = target(item)
+        except Exception as e:
+            results[item] = e
+    
+    threads = [threading.Thread(target=call, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def group_payload(*names: str) -> dict:
+    return {'cnt': len(names), 'list': [load_payload(f'weather_{name.lower()}') for name in names]}
+
+
+@pytest.fixture
+def clocked(clock, monkeypatch):
+    # Cache timestamps only; the batch window itself waits in real time
+    return clock.install(monkeypatch, cache_module)
+
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+    
+    def fetch_many(items):
+        calls.append(sorted(items))
+        return {item: item * 10 for item in items}
+    
+    batcher = MicroBatcher(fetch_many, window=0.1, max_size=50)
+    results = run_threads(batcher.submit, [1, 2, 3, 4])
+    
+    assert results == {1: 10, 2: 20, 3: 30, 4: 40}
+    assert calls == [[1, 2, 3, 4]]
+    stats = batcher.get_stats()
+    assert (stats['batches'], stats['items'], stats['meanSize'], stats['full']) == (1, 4, 4.0, 0)
+
+
+def test_full_batch_is_sent_before_the_window_ends():
+    batcher = MicroBatcher(lambda items: {item: item for item in items}, window=10, max_size=3)
+    started = time.monotonic()
+    
+    assert run_threads(batcher.submit, [1, 2, 3]) == {1: 1, 2: 2, 3: 3}
+    assert time.monotonic() - started < 5
+    assert batcher.get_stats()['full'] == 1
+
+
+def test_items_left_out_are_missing_and_errors_reach_every_caller():
+    batcher = MicroBatcher(lambda items: {1: 'one'}, window=0.05, max_size=10)
+    assert run_threads(batcher.submit, [1, 2]) == {1: 'one', 2: MISSING}
+    
+    def failing(items):
+        raise RuntimeError('upstream down')
+    
+    batcher = MicroBatcher(failing, window=0.05, max_size=10)
+    results = run_threads(batcher.submit, [1, 2, 3])
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results.values())
+
+
+def test_window_and_size_must_be_positive():
+    with pytest.raises(ValueError):
+        MicroBatcher(lambda items: {}, window=0, max_size=1)
+
+
+def test_async_callers_share_one_call_and_survive_a_cancelled_peer():
+    calls = []
+    
+    async def fetch_many(items):
+        calls.append(sorted(items))
+        await asyncio.sleep(0.02)
+        return {item: -item for item in items}
+    
+    async def scenario():
+        batcher = AsyncMicroBatcher(fetch_many, window=0.01, max_size=50)
+        tasks = [asyncio.ensure_future(batcher.submit(item)) for item in (1, 2, 3)]
+        await asyncio.sleep(0.015)  # flushed; the call is running
+        tasks[0].cancel()
+        return await asyncio.gather(*tasks[1:])
+    
+    assert asyncio.run(scenario()) == [-2, -3]
+    assert calls == [[1, 2, 3]]
+
+
+def test_async_full_batch_and_errors():
+    async def failing(items):
+        raise RuntimeError('upstream down')
+    
+    async def scenario():
+        batcher = AsyncMicroBatcher(failing, window=10, max_size=2)
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True), 5)
+    
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_concurrent_lookups_make_a_single_group_request(clocked):
+    session = FakeSession(FakeResponse(200, group_payload('London', 'Chicago', 'Mumbai')))
+    service = WeatherService('test-key', session=session, group_window=0.1, group_max_size=20, max_retries=0)
+    
+    results = run_threads(service.get_current_weather, list(CITIES))
+    
+    assert [url.rsplit('/', 1)[1] for url, _ in session.calls] == ['group']
+    assert sorted(session.calls[0][1]['id'].split(',')) == sorted(str(city_id) for city_id in CITIES.values())
+    assert {name: result['city'] for name, result in results.items()} == {name: name for name in CITIES}
+    assert service.get_grouping_stats()['batches'] == 1
+
+
+def test_city_missing_from_the_group_falls_back_to_its_own_call(clocked):
+    session = FakeSession(
+        FakeResponse(200, group_payload('London', 'Chicago')),
+        FakeResponse(200, load_payload('weather_mumbai')),
+    )
+    service = WeatherService('test-key', session=session, group_window=0.1, group_max_size=20, max_retries=0)
+    
+    results = run_threads(service.get_current_weather, list(CITIES))
+    
+    assert [url.rsplit('/', 1)[1] for url, _ in session.calls] == ['group', 'weather']
+    assert session.calls[1][1]['id'] == CITIES['Mumbai']
+    assert results['Mumbai']['city'] == 'Mumbai'
+
+
+def test_single_lookup_skips_the_group_call(clocked):
+    session = FakeSession(FakeResponse(200, load_payload('weather_london')))
+    service = WeatherService('test-key', session=session, group_window=0.01, max_retries=0)
+    
+    assert service._fetch_group([CITIES['London']]) == {}
+    assert service.get_current_weather('London')['city'] == 'London'
+    assert [url.rsplit('/', 1)[1] for url, _ in session.calls] == ['weather']
+
+
+def test_async_service_groups_concurrent_lookups():
+    service = AsyncWeatherService('test-key', group_window=0.02, group_max_size=20)
+    calls = []
+    
+    async def make_request(endpoint, params, provider=None):
+        calls.append((endpoint, params))
+        return group_payload('London', 'Chicago', 'Mumbai')
+    
+    service._make_request = make_request
+    
+    async def scenario():
+        try:
+            return await asyncio.gather(*(service.get_current_weather(city) for city in CITIES))
+        finally:
+            await service.aclose()
+    
+    results = asyncio.run(scenario())
+    assert [endpoint for endpoint, _ in calls] == ['/group']
+    assert [result['city'] for result in results] == list(CITIES)
@@ -0,0 +1,119 @@
+"""Tests for the built-in minifiers and asset bundling in build.py"""
+
+import gzip
+import shutil
+import subprocess
+from pathlib import Path
+import pytest
+import build
+
+FRONTEND_JS = sorted((Path(__file__).resolve().parent.parent / 'frontend' / 'js').glob('*.js'))
+
+
+@pytest.fixture(autouse=True)
+def builtin_minifiers(monkeypatch):
+    """Exercise the fallback minifiers even when rjsmin/rcssmin are installed"""
+    monkeypatch.setattr(build, 'rjsmin', None)
+    monkeypatch.setattr(build, 'rcssmin', None)
+
+
+def test_js_comments_are_stripped():
+    source = "// header\nvar a = 1; /* block\n comment */ var b = 2;\n"
+    assert build.minify_js(source) == "var a=1;var b=2;\n"
+
+
+def test_js_strings_and_regexes_survive():
+    source = "var r = /\\/\\/x/g;\nvar s = '// not a comment /* */';\n"
+    assert build.minify_js(source) == "var r=/\\/\\/x/g;var s='// not a comment /* */';\n"
+
+
+def test_js_division_is_not_a_regex():
+    assert build.minify_js("a = b / c / d;\n").startswith("a=b/c/d;")
+
+
+def test_js_keeps_newlines_that_asi_depends_on():
+    source = "x = y\n++z\nfunction f() {\n  return\n  1\n}\n"
+    assert build.minify_js(source) == "x=y\n++z\nfunction f(){return\n1}\n"
+
+
+def test_js_template_literals_and_unary_operators():
+    source = "var t = `a ${ '}' + `${b}` } c`;\nq = a + +b - -c\n"
+    assert build.minify_js(source) == "var t=`a ${ '}' + `${b}` } c`;q=a+ +b- -c\n"
+
+
+def test_js_keyword_spacing_is_kept():
+    source = "if (x) return typeof y === 'string' ? /a/.test(y) : y instanceof Z\n"
+    assert build.minify_js(source) == "if(x)return typeof y==='string'?/a/.test(y):y instanceof Z\n"
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+@pytest.mark.parametrize('path', FRONTEND_JS, ids=lambda path: path.name)
+def test_minified_frontend_scripts_still_parse(path, tmp_path):
+    minified = tmp_path / path.name
+    minified.write_text(build.minify_js(path.read_text(encoding='utf-8')), encoding='utf-8')
+    result = subprocess.run(['node', '--check', str(minified)], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_css_is_minified_without_changing_meaning():
+    source = (
+        "/* theme */\n"
+        "a > b, c:hover {\n  color: red;\n  margin: 0 auto !important;\n}\n"
+        ".x::after { content: \"a  /* b */\"; }\n"
+        "@media (max-width: 600px) {\n  .y { padding: 0; }\n}\n"
+    )
+    assert build.minify_css(source) == (
+        'a>b,c:hover{color:red;margin:0 auto!important}'
+        '.x::after{content:"a  /* b */"}'
+        '@media (max-width:600px){.y{padding:0}}\n'
+    )
+
+
+def test_css_descendant_pseudo_selector_keeps_its_space():
+    # "a :hover" matches hovered descendants of a; "a:hover" matches a itself
+    assert build.minify_css("a :hover { color: red }").startswith("a :hover{")
+
+
+def test_bundle_replaces_tags_with_one_fingerprinted_file(tmp_path):
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'one.js').write_text("var a = 1;\n", encoding='utf-8')
+    (tmp_path / 'js' / 'two.js').write_text("var b = 2;\n", encoding='utf-8')
+    html = (
+        '<body>\n'
+        '    <script src="js/one.js"></script>\n'
+        '    <script src="https://cdn.example.com/lib.js"></script>\n'
+        '    <script src="js/two.js"></script>\n'
+        '</body>\n'
+    )
+    
+    html, entry = build.bundle(tmp_path, html, build.SCRIPT_TAG, 'js', build.minify_js, ';\n')
+    
+    content = (tmp_path / entry['file']).read_text(encoding='utf-8')
+    assert content == "var a=1;\n;\nvar b=2;\n"
+    assert entry['file'] == f"js/app.{build.fingerprint(content.encode('utf-8'))}.js"
+    assert entry['sources'] == ['js/one.js', 'js/two.js']
+    assert html == (
+        '<body>\n'
+        f'    <script src="{entry["file"]}"></script>\n'
+        '    <script src="https://cdn.example.com/lib.js"></script>\n'
+        '</body>\n'
+    )
+    assert not (tmp_path / 'js' / 'one.js').exists()
+
+
+def test_bundle_without_local_assets_is_a_no_op(tmp_path):
+    html = '<link rel="stylesheet" href="https://cdn.example.com/x.css">\n'
+    assert build.bundle(tmp_path, html, build.STYLESHEET_TAG, 'css', None, '\n') == (html, None)
+
+
+def test_precompress_skips_small_and_binary_files(monkeypatch, tmp_path):
+    monkeypatch.setattr(build, 'brotli', None)
+    big = 'body { color: red; }\n' * 200
+    (tmp_path / 'app.css').write_text(big, encoding='utf-8')
+    (tmp_path / 'tiny.css').write_text('a{}', encoding='utf-8')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\0' * 4096)
+    
+    assert build.precompress(tmp_path) == 1
+    assert gzip.decompress((tmp_path / 'app.css.gz').read_bytes()).decode('utf-8') == big
+    assert not (tmp_path / 'tiny.css.gz').exists()
+    assert not (tmp_path / 'logo.png.gz').exists()
@@ -0,0 +1,113 @@
+"""Tests for the TTL + LRU response cache and stale-while-revalidate serving"""
+
+import threading
+import time
+import pytest
+from backend import cache as cache_module
+from backend.cache import ResponseCache, create_cache, deserialize_value, serialize_value
+from backend.weather_service import WeatherService
+
+
+@pytest.fixture
+def cache(clock, monkeypatch):
+    clock.install(monkeypatch, cache_module)
+    return ResponseCache(max_entries=3)
+
+
+def test_fresh_then_stale_then_expired(cache, clock):
+    cache.set('k', 'v', ttl=10, stale_ttl=5)
+    
+    assert cache.get('k').is_fresh(clock.now)
+    clock.advance(12)
+    entry = cache.get('k')
+    assert entry.value == 'v' and not entry.is_fresh(clock.now)
+    clock.advance(5)
+    assert cache.get('k') is None
+    
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['staleHits'], stats['misses'], stats['expirations']) == (1, 1, 1, 1)
+
+
+def test_peek_keeps_expired_entries_for_the_retain_window(cache, clock):
+    cache.set('k', 'v', ttl=10)
+    clock.advance(10 + cache.RETAIN - 1)
+    assert cache.get('k') is None
+    assert cache.peek('k').value == 'v'
+    clock.advance(1)
+    assert cache.peek('k') is None
+
+
+def test_lru_eviction_prefers_least_recently_used(cache):
+    for key in 'abc':
+        cache.set(key, key, ttl=60)
+    cache.get('a')
+    cache.set('d', 'd', ttl=60)
+    
+    assert cache.get('b') is None
+    assert [cache.get(key).value for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.get_stats()['evictions'] == 1
+    assert len(cache) == 3
+
+
+def test_refresh_claim_is_exclusive(cache):
+    assert cache.begin_refresh('k')
+    assert not cache.begin_refresh('k')
+    cache.end_refresh('k')
+    assert cache.begin_refresh('k')
+
+
+def test_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        ResponseCache(max_entries=0)
+
+
+def test_serialization_round_trip_compresses_large_values():
+    small = {'temperature': 12.5, 'city': 'London'}
+    large = [{'time': '2024-01-01T00:00:00', 'temperature': i} for i in range(100)]
+    
+    assert serialize_value(small)[:1] == b'j'
+    assert serialize_value(large)[:1] == b'z'
+    assert deserialize_value(serialize_value(small)) == small
+    assert deserialize_value(serialize_value(large)) == large
+
+
+def test_create_cache_rejects_unknown_scheme():
+    assert isinstance(create_cache(None), ResponseCache)
+    with pytest.raises(ValueError):
+        create_cache('memcached://localhost')
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    """Poll until a condition set by a background thread holds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def test_service_serves_stale_entry_while_one_refresh_runs(cache, clock):
+    service = WeatherService('test-key', cache=cache, current_ttl=10, stale_ttl=30)
+    release = threading.Event()
+    calls = []
+    
+    def fake_fetch(endpoint, query):
+        calls.append(query)
+        if len(calls) > 1:
+            release.wait(5)
+        return {'temperature': len(calls)}
+    
+    service._fetch = fake_fetch
+    city = 'Nowhere Special'
+    assert service.get_current_weather_result(city).data['temperature'] == 1
+    
+    clock.advance(15)
+    for _ in range(3):
+        result = service.get_current_weather_result(city)
+        assert result.data['temperature'] == 1
+    wait_for(lambda: len(calls) == 2)
+    assert cache.get_stats()['refreshing'] == 1  # one background refresh for three stale hits
+    
+    release.set()
+    wait_for(lambda: not cache.get_stats()['refreshing'])
+    assert service.get_current_weather_result(city).data['temperature'] == 2
+    service.close()
@@ -0,0 +1,95 @@
+"""Tests for the circuit breaker and degraded-mode serving"""
+
+import pytest
+import requests
+from backend import cache as cache_module, circuit_breaker as breaker_module
+from backend.cache import ResponseCache
+from backend.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession
+
+
+@pytest.fixture
+def clocked(clock, monkeypatch):
+    return clock.install(monkeypatch, cache_module, breaker_module)
+
+
+def make_breaker(**options) -> CircuitBreaker:
+    return CircuitBreaker(**dict({'window': 4, 'min_calls': 4, 'open_seconds': 30}, **options))
+
+
+def test_opens_at_the_failure_rate_and_rejects_calls(clocked):
+    breaker = make_breaker()
+    for failed in (False, True, False):
+        breaker.record(0.1, failed)
+    assert breaker.state == CLOSED  # fewer than min_calls
+    breaker.record(0.1, True)
+    assert breaker.state == OPEN
+    
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call()
+    assert raised.value.retry_after == pytest.approx(30.0)
+    assert breaker.get_stats()['rejected'] == 1
+
+
+def test_opens_when_most_calls_are_slow(clocked):
+    breaker = make_breaker(slow_call_seconds=1.0, slow_call_rate=0.75)
+    for latency in (2.0, 2.0, 0.5, 2.0):
+        breaker.record(latency, False)
+    assert breaker.state == OPEN
+
+
+def test_window_forgets_old_outcomes(clocked):
+    breaker = make_breaker()
+    for failed in (True, False, False, False, False, False):
+        breaker.record(0.1, failed)
+    assert breaker.get_stats()['failureRate'] == 0.0
+
+
+def test_half_open_probe_closes_or_reopens(clocked):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(0.1, True)
+    clocked.advance(30)
+    assert breaker.state == HALF_OPEN
+    
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record(0.1, True)
+    assert breaker.state == OPEN
+    
+    clocked.advance(30)
+    breaker.before_call()
+    breaker.record(0.1, False)
+    assert breaker.state == CLOSED
+    assert breaker.get_stats()['opens'] == 2
+
+
+def test_released_probe_can_be_retaken(clocked):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(0.1, True)
+    clocked.advance(30)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+
+
+def test_open_circuit_serves_stale_cache_then_503(clocked, london_weather):
+    session = FakeSession(FakeResponse(200, london_weather), requests.exceptions.ConnectionError('reset'))
+    service = WeatherService('test-key', cache=ResponseCache(), session=session, breaker=make_breaker(min_calls=1),
+                             current_ttl=10, stale_ttl=0, max_retries=0)
+    fresh = service.get_current_weather_result('London')
+    
+    clocked.advance(20)
+    with pytest.raises(Exception, match='Network error'):
+        service.get_current_weather_result('London')
+    assert service.is_degraded()
+    
+    result = service.get_current_weather_result('London')
+    assert result.stale and result.data == fresh.data
+    assert len(session.calls) == 2  # the open circuit made no call
+    assert service.get_circuit_stats()['staleServed'] == 1
+    with pytest.raises(CircuitOpenError):
+        service.get_current_weather_result('Paris')
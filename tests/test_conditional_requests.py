@@ -0,0 +1,82 @@
+"""Tests for ETag validation and Cache-Control on the weather API"""
+
+import pytest
+import requests
+from backend import cache as cache_module, json_codec, weather_service as weather_service_module
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession
+
+app_module = pytest.importorskip('app')
+
+TTL = 600
+STALE = 300
+
+
+@pytest.fixture
+def client(clock, monkeypatch, london_weather):
+    """Flask test client backed by a fresh service answering from a script, on a fake clock"""
+    clock.install(monkeypatch, cache_module, json_codec, weather_service_module)
+    session = FakeSession(FakeResponse(200, london_weather), requests.exceptions.ConnectionError('offline'))
+    service = WeatherService('test-key', session=session, current_ttl=TTL, stale_ttl=STALE, max_retries=0)
+    monkeypatch.setattr(app_module, 'weather_service', service)
+    client = app_module.app.test_client()
+    client.clock = clock
+    client.service = service
+    return client
+
+
+def get(client, **headers):
+    return client.get('/api/weather/current?city=London', headers=headers)
+
+
+def test_matching_etag_gets_an_empty_304(client):
+    first = get(client)
+    assert first.status_code == 200 and first.headers['ETag']
+    
+    second = get(client, **{'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.headers['Cache-Control'] == first.headers['Cache-Control']
+
+
+@pytest.mark.parametrize('tag', ['"not-the-tag"', 'W/{etag}', '"other", W/{etag}'])
+def test_weak_or_mismatched_etag_gets_the_full_body(client, tag):
+    etag = get(client).headers['ETag']
+    
+    response = get(client, **{'If-None-Match': tag.format(etag=etag)})
+    
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+
+
+def test_any_listed_current_tag_matches(client):
+    etag = get(client).headers['ETag']
+    assert get(client, **{'If-None-Match': f'"other", {etag}'}).status_code == 304
+
+
+def test_max_age_counts_down_to_fresh_until(client):
+    assert get(client).headers['Cache-Control'] == (
+        f'public, max-age={TTL}, s-maxage={TTL}, stale-while-revalidate={STALE}')
+    
+    client.clock.advance(100)
+    assert get(client).headers['Cache-Control'].startswith(f'public, max-age={TTL - 100}, s-maxage={TTL - 100},')
+    
+    client.clock.advance(TTL)  # past fresh_until, inside the stale window
+    assert get(client).headers['Cache-Control'].startswith('public, max-age=0, s-maxage=0,')
+
+
+def test_stale_bodies_are_encoded_once_per_entry(client, monkeypatch):
+    fresh = get(client)
+    client.clock.advance(TTL + 10)  # served stale while a (failing) refresh runs
+    encoded = []
+    original = weather_service_module.encode_body
+    monkeypatch.setattr(weather_service_module, 'encode_body', lambda *args: encoded.append(1) or original(*args))
+    
+    stale = get(client)
+    revalidated = get(client, **{'If-None-Match': stale.headers['ETag']})
+    
+    assert stale.status_code == 200 and revalidated.status_code == 304
+    assert stale.headers['ETag'] == fresh.headers['ETag']  # same data, same bytes
+    assert len(encoded) == 0
+    assert client.service.get_body_cache_stats()['reused'] == 2
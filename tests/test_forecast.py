@@ -0,0 +1,96 @@
+"""Tests for the single-pass forecast parser and its NumPy rollup path"""
+
+import copy
+import pytest
+from backend import forecast
+from backend.forecast import DayRollup, parse_forecast, parse_forecasts
+from tests.conftest import load_payload
+
+FIXTURES = ['forecast_london', 'forecast_chicago', 'forecast_mumbai']
+
+
+def item(temperature, main, precipitation=0.0, description=''):
+    return {'temperature': temperature, 'main': main, 'precipitation': precipitation,
+            'description': description or main.lower(), 'icon': '01d'}
+
+
+def edge_payload() -> dict:
+    """Recorded forecast with missing readings, snow and an entry without weather"""
+    data = load_payload('forecast_london')
+    data['list'][1]['main'].pop('temp')
+    data['list'][2]['snow'] = {'3h': 1.25}
+    data['list'][2]['rain'] = {'3h': 0.5}
+    data['list'][3].pop('weather')
+    return data
+
+
+def test_day_rollup_aggregates_and_picks_the_dominant_condition():
+    day = DayRollup('2024-01-01T00:00:00')
+    for entry in (item(4.0, 'Clouds'), item(None, 'Rain', 1.5), item(8.0, 'Rain', 0.25),
+                  item(6.0, 'Clouds', description='overcast')):
+        day.add(entry)
+    
+    result = day.to_dict()
+    
+    assert (result['temperature'], result['tempMin'], result['tempMax']) == (6.0, 4.0, 8.0)
+    assert result['precipitation'] == 1.75
+    # Clouds and Rain tie at two items each; the earlier condition wins with its first item
+    assert (result['main'], result['description']) == ('Clouds', 'clouds')
+    assert len(result['items']) == 4
+
+
+def test_day_without_temperatures_has_no_rollup_temperatures():
+    day = DayRollup('2024-01-01T00:00:00')
+    day.add(item(None, 'Clear'))
+    result = day.to_dict()
+    assert (result['temperature'], result['tempMin'], result['tempMax']) == (None, None, None)
+
+
+@pytest.mark.parametrize('name', FIXTURES)
+def test_rollups_match_the_items_they_summarize(name):
+    days = parse_forecast(load_payload(name))
+    
+    assert 1 <= len(days) <= forecast.MAX_DAYS
+    assert sum(len(day['items']) for day in days) <= len(load_payload(name)['list'])
+    for day in days:
+        temps = [entry['temperature'] for entry in day['items'] if entry['temperature'] is not None]
+        assert day['date'] == day['items'][0]['time']
+        assert {entry['time'][:10] for entry in day['items']} == {day['date'][:10]}
+        assert day['temperature'] == pytest.approx(sum(temps) / len(temps))
+        assert (day['tempMin'], day['tempMax']) == (min(temps), max(temps))
+        assert day['precipitation'] == round(sum(entry['precipitation'] for entry in day['items']), 2)
+
+
+def test_missing_fields_are_tolerated():
+    days = parse_forecast(edge_payload())
+    entries = [entry for day in days for entry in day['items']]
+    
+    assert entries[1]['temperature'] is None
+    assert entries[2]['precipitation'] == 1.75
+    assert (entries[3]['icon'], entries[3]['main']) == ('01d', '')
+    assert parse_forecast({'list': []}) == [] and parse_forecast({}) == []
+
+
+def test_max_days_limits_the_output():
+    assert len(parse_forecast(load_payload('forecast_london'), max_days=2)) == 2
+
+
+def test_pure_python_batch_equals_single_parses():
+    payloads = [load_payload(name) for name in FIXTURES] + [edge_payload(), {}]
+    assert parse_forecasts(copy.deepcopy(payloads), use_numpy=False) == [parse_forecast(data) for data in payloads]
+
+
+def test_numpy_path_matches_the_pure_python_path():
+    pytest.importorskip('numpy')
+    payloads = [load_payload(name) for name in FIXTURES] + [edge_payload(), {}]
+    
+    vectorized = parse_forecasts(copy.deepcopy(payloads), use_numpy=True)
+    
+    assert vectorized == parse_forecasts(copy.deepcopy(payloads), use_numpy=False)
+
+
+def test_forcing_numpy_without_it_installed_fails(monkeypatch):
+    monkeypatch.setattr(forecast, '_numpy', False)
+    with pytest.raises(RuntimeError):
+        parse_forecasts([load_payload('forecast_london')], use_numpy=True)
+    assert parse_forecasts([{}]) == [[]]
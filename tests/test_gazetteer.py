@@ -0,0 +1,118 @@
+"""Tests for the city index and the negative cache of unknown city names"""
+
+import gzip
+import json
+import pytest
+from backend import cache as cache_module, gazetteer
+from backend.gazetteer import CityIndex, get_city_index, load_city_index, normalize_city_name
+from backend.weather_service import CityNotFoundError, WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+NOT_FOUND = FakeResponse(404, {'cod': '404', 'message': 'city not found'})
+
+
+@pytest.fixture
+def city_list(tmp_path):
+    """A small city.list.json.gz standing in for OpenWeatherMap's full list"""
+    path = tmp_path / 'city.list.json.gz'
+    entries = [
+        {'id': 6058560, 'name': 'London', 'country': 'CA', 'coord': {'lat': 42.98, 'lon': -81.23}},
+        {'id': 2867714, 'name': 'Munich', 'country': 'DE', 'coord': {'lat': 48.14, 'lon': 11.58}},
+        {'id': 2867993, 'name': 'Münster', 'country': 'DE', 'coord': {'lat': 51.96, 'lon': 7.63}},
+    ]
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(entries, f)
+    return str(path)
+
+
+def test_normalized_names_share_one_key():
+    assert normalize_city_name('  SÃO   paulo ') == normalize_city_name('Sao Paulo') == 'sao paulo'
+
+
+def test_spellings_resolve_to_one_canonical_id():
+    index = load_city_index()
+    assert index.lookup('LONDON ').id == index.lookup('london').id == 2643743
+    assert index.lookup('São Paulo') == index.lookup('sao paulo')
+    assert index.get(2643743).name == 'London'
+    assert index.lookup('Atlantis') is None and index.get(1) is None
+    
+    service = WeatherService('test-key')
+    assert service._resolve_city('  london', '/weather') == ('id:2643743', {'id': 2643743})
+    assert service._resolve_city('Atlantis', '/weather') == ('q:atlantis', {'q': 'Atlantis'})
+
+
+def test_first_row_wins_for_a_shared_name():
+    index = CityIndex([(1, 'Springfield', 'US', 0, 0), (2, 'springfield', 'US', 1, 1)])
+    assert len(index) == 1 and index.lookup('SPRINGFIELD').id == 1
+
+
+def test_suggest_scans_a_prefix_in_alphabetical_order(city_list):
+    index = load_city_index(full_path=city_list)
+    
+    assert [city.name for city in index.suggest('mun')] == ['Munich', 'Münster']
+    assert [city.name for city in index.suggest('MÜN', limit=1)] == ['Munich']
+    assert index.suggest('') == [] and index.suggest('zzzz') == []
+
+
+def test_seed_wins_over_the_full_list(city_list):
+    index = load_city_index(full_path=city_list)
+    assert index.lookup('London').country == 'GB'
+    assert index.lookup('Münster').id == 2867993
+
+
+def test_index_is_authoritative_only_with_the_full_list(city_list, monkeypatch):
+    monkeypatch.setattr(gazetteer, '_index', None)
+    monkeypatch.delenv(gazetteer.INDEX_ENV, raising=False)
+    assert not get_city_index().authoritative
+    
+    monkeypatch.setattr(gazetteer, '_index', None)
+    monkeypatch.setenv(gazetteer.INDEX_ENV, city_list)
+    assert get_city_index().authoritative
+    monkeypatch.setattr(gazetteer, '_index', None)
+
+
+def test_unknown_name_is_rejected_locally_by_an_authoritative_index(city_list):
+    session = FakeSession(FakeResponse(200, load_payload('weather_london')))
+    service = WeatherService('test-key', session=session)
+    service._city_index = load_city_index(full_path=city_list)
+    
+    with pytest.raises(CityNotFoundError):
+        service.get_current_weather('Atlantis')
+    assert session.calls == []
+
+
+def test_upstream_404_for_a_name_is_cached(clock, monkeypatch):
+    clock.install(monkeypatch, cache_module)
+    session = FakeSession(NOT_FOUND)
+    service = WeatherService('test-key', session=session, negative_ttl=60, max_retries=0)
+    
+    for _ in range(3):
+        with pytest.raises(CityNotFoundError):
+            service.get_current_weather('Atlantis')
+    assert len(session.calls) == 1
+    
+    clock.advance(61)
+    with pytest.raises(CityNotFoundError):
+        service.get_current_weather('Atlantis')
+    assert len(session.calls) == 2
+
+
+def test_negative_cache_can_be_disabled():
+    session = FakeSession(NOT_FOUND)
+    service = WeatherService('test-key', session=session, negative_ttl=0, max_retries=0)
+    for _ in range(2):
+        with pytest.raises(CityNotFoundError):
+            service.get_current_weather('Atlantis')
+    assert len(session.calls) == 2
+
+
+def test_negative_cache_check_does_not_count_as_a_lookup(london_weather):
+    service = WeatherService('test-key', session=FakeSession(NOT_FOUND, FakeResponse(200, london_weather)),
+                             max_retries=0)
+    with pytest.raises(CityNotFoundError):
+        service.get_current_weather('Atlantis')
+    service.get_current_weather('London')
+    service.get_current_weather('London')
+    
+    stats = service.get_cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
@@ -0,0 +1,154 @@
+"""Tests for racing a slow or failing primary provider against the secondary"""
+
+import asyncio
+import time
+import pytest
+from backend.async_weather_service import AsyncWeatherService
+from backend.providers import HedgePolicy, create_provider
+from backend.weather_service import CityNotFoundError, WeatherService
+
+HEDGE_DELAY = 0.05  # seconds the primary gets before a hedge while it has no latency history
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def make_service(service_class, budget_burst: int = 10):
+    hedge = HedgePolicy(budget=0.1, burst=budget_burst)
+    hedge.DEFAULT_DELAY = HEDGE_DELAY
+    return service_class('test-key', secondary=create_provider('openmeteo'), hedge=hedge)
+
+
+def script(service, primary, secondary):
+    """
+    Replace the provider calls with (seconds, value or exception) scripts
+    
+    Returns:
+        Dictionary of provider name -> 'done', 'cancelled' or 'failed'
+    """
+    outcomes = {}
+    plans = {service.primary: primary, service.secondary: secondary}
+    
+    def finish(provider, result):
+        outcomes[provider.name] = 'failed' if isinstance(result, Exception) else 'done'
+        if isinstance(result, Exception):
+            raise result
+        return result
+    
+    if isinstance(service, AsyncWeatherService):
+        async def fetch_from(provider, endpoint, params, place=None):
+            seconds, result = plans[provider]
+            try:
+                await asyncio.sleep(seconds)
+            except asyncio.CancelledError:
+                outcomes[provider.name] = 'cancelled'
+                raise
+            return finish(provider, result)
+    else:
+        def fetch_from(provider, endpoint, params, place=None, cancel=None):
+            seconds, result = plans[provider]
+            time.sleep(seconds)
+            return finish(provider, result)
+    
+    service._fetch_from = fetch_from
+    return outcomes
+
+
+def race(service):
+    if isinstance(service, AsyncWeatherService):
+        async def run():
+            try:
+                return await service._fetch_hedged('/weather', {'q': 'London'}, {}, None)
+            finally:
+                await service.aclose()
+        return asyncio.run(run())
+    try:
+        return service._fetch_hedged('/weather', {'q': 'London'}, {}, None)
+    finally:
+        service.close()
+
+
+services = pytest.mark.parametrize('service_class', [WeatherService, AsyncWeatherService])
+
+
+@services
+def test_fast_primary_is_not_hedged(service_class):
+    service = make_service(service_class)
+    outcomes = script(service, (0, 'primary'), (0, 'secondary'))
+    
+    assert race(service) == 'primary'
+    assert outcomes == {service.primary.name: 'done'}
+    assert service.hedge.get_stats()['hedged'] == 0
+
+
+@services
+def test_slow_primary_loses_to_the_hedge(service_class):
+    service = make_service(service_class)
+    outcomes = script(service, (0.5, 'primary'), (0, 'secondary'))
+    
+    assert race(service) == 'secondary'
+    stats = service.hedge.get_stats()
+    assert (stats['hedged'], stats['hedgeWins'], stats['failovers']) == (1, 1, 0)
+    if service_class is AsyncWeatherService:
+        assert outcomes[service.primary.name] == 'cancelled'
+
+
+@services
+def test_slow_primary_still_wins_against_a_slower_hedge(service_class):
+    service = make_service(service_class)
+    script(service, (0.1, 'primary'), (0.5, 'secondary'))
+    
+    assert race(service) == 'primary'
+    stats = service.hedge.get_stats()
+    assert (stats['hedged'], stats['hedgeWins']) == (1, 0)
+
+
+@services
+def test_failed_primary_fails_over(service_class):
+    service = make_service(service_class)
+    script(service, (0, UpstreamError('primary down')), (0, 'secondary'))
+    
+    assert race(service) == 'secondary'
+    stats = service.hedge.get_stats()
+    assert (stats['failovers'], stats['failoverWins'], stats['hedged']) == (1, 1, 0)
+
+
+@services
+def test_city_not_found_from_the_primary_is_final(service_class):
+    service = make_service(service_class)
+    outcomes = script(service, (0, CityNotFoundError()), (0, 'secondary'))
+    
+    with pytest.raises(CityNotFoundError):
+        race(service)
+    assert service.secondary.name not in outcomes
+
+
+@services
+def test_primary_error_is_raised_when_both_fail(service_class):
+    service = make_service(service_class)
+    script(service, (0, UpstreamError('primary down')), (0, UpstreamError('secondary down')))
+    
+    with pytest.raises(UpstreamError, match='primary down'):
+        race(service)
+
+
+@services
+def test_spent_budget_waits_for_the_primary(service_class):
+    service = make_service(service_class, budget_burst=0)
+    outcomes = script(service, (0.1, 'primary'), (0, 'secondary'))
+    
+    assert race(service) == 'primary'
+    assert service.secondary.name not in outcomes
+    assert service.hedge.get_stats()['overBudget'] == 1
+
+
+def test_delay_follows_the_primary_percentile_once_trusted():
+    primary = create_provider('openmeteo')
+    hedge = HedgePolicy(percentile=0.5)
+    assert hedge.delay(primary, '/weather') == HedgePolicy.DEFAULT_DELAY
+    
+    for i in range(HedgePolicy.MIN_SAMPLES):
+        primary.observe('/weather', 0.1 + i * 0.01)
+    assert hedge.delay(primary, '/weather') == pytest.approx(0.2)
+    assert HedgePolicy(percentile=0).delay(primary, '/weather') is None
@@ -0,0 +1,107 @@
+"""Tests for the columnar weather history store"""
+
+import os
+from datetime import datetime
+import pytest
+from backend.history import HistoryStore, downsample, widen_step
+
+T0 = 1_699_999_200  # a whole hour
+
+
+def iso(t: int) -> str:
+    return datetime.fromtimestamp(t).isoformat()
+
+
+def temperatures(points: list) -> list:
+    return [(point['time'], point['temperature']) for point in points]
+
+
+def test_append_and_query_a_range(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.append('observed', 'id:1', [(T0 + i * 600, 10.0 + i, 80, 1013, None) for i in range(6)]) == 6
+    
+    step, points = store.query('observed', 'id:1', T0 + 600, T0 + 1800)
+    
+    assert step == 0
+    assert temperatures(points) == [(iso(T0 + 600), 11.0), (iso(T0 + 1200), 12.0), (iso(T0 + 1800), 13.0)]
+    assert points[0] == {'time': iso(T0 + 600), 'temperature': 11.0, 'humidity': 80.0, 'pressure': 1013.0, 'windSpeed': None}
+
+
+def test_unknown_location_and_series(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.query('observed', 'id:404', T0, T0 + 3600) == (0, [])
+    with pytest.raises(ValueError):
+        store.query('hourly', 'id:1', T0, T0 + 3600)
+
+
+def test_newest_sample_for_a_timestamp_wins(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append('forecast', 'id:1', [(T0, 10.0, 1, 1, 1), (T0 + 10800, 12.0, 1, 1, 1)])
+    store.append('forecast', 'id:1', [(T0 + 10800, 15.0, 1, 1, 1), (T0 + 21600, 16.0, 1, 1, 1)])
+    
+    _, points = store.query('forecast', 'id:1', T0, T0 + 21600)
+    
+    assert temperatures(points) == [(iso(T0), 10.0), (iso(T0 + 10800), 15.0), (iso(T0 + 21600), 16.0)]
+
+
+def test_sealing_and_compaction_keep_one_sorted_row_per_timestamp(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=2, compact_segments=2)
+    # Out of order and overlapping, across several sealed segments
+    for t, temperature in [(3, 3.0), (1, 1.0), (2, 2.0), (1, 1.5), (5, 5.0), (4, 4.0), (2, 2.5), (6, 6.0), (7, 7.0)]:
+        store.append('observed', 'id:1', [(T0 + t * 60, temperature, None, None, None)])
+    
+    stats = store.get_stats()
+    assert stats['sealed'] == 4
+    assert stats['compactions'] == 2
+    names = os.listdir(tmp_path / 'observed' / 'id%3A1')
+    assert [name for name in names if name.startswith('seg-')] == [max(names)]
+    assert max(names).endswith('c')
+    
+    _, points = store.query('observed', 'id:1', T0, T0 + 3600)
+    assert [point['temperature'] for point in points] == [1.5, 2.5, 3.0, 4.0, 5.0, 6.0, 7.0]
+
+
+def test_compact_folds_in_sealed_segments_on_demand(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_rows=1, compact_segments=100)
+    store.append('observed', 'id:1', [(T0 + 60, 2.0, None, None, None)])
+    store.append('observed', 'id:1', [(T0, 1.0, None, None, None)])
+    
+    assert store.compact('observed', 'id:1')
+    assert not store.compact('observed', 'id:1')
+    _, points = store.query('observed', 'id:1', T0, T0 + 60)
+    assert [point['temperature'] for point in points] == [1.0, 2.0]
+
+
+def test_wide_ranges_are_downsampled(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append('observed', 'id:1', [(T0 + i * 600, float(i), None, None, None) for i in range(12)])
+    
+    step, points = store.query('observed', 'id:1', T0, T0 + 7200, max_points=3)
+    
+    assert step == 3600
+    assert [point['temperature'] for point in points] == [2.5, 8.5]
+    assert points[0]['humidity'] is None
+
+
+def test_widen_step_rounds_up_to_a_nice_step():
+    assert widen_step(0, 86400, 1000) == 300
+    assert widen_step(3600, 86400, 1000) == 3600
+    assert widen_step(0, 52 * 7 * 86400, 10) == 6 * 7 * 86400
+
+
+def test_downsample_averages_present_readings_only():
+    nan = float('nan')
+    rows = [(0, 1.0, nan, 1.0, 1.0), (30, 3.0, 4.0, 1.0, 1.0), (60, 5.0, nan, 1.0, 1.0)]
+    
+    first, second = downsample(rows, 60)
+    
+    assert first[:3] == (0, 2.0, 4.0)
+    assert second[:2] == (60, 5.0) and second[2] != second[2]
+
+
+def test_disk_errors_are_counted_not_raised(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    (tmp_path / 'observed').write_text('not a directory')
+    
+    assert store.append('observed', 'id:1', [(T0, 1.0, None, None, None)]) == 0
+    assert store.get_stats()['errors'] == 1
@@ -0,0 +1,158 @@
+"""Tests for content-coding negotiation and pre-encoded response bodies"""
+
+import gzip
+import json
+import types
+from datetime import datetime
+import pytest
+from backend import json_codec
+from backend.json_codec import (EncodedBody, EncodedBodyCache, MIN_COMPRESS_SIZE, accepted_encodings, encode_body,
+                                entity_tag, negotiate_encoding)
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+FAKE_BROTLI = types.SimpleNamespace(compress=lambda body, quality: b'br:' + body)
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    """Pretend the optional brotli module is installed"""
+    monkeypatch.setattr(json_codec, 'brotli', FAKE_BROTLI)
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(json_codec, 'brotli', None)
+
+
+def large_payload() -> dict:
+    return {'success': True, 'data': {'hours': [{'hour': hour, 'temperature': 15.5} for hour in range(100)]}}
+
+
+def test_accepted_encodings_drop_refused_codings():
+    assert accepted_encodings('gzip, deflate, br;q=0') == {'gzip', 'deflate'}
+    assert accepted_encodings('GZIP;q=0.5, identity; q=0.0') == {'gzip'}
+    assert accepted_encodings(None) == accepted_encodings('') == frozenset()
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('deflate', None),
+    (None, None),
+])
+def test_brotli_is_preferred_when_available(with_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize('header, expected', [('gzip, br', 'gzip'), ('br', None), ('*', 'gzip')])
+def test_gzip_is_offered_without_brotli(without_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_small_bodies_are_sent_uncompressed():
+    body = encode_body({'success': True}, 'gzip', 100.0, 700.0)
+    assert body.encoding is None
+    assert body.body == b'{"success":true}'
+    assert body.etag == entity_tag(body.body)
+    assert 'Content-Encoding' not in body.headers()
+
+
+def test_large_bodies_are_compressed_with_a_coding_specific_etag():
+    payload = large_payload()
+    identity = encode_body(payload, None, 100.0, 700.0)
+    zipped = encode_body(payload, 'gzip', 100.0, 700.0)
+    
+    assert len(identity.body) >= MIN_COMPRESS_SIZE
+    assert zipped.encoding == 'gzip' and len(zipped.body) < len(identity.body)
+    assert json.loads(gzip.decompress(zipped.body)) == payload
+    assert zipped.etag != identity.etag and zipped.etag.endswith('-gzip"')
+    assert zipped.headers()['Content-Encoding'] == 'gzip'
+    # gzip output carries no timestamp, so every worker produces the same bytes
+    assert encode_body(payload, 'gzip', 100.0, 700.0).body == zipped.body
+
+
+def test_brotli_bodies(with_brotli):
+    body = encode_body(large_payload(), 'br', 100.0, 700.0)
+    assert body.encoding == 'br' and body.body.startswith(b'br:')
+    assert body.etag.endswith('-br"')
+
+
+def test_validator_headers(clock, monkeypatch):
+    clock.install(monkeypatch, json_codec)
+    fresh = encode_body({'success': True}, None, clock.now - 100, clock.now + 500, revalidate=300)
+    headers = fresh.headers()
+    
+    assert headers['Cache-Control'] == 'public, max-age=500, s-maxage=500, stale-while-revalidate=300'
+    assert headers['Content-Type'] == 'application/json' and headers['Vary'] == 'Accept-Encoding'
+    assert headers['Last-Modified'].endswith(' GMT')
+    
+    clock.advance(600)
+    assert fresh.headers()['Cache-Control'].startswith('public, max-age=0,')
+    stale = fresh._replace(stale=True)
+    assert stale.headers()['Cache-Control'] == 'no-cache'
+
+
+def test_dumps_is_compact_and_writes_datetimes():
+    assert json_codec.dumps({'a': [1, 'é'], 'at': datetime(2024, 1, 2, 3, 4, 5)}) == \
+        '{"a":[1,"é"],"at":"2024-01-02T03:04:05"}'.encode('utf-8')
+
+
+def test_registered_encoder_can_be_selected(monkeypatch):
+    monkeypatch.setattr(json_codec, '_dumps', json_codec._dumps)
+    json_codec.register_encoder('test', lambda value: b'encoded')
+    try:
+        json_codec.use_encoder('test')
+        assert json_codec.dumps({}) == b'encoded' and json_codec.encoder_name() == 'test'
+        with pytest.raises(ValueError, match='Unknown JSON encoder'):
+            json_codec.use_encoder('missing')
+    finally:
+        del json_codec.ENCODERS['test']
+
+
+def body_at(stored_at: float, fresh_until: float, stale: bool = False) -> EncodedBody:
+    return EncodedBody(b'{}', None, '"tag"', stored_at, fresh_until, stale, 0)
+
+
+def test_body_cache_serves_fresh_bodies_and_evicts_the_least_recent():
+    cache = EncodedBodyCache(max_entries=2)
+    cache.put('a', body_at(0, 100))
+    cache.put('b', body_at(0, 100))
+    assert cache.get('a', now=50) is not None  # 'a' is now the most recent
+    cache.put('c', body_at(0, 100))
+    
+    assert cache.get('b', now=50) is None
+    assert cache.get('a', now=150) is None  # no longer fresh
+    stats = cache.get_stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (2, 1, 2)
+
+
+def test_body_cache_reuses_only_bodies_built_from_the_same_data():
+    cache = EncodedBodyCache()
+    cache.put('a', body_at(10, 100))
+    
+    assert cache.reuse('a', stored_at=10, stale=False) is not None
+    assert cache.reuse('a', stored_at=20, stale=False) is None  # refreshed data
+    assert cache.reuse('a', stored_at=10, stale=True) is None  # now a stale fallback
+    assert cache.reuse('missing', stored_at=10, stale=False) is None
+    assert cache.get_stats()['reused'] == 1
+
+
+def test_forecast_route_sends_the_pre_encoded_gzip_body(monkeypatch, without_brotli):
+    app_module = pytest.importorskip('app')
+    service = WeatherService('test-key', session=FakeSession(FakeResponse(200, load_payload('forecast_london'))))
+    monkeypatch.setattr(app_module, 'weather_service', service)
+    client = app_module.app.test_client()
+    
+    first = client.get('/api/weather/forecast?city=London', headers={'Accept-Encoding': 'gzip, br'})
+    second = client.get('/api/weather/forecast?city=London', headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/api/weather/forecast?city=London')
+    
+    assert first.headers['Content-Encoding'] == 'gzip' and first.headers['Vary'] == 'Accept-Encoding'
+    assert json.loads(gzip.decompress(first.data)) == plain.get_json()
+    assert second.data == first.data and second.headers['ETag'] == first.headers['ETag']
+    assert 'Content-Encoding' not in plain.headers and plain.headers['ETag'] != first.headers['ETag']
+    assert service.get_body_cache_stats()['hits'] == 1
+    assert len(service.session.calls) == 1
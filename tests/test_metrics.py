@@ -0,0 +1,84 @@
+"""Tests for the Prometheus registry and the weather service collector"""
+
+import asyncio
+from backend.async_weather_service import AsyncWeatherService
+from backend.metrics import Registry, service_collector
+from backend.quota import QuotaGovernor
+from backend.weather_service import WeatherService
+
+
+def sample(text: str, name: str) -> float:
+    """Value of an unlabelled sample in exposition text"""
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[1])
+    raise AssertionError(f'{name} not rendered')
+
+
+def test_collector_sums_per_service_counters_across_services():
+    sync_service = WeatherService('test-key', group_window=0.01)
+    async_service = AsyncWeatherService('test-key', cache=sync_service.cache, quota=sync_service.quota,
+                                        breaker=sync_service.breaker, group_window=0.01)
+    release = None
+    
+    async def slow_fetch(endpoint, query):
+        await release.wait()
+        return {'temperature': 20.0, 'coord': {'lat': 51.5, 'lon': -0.12}}
+    
+    async_service._fetch = slow_fetch
+    
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        waiters = [asyncio.ensure_future(async_service.get_current_weather_result('Nowhere Special'))
+                   for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*waiters)
+        await async_service.aclose()
+    
+    asyncio.run(scenario())
+    registry = Registry()
+    registry.register_collector(service_collector(sync_service, async_service))
+    text = registry.render()
+    
+    assert sample(text, 'weather_coalesced_requests_total') == 2
+    assert sample(text, 'weather_group_batches_total') == 0
+    assert text.count('# TYPE weather_coalesced_requests ') == 1
+    assert text.count('# TYPE weather_cache_lookups ') == 1
+
+
+def test_unregistered_collector_is_not_rendered():
+    registry = Registry()
+    collector = lambda: [('weather_test', 'gauge', 'Test gauge', [('', {}, 1)])]
+    registry.register_collector(collector)
+    assert 'weather_test 1' in registry.render()
+    
+    registry.unregister_collector(collector)
+    registry.unregister_collector(collector)
+    assert 'weather_test' not in registry.render()
+
+
+def remaining_samples(text: str) -> dict:
+    """weather_quota_remaining samples by window"""
+    prefix = 'weather_quota_remaining{window="'
+    return {line[len(prefix):line.index('"', len(prefix))]: float(line.split()[1])
+            for line in text.splitlines() if line.startswith(prefix)}
+
+
+def test_quota_remaining_is_rendered_only_for_enabled_windows():
+    registry = Registry()
+    service = WeatherService('test-key', quota=QuotaGovernor(per_minute=10, per_day=100))
+    registry.register_collector(service_collector(service))
+    service.quota.acquire()
+    
+    assert remaining_samples(registry.render()) == {'minute': 9, 'day': 99}
+    
+    registry = Registry()
+    registry.register_collector(service_collector(WeatherService('test-key', quota=QuotaGovernor(per_day=100))))
+    assert remaining_samples(registry.render()) == {'day': 100}
+    
+    registry = Registry()
+    registry.register_collector(service_collector(WeatherService('test-key')))
+    text = registry.render()
+    assert remaining_samples(text) == {} and 'weather_quota_remaining' not in text
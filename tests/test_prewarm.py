@@ -0,0 +1,169 @@
+"""Tests for popularity tracking and the prewarmer's choice of entries to refresh"""
+
+import pytest
+from backend import cache as cache_module, prewarm, weather_service as weather_service_module
+from backend.prewarm import PopularityCounter, Prewarmer
+from backend.quota import QuotaExceededError, QuotaGovernor
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+HALF_LIFE = 100.0
+
+
+@pytest.fixture
+def counter(clock, monkeypatch) -> PopularityCounter:
+    clock.install(monkeypatch, prewarm)
+    return PopularityCounter(half_life=HALF_LIFE, capacity=4)
+
+
+def test_hits_lose_half_their_weight_per_half_life(counter, clock):
+    counter.record('a')
+    clock.advance(HALF_LIFE)
+    counter.record('a')
+    counter.record('b')
+    
+    assert counter.top(2) == [('a', pytest.approx(1.5)), ('b', pytest.approx(1.0))]
+    clock.advance(HALF_LIFE)
+    assert counter.top(2) == [('a', pytest.approx(0.75)), ('b', pytest.approx(0.5))]
+
+
+def test_recent_hits_outrank_old_ones(counter, clock):
+    for _ in range(4):
+        counter.record('old')
+    clock.advance(3 * HALF_LIFE)
+    counter.record('new')
+    counter.record('new')
+    
+    assert [key for key, _ in counter.top(2)] == ['new', 'old']
+
+
+def test_rescaling_keeps_scores(counter, clock):
+    counter.record('a')
+    counter.record('a')
+    clock.advance(10 * HALF_LIFE)
+    counter.record('b')
+    clock.advance((PopularityCounter.RESCALE_EXPONENT - 5) * HALF_LIFE)
+    counter.record('b')  # past the rescale point: the landmark moves, 'a' decays away
+    
+    assert counter._landmark == clock.now
+    assert counter.top(5) == [('b', pytest.approx(1.0 + 2.0 ** -(PopularityCounter.RESCALE_EXPONENT - 5)))]
+
+
+def test_tracked_keys_are_bounded(counter):
+    for key in range(4):
+        for _ in range(2):
+            counter.record(key)
+    for key in range(4, 9):  # one past twice the capacity
+        counter.record(key)
+    
+    assert len(counter) == 4
+    assert sorted(key for key, _ in counter.top(10)) == [0, 1, 2, 3]
+
+
+def test_settings_must_be_positive():
+    with pytest.raises(ValueError):
+        PopularityCounter(half_life=0)
+    with pytest.raises(ValueError):
+        PopularityCounter(capacity=0)
+
+
+class StubService:
+    """The parts of WeatherService the prewarmer uses"""
+    
+    def __init__(self, popularity, quota=None, degraded=False, failures=None):
+        self.popularity = popularity
+        self.quota = quota or QuotaGovernor()
+        self.degraded = degraded
+        self.failures = failures or {}
+        self.refreshed = []
+    
+    def is_degraded(self):
+        return self.degraded
+    
+    def get_quota_stats(self):
+        return self.quota.get_stats()
+    
+    def refresh(self, endpoint, city, before):
+        if city in self.failures:
+            raise self.failures[city]
+        self.quota.acquire()
+        self.refreshed.append((endpoint, city))
+        return True
+
+
+def popular(counter, hits):
+    for city, count in hits.items():
+        for _ in range(count):
+            counter.record(('/weather', city, 'metric'))
+
+
+def make_prewarmer(service, top_n=20):
+    return Prewarmer(service, top_n=top_n, lead=0.002, interval=0.001)
+
+
+def test_only_the_hottest_keys_above_the_minimum_score_are_refreshed(counter):
+    popular(counter, {'london': 5, 'paris': 4, 'oslo': 3, 'rare': 1})
+    service = StubService(counter)
+    
+    assert make_prewarmer(service, top_n=2).run_once() == 2
+    assert service.refreshed == [('/weather', 'london'), ('/weather', 'paris')]
+    
+    service.refreshed.clear()
+    make_prewarmer(service).run_once()
+    assert ('/weather', 'rare') not in service.refreshed and len(service.refreshed) == 3
+
+
+def test_pass_stops_when_the_budget_reserve_is_reached(counter):
+    popular(counter, {'london': 5, 'paris': 4, 'oslo': 3})
+    service = StubService(counter, quota=QuotaGovernor(per_minute=4))
+    prewarmer = make_prewarmer(service)
+    
+    # Each refresh spends a call; once half of the bucket is gone the rest is kept for misses
+    assert prewarmer.run_once() == 2
+    assert service.refreshed == [('/weather', 'london'), ('/weather', 'paris')]
+    assert prewarmer.get_stats()['budgetSkips'] == 1
+
+
+def test_pass_stops_while_degraded_or_blocked(counter):
+    popular(counter, {'london': 5})
+    prewarmer = make_prewarmer(StubService(counter, degraded=True))
+    assert prewarmer.run_once() == 0 and prewarmer.get_stats()['budgetSkips'] == 1
+    
+    service = StubService(counter)
+    service.quota.block(30)
+    assert make_prewarmer(service).run_once() == 0 and service.refreshed == []
+
+
+def test_failures_skip_the_key_but_budget_errors_end_the_pass(counter):
+    popular(counter, {'london': 5, 'paris': 4, 'oslo': 3})
+    service = StubService(counter, failures={'london': RuntimeError('upstream down')})
+    prewarmer = make_prewarmer(service)
+    assert prewarmer.run_once() == 2
+    assert prewarmer.get_stats()['errors'] == 1
+    
+    service = StubService(counter, failures={'paris': QuotaExceededError(30)})
+    prewarmer = make_prewarmer(service)
+    assert prewarmer.run_once() == 1 and service.refreshed == [('/weather', 'london')]
+    assert prewarmer.get_stats()['budgetSkips'] == 1
+
+
+def test_lead_must_cover_two_intervals():
+    with pytest.raises(ValueError):
+        Prewarmer(StubService(PopularityCounter()), lead=10, interval=10)
+    with pytest.raises(ValueError):
+        Prewarmer(StubService(None))
+
+
+def test_service_refreshes_only_entries_expiring_within_the_lead(clock, monkeypatch):
+    clock.install(monkeypatch, cache_module, weather_service_module, prewarm)
+    session = FakeSession(FakeResponse(200, load_payload('weather_london')))
+    service = WeatherService('test-key', session=session, current_ttl=600, popularity=PopularityCounter())
+    for _ in range(4):  # still above MIN_SCORE once decayed for most of the TTL
+        service.get_current_weather('London')
+    prewarmer = Prewarmer(service, lead=60, interval=0.001)
+    
+    assert prewarmer.run_once() == 0  # 600 s of freshness left
+    clock.advance(600 - 30)  # due even at the latest point of the lead window
+    assert prewarmer.run_once() == 1
+    assert len(session.calls) == 2
+    assert service.cache.peek(('/weather', 'id:2643743')).fresh_until == clock.now + 600
@@ -0,0 +1,159 @@
+"""Tests for the upstream quota governor and the stale-cache fallback it triggers"""
+
+import asyncio
+import sqlite3
+import threading
+import pytest
+from backend import cache as cache_module, quota as quota_module
+from backend.async_weather_service import AsyncWeatherService
+from backend.cache import ResponseCache
+from backend.circuit_breaker import HALF_OPEN, CircuitBreaker
+from backend.quota import QuotaExceededError, QuotaGovernor, SQLiteQuotaGovernor, create_quota
+from backend.weather_service import WeatherService
+from tests.conftest import FakeResponse, FakeSession
+
+
+@pytest.fixture
+def clocked(clock, monkeypatch):
+    return clock.install(monkeypatch, cache_module, quota_module)
+
+
+def test_minute_bucket_allows_a_burst_then_refills(clocked):
+    governor = QuotaGovernor(per_minute=3)
+    for _ in range(3):
+        governor.acquire()
+    with pytest.raises(QuotaExceededError) as raised:
+        governor.acquire()
+    assert raised.value.retry_after == pytest.approx(20.0)
+    
+    clocked.advance(20)
+    governor.acquire()
+    stats = governor.get_stats()
+    assert (stats['granted'], stats['throttled'], stats['minuteRemaining']) == (4, 1, 0)
+
+
+def test_day_bucket_is_enforced_alongside_the_minute_bucket(clocked):
+    governor = QuotaGovernor(per_minute=100, per_day=2)
+    governor.acquire()
+    governor.acquire()
+    with pytest.raises(QuotaExceededError) as raised:
+        governor.acquire()
+    assert raised.value.retry_after == pytest.approx(43200.0)
+
+
+def test_upstream_429_pauses_even_an_unlimited_budget(clocked):
+    governor = QuotaGovernor()
+    governor.block(30)
+    with pytest.raises(QuotaExceededError) as raised:
+        governor.acquire()
+    assert raised.value.retry_after == pytest.approx(30.0)
+    clocked.advance(30)
+    governor.acquire()
+
+
+def test_rejects_negative_limits():
+    with pytest.raises(ValueError):
+        QuotaGovernor(per_minute=-1)
+
+
+def test_sqlite_budget_is_shared_between_workers(clocked, tmp_path):
+    path = str(tmp_path / 'quota.db')
+    first, second = SQLiteQuotaGovernor(path, per_minute=2), SQLiteQuotaGovernor(path, per_minute=2)
+    first.acquire()
+    second.acquire()
+    with pytest.raises(QuotaExceededError):
+        first.acquire()
+    
+    second.block(60)
+    clocked.advance(59)
+    with pytest.raises(QuotaExceededError):
+        first.acquire()
+
+
+def test_sqlite_upstream_429_pauses_an_unlimited_budget(clocked, tmp_path):
+    path = str(tmp_path / 'quota.db')
+    first, second = SQLiteQuotaGovernor(path, per_minute=0), SQLiteQuotaGovernor(path, per_minute=0)
+    first.acquire()
+    
+    second.block(30)
+    with pytest.raises(QuotaExceededError) as raised:
+        first.acquire()
+    assert raised.value.retry_after == pytest.approx(30.0)
+    assert first.get_stats()['throttled'] == 1
+    
+    clocked.advance(30)
+    first.acquire()
+
+
+def test_sqlite_errors_never_fail_requests(tmp_path, monkeypatch):
+    governor = SQLiteQuotaGovernor(str(tmp_path / 'quota.db'), per_minute=1)
+    
+    def broken(update):
+        raise sqlite3.OperationalError('database is locked')
+    
+    monkeypatch.setattr(governor, '_transact', broken)
+    governor.acquire()
+    governor.block(10)
+    assert governor.get_stats()['granted'] == 1
+
+
+def test_create_quota_from_url(tmp_path):
+    assert type(create_quota(None, per_minute=1)) is QuotaGovernor
+    assert isinstance(create_quota(f'sqlite:///{tmp_path}/q.db'), SQLiteQuotaGovernor)
+    with pytest.raises(ValueError):
+        create_quota('redis://localhost')
+
+
+def test_exhausted_budget_serves_the_last_cached_value(clocked, london_weather):
+    service = WeatherService('test-key', cache=ResponseCache(), session=FakeSession(FakeResponse(200, london_weather)),
+                             quota=QuotaGovernor(per_minute=1), current_ttl=10, stale_ttl=0, max_retries=0)
+    fresh = service.get_current_weather_result('London')
+    
+    clocked.advance(20)  # expired, and only a third of a token earned back
+    result = service.get_current_weather_result('London')
+    assert result.stale and result.data == fresh.data
+    assert service.get_quota_stats()['staleServed'] == 1
+    assert len(service.session.calls) == 1
+
+
+def test_upstream_429_blocks_the_budget(clocked, london_weather):
+    service = WeatherService('test-key', session=FakeSession(FakeResponse(429, {'cod': 429}, {'Retry-After': '30'})),
+                             max_retries=0)
+    with pytest.raises(QuotaExceededError) as raised:
+        service.get_current_weather('London')
+    assert raised.value.retry_after == 30.0
+    assert service.get_quota_stats()['blockedFor'] == 30.0
+
+
+class RecordingQuota(QuotaGovernor):
+    """Blocking governor that records which threads call it"""
+    
+    blocking = True
+    
+    def __init__(self, per_minute: int):
+        super().__init__(per_minute)
+        self.threads = set()
+    
+    def acquire(self) -> None:
+        self.threads.add(threading.get_ident())
+        super().acquire()
+
+
+def test_async_service_takes_blocking_quota_off_the_loop_and_releases_probes():
+    quota = RecordingQuota(per_minute=1)
+    quota.acquire()  # budget now exhausted
+    quota.threads.clear()
+    breaker = CircuitBreaker(min_calls=1, open_seconds=0)
+    breaker.record(0.1, failed=True)  # open, immediately half-open
+    service = AsyncWeatherService('test-key', quota=quota, breaker=breaker, max_retries=0)
+    
+    async def scenario():
+        with pytest.raises(QuotaExceededError):
+            await service.get_current_weather('London')
+        await service.aclose()
+        return threading.get_ident()
+    
+    loop_thread = asyncio.run(scenario())
+    assert quota.threads and loop_thread not in quota.threads
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()  # the probe slot taken by the throttled attempt was given back
@@ -0,0 +1,97 @@
+"""Tests for the RESP client and RedisCache against the in-process stand-in"""
+
+import pytest
+from backend import cache as cache_module, redis_cache as redis_module
+from backend.redis_cache import RedisCache, RedisError
+from tests.fake_redis import FakeRedis
+
+
+@pytest.fixture
+def server(clock, monkeypatch):
+    clock.install(monkeypatch, cache_module, redis_module)
+    fake = FakeRedis(clock=clock.time).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def cache(server):
+    return RedisCache.from_url(server.url())
+
+
+def test_set_and_get_round_trip(cache, clock):
+    payload = {'city': 'London', 'temperature': 15.5, 'items': list(range(400))}
+    stored = cache.set(('/weather', 'id:2643743'), payload, ttl=60, stale_ttl=30)
+    
+    entry = cache.get(('/weather', 'id:2643743'))
+    assert entry.value == payload
+    assert (entry.stored_at, entry.fresh_until, entry.stale_until) == (stored.stored_at, clock.now + 60, clock.now + 90)
+    assert cache.get(('/weather', 'id:0')) is None
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 1
+
+
+def test_entries_expire_server_side_after_retention(cache, server, clock):
+    cache.set('k', 'v', ttl=10, stale_ttl=5)
+    
+    clock.advance(20)
+    assert cache.get('k') is None  # past the stale window
+    assert cache.peek('k').value == 'v'  # still kept as a fallback
+    clock.advance(cache.RETAIN)
+    assert cache.peek('k') is None
+    assert server.keys() == []
+
+
+def test_reconnects_after_the_server_drops_the_connection(cache, server):
+    cache.set('k', 'v', ttl=60)
+    server.drop_connections()
+    
+    assert cache.get('k').value == 'v'
+    assert cache.get_stats()['errors'] == 0
+
+
+def test_unreachable_server_counts_errors_and_misses(server):
+    cache = RedisCache(port=server.port)
+    server.stop()
+    
+    assert cache.get('k') is None
+    assert cache.set('k', 'v', ttl=60).value == 'v'
+    stats = cache.get_stats()
+    assert stats['errors'] == 2 and stats['misses'] == 1
+
+
+def test_error_replies_raise_and_keep_the_connection(cache):
+    with pytest.raises(RedisError, match='unknown command'):
+        cache._execute('BOGUS')
+    assert cache._execute('PING') == b'PONG'
+
+
+def test_auth_and_database_selection(clock, monkeypatch):
+    clock.install(monkeypatch, cache_module, redis_module)
+    server = FakeRedis(password='s3cret', clock=clock.time).start()
+    try:
+        RedisCache.from_url(server.url(db=2)).set('k', 'v', ttl=60)
+        assert server.keys(db=2) == [b'weather:k']
+        assert server.keys(db=0) == []
+        assert RedisCache(port=server.port).get('k') is None  # NOAUTH is an error, not a crash
+    finally:
+        server.stop()
+
+
+def test_clear_only_touches_prefixed_keys(cache, server):
+    cache._execute('SET', 'other:app', 'keep')
+    for index in range(1200):  # more than one SCAN page and DEL batch
+        cache.set(('/weather', f'id:{index}'), index, ttl=60)
+    
+    cache.clear()
+    assert server.keys() == [b'other:app']
+    assert cache.size() is None  # not DBSIZE, which would count other:app
+    assert cache.get_stats()['size'] is None
+
+
+def test_refresh_lease_is_shared_between_workers(server):
+    first, second = RedisCache(port=server.port), RedisCache(port=server.port)
+    
+    assert first.begin_refresh('k')
+    assert not second.begin_refresh('k')
+    first.end_refresh('k')
+    assert second.begin_refresh('k')
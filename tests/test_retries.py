@@ -0,0 +1,89 @@
+"""Tests for the retry and backoff policy of WeatherService._make_request"""
+
+from email.utils import formatdate
+import pytest
+import requests
+from backend import weather_service
+from backend.quota import QuotaExceededError
+from backend.weather_service import CityNotFoundError, WeatherService
+from tests.conftest import FakeResponse, FakeSession, load_payload
+
+
+@pytest.fixture
+def clocked(clock, monkeypatch):
+    """Record backoff sleeps on the manual clock instead of waiting"""
+    return clock.install(monkeypatch, weather_service)
+
+
+def make_service(*script, max_retries=2):
+    return WeatherService('test-key', session=FakeSession(*script), max_retries=max_retries)
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_5xx_is_retried_until_success(clocked, status):
+    service = make_service(FakeResponse(status), FakeResponse(status), FakeResponse(200, load_payload('weather_london')))
+    
+    assert service.get_current_weather('London')['city'] == 'London'
+    assert len(service.session.calls) == 3
+    assert len(clocked.sleeps) == 2
+    # Full jitter: each delay is at most the doubled base
+    assert all(0 <= delay <= WeatherService.BACKOFF_BASE * 2 ** n for n, delay in enumerate(clocked.sleeps))
+
+
+def test_connection_error_is_retried(clocked):
+    service = make_service(requests.exceptions.ConnectionError(), FakeResponse(200, load_payload('weather_london')))
+    assert service.get_current_weather('London')['city'] == 'London'
+    assert len(service.session.calls) == 2
+
+
+def test_retries_are_bounded(clocked):
+    service = make_service(FakeResponse(503, {'message': 'unavailable'}), max_retries=2)
+    with pytest.raises(Exception, match='unavailable'):
+        service.get_current_weather('London')
+    assert len(service.session.calls) == 3 and len(clocked.sleeps) == 2
+
+
+@pytest.mark.parametrize('status', [400, 401, 403])
+def test_4xx_is_not_retried(clocked, status):
+    service = make_service(FakeResponse(status, {'message': 'bad request'}), FakeResponse(200, load_payload('weather_london')))
+    with pytest.raises(Exception):
+        service.get_current_weather('London')
+    assert len(service.session.calls) == 1 and clocked.sleeps == []
+
+
+def test_404_is_never_retried(clocked):
+    service = make_service(FakeResponse(404, {'cod': '404', 'message': 'city not found'}),
+                           FakeResponse(200, load_payload('weather_london')))
+    with pytest.raises(CityNotFoundError):
+        service.get_current_weather('Atlantis')
+    assert len(service.session.calls) == 1 and clocked.sleeps == []
+
+
+def test_retry_after_is_honored(clocked):
+    service = make_service(FakeResponse(503, headers={'Retry-After': '3'}),
+                           FakeResponse(200, load_payload('weather_london')))
+    service.get_current_weather('London')
+    assert clocked.sleeps == [3.0]
+
+
+def test_retry_after_http_date_is_honored(clocked):
+    later = formatdate(clocked.time() + 2, usegmt=True)
+    service = make_service(FakeResponse(429, headers={'Retry-After': later}),
+                           FakeResponse(200, load_payload('weather_london')))
+    service.get_current_weather('London')
+    assert clocked.sleeps == [pytest.approx(2.0, abs=1)]
+
+
+def test_retry_after_beyond_the_cap_is_not_waited_for(clocked):
+    service = make_service(FakeResponse(429, {'cod': 429}, {'Retry-After': str(WeatherService.BACKOFF_MAX + 26)}),
+                           FakeResponse(200, load_payload('weather_london')))
+    with pytest.raises(QuotaExceededError) as raised:
+        service.get_current_weather('London')
+    assert raised.value.retry_after == WeatherService.BACKOFF_MAX + 26
+    assert len(service.session.calls) == 1 and clocked.sleeps == []
+    
+    # A 5xx asking for too long a wait fails instead of sleeping
+    service = make_service(FakeResponse(503, {'message': 'maintenance'}, {'Retry-After': '600'}))
+    with pytest.raises(Exception, match='maintenance'):
+        service.get_current_weather('London')
+    assert len(service.session.calls) == 1 and clocked.sleeps == []
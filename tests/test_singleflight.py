@@ -0,0 +1,84 @@
+"""Tests for coalescing concurrent identical fetches"""
+
+import asyncio
+import threading
+import pytest
+from backend.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while flight.get_stats()['waiting'] < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert flight.get_stats() == {'inFlight': 0, 'waiting': 0, 'leaders': 1, 'coalesced': 4}
+
+
+def test_error_reaches_every_waiter_and_next_call_starts_fresh():
+    flight = SingleFlight()
+    
+    def fail():
+        raise LookupError('boom')
+    
+    with pytest.raises(LookupError):
+        flight.do('k', fail)
+    assert flight.do('k', lambda: 'ok') == 'ok'
+    assert flight.get_stats()['leaders'] == 2
+
+
+def test_async_callers_share_one_task():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+        
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+        
+        results = await asyncio.gather(*(flight.do('k', fetch) for _ in range(5)))
+        return results, calls, flight.get_stats()
+    
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert stats == {'inFlight': 0, 'waiting': 0, 'leaders': 1, 'coalesced': 4}
+
+
+def test_async_cancelled_caller_does_not_cancel_shared_fetch():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return 'value'
+        
+        first = asyncio.ensure_future(flight.do('k', fetch))
+        second = asyncio.ensure_future(flight.do('k', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second, first.cancelled()
+    
+    assert asyncio.run(scenario()) == ('value', True)
@@ -0,0 +1,84 @@
+"""Tests for the grid index used to reuse nearby observations"""
+
+import random
+import pytest
+from backend.spatial import SpatialIndex, haversine_km
+
+
+def brute_force(points: dict, lat: float, lon: float, radius_km: float, limit: int) -> list:
+    matches = [(key, haversine_km(lat, lon, *point)) for key, point in points.items()]
+    return sorted((match for match in matches if match[1] <= radius_km), key=lambda match: match[1])[:limit]
+
+
+def test_haversine_known_distance():
+    # London to Paris is about 344 km
+    assert haversine_km(51.5074, -0.1278, 48.8566, 2.3522) == pytest.approx(343.6, abs=1)
+    assert haversine_km(10, 20, 10, 20) == 0
+
+
+@pytest.mark.parametrize('radius_km', [2.0, 5.0, 25.0])
+def test_nearest_matches_a_full_scan(radius_km):
+    rng = random.Random(7)
+    index = SpatialIndex(cell_km=5.0)
+    points = {}
+    centres = [(51.5, -0.12), (0.0, 179.99), (89.9, 10.0), (-45.0, -179.99), (-89.95, 0.0)]
+    for i in range(3000):
+        lat, lon = rng.choice(centres)
+        point = (max(-90.0, min(90.0, lat + rng.uniform(-0.3, 0.3))), (lon + rng.uniform(-0.3, 0.3) + 180) % 360 - 180)
+        points[i] = point
+        index.add(i, *point)
+    
+    for lat, lon in centres + [(51.52, -0.1), (0.01, -179.995)]:
+        assert index.nearest(lat, lon, radius_km, limit=10) == brute_force(points, lat, lon, radius_km, 10)
+
+
+def test_search_wraps_around_the_antimeridian():
+    index = SpatialIndex()
+    index.add('east', 0.0, 179.99)
+    assert [key for key, _ in index.nearest(0.0, -179.99, 5.0)] == ['east']
+
+
+def test_search_at_the_pole_returns_each_point_once():
+    index = SpatialIndex()
+    for i, lon in enumerate(range(-180, 180, 30)):
+        index.add(i, 89.99, lon)
+    found = index.nearest(90.0, 0.0, 5.0, limit=100)
+    assert sorted(key for key, _ in found) == list(range(12))
+
+
+def test_add_moves_an_existing_key_and_discard_removes_it():
+    index = SpatialIndex()
+    index.add('station', 51.5, -0.12)
+    index.add('station', 48.85, 2.35)
+    
+    assert index.nearest(51.5, -0.12, 5.0) == []
+    assert [key for key, _ in index.nearest(48.85, 2.35, 5.0)] == ['station']
+    assert len(index) == 1
+    
+    index.discard('station')
+    index.discard('station')
+    assert len(index) == 0
+    assert index.get_stats()['cells'] == 0
+
+
+def test_oldest_points_are_dropped_beyond_max_points():
+    index = SpatialIndex(max_points=2)
+    index.add('a', 10.0, 10.0)
+    index.add('b', 10.001, 10.0)
+    index.add('c', 10.002, 10.0)
+    
+    assert sorted(key for key, _ in index.nearest(10.0, 10.0, 5.0)) == ['b', 'c']
+
+
+def test_lookup_counters():
+    index = SpatialIndex()
+    index.record(True)
+    index.record(False)
+    index.record(False)
+    stats = index.get_stats()
+    assert (stats['nearbyHits'], stats['misses']) == (1, 2)
+
+
+def test_cell_size_must_be_positive():
+    with pytest.raises(ValueError):
+        SpatialIndex(cell_km=0)
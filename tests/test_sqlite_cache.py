@@ -0,0 +1,103 @@
+"""Tests for SQLiteCache, with two instances standing in for two workers on one host"""
+
+import pytest
+from backend import cache as cache_module, sqlite_cache as sqlite_module
+from backend.sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def path(clock, monkeypatch, tmp_path):
+    clock.install(monkeypatch, cache_module, sqlite_module)
+    return str(tmp_path / 'cache' / 'weather.db')
+
+
+@pytest.fixture
+def cache(path):
+    return SQLiteCache(path)
+
+
+def test_set_and_get_round_trip_between_workers(path, clock):
+    first, second = SQLiteCache(path), SQLiteCache(path)
+    payload = {'city': 'London', 'temperature': 15.5, 'items': list(range(400))}
+    stored = first.set(('/weather', 'id:2643743'), payload, ttl=60, stale_ttl=30)
+    
+    entry = second.get(('/weather', 'id:2643743'))
+    assert entry.value == payload
+    assert (entry.stored_at, entry.fresh_until, entry.stale_until) == (stored.stored_at, clock.now + 60, clock.now + 90)
+    assert second.get(('/weather', 'id:0')) is None
+    assert second.get_stats()['hits'] == 1 and second.get_stats()['misses'] == 1
+
+
+def test_entry_is_stale_after_its_ttl_then_expires(path, clock):
+    first, second = SQLiteCache(path), SQLiteCache(path)
+    first.set('k', 'v', ttl=10, stale_ttl=5)
+    
+    clock.advance(12)  # inside the stale window
+    entry = second.get('k')
+    assert entry.value == 'v' and not entry.is_fresh() and entry.is_usable()
+    
+    clock.advance(5)  # past the stale window
+    assert second.get('k') is None
+    assert second.peek('k').value == 'v'  # still kept as a fallback
+
+
+def test_rows_past_retention_are_pruned(cache, clock):
+    cache.set('old', 'v', ttl=10, stale_ttl=5)
+    
+    clock.advance(15 + cache.RETAIN + cache.PRUNE_INTERVAL)
+    cache.set('new', 'v', ttl=10)
+    assert cache.peek('old') is None
+    assert cache.size() == 1
+    assert cache.get_stats()['expirations'] == 1
+
+
+def test_oldest_rows_are_evicted_beyond_max_entries(path, clock):
+    cache = SQLiteCache(path, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        clock.advance(cache.PRUNE_INTERVAL)
+        cache.set(key, key, ttl=600)
+    
+    assert cache.peek('a') is None and cache.size() == 2
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_refresh_lease_is_shared_between_workers(path):
+    first, second = SQLiteCache(path), SQLiteCache(path)
+    first.set('k', 'v', ttl=10, stale_ttl=5)
+    
+    assert first.begin_refresh('k')
+    assert not second.begin_refresh('k')
+    first.end_refresh('k')
+    assert second.begin_refresh('k')
+
+
+def test_store_releases_the_lease_and_an_abandoned_lease_expires(path, clock):
+    first, second = SQLiteCache(path), SQLiteCache(path)
+    first.set('k', 'v', ttl=10, stale_ttl=5)
+    
+    assert first.begin_refresh('k')
+    first.set('k', 'v2', ttl=10, stale_ttl=5)  # a successful refresh clears the lease
+    first.end_refresh('k')
+    assert second.begin_refresh('k')
+    
+    # The second worker dies without releasing its claim
+    assert not first.begin_refresh('k')
+    clock.advance(second.REFRESH_LEASE + 1)
+    assert first.begin_refresh('k')
+
+
+def test_refresh_of_a_missing_key_is_not_claimed(cache):
+    assert not cache.begin_refresh('missing')
+    cache.set('missing', 'v', ttl=10)
+    assert cache.begin_refresh('missing')
+
+
+def test_clear_and_delete_are_seen_by_every_worker(path):
+    first, second = SQLiteCache(path), SQLiteCache(path)
+    first.set('a', 1, ttl=60)
+    first.set('b', 2, ttl=60)
+    
+    second.delete('a')
+    assert first.peek('a') is None and first.get('b').value == 2
+    second.clear()
+    assert first.size() == 0
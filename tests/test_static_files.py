@@ -0,0 +1,46 @@
+"""Tests for the static asset table"""
+
+import os
+from backend.static_files import IMMUTABLE_CACHE, REVALIDATE_CACHE, StaticFiles
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write(path, content=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def test_repository_root_exposes_only_frontend_files():
+    files = StaticFiles(REPO_ROOT)
+    
+    assert files.get('index.html') is not None
+    for private in ('requirements.txt', 'app.py', 'requests.jsonl', 'Procfile', 'README.md', 'render.yaml'):
+        assert files.get(private) is None, private
+
+
+def test_top_level_files_are_filtered_by_suffix(tmp_path):
+    root = str(tmp_path)
+    for name in ('index.html', 'favicon.ico', 'robots.txt', 'secrets.env', '.hidden.html'):
+        write(os.path.join(root, name))
+    write(os.path.join(root, 'js', 'app.js'))
+    write(os.path.join(root, 'js', 'app.js.gz'))
+    
+    files = StaticFiles(root)
+    assert files.get('index.html') and files.get('favicon.ico')
+    assert files.get('robots.txt') is None and files.get('secrets.env') is None and files.get('.hidden.html') is None
+    assert files.get('js/app.js').variants == (('gzip', os.path.join(root, 'js', 'app.js.gz')),)
+    assert files.get('js/app.js.gz') is None
+
+
+def test_manifest_marks_fingerprinted_files_immutable(tmp_path):
+    root = str(tmp_path)
+    write(os.path.join(root, 'index.html'))
+    write(os.path.join(root, 'js', 'app.3f2a1b.js'))
+    write(os.path.join(root, 'asset-manifest.json'), b'{"immutable": ["js/app.3f2a1b.js"]}')
+    
+    files = StaticFiles(root)
+    assert files.built
+    assert files.get('js/app.3f2a1b.js').cache_control == IMMUTABLE_CACHE
+    assert files.get('index.html').cache_control == REVALIDATE_CACHE
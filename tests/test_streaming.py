@@ -0,0 +1,145 @@
+"""Tests for live weather stream change detection and per-client buffering"""
+
+import asyncio
+import time
+from datetime import datetime
+from backend.streaming import Subscriber, WeatherStreamHub
+from backend.weather_service import WeatherResult
+
+
+class ScriptedService:
+    """Returns the next temperature on each poll, parsed afresh with a new timestamp"""
+    
+    def __init__(self, *temperatures: float):
+        self.temperatures = list(temperatures)
+        self.polled = asyncio.Event()
+        self.polls = 0
+    
+    async def get_current_weather_result(self, city, unit='metric'):
+        self.polls += 1
+        temperature = self.temperatures.pop(0) if len(self.temperatures) > 1 else self.temperatures[0]
+        if len(self.temperatures) == 1:
+            self.polled.set()
+        data = {'city': city, 'temperature': temperature, 'timestamp': datetime.now().isoformat()}
+        return WeatherResult(data, time.time(), time.time(), False)
+
+
+def drain(subscriber) -> list:
+    """Chunks pending for a subscriber, in sending order"""
+    chunks = list(subscriber.pending.values())
+    subscriber.pending.clear()
+    subscriber._comments.clear()
+    return chunks
+
+
+async def read_weather_events(subscriber) -> list:
+    """Read a stream to its end, as a connected client does, keeping the weather events"""
+    events = []
+    while True:
+        chunk = await subscriber.next()
+        if chunk is None:
+            return events
+        if chunk.startswith(b'event: weather'):
+            events.append(chunk)
+
+
+def run_polls(*temperatures: float) -> list:
+    async def scenario():
+        service = ScriptedService(*temperatures)
+        hub = WeatherStreamHub(service)
+        hub.MIN_INTERVAL = 0.001
+        hub.JITTER = 0
+        subscriber = hub.subscribe([('London', 'metric')])
+        reader = asyncio.ensure_future(read_weather_events(subscriber))
+        await asyncio.wait_for(service.polled.wait(), 5)
+        await asyncio.sleep(0.02)  # a few more polls of the unchanged last reading
+        hub.close()
+        return await reader
+    
+    return asyncio.run(scenario())
+
+
+def test_refetch_with_only_a_new_timestamp_sends_no_event():
+    events = run_polls(20.0, 20.0, 20.0)
+    assert len(events) == 1
+
+
+def test_changed_reading_sends_an_event():
+    events = run_polls(20.0, 20.0, 21.5)
+    assert len(events) == 2
+    assert b'"temperature":21.5' in events[1]
+
+
+LONDON = ('london', 'metric')
+PARIS = ('paris', 'metric')
+
+
+def test_pending_events_are_coalesced_per_city():
+    subscriber = Subscriber([LONDON, PARIS])
+    subscriber.push(b'retry: 5000\n\n', Subscriber.RETRY_KEY)
+    subscriber.push(b'event: weather\ndata: {"t":1}\n\n', LONDON)
+    subscriber.push(b'event: weather\ndata: {"p":1}\n\n', PARIS)
+    subscriber.push(b'event: weather\ndata: {"t":2}\n\n', LONDON)
+    subscriber.push(b'event: weather\ndata: {"t":3}\n\n', LONDON)
+    
+    assert drain(subscriber) == [
+        b'retry: 5000\n\n',
+        b'event: weather\ndata: {"t":3}\n\n',  # the latest reading, in the city's place
+        b'event: weather\ndata: {"p":1}\n\n',
+    ]
+    assert subscriber.dropped == 2
+
+
+def test_comments_beyond_max_pending_drop_the_oldest_comment_only():
+    subscriber = Subscriber([LONDON])
+    subscriber.push(b'retry: 5000\n\n', Subscriber.RETRY_KEY)
+    subscriber.push(b'event: weather\ndata: {}\n\n', LONDON)
+    for index in range(Subscriber.MAX_PENDING + 3):
+        subscriber.push(f': ping {index}\n\n'.encode('ascii'))
+    subscriber.push(None)
+    
+    chunks = drain(subscriber)
+    assert chunks[:2] == [b'retry: 5000\n\n', b'event: weather\ndata: {}\n\n']
+    assert chunks[2] == b': ping 3\n\n' and len(chunks) == 2 + Subscriber.MAX_PENDING + 1
+    assert chunks[-1] is None
+    assert subscriber.dropped == 3
+
+
+def test_next_waits_for_chunks_in_order():
+    async def scenario():
+        subscriber = Subscriber([LONDON])
+        reader = asyncio.ensure_future(subscriber.next())
+        await asyncio.sleep(0)
+        assert not reader.done()
+        subscriber.push(b': ping\n\n')
+        subscriber.push(b'event: weather\ndata: {}\n\n', LONDON)
+        subscriber.push(None)
+        return [await reader, await subscriber.next(), await subscriber.next()]
+    
+    assert asyncio.run(scenario()) == [b': ping\n\n', b'event: weather\ndata: {}\n\n', None]
+
+
+def test_unsubscribe_stops_the_poller_with_its_last_subscriber():
+    async def scenario():
+        service = ScriptedService(20.0, 20.0)
+        hub = WeatherStreamHub(service)
+        hub.MIN_INTERVAL = 0.001
+        hub.JITTER = 0
+        first = hub.subscribe([('London', 'metric')])
+        second = hub.subscribe([('LONDON ', 'metric'), ('Paris', 'metric')])
+        await asyncio.wait_for(service.polled.wait(), 5)
+        assert hub.get_stats()['pollers'] == 2
+        
+        task = hub._pollers[LONDON].task
+        hub.unsubscribe(first)
+        assert not task.cancelled() and hub.get_stats()['pollers'] == 2
+        hub.unsubscribe(second)
+        await asyncio.sleep(0)
+        assert task.cancelled() and hub.get_stats()['pollers'] == 0 and hub.get_stats()['streams'] == 0
+        
+        polls = service.polls
+        await asyncio.sleep(0.02)
+        assert service.polls == polls
+        hub.close()
+    
+    asyncio.run(scenario())
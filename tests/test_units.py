@@ -0,0 +1,21 @@
+"""Tests for converting the canonical metric payloads to imperial"""
+
+from backend.utils import convert_forecast_units, convert_weather_units
+
+
+def test_imperial_matches_upstream_rounding():
+    converted = convert_weather_units({'temperature': 15.5, 'feelsLike': -40.0, 'windSpeed': 3.5, 'humidity': 65}, 'imperial')
+    assert converted == {'temperature': 59.9, 'feelsLike': -40.0, 'windSpeed': 7.83, 'humidity': 65}
+
+
+def test_metric_is_unchanged():
+    data = {'temperature': 15.5, 'windSpeed': 3.5}
+    assert convert_weather_units(data, 'metric') == data
+
+
+def test_precipitation_stays_in_millimeters():
+    days = [{'temperature': 10.0, 'precipitation': 1.97, 'items': [{'temperature': 10.0, 'precipitation': 1.97}]}]
+    converted = convert_forecast_units(days, 'imperial')
+    assert converted[0]['precipitation'] == 1.97
+    assert converted[0]['items'][0] == {'temperature': 50.0, 'precipitation': 1.97}
+    assert days[0]['temperature'] == 10.0  # input left untouched